@@ -1,7 +1,7 @@
 """Agents module for ISEA agent system"""
 
 from .base import BaseAgent
-from .context import Context, Patches, Location
+from .context import Context, Patches, Location, Candidate
 from .messages import global_message_history
 
 __all__ = [
@@ -9,5 +9,6 @@ __all__ = [
     "Context",
     "Patches",
     "Location",
+    "Candidate",
     "global_message_history"
 ]
\ No newline at end of file
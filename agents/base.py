@@ -24,12 +24,20 @@ from pydantic_ai.messages import (
 )
 from pydantic_ai.models.openai import OpenAIChatModel
 from pydantic_ai.providers.openai import OpenAIProvider
-from agents.context import Context
+from agents.context import Context, active_context
 from agents.messages import global_message_history
 from settings import settings
+from prompts.common import repo_map
 from agents.callbacks import update_context
 from utils.logging import log_event_stream, record_api_call
-from utils.metrics import increment_tool_usage, increment_agent_run, print_tool_usage_stats
+from utils.metrics import (
+    increment_tool_usage,
+    increment_agent_run,
+    print_tool_usage_stats,
+    print_tool_latency_summary,
+    track_agent_run,
+    RunStats,
+)
 import textwrap
 
 Callback: TypeAlias = Callable[..., Context]
@@ -123,6 +131,16 @@ class BaseAgent(ABC, Generic[T]):
             if ctx.deps.issue:
                 context_info.append(f"Issue: {ctx.deps.issue}")
 
+            if ctx.deps.candidates:
+                cand_strings = [
+                    f"{c.full_qualified_name} ({c.path}:{c.start_line}-{c.end_line}; {', '.join(c.reasons)})"
+                    for c in ctx.deps.candidates
+                ]
+                context_info.append(
+                    "Candidate Entities (ranked from the issue text, verify before relying on them): "
+                    + "; ".join(cand_strings)
+                )
+
             if ctx.deps.locations and ctx.deps.locations.locations:
                 loc_strings = [
                     f"{loc.path}:{loc.start_line}-{loc.end_line}"
@@ -191,6 +209,19 @@ class BaseAgent(ABC, Generic[T]):
     def get_system_prompt(self) -> str:
         pass
 
+    def repo_map_prompt(self) -> str:
+        """Ranked repo map section for get_system_prompt ("" when disabled or the graph cannot be built)"""
+        if settings.REPO_MAP_TOKENS <= 0:
+            return ""
+        # tools imports agents.context, so it cannot be imported at module level here
+        from tools.retriever_tools import get_repo_map
+        try:
+            text = get_repo_map()
+        except Exception as e:
+            print(f"Repo map unavailable: {e}")
+            return ""
+        return repo_map.format(repo_map=text) if text else ""
+
     def add_tool(self, func: Callable, name: str | None = None):
         self.dynamic_toolset.add_function(func, name=name)
 
@@ -220,15 +251,22 @@ class BaseAgent(ABC, Generic[T]):
         max_retries = 1
         base_delay = 5
 
+        run_stats = RunStats(agent_name)
+
         for attempt in range(max_retries):
             try:
-                result = await self.agent.run(
-                    message,
-                    deps=context,
-                    message_history=message_history,
-                    usage_limits=UsageLimits(request_limit=150),
-                    toolsets=toolsets,
-                )
+                context_token = active_context.set(context)
+                try:
+                    with track_agent_run(agent_name, run_stats):
+                        result = await self.agent.run(
+                            message,
+                            deps=context,
+                            message_history=message_history,
+                            usage_limits=UsageLimits(request_limit=150),
+                            toolsets=toolsets,
+                        )
+                finally:
+                    active_context.reset(context_token)
                 break
             except ModelHTTPError as e:
                 if attempt == max_retries - 1:
@@ -270,5 +308,6 @@ class BaseAgent(ABC, Generic[T]):
 
         # Print tool usage statistics after each run
         print_tool_usage_stats()
+        print_tool_latency_summary(run_stats)
 
         return result.output
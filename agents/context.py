@@ -1,3 +1,4 @@
+from contextvars import ContextVar
 from pydantic import BaseModel, Field
 from typing import List, Optional, Literal
 
@@ -45,8 +46,18 @@ class Patches(BaseModel):
     patches: List[Patch]
 
 
+class Candidate(BaseModel):
+    full_qualified_name: str
+    path: str
+    start_line: int
+    end_line: int
+    score: float = 0.0
+    reasons: List[str] = Field(default_factory=list)
+
+
 class Context(BaseModel):
     issue: str = ""
+    candidates: List[Candidate] = Field(default_factory=list)
     locations: Locations = Field(default_factory=lambda: Locations(locations=[], reasons=[]))
     suggestions: Suggestions = Field(default_factory=lambda: Suggestions(suggestions=[]))
     states: Patches = Field(default_factory=lambda: Patches(patches=[]))
@@ -60,3 +71,5 @@ class Context(BaseModel):
         
 
 
+# Context of the agent run in progress; tools read it to rank results near the current locations
+active_context: ContextVar[Optional[Context]] = ContextVar("active_context", default=None)
@@ -24,5 +24,5 @@ class FixerAgent(BaseAgent[END]):
 
     def get_system_prompt(self) -> str:
         base_dir = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        combined_prompt = fixer.format(base_dir=str(base_dir))
+        combined_prompt = fixer.format(base_dir=str(base_dir)) + self.repo_map_prompt()
         return combined_prompt
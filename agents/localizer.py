@@ -20,5 +20,5 @@ class LocalizerAgent(BaseAgent[Localize_output]):
 
     def get_system_prompt(self) -> str:
         base_dir = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        combined_prompt = localizer.format(base_dir=str(base_dir))
+        combined_prompt = localizer.format(base_dir=str(base_dir)) + self.repo_map_prompt()
         return combined_prompt
@@ -16,5 +16,5 @@ class SuggesterAgent(BaseAgent[Suggester_output]):
 
     def get_system_prompt(self) -> str:
         base_dir = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        combined_prompt = suggester.format(base_dir=str(base_dir))
+        combined_prompt = suggester.format(base_dir=str(base_dir)) + self.repo_map_prompt()
         return combined_prompt
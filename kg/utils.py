@@ -1,7 +1,7 @@
 import os
 import ast
 import json
-from typing import List, Dict
+from typing import List, Dict, Optional
 from tqdm import tqdm
 from lib2to3.refactor import RefactoringTool, get_fixers_from_package
 from pathlib import Path
@@ -70,10 +70,9 @@ class SimpleClassVisitor(ast.NodeVisitor):
     def visit_ClassDef(self, node: ast.ClassDef):
         self.class_stack.append(node.name)
 
-        # 解析 parent_class
-        parent_fqn = None
-        if node.bases:
-            parent_fqn = self.resolve_parent(node.bases[0])
+        # 解析 parent_class（第一个基类）及全部基类 parent_classes
+        parent_fqns = [self.resolve_parent(base) for base in node.bases]
+        parent_fqn = parent_fqns[0] if parent_fqns else None
 
         # 收集 methods
         func_vis = FunctionVisitor(self.file_content, self.file_path, self.class_stack, self.module_prefix)
@@ -92,7 +91,10 @@ class SimpleClassVisitor(ast.NodeVisitor):
             "end_line": node.end_lineno,
             "content": "\n".join(self.file_content.splitlines()[node.lineno-1:node.end_lineno]),
             "class_type": "inner" if len(self.class_stack)>1 else "normal",
+            "decorators": [ast.unparse(d).strip() for d in node.decorator_list],
+            "docstring": ast.get_docstring(node) or "",
             "parent_class": parent_fqn,
+            "parent_classes": parent_fqns,
             "methods": func_vis.functions,
             "constants": const_vis.constants
         })
@@ -117,16 +119,22 @@ class ConstantVisitor(ast.NodeVisitor):
         if not isinstance(node.targets[0], ast.Name):
             return
         in_class_scope = False
+        in_function = False
         current = node
         while hasattr(current, 'parent'):
             if isinstance(current.parent, ast.ClassDef):
                 in_class_scope = True
                 break
+            if isinstance(current.parent, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                in_function = True
             current = current.parent
         if not self.class_stack and in_class_scope:
             return
         if self.class_stack and not in_class_scope:
             return
+        # 方法内的局部变量不是类变量
+        if self.class_stack and in_function:
+            return
         target = node.targets[0]
         try:
             data_type = type(ast.literal_eval(node.value)).__name__
@@ -183,13 +191,326 @@ class FunctionVisitor(ast.NodeVisitor):
             "content": "\n".join(self.file_content.splitlines()[node.lineno-1:node.end_lineno]),
             "params": params,
             "modifiers": modifiers + [access],
-            "signature": f"def {node.name}({signature})",
+            "signature": f"def {node.name}({signature})" + (f" -> {ast.unparse(node.returns)}" if node.returns else ""),
+            "docstring": ast.get_docstring(node) or "",
             "class_name": self.current_class,
             "type": "constructor" if node.name == "__init__" else "normal",
             "is_class_method": is_method
         })
         self.generic_visit(node)
 
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+class SymbolVisitor(ast.NodeVisitor):
+    """
+    收集跳转定义 / 查找引用所需的原始符号信息，全局解析（跨文件 import、继承）在 retriever 中完成：
+      - scopes: 作用域 id -> {"parent", "kind", "class", "self", "bindings", "free", "stars"}
+        id 0 为模块作用域；bindings 为 name -> (首次绑定行号, import 目标或 None, 值的链或 None)，
+        值的链用于推断 x = Foo(...) / x: Foo 中 x 的类型
+      - imports: [{"alias", "target", "line", "col", "scope"}]，target 为绝对点分名称，相对导入已展开
+      - attributes: 类 fqn -> {属性名: [赋值点]}，来自方法中的 self.x = ...，
+        赋值点为 (语句起始行, 语句结束行, 方法 fqn, 类型或 None, 类型是否来自注解)
+      - occurrences: [(line, col, chain, scope, is_store)]，chain 为 Name/Attribute 链，
+        如 self.radius -> ("self", "radius")，调用记为 "()"：Foo(1).area -> ("Foo", "()", "area")；
+        基底不是名字时为 ("", "attr")
+    """
+    COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+    def __init__(self, module_prefix: str):
+        self.module_prefix = module_prefix
+        # pkg.mod 与 pkg.__init__ 所在的包都是 pkg
+        self.package = module_prefix.split(".")[:-1]
+        self.class_stack: List[str] = []
+        self.scopes: Dict[int, Dict] = {0: self._scope(None, "module")}
+        self.scope_stack = [0]
+        self.imports: List[Dict] = []
+        self.attributes: Dict[str, Dict[str, List[tuple]]] = {}
+        self.occurrences: List[tuple] = []
+
+    @staticmethod
+    def _chain(node: ast.expr):
+        """Name / Attribute / 调用组成的链，其他表达式返回 None"""
+        chain = []
+        while True:
+            if isinstance(node, ast.Attribute):
+                chain.append(node.attr)
+                node = node.value
+            elif isinstance(node, ast.Call):
+                chain.append("()")
+                node = node.func
+            elif isinstance(node, ast.Name):
+                chain.append(node.id)
+                return tuple(reversed(chain))
+            else:
+                return None
+
+    @staticmethod
+    def _scope(parent, kind, cls=None, self_name=None, method=None) -> Dict:
+        scope = {"parent": parent, "kind": kind, "class": cls, "self": self_name,
+                 "bindings": {}, "free": {}, "stars": []}
+        if method is not None:
+            scope["method"] = method
+        return scope
+
+    def _push(self, kind, cls=None, self_name=None, method=None) -> int:
+        scope_id = len(self.scopes)
+        self.scopes[scope_id] = self._scope(self.scope_stack[-1], kind, cls, self_name, method)
+        self.scope_stack.append(scope_id)
+        return scope_id
+
+    def _bind(self, name: str, line: int, target: str = None, value: tuple = None):
+        scope = self.scopes[self.scope_stack[-1]]
+        free = scope["free"].get(name)
+        if free == "nonlocal":
+            return
+        if free == "global":
+            scope = self.scopes[0]
+        scope["bindings"].setdefault(name, (line, target, value))
+
+    def _self_scope(self, name: str):
+        """name 是否为外层方法的 self / cls 参数，是则返回该方法的作用域"""
+        for scope_id in reversed(self.scope_stack):
+            scope = self.scopes[scope_id]
+            if scope["kind"] == "function":
+                if scope["self"] == name:
+                    return scope
+                if name in scope["bindings"]:
+                    return None
+        return None
+
+    def _visit_all(self, nodes):
+        for node in nodes:
+            if node is not None:
+                self.visit(node)
+
+    def _bind_arguments(self, args: ast.arguments):
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None:
+                annotation = self._chain(arg.annotation) if arg.annotation is not None else None
+                self._bind(arg.arg, arg.lineno, value=annotation + ("()",) if annotation else None)
+
+    def _visit_argument_defaults(self, args: ast.arguments):
+        self._visit_all(args.defaults + args.kw_defaults)
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self._visit_all(node.decorator_list + node.bases + [k.value for k in node.keywords])
+        self._bind(node.name, node.lineno)
+        self.class_stack.append(node.name)
+        cls_fqn = ".".join(self.module_prefix.split(".") + self.class_stack)
+        self._push("class", cls=cls_fqn)
+        self._visit_all(node.body)
+        self.scope_stack.pop()
+        self.class_stack.pop()
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self._visit_all(node.decorator_list)
+        self._visit_argument_defaults(node.args)
+        annotations = [a.annotation for a in node.args.posonlyargs + node.args.args + node.args.kwonlyargs]
+        self._visit_all(annotations + [node.returns])
+        self._bind(node.name, node.lineno)
+
+        # 类体中直接定义的方法：第一个参数（self / cls）指向所属类
+        current = self.scopes[self.scope_stack[-1]]
+        cls_fqn, self_name = None, None
+        positional = node.args.posonlyargs + node.args.args
+        is_static = any(isinstance(d, ast.Name) and d.id == "staticmethod" for d in node.decorator_list)
+        if current["kind"] == "class" and positional and not is_static:
+            cls_fqn, self_name = current["class"], positional[0].arg
+        self._push("function", cls=cls_fqn, self_name=self_name,
+                   method=f"{cls_fqn}.{node.name}" if cls_fqn else None)
+        self._bind_arguments(node.args)
+        self._visit_all(node.body)
+        self.scope_stack.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda):
+        self._visit_argument_defaults(node.args)
+        self._push("function")
+        self._bind_arguments(node.args)
+        self.visit(node.body)
+        self.scope_stack.pop()
+
+    def _visit_comprehension(self, node, elements):
+        # 第一个 for 的可迭代对象在外层作用域求值
+        self.visit(node.generators[0].iter)
+        self._push("comprehension")
+        for i, generator in enumerate(node.generators):
+            self.visit(generator.target)
+            if i:
+                self.visit(generator.iter)
+            self._visit_all(generator.ifs)
+        self._visit_all(elements)
+        self.scope_stack.pop()
+
+    def visit_ListComp(self, node):
+        self._visit_comprehension(node, [node.elt])
+
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._visit_comprehension(node, [node.key, node.value])
+
+    def visit_Global(self, node: ast.Global):
+        for name in node.names:
+            self.scopes[self.scope_stack[-1]]["free"][name] = "global"
+
+    def visit_Nonlocal(self, node: ast.Nonlocal):
+        for name in node.names:
+            self.scopes[self.scope_stack[-1]]["free"][name] = "nonlocal"
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            # import a.b 绑定的是顶层包 a；import a.b as c 绑定 c -> a.b
+            local = alias.asname or alias.name.split(".")[0]
+            target = alias.name if alias.asname else local
+            self._bind(local, node.lineno, target)
+            self.imports.append({"alias": local, "target": alias.name, "line": node.lineno,
+                                 "col": getattr(alias, "col_offset", node.col_offset), "scope": self.scope_stack[-1]})
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if node.level:
+            parts = self.package[:len(self.package) - (node.level - 1)] if node.level > 1 else list(self.package)
+            base = ".".join(parts + ([node.module] if node.module else []))
+        else:
+            base = node.module or ""
+        for alias in node.names:
+            if alias.name == "*":
+                self.scopes[self.scope_stack[-1]]["stars"].append(base)
+                self.imports.append({"alias": "*", "target": base, "line": node.lineno,
+                                     "col": getattr(alias, "col_offset", node.col_offset), "scope": self.scope_stack[-1]})
+                continue
+            local = alias.asname or alias.name
+            target = f"{base}.{alias.name}" if base else alias.name
+            self._bind(local, node.lineno, target)
+            self.imports.append({"alias": local, "target": target, "line": node.lineno,
+                                 "col": getattr(alias, "col_offset", node.col_offset), "scope": self.scope_stack[-1]})
+
+    def visit_Assign(self, node: ast.Assign):
+        self.visit(node.value)
+        value = self._chain(node.value)
+        for target in node.targets:
+            if value and isinstance(target, ast.Name):
+                self._bind(target.id, target.lineno, value=value)
+            self.visit(target)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        self._visit_all([node.annotation, node.value])
+        annotation = self._chain(node.annotation)
+        if annotation and isinstance(node.target, ast.Name):
+            self._bind(node.target.id, node.target.lineno, value=annotation + ("()",))
+        self.visit(node.target)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        if node.name:
+            self._bind(node.name, node.lineno)
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name):
+        is_store = not isinstance(node.ctx, ast.Load)
+        if is_store:
+            self._bind(node.id, node.lineno)
+        self.occurrences.append((node.lineno, node.col_offset, (node.id,), self.scope_stack[-1], is_store))
+
+    def visit_Attribute(self, node: ast.Attribute):
+        chain = self._chain(node) or ("", node.attr)
+        is_store = not isinstance(node.ctx, ast.Load)
+        if is_store and len(chain) == 2:
+            scope = self._self_scope(chain[0])
+            if scope is not None:
+                self._record_attribute(node, scope)
+        # 属性名位于表达式末尾
+        col = max(node.end_col_offset - len(node.attr), 0)
+        self.occurrences.append((node.end_lineno, col, chain, self.scope_stack[-1], is_store))
+        self.visit(node.value)
+
+    DISPLAY_TYPES = {ast.List: "list", ast.ListComp: "list", ast.Dict: "dict", ast.DictComp: "dict",
+                     ast.Set: "set", ast.SetComp: "set", ast.Tuple: "tuple", ast.JoinedStr: "str"}
+
+    def _value_type(self, value: ast.expr, function) -> Optional[str]:
+        """推断赋值右侧的类型：字面量、Foo(...) 调用、带注解的参数或 x = Foo() 绑定的局部名"""
+        if isinstance(value, ast.Constant):
+            return None if value.value is None else type(value.value).__name__
+        if type(value) in self.DISPLAY_TYPES:
+            return self.DISPLAY_TYPES[type(value)]
+        if isinstance(value, ast.Call):
+            chain = self._chain(value.func)
+            return ".".join(chain) if chain and "()" not in chain else None
+        if isinstance(value, ast.Name):
+            if function is not None:
+                args = function.args
+                for arg in args.posonlyargs + args.args + args.kwonlyargs:
+                    if arg.arg == value.id and arg.annotation is not None:
+                        return ast.unparse(arg.annotation)
+            binding = self.scopes[self.scope_stack[-1]]["bindings"].get(value.id)
+            chain = binding[2] if binding else None
+            if chain and chain[-1] == "()" and "()" not in chain[:-1]:
+                return ".".join(chain[:-1])
+        return None
+
+    def _record_attribute(self, node: ast.Attribute, scope: Dict):
+        """记录 self.x 的一次赋值：所在语句的行范围、所在方法与类型"""
+        stmt, function = node, None
+        while not isinstance(stmt, ast.stmt) and hasattr(stmt, "parent"):
+            stmt = stmt.parent
+        current = stmt
+        while hasattr(current, "parent"):
+            current = current.parent
+            if isinstance(current, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                function = current
+                break
+        data_type, annotated = None, False
+        if isinstance(stmt, ast.AnnAssign) and stmt.target is node:
+            data_type, annotated = ast.unparse(stmt.annotation), True
+        elif isinstance(stmt, ast.Assign) and any(t is node for t in stmt.targets):
+            data_type = self._value_type(stmt.value, function)
+        start = getattr(stmt, "lineno", node.lineno)
+        end = getattr(stmt, "end_lineno", node.end_lineno)
+        sites = self.attributes.setdefault(scope["class"], {}).setdefault(node.attr, [])
+        sites.append((start, end, scope.get("method"), data_type, annotated))
+
+    def instance_attributes(self, file_path: str, lines: List[str]) -> Dict[str, List[Dict]]:
+        """
+        把收集到的 self.x 赋值整理为类 fqn -> 实例属性列表，字段与 ConstantVisitor 的变量一致，另含：
+          - defined_in: 定义该属性的方法（优先 __init__，否则首次赋值的方法）
+          - assigned_in: 所有赋值过该属性的方法
+          - assignments: [[起始行, 结束行, 方法 fqn]]
+        类型优先取注解，其次取首个可推断的赋值
+        """
+        result: Dict[str, List[Dict]] = {}
+        for cls_fqn, attrs in self.attributes.items():
+            for attr, sites in attrs.items():
+                sites = sorted(sites, key=lambda site: site[0])
+                defining = next((s for s in sites if s[2] and s[2].endswith(".__init__")), sites[0])
+                annotated = [s[3] for s in sites if s[4]]
+                inferred = [s[3] for s in sites if s[3]]
+                data_type = (annotated or inferred or [None])[0]
+                assigned_in = []
+                for site in sites:
+                    if site[2] and site[2] not in assigned_in:
+                        assigned_in.append(site[2])
+                result.setdefault(cls_fqn, []).append({
+                    "name": attr,
+                    "full_qualified_name": f"{cls_fqn}.{attr}",
+                    "absolute_path": file_path,
+                    "start_line": defining[0],
+                    "end_line": defining[1],
+                    "content": "\n".join(lines[defining[0]-1:defining[1]]),
+                    "modifiers": ["instance"],
+                    "data_type": data_type,
+                    "class_name": cls_fqn,
+                    "defined_in": defining[2],
+                    "assigned_in": assigned_in,
+                    "assignments": [[s[0], s[1], s[2]] for s in sites],
+                })
+        for attrs in result.values():
+            attrs.sort(key=lambda a: a["start_line"])
+        return result
+
+    def symbols(self) -> Dict:
+        return {"scopes": self.scopes, "imports": self.imports, "occurrences": self.occurrences}
+
 
 # def parse_python_file(
 #     file_path: str,
@@ -250,7 +571,7 @@ def parse_python_file(
         tree = try_parse_with_2to3(file_content)
         if tree is None:
             print(f"[Warning] 无法解析，跳过 {file_path}")
-            return [], [], [], file_content.splitlines()
+            return [], [], [], file_content.splitlines(), {}
     add_parents(tree)
 
     # 构造 import_map，只处理顶层 from X import Y
@@ -272,14 +593,21 @@ def parse_python_file(
         independent_funcs = [f for f in func_vis.functions if not f["is_class_method"]]
         const_vis = ConstantVisitor(file_content, file_path, [], module_prefix)
         const_vis.visit(tree)
+        # 作用域、import 与名字出现位置（跳转定义 / 查找引用）
+        sym_vis = SymbolVisitor(module_prefix)
+        sym_vis.visit(tree)
+        # 方法中 self.x = ... 赋值的实例属性挂到所属类上
+        attributes = sym_vis.instance_attributes(file_path, file_content.splitlines())
+        for cls in cls_vis.classes:
+            cls["attributes"] = attributes.get(cls["full_qualified_name"], [])
     except RecursionError:
         print(f"[Warning] Recursion limit exceeded while parsing {file_path}. Skipping detailed analysis.")
-        return [], [], [], file_content.splitlines()
+        return [], [], [], file_content.splitlines(), {}
     except Exception as e:
         print(f"[Warning] Error parsing {file_path}: {e}")
-        return [], [], [], file_content.splitlines()
+        return [], [], [], file_content.splitlines(), {}
 
-    return cls_vis.classes, independent_funcs, const_vis.constants, file_content.splitlines()
+    return cls_vis.classes, independent_funcs, const_vis.constants, file_content.splitlines(), sym_vis.symbols()
 
 
 def create_structure(directory_path: str) -> Dict:
@@ -325,8 +653,9 @@ def create_structure(directory_path: str) -> Dict:
                 rel_no_ext = rel_path.with_suffix('')
                 mod_pref = ".".join(rel_no_ext.as_posix().lstrip(os.sep).split(os.sep))
 
-                cls, funcs, consts, lines = parse_python_file(full, mod_pref)
-                curr[fn] = {"classes": cls, "functions": funcs, "variables": consts, "text": lines}
+                cls, funcs, consts, lines, symbols = parse_python_file(full, mod_pref)
+                curr[fn] = {"classes": cls, "functions": funcs, "variables": consts, "text": lines,
+                            "module": mod_pref, "path": full, "symbols": symbols}
                 pbar.update(1)
             else:
                 curr[fn] = None
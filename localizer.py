@@ -2,7 +2,9 @@ import asyncio
 import json
 from pathlib import Path
 from agents.localizer import LocalizerAgent
-from agents.context import Context
+from agents.context import Context, Candidate
+from retriever.issue_ranker import rank_issue_candidates
+from tools.retriever_tools import get_retriever
 from settings import settings
 from utils.dock import (
     find_image,
@@ -21,6 +23,19 @@ class AgentOrchestrator:
         self.context = Context()
         self.context.issue = settings.PROBLEM_STATEMENT
 
+    def _precompute_candidates(self) -> None:
+        """Rank KG entities against the issue so the first LLM call already sees likely targets."""
+        if settings.ISSUE_CANDIDATES_TOP_K <= 0:
+            return
+        try:
+            candidates = rank_issue_candidates(
+                get_retriever(), settings.PROBLEM_STATEMENT, settings.ISSUE_CANDIDATES_TOP_K
+            )
+            self.context.candidates = [Candidate(**c) for c in candidates]
+            print(f"Precomputed {len(self.context.candidates)} candidate entities from the issue")
+        except Exception as e:
+            print(f"Error ranking issue candidates: {e}")
+
     async def run(self) -> None:
         """
         Run the single localizer agent system.
@@ -29,6 +44,7 @@ class AgentOrchestrator:
         print("\nRunning Localizer Agent...")
         print(f"Using the docker image :{settings.DOCKER_IMAGE}")
         localizer_instruction = "Identify the locations of the bug based on the issue description."
+        self._precompute_candidates()
 
         result = await self.localizer.run(localizer_instruction, context=self.context)
         print(f"Localizer result: {result}")
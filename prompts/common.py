@@ -75,7 +75,7 @@ common = """
 </tool>
 
 <tool name="show_file_imports">
-<description>Extract all import statements from a Python file. Essential for understanding dependencies and module relationships.</description>
+<description>List the imports of a Python file with each imported name resolved to its project class/function/module (file and line span) or marked external. Essential for understanding dependencies and module relationships.</description>
 <parameters>
 <param name="python_file_path" type="str">Path to the Python file</param>
 </parameters>
@@ -83,10 +83,12 @@ common = """
 
 <!-- Content Search Tools -->
 <tool name="search_code_with_context">
-<description>Search for keywords in Python files with surrounding code context (3 lines before and after each match). Returns file paths and line numbers.</description>
+<description>Search the project's .py files (including ones created during this session) for a substring, a whole word or a regular expression, with 3 lines of context before and after each match. Reports the total number of matches; non-test code and matches near the current bug locations are listed first. Long results end with a next_page cursor.</description>
 <parameters>
-<param name="keyword" type="str">Code element to search for (function, class, variable, or string)</param>
-<param name="search_path" type="str">Directory or file to search within</param>
+<param name="keyword" type="str">Text to search for: a function, class, variable or string, or a regular expression when mode is "regex"</param>
+<param name="search_path" type="str">Directory or file to search within ("." for the whole project)</param>
+<param name="mode" type="str" optional="true">"literal" (substring, default), "word" (whole identifier or word only) or "regex"</param>
+<param name="case_sensitive" type="bool" optional="true">Set to false for a case-insensitive search (default true)</param>
 </parameters>
 </tool>
 
@@ -99,10 +101,10 @@ common = """
 
 <!-- File System Tools -->
 <tool name="explore_directory">
-<description>List directories and files in a given path. Use for understanding project structure and finding relevant files.</description>
+<description>List directories and files in a given path, with file counts, sizes and class/function counts. Use for understanding project structure and finding relevant files.</description>
 <parameters>
 <param name="dir_path" type="str">Directory path to explore</param>
-<param name="prefix" type="str" optional="true">Internal formatting parameter</param>
+<param name="depth" type="int" optional="true">Number of levels to expand (default 1)</param>
 </parameters>
 </tool>
 
@@ -241,3 +243,10 @@ Summarize what you know, your current goal, and what tool you might use next.
 
 </system>
 """
+
+repo_map = """
+<repo_map>
+<description>The most central files of this repository and their most used classes and functions, ranked by how much the rest of the code depends on them (paths relative to the project base dir). Use it to decide where to look first instead of exploring the directory tree; use get_file_outline or read_code_window for details.</description>
+{repo_map}
+</repo_map>
+"""
@@ -1,10 +1,18 @@
 """Code Knowledge Graph Retriever module"""
 
 from .ckg_retriever import CKGRetriever
+from .sqlite_retriever import SQLiteCKGRetriever, export_to_sqlite
+from .snapshot import SnapshotRetriever, load_into_shared_memory, unlink_shared_snapshot, write_snapshot
 from .converters import _convert_to_clazz, _convert_to_method, _convert_to_variable
 
 __all__ = [
     "CKGRetriever",
+    "SQLiteCKGRetriever",
+    "export_to_sqlite",
+    "SnapshotRetriever",
+    "write_snapshot",
+    "load_into_shared_memory",
+    "unlink_shared_snapshot",
     "_convert_to_clazz",
     "_convert_to_method",
     "_convert_to_variable"
@@ -0,0 +1,160 @@
+"""BM25 ranked search index over code entities"""
+import heapq
+import keyword
+import math
+import re
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Tuple
+
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+# HTTPResponseCode -> HTTP, Response, Code ; parseXML2 -> parse, XML, 2
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+STOPWORDS = frozenset(k.lower() for k in keyword.kwlist) | {"self", "cls", "the", "a", "an", "of", "to", "is", "in"}
+
+
+def tokenize_identifier(text: str) -> List[str]:
+    """
+    代码感知的分词：按 camelCase / snake_case 拆分标识符，
+    同时保留完整标识符本身，使精确名称的匹配得分更高
+
+    Args:
+        text: 名称、签名、文档字符串或代码
+
+    Returns:
+        小写 token 列表（保留重复，用于词频统计）
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text or ""):
+        parts = [
+            part.lower()
+            for chunk in word.split("_")
+            for part in _CAMEL_RE.findall(chunk)
+        ]
+        whole = word.strip("_").lower()
+        if whole and (len(parts) != 1 or parts[0] != whole) and whole not in STOPWORDS:
+            tokens.append(whole)
+        tokens.extend(p for p in parts if len(p) > 1 and p not in STOPWORDS)
+    return tokens
+
+
+def _sublinear_tf(tf: float) -> float:
+    """1 + log(tf)；字段权重可能使 tf 小于 1，此时按线性处理"""
+    return 1 + math.log(tf) if tf >= 1 else tf
+
+
+class BM25Index:
+    """
+    倒排索引 + Okapi BM25 打分
+
+    每个文档由多个带权重的字段组成（名称、签名、文档字符串、代码），
+    字段权重直接乘到词频上。postings 为 term -> [(doc_idx, tf)]，
+    查询只遍历查询词的 postings，因此复杂度与命中数而非文档总数相关
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[Hashable] = []
+        self.doc_lengths: List[float] = []
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        self.idf: Dict[str, float] = {}
+        self.avg_doc_length = 0.0
+        self._doc_norms: Optional[List[float]] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: Hashable, fields: List[Tuple[str, float]]):
+        """
+        添加一个文档
+
+        Args:
+            doc_id: 文档标识（例如 (label, fqn)）
+            fields: [(text, weight)] 列表
+        """
+        term_freqs: Counter = Counter()
+        for text, weight in fields:
+            if not text:
+                continue
+            for token in tokenize_identifier(text):
+                term_freqs[token] += weight
+
+        doc_idx = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(sum(term_freqs.values()))
+        for term, tf in term_freqs.items():
+            self.postings.setdefault(term, []).append((doc_idx, tf))
+
+    def finalize(self):
+        """所有文档添加完毕后计算 idf 和平均文档长度"""
+        n_docs = len(self.doc_ids)
+        self.avg_doc_length = (sum(self.doc_lengths) / n_docs) if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    def score_terms(self, terms: List[str]) -> Dict[int, float]:
+        """对去重后的查询词累加 BM25 得分，返回 doc_idx -> score"""
+        scores: Dict[int, float] = {}
+        k1, b, avgdl = self.k1, self.b, self.avg_doc_length or 1.0
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for doc_idx, tf in posting:
+                norm = k1 * (1 - b + b * self.doc_lengths[doc_idx] / avgdl)
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+    def cosine_scores(self, terms: List[str]) -> Dict[int, float]:
+        """
+        稀疏 TF-IDF 余弦相似度，权重为 (1 + log tf) * idf，复用同一份 postings
+
+        Returns:
+            doc_idx -> cosine
+        """
+        if self._doc_norms is None:
+            squared = [0.0] * len(self.doc_ids)
+            for term, posting in self.postings.items():
+                idf = self.idf[term]
+                for doc_idx, tf in posting:
+                    squared[doc_idx] += (_sublinear_tf(tf) * idf) ** 2
+            self._doc_norms = [math.sqrt(v) or 1.0 for v in squared]
+
+        query_weights = {
+            term: _sublinear_tf(count) * self.idf[term]
+            for term, count in Counter(terms).items()
+            if term in self.idf
+        }
+        query_norm = math.sqrt(sum(w * w for w in query_weights.values())) or 1.0
+
+        scores: Dict[int, float] = {}
+        for term, q_weight in query_weights.items():
+            idf = self.idf[term]
+            for doc_idx, tf in self.postings[term]:
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + q_weight * _sublinear_tf(tf) * idf
+        return {
+            doc_idx: score / (query_norm * self._doc_norms[doc_idx])
+            for doc_idx, score in scores.items()
+        }
+
+    def search(self, query: str, top_k: Optional[int] = 10) -> List[Tuple[Hashable, float]]:
+        """
+        查询 top-k 文档
+
+        Args:
+            query: 自由文本查询，按与文档相同的规则分词
+            top_k: 返回数量，None 表示返回全部命中
+
+        Returns:
+            [(doc_id, score)]，按得分降序
+        """
+        scores = self.score_terms(tokenize_identifier(query))
+        if top_k is None:
+            ranked = sorted(scores.items(), key=lambda item: -item[1])
+        else:
+            ranked = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(self.doc_ids[doc_idx], score) for doc_idx, score in ranked]
@@ -1,29 +1,144 @@
 """Code Knowledge Graph Retriever for in-memory database"""
+import os
 import json
-from typing import List, Dict, Any, Optional, Tuple
-from collections import defaultdict
+from typing import List, Dict, Optional, Tuple, Callable
+from collections import defaultdict, deque
 from bisect import bisect_right
 
 from models.entities import Clazz, Method, Variable
-from utils.decorators import singleton
+from utils.metrics import instrument_queries
 from retriever.converters import _convert_to_clazz, _convert_to_method, _convert_to_variable
+from retriever.bm25 import BM25Index, tokenize_identifier
+from retriever.query import GraphQueryEngine
+from retriever.fuzzy import FuzzyIndex, build_fuzzy_index
+from retriever.file_tree import scan_file_tree
+from retriever.symbols import (
+    SymbolResolver, build_file_imports, build_import_graph, build_usages_index, find_definitions, find_usages,
+    module_dependencies, resolve_module_name,
+)
+
+
+def is_test_path(path: str) -> bool:
+    """按 pytest/unittest 的命名约定判断文件是否为测试代码"""
+    path = path.replace(os.sep, "/")
+    basename = os.path.basename(path)
+    return (
+        basename.startswith("test")
+        or basename.endswith("_test.py")
+        or "/tests/" in path
+        or "/testing/" in path
+    )
+
+
+def is_test_method(method: dict) -> bool:
+    """按 pytest/unittest 的命名约定判断方法是否为测试函数"""
+    return method["name"].startswith("test") and is_test_path(method["absolute_path"])
+
+
+def linearize_mro(
+    class_fqn: str,
+    bases_of: Callable[[str], List[str]],
+    is_project_class: Callable[[str], bool],
+    cache: Dict[str, List[str]],
+) -> List[str]:
+    """
+    C3 线性化（各存储后端共用）。外部基类无法展开，按原始引用作为叶子参与合并；
+    C3 冲突时退化为深度优先、保留首次出现
+
+    Args:
+        class_fqn: 目标类
+        bases_of: fqn -> 直接基类列表
+        is_project_class: 判断基类是否为项目内可展开的类
+        cache: MRO 缓存，会被写入
+    """
+    if class_fqn in cache:
+        return cache[class_fqn]
+    # 先占位，防止循环继承（解析错误时可能出现）导致无限递归
+    cache[class_fqn] = [class_fqn]
+
+    def mro_of(base: str) -> List[str]:
+        if is_project_class(base):
+            return linearize_mro(base, bases_of, is_project_class, cache)
+        return [base]
+
+    bases = bases_of(class_fqn)
+    sequences = [list(mro_of(base)) for base in bases]
+    sequences.append(list(bases))
+
+    merged: Optional[List[str]] = []
+    while True:
+        sequences = [seq for seq in sequences if seq]
+        if not sequences:
+            break
+        for seq in sequences:
+            head = seq[0]
+            if not any(head in other[1:] for other in sequences):
+                break
+        else:
+            merged = None
+            break
+        merged.append(head)
+        for seq in sequences:
+            if seq and seq[0] == head:
+                del seq[0]
+
+    if merged is None:
+        merged = []
+        for base in bases:
+            for ancestor in mro_of(base):
+                if ancestor not in merged:
+                    merged.append(ancestor)
+
+    mro = [class_fqn] + [a for a in merged if a != class_fqn]
+    cache[class_fqn] = mro
+    return mro
+
+
+def collect_class_attributes(retriever, class_fqn: str, inherited: bool = True) -> List[dict]:
+    """
+    类的属性（各存储后端共用）：类体中的类变量（constants）与方法中 self.x = ... 的实例属性（attributes）。
+    inherited 时沿 MRO 合并祖先类的属性，同名属性以 MRO 中靠前的定义为准
 
-
-@singleton
+    Returns:
+        属性字典列表，在原字段基础上增加 kind（"class" / "instance"）和 declared_in（声明所在类）
+    """
+    classes = retriever.get_class_mro(class_fqn) if inherited else [class_fqn]
+    result, seen = [], set()
+    for cls in classes:
+        data = retriever.classes.get(cls)
+        if data is None:
+            continue
+        for kind, attrs in (("class", data.get("constants", [])), ("instance", data.get("attributes", []))):
+            for attr in attrs:
+                if attr["name"] in seen:
+                    continue
+                seen.add(attr["name"])
+                result.append({**attr, "kind": kind, "declared_in": cls})
+    return result
+
+
+@instrument_queries
 class CKGRetriever:
     """
     内存版 Code Knowledge Graph Retriever
     不再依赖 Neo4j，所有数据和索引存储在内存中
     """
 
-    def __init__(self, structure: dict, tags: list):
+    # str key、值可 JSON 序列化的辅助索引；sqlite / snapshot 后端按名称原样保存，查询时按 key 读取
+    AUX_INDEXES = ("modules", "symbol_occurrences", "usages_index", "path_modules",
+                   "import_graph", "imported_by", "external_imports", "file_tree",
+                   "file_imports")
+
+    def __init__(self, structure: dict, tags: list, root: Optional[str] = None):
         """
         初始化内存检索器
 
         Args:
             structure: kg 数据结构（原 kg.json）
             tags: tags 列表（原 tags.json 的内容）
+            root: 图对应的仓库根目录（多仓库共存时用于区分，见 retriever/pool.py）
         """
+        self.root = root
         self.structure = structure
         self.tags = tags
         self.focal_method_id = -1
@@ -51,6 +166,39 @@ class CKGRetriever:
         self.calls_index: Dict[str, List[dict]] = defaultdict(list)  # caller_fqn -> [callee_info]
         self.references_index: Dict[str, List[dict]] = defaultdict(list)  # referrer_fqn -> [referenced_class_info]
 
+        # 测试索引：被测方法/类 fqn -> [测试函数 fqn]，由测试函数内的调用和引用反推
+        self.tests_index: Dict[str, List[str]] = defaultdict(list)
+        self._test_method_fqns: set = set()
+
+        # 类继承索引：基类 / 子类 / 类内方法名，MRO 按需计算并缓存
+        self.class_bases: Dict[str, List[str]] = {}  # class_fqn -> [base_fqn 或无法解析的外部基类名]
+        self.class_subclasses: Dict[str, List[str]] = defaultdict(list)  # class_fqn -> [直接子类 fqn]
+        self.class_method_names: Dict[str, Dict[str, str]] = defaultdict(dict)  # class_fqn -> {method_name: method_fqn}
+        self._mro_cache: Dict[str, List[str]] = {}
+
+        # 符号索引：模块名 -> {"prefix", "path"}；文件 -> 解析后的名字出现（见 retriever/symbols.py）
+        self.modules: Dict[str, dict] = {}
+        self.symbol_occurrences: Dict[str, List[tuple]] = {}
+        # 引用索引：目标 fqn -> [(path, line, col, is_store)]
+        self.usages_index: Dict[str, List[tuple]] = {}
+        # 模块导入图：文件路径 -> 模块名；模块 -> [[被导入模块, 行号]] / [[导入方模块, 行号]] / [外部顶层包名]
+        self.path_modules: Dict[str, str] = {}
+        self.import_graph: Dict[str, list] = {}
+        self.imported_by: Dict[str, list] = {}
+        self.external_imports: Dict[str, List[str]] = {}
+        # 文件 -> 按源码顺序的 import 及其解析结果（见 retriever.symbols.build_file_imports）
+        self.file_imports: Dict[str, List[dict]] = {}
+        # 目录树：相对目录 -> {"dirs", "files": [[名字, 大小, 类数量, 函数数量]]}（见 retriever/file_tree.py）
+        self.file_tree: Dict[str, dict] = {}
+        self._files: List[dict] = []
+
+        # BM25 排序检索索引，首次查询时构建
+        self._search_index: Optional[BM25Index] = None
+        # fqn / 文件路径容错匹配索引，首次需要时构建
+        self._fuzzy_index: Optional[FuzzyIndex] = None
+        # 图查询引擎（反向边索引按需构建）
+        self._query_engine: Optional[GraphQueryEngine] = None
+
         # 构建索引
         self._build_indexes()
 
@@ -62,8 +210,24 @@ class CKGRetriever:
         for path in self.file_intervals:
             self.file_intervals[path].sort(key=lambda t: t[0])
 
-        # 预计算 CALLS 和 REFERENCES 索引
+        # 解析所有基类，构建继承索引
+        self._build_hierarchy_index()
+
+        # 解析名字出现（依赖实体与继承索引）
+        self._build_symbol_index()
+
+        # 预计算 CALLS 和 REFERENCES 索引（同时收集测试函数的调用，构建测试索引）
+        self._test_method_fqns = {
+            fqn for fqn, m in self.methods.items() if self._is_test_method(m)
+        }
         self._build_calls_references_index()
+        self._finalize_tests_index()
+
+        # 采集一次目录树，目录浏览类工具不再逐次访问文件系统
+        if self.root:
+            self.file_tree = scan_file_tree(self.root, lambda path: (
+                len(self.classes_by_file.get(path, [])), len(self.methods_by_file.get(path, []))
+            ))
 
     def _build_calls_references_index(self):
         """
@@ -95,6 +259,9 @@ class CKGRetriever:
                 continue
             src_fqn, src_label = src
 
+            if src_fqn in self._test_method_fqns:
+                self._index_test_reference(src_fqn, name, category)
+
             # 根据 category 查找目标并建立索引
             if category == "function":
                 # CALLS 关系：函数调用
@@ -112,6 +279,43 @@ class CKGRetriever:
         print(f"Index built: {len(self.calls_index)} entities with calls, "
               f"{len(self.references_index)} entities with references")
 
+    # 测试函数内同名候选超过该数量时视为噪声，不建立测试关系
+    MAX_TEST_LINK_CANDIDATES = 3
+
+    _is_test_method = staticmethod(is_test_method)
+
+    def _index_test_reference(self, test_fqn: str, name: str, category: str):
+        """
+        记录测试函数中的一次调用/引用。
+        与 CALLS 索引不同，这里允许少量同名候选，并把类实例化 Foo() 视为对类的测试
+        """
+        targets = []
+        if category == "function":
+            targets.extend(self.methods_by_name.get(name, []))
+        targets.extend(self.classes_by_name.get(name, []))
+        if not targets or len(targets) > self.MAX_TEST_LINK_CANDIDATES:
+            return
+
+        for target in targets:
+            target_fqn = target["full_qualified_name"]
+            if target_fqn in self._test_method_fqns:
+                continue
+            self.tests_index[target_fqn].append(test_fqn)
+            # 方法被测试时，其所属类也视为被测试
+            class_name = target.get("class_name")
+            if class_name and class_name in self.classes:
+                self.tests_index[class_name].append(test_fqn)
+
+    def _finalize_tests_index(self):
+        """测试索引去重并按位置排序"""
+        for target_fqn, test_fqns in self.tests_index.items():
+            self.tests_index[target_fqn] = sorted(
+                set(test_fqns),
+                key=lambda fqn: (self.methods[fqn]["absolute_path"], self.methods[fqn]["start_line"])
+            )
+        print(f"Tests index built: {len(self._test_method_fqns)} test functions, "
+              f"{len(self.tests_index)} tested entities")
+
 
     def _process_structure(self, structure, current_path=None):
         """递归处理 structure，提取所有实体"""
@@ -121,6 +325,8 @@ class CKGRetriever:
         for key, value in structure.items():
             if key.endswith(".py") and isinstance(value, dict):
                 # 处理 Python 文件
+                if "module" in value:
+                    self._files.append(value)
                 for class_data in value.get("classes", []):
                     self._index_class(class_data)
                 for func in value.get("functions", []):
@@ -149,6 +355,8 @@ class CKGRetriever:
         # 处理类的方法和常量
         for method in class_data.get("methods", []):
             self._index_method(method)
+            # 先出现的是类体中直接定义的方法，嵌套函数不覆盖它
+            self.class_method_names[fqn].setdefault(method["name"], method["full_qualified_name"])
         for const in class_data.get("constants", []):
             self._index_variable(const)
 
@@ -175,20 +383,245 @@ class CKGRetriever:
         self.variables_by_name[var_data["name"]].append(var_data)
         self.variables_by_file[var_data["absolute_path"]].append(var_data)
 
+    def _resolve_base_class(self, class_data: dict, base_ref: str) -> str:
+        """
+        把 kg 中记录的基类引用解析为项目内类的 fqn。
+        kg 阶段的解析只是猜测（同包前缀或 import_map），这里按以下顺序修正：
+        精确 fqn -> 同文件同名类 -> 唯一同名类 -> 与引用后缀/所在模块最接近的同名类；
+        都失败时保留原始引用（外部基类，如 object、BaseModel）
+        """
+        if base_ref in self.classes:
+            return base_ref
+        name = base_ref.rsplit(".", 1)[-1]
+        candidates = [
+            c for c in self.classes_by_name.get(name, [])
+            if c["full_qualified_name"] != class_data["full_qualified_name"]
+        ]
+        if not candidates:
+            return base_ref
+        same_file = [c for c in candidates if c["absolute_path"] == class_data["absolute_path"]]
+        if same_file:
+            return same_file[0]["full_qualified_name"]
+        if len(candidates) == 1:
+            return candidates[0]["full_qualified_name"]
+
+        own_parts = class_data["full_qualified_name"].split(".")
+        ref_parts = base_ref.split(".")
+
+        def closeness(c):
+            parts = c["full_qualified_name"].split(".")
+            suffix = 0
+            for a, b in zip(reversed(parts), reversed(ref_parts)):
+                if a != b:
+                    break
+                suffix += 1
+            prefix = 0
+            for a, b in zip(parts, own_parts):
+                if a != b:
+                    break
+                prefix += 1
+            return suffix, prefix
+
+        return max(candidates, key=closeness)["full_qualified_name"]
+
+    def _build_hierarchy_index(self):
+        """解析每个类的全部基类，并建立反向的子类索引"""
+        for fqn, class_data in self.classes.items():
+            refs = class_data.get("parent_classes")
+            if refs is None:
+                refs = [class_data["parent_class"]] if class_data.get("parent_class") else []
+            bases = []
+            for ref in refs:
+                base = self._resolve_base_class(class_data, ref)
+                if base not in bases:
+                    bases.append(base)
+            self.class_bases[fqn] = bases
+            for base in bases:
+                if base in self.classes:
+                    self.class_subclasses[base].append(fqn)
+
+    def _build_symbol_index(self):
+        """解析每个文件中的名字出现，得到 文件 -> [(line, col, name, target, def_line, is_store)]"""
+        resolver = SymbolResolver(self, self._files)
+        self.modules = resolver.modules
+        for file in resolver.files:
+            self.symbol_occurrences[file["path"]] = resolver.resolve_file(file)
+        self.usages_index = build_usages_index(self.symbol_occurrences)
+        self.path_modules = {info["path"]: module for module, info in self.modules.items()}
+        self.import_graph, self.imported_by, self.external_imports = build_import_graph(resolver)
+        self.file_imports = build_file_imports(resolver)
+        resolved = sum(1 for occs in self.symbol_occurrences.values() for o in occs if o[3] or o[4])
+        total = sum(len(occs) for occs in self.symbol_occurrences.values())
+        edges = sum(len(deps) for deps in self.import_graph.values())
+        print(f"Symbol index built: {len(self.modules)} modules, {edges} import edges, "
+              f"{resolved}/{total} name occurrences resolved")
+
+    def go_to_definition(self, path: str, line: int, identifier: str) -> List[dict]:
+        """
+        跳转定义：path 第 line 行的 identifier 指向的实体 / 模块 / 局部变量，
+        在构建期预先解析，查询只需一次二分
+
+        Returns:
+            见 retriever.symbols.find_definitions
+        """
+        return find_definitions(self, path, line, identifier)
+
+    def find_usages(self, full_qualified_name: str, include_writes: bool = True) -> List[dict]:
+        """
+        查找类、方法、模块变量、实例属性（类 fqn.属性名）或模块的全部引用位置及所在容器
+
+        Returns:
+            见 retriever.symbols.find_usages
+        """
+        return find_usages(self, full_qualified_name, include_writes)
+
+    def resolve_module(self, name: str) -> Optional[str]:
+        """模块名（可为点分后缀）或文件路径 -> 图中的模块名，见 retriever.symbols.resolve_module_name"""
+        return resolve_module_name(self, name)
+
+    def resolve_approximate_fqn(self, query: str, label: Optional[str] = None,
+                                limit: int = 5) -> Tuple[Optional[str], List[str]]:
+        """
+        容错解析 fqn（模块前缀写错或缺失、名字拼错）
+
+        Returns:
+            (唯一可信的匹配或 None, 按相似度排序的建议)，见 retriever.fuzzy.FuzzyIndex
+        """
+        return self._get_fuzzy_index().resolve_fqn(query, label, limit)
+
+    def resolve_approximate_path(self, query: str, limit: int = 5) -> Tuple[Optional[str], List[str]]:
+        """容错解析文件路径（相对路径、多余 / 缺失的目录、拼错的分量）"""
+        return self._get_fuzzy_index().resolve_path(query, limit)
+
+    def _get_fuzzy_index(self) -> FuzzyIndex:
+        if self._fuzzy_index is None:
+            self._fuzzy_index = build_fuzzy_index(self)
+        return self._fuzzy_index
+
+    def get_module_dependencies(self, module: str, reverse: bool = False, transitive: bool = False,
+                                max_depth: Optional[int] = None) -> List[dict]:
+        """
+        模块导入依赖：reverse=False 为 module 导入的项目模块，True 为导入 module 的模块；
+        transitive 时返回传递闭包（影响分析）
+
+        Returns:
+            见 retriever.symbols.module_dependencies
+        """
+        return module_dependencies(self, module, reverse, transitive, max_depth)
+
+    def get_class_attributes(self, class_fqn: str, inherited: bool = True) -> List[dict]:
+        """类变量与实例属性，见 collect_class_attributes"""
+        return collect_class_attributes(self, class_fqn, inherited)
+
+    def get_class_bases(self, class_fqn: str) -> List[str]:
+        """直接基类（项目内为 fqn，外部基类为原始引用），O(1)"""
+        return self.class_bases.get(class_fqn, [])
+
+    def get_class_mro(self, class_fqn: str) -> List[str]:
+        """
+        近似 MRO：对项目内的类做 C3 线性化，外部基类按原始引用保留在相应位置；
+        C3 冲突（通常由基类解析不准引起）时退化为深度优先、保留首次出现。
+        结果缓存，首次计算 O(继承深度)，之后 O(1)
+
+        Returns:
+            [class_fqn, ...祖先]，包含自身
+        """
+        return linearize_mro(
+            class_fqn,
+            bases_of=lambda fqn: self.class_bases.get(fqn, []),
+            is_project_class=lambda fqn: fqn in self.classes,
+            cache=self._mro_cache,
+        )
+
+    def get_class_ancestors(self, class_fqn: str) -> List[str]:
+        """全部祖先类（按 MRO 顺序，不含自身）"""
+        return self.get_class_mro(class_fqn)[1:]
+
+    def get_class_descendants(self, class_fqn: str) -> List[str]:
+        """全部后代类（广度优先，先直接子类）"""
+        result, seen = [], {class_fqn}
+        queue = deque(self.class_subclasses.get(class_fqn, []))
+        while queue:
+            current = queue.popleft()
+            if current in seen:
+                continue
+            seen.add(current)
+            result.append(current)
+            queue.extend(self.class_subclasses.get(current, []))
+        return result
+
+    def get_method_overrides(self, method_fqn: str) -> Dict[str, List[str]]:
+        """
+        方法重写关系
+
+        Returns:
+            {"overrides": [祖先中同名方法 fqn，按 MRO 顺序，第一个即被直接重写的版本],
+             "overridden_by": [后代中重写该方法的 fqn]}
+        """
+        result = {"overrides": [], "overridden_by": []}
+        method = self.methods.get(method_fqn)
+        if not method or not method.get("class_name"):
+            return result
+        name, class_fqn = method["name"], method["class_name"]
+
+        for ancestor in self.get_class_ancestors(class_fqn):
+            found = self.class_method_names.get(ancestor, {}).get(name)
+            if found:
+                result["overrides"].append(found)
+        for descendant in self.get_class_descendants(class_fqn):
+            found = self.class_method_names.get(descendant, {}).get(name)
+            if found:
+                result["overridden_by"].append(found)
+        return result
+
     def close(self):
         """兼容接口，内存版无需关闭"""
         pass
 
+    def _approximate_size(self) -> int:
+        """
+        估算整图占用的内存（字节），供 RetrieverPool 做容量控制。
+        实体字典与 structure 共享，因此只遍历 structure，再加上 tags 和各索引的开销
+        """
+        total, stack = 0, [self.structure]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                total += 100 * len(node)
+                stack.extend(node.values())
+            elif isinstance(node, (list, tuple)):
+                total += 60 * len(node)
+                stack.extend(node)
+            elif isinstance(node, str):
+                total += 50 + len(node)
+        entities = len(self.classes) + len(self.methods) + len(self.variables)
+        edges = sum(len(v) for v in self.calls_index.values()) + sum(len(v) for v in self.references_index.values())
+        occurrences = sum(len(v) for v in self.symbol_occurrences.values())
+        usages = sum(len(v) for v in self.usages_index.values())
+        return total + 250 * len(self.tags) + 400 * entities + 100 * edges + 120 * occurrences + 100 * usages
+
     def change_focal_method_id(self, focal_method_id):
         """兼容接口"""
         self.focal_method_id = focal_method_id
 
-    def run_query(self, query: str, parameters: dict) -> List[Any]:
+    def run_query(self, query: str, parameters: Optional[dict] = None, limit: Optional[int] = None) -> List[dict]:
         """
-        兼容接口，但不再使用 Cypher 查询
-        此方法不应被直接调用
+        执行 Cypher 风格的图查询（子集，见 retriever/query.py），直接在内存索引上运行
+
+        Args:
+            query: 例如 MATCH (m:Method {name: $name})<-[:CALLS]-(caller) RETURN caller.fqn LIMIT 20
+            parameters: 查询中 $name 形式的参数
+            limit: 最多返回的行数（与查询中的 LIMIT 取较小者），达到后停止匹配
+
+        Returns:
+            每行一个字典：RETURN 项 -> 实体字典或属性值
+
+        Raises:
+            QueryError: 查询语法错误
         """
-        raise NotImplementedError("Memory-based retriever does not support Cypher queries")
+        if self._query_engine is None:
+            self._query_engine = GraphQueryEngine(self)
+        return self._query_engine.run(query, parameters, limit)
 
     def search_method_accurately(self, absolute_path: str, full_qualified_name: str = None) -> List[Method]:
         """
@@ -216,6 +649,35 @@ class CKGRetriever:
 
         return [_convert_to_method(m) for m in results]
 
+    def search_methods_many(self, queries: List[Tuple[str, Optional[str]]]) -> List[List[Method]]:
+        """
+        批量精确查找方法，按文件分组，每个文件的候选方法只扫描一次
+
+        Args:
+            queries: [(absolute_path, full_qualified_name)] 列表，fqn 可为 None
+
+        Returns:
+            与 queries 一一对应的方法列表
+        """
+        by_file: Dict[str, List[int]] = defaultdict(list)
+        for idx, (absolute_path, _) in enumerate(queries):
+            by_file[absolute_path].append(idx)
+
+        results: List[List[Method]] = [[] for _ in queries]
+        for absolute_path, indexes in by_file.items():
+            candidates = self.methods_by_file.get(absolute_path, [])
+            if not candidates:
+                continue
+            for idx in indexes:
+                full_qualified_name = queries[idx][1]
+                if full_qualified_name is None:
+                    matched = candidates
+                else:
+                    matched = [m for m in candidates if full_qualified_name in m["full_qualified_name"]]
+                results[idx] = [_convert_to_method(m) for m in matched]
+
+        return results
+
     def search_method_fuzzy(self, name: str) -> List[Method]:
         """
         模糊查找方法和测试节点
@@ -237,6 +699,21 @@ class CKGRetriever:
 
         return [_convert_to_method(m) for m in results]
 
+    def find_entity(self, full_qualified_name: str) -> Optional[Tuple[str, dict]]:
+        """
+        按全限定名查找实体
+
+        Returns:
+            (label, entity_dict)，label 为 "Method" / "Class" / "Variable"；找不到返回 None
+        """
+        if full_qualified_name in self.methods:
+            return "Method", self.methods[full_qualified_name]
+        if full_qualified_name in self.classes:
+            return "Class", self.classes[full_qualified_name]
+        if full_qualified_name in self.variables:
+            return "Variable", self.variables[full_qualified_name]
+        return None
+
     def get_relevant_entities(self, file: str, full_qualified_name: str) -> dict:
         """
         查找与目标实体相关的所有关系节点（动态计算）
@@ -298,11 +775,11 @@ class CKGRetriever:
                     if const["full_qualified_name"] != full_qualified_name:
                         result["HAS_VARIABLE"].append(self._entity_to_dict(const))
 
-        # INHERITS: 类的继承关系
+        # INHERITS: 类的继承关系（全部可解析的直接基类）
         if target_type == "Class":
-            parent_class = target.get("parent_class")
-            if parent_class and parent_class in self.classes:
-                result["INHERITS"].append(self._entity_to_dict(self.classes[parent_class]))
+            for base in self.get_class_bases(full_qualified_name):
+                if base in self.classes:
+                    result["INHERITS"].append(self._entity_to_dict(self.classes[base]))
 
         # CALLS & REFERENCES: 从 tags 动态计算
         calls, references = self._compute_calls_and_references(file, full_qualified_name)
@@ -311,6 +788,25 @@ class CKGRetriever:
 
         return result
 
+    def get_relevant_entities_many(self, queries: List[Tuple[str, str]]) -> List[dict]:
+        """
+        批量查找多个实体的关系节点，重复的目标只计算一次
+
+        Args:
+            queries: [(absolute_path, full_qualified_name)] 列表
+
+        Returns:
+            与 queries 一一对应的关系字典列表
+        """
+        computed: Dict[Tuple[str, str], dict] = {}
+        results = []
+        for key in queries:
+            key = tuple(key)
+            if key not in computed:
+                computed[key] = self.get_relevant_entities(*key)
+            results.append(computed[key])
+        return results
+
     def _entity_to_dict(self, entity: dict) -> dict:
         """将实体转换为字典格式（处理 JSON 字段）"""
         props = dict(entity)
@@ -440,6 +936,8 @@ class CKGRetriever:
         for cls in class_list:
             for const in cls.get("constants", []):
                 results.append(const)
+            # 方法中 self.x = ... 赋值的实例属性
+            results.extend(cls.get("attributes", []))
 
         return [_convert_to_variable(v) for v in results]
 
@@ -451,7 +949,7 @@ class CKGRetriever:
             keyword: 搜索关键字
 
         Returns:
-            匹配的文件路径列表
+            匹配的文件路径列表，按相关度排序
         """
         matched_paths = set()
 
@@ -484,7 +982,93 @@ class CKGRetriever:
                     if keyword.lower() in content.lower():
                         matched_paths.add(var["absolute_path"])
 
-        return list(matched_paths)
+        # 按文件内实体的最高 BM25 得分排序，得分相同按路径
+        file_scores: Dict[str, float] = {}
+        stores = {"Class": self.classes, "Method": self.methods, "Variable": self.variables}
+        for (label, fqn), score in self._get_search_index().search(keyword, top_k=None):
+            path = stores[label][fqn]["absolute_path"]
+            if path in matched_paths and score > file_scores.get(path, 0.0):
+                file_scores[path] = score
+        return sorted(matched_paths, key=lambda p: (-file_scores.get(p, 0.0), p))
+
+    # BM25 各字段权重：名称 > 签名 > 文档字符串 > 代码
+    SEARCH_FIELD_WEIGHTS = {"name": 3.0, "signature": 2.0, "docstring": 1.5, "content": 1.0}
+
+    def _get_search_index(self) -> BM25Index:
+        """懒加载 BM25 索引：类（名称、基类、文档、成员名）、方法（全部字段）、模块级变量"""
+        if self._search_index is not None:
+            return self._search_index
+
+        weights = self.SEARCH_FIELD_WEIGHTS
+        index = BM25Index()
+        for fqn, cls in self.classes.items():
+            members = " ".join(
+                [m["name"] for m in cls.get("methods", [])]
+                + [c["name"] for c in cls.get("constants", [])]
+                + [a["name"] for a in cls.get("attributes", [])]
+            )
+            index.add(("Class", fqn), [
+                (cls["name"], weights["name"]),
+                (cls.get("parent_class") or "", weights["signature"]),
+                (cls.get("docstring", ""), weights["docstring"]),
+                (members, weights["content"]),
+            ])
+        for fqn, method in self.methods.items():
+            index.add(("Method", fqn), [
+                (method["name"], weights["name"]),
+                (method.get("signature", ""), weights["signature"]),
+                (method.get("docstring", ""), weights["docstring"]),
+                (method.get("content", ""), weights["content"]),
+            ])
+        for fqn, var in self.variables.items():
+            if var.get("class_name"):
+                continue
+            index.add(("Variable", fqn), [
+                (var["name"], weights["name"]),
+                (var.get("content", ""), weights["content"]),
+            ])
+        index.finalize()
+        print(f"Search index built: {len(index)} entities, {len(index.postings)} terms")
+        self._search_index = index
+        return index
+
+    def search_entities_ranked(
+        self, query: str, top_k: Optional[int] = 10, label: Optional[str] = None
+    ) -> List[Tuple[str, dict, float]]:
+        """
+        BM25 排序检索实体（名称、签名、文档字符串、代码）
+
+        Args:
+            query: 查询文本，按 camelCase/snake_case 拆分
+            top_k: 返回数量，None 表示不限
+            label: 可选过滤 "Class" / "Method" / "Variable"
+
+        Returns:
+            [(label, entity_dict, score)]，按得分降序
+        """
+        index = self._get_search_index()
+        # 有过滤条件时多取一些候选再截断
+        hits = index.search(query, top_k=None if label else top_k)
+        stores = {"Class": self.classes, "Method": self.methods, "Variable": self.variables}
+        results = []
+        for (hit_label, fqn), score in hits:
+            if label and hit_label != label:
+                continue
+            results.append((hit_label, stores[hit_label][fqn], score))
+            if top_k is not None and len(results) >= top_k:
+                break
+        return results
+
+    def text_similarity_scores(self, text: str) -> Dict[str, float]:
+        """
+        自由文本与各实体的稀疏 TF-IDF 余弦相似度
+
+        Returns:
+            fqn -> cosine（只包含有共同词的实体）
+        """
+        index = self._get_search_index()
+        scores = index.cosine_scores(tokenize_identifier(text))
+        return {index.doc_ids[doc_idx][1]: score for doc_idx, score in scores.items()}
 
     def search_variable_by_only_name_query(self, variable_name: str) -> List[Variable]:
         """
@@ -510,12 +1094,25 @@ class CKGRetriever:
         results.sort(key=lambda v: (v["absolute_path"], v["start_line"]))
         return [_convert_to_variable(v) for v in results]
 
+    def search_tests_for_entity(self, full_qualified_name: str) -> List[Method]:
+        """
+        从测试索引中查找调用或引用了目标方法/类的测试函数，O(1) 复杂度
+
+        Args:
+            full_qualified_name: 被测试方法或类的全限定名
+
+        Returns:
+            测试函数列表
+        """
+        test_fqns = self.tests_index.get(full_qualified_name, [])
+        return [_convert_to_method(self.methods[fqn]) for fqn in test_fqns]
+
     def search_test_cases_by_method_query(self, full_qualified_name: str) -> List[Method]:
         """
         查询方法的测试用例（通过 TESTED 边连接）
 
-        注意：由于没有显式的 TESTED 关系，这里通过命名约定推断
-        （例如 test_xxx 对应 xxx 方法）
+        优先使用构建期生成的测试索引；索引中没有记录时，
+        再通过命名约定推断（例如 test_xxx 对应 xxx 方法）
 
         Args:
             full_qualified_name: 被测试方法的全限定名
@@ -523,6 +1120,10 @@ class CKGRetriever:
         Returns:
             测试用例列表
         """
+        indexed = self.search_tests_for_entity(full_qualified_name)
+        if indexed:
+            return indexed
+
         # 提取方法名
         method_name = full_qualified_name.split(".")[-1]
         test_name_patterns = [f"test_{method_name}", f"test{method_name.capitalize()}"]
@@ -0,0 +1,128 @@
+"""按实体边界对齐读取窗口：扩展到完整的方法 / 类，并省略无关嵌套函数的函数体"""
+import re
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from utils.file_cache import CachedFile
+
+# 签名最多跨越的行数（多行参数列表）
+SIGNATURE_MAX_LINES = 15
+# 函数体不超过该行数时不省略
+MIN_ELIDED_LINES = 3
+
+_DEF = re.compile(r"^\s*(?:async\s+def|def|class)\b")
+_COMMENT = re.compile(r"\s+#.*$")
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+    fqn: str
+    label: str
+
+
+class Window(NamedTuple):
+    start: int
+    end: int
+    # 窗口对齐到的实体（fqn, label），没有时为 None
+    unit: Optional[Tuple[str, str]]
+    # 被省略函数体的区间：(签名结束行, 省略起始行, 省略结束行, fqn)
+    elided: List[Tuple[int, int, int, str]]
+    text: str
+
+
+def entity_spans(retriever, path: str) -> List[Span]:
+    """文件中所有方法和类的行区间（各存储后端共用），按起始行排序"""
+    spans = [
+        Span(e.get("start_line") or 0, e.get("end_line") or 0, e["full_qualified_name"], label)
+        for by_file, label in ((retriever.methods_by_file, "Method"), (retriever.classes_by_file, "Class"))
+        for e in by_file.get(path, []) or []
+    ]
+    return sorted((s for s in spans if 0 < s.start <= s.end), key=lambda s: (s.start, -s.end))
+
+
+def _signature_end(cached: CachedFile, span: Span) -> int:
+    """def / class 语句（含装饰器与多行参数）结束的行"""
+    seen_def = False
+    for number in range(span.start, min(span.end, span.start + SIGNATURE_MAX_LINES) + 1):
+        line = cached.line(number)
+        seen_def = seen_def or bool(_DEF.match(line))
+        if seen_def and _COMMENT.sub("", line).rstrip().endswith(":"):
+            return number
+    return span.start
+
+
+def _body_indent(cached: CachedFile, signature_end: int, end: int) -> str:
+    for number in range(signature_end + 1, end + 1):
+        line = cached.line(number)
+        if line.strip():
+            return line[:len(line) - len(line.lstrip())]
+    header = cached.line(signature_end)
+    return header[:len(header) - len(header.lstrip())] + "    "
+
+
+def render_window(cached: CachedFile, spans: List[Span], start: int, end: int,
+                  focus: Tuple[int, int], unit: Optional[Span] = None) -> Window:
+    """
+    渲染 start..end 的带行号代码；窗口内与 focus 不相交的函数（最外层的那些，unit 本身除外）
+    只保留签名，函数体替换为 `...`，结果仍是语法完整的代码
+    """
+    elided = []
+    for span in spans:
+        if span.label != "Method" or span == unit or span.start < start or span.end > end:
+            continue
+        if span.start <= focus[1] and focus[0] <= span.end:
+            continue
+        if elided and span.start <= elided[-1][2]:
+            continue  # 位于已省略的函数体内
+        signature_end = _signature_end(cached, span)
+        if span.end - signature_end >= MIN_ELIDED_LINES:
+            elided.append((signature_end, signature_end + 1, span.end, span.fqn))
+
+    parts, number = [], start
+    for signature_end, body_start, body_end, _ in elided:
+        parts.extend(f"{n:4d}: {line}" for n, line in enumerate(cached.lines(number, signature_end), number))
+        indent = _body_indent(cached, signature_end, body_end)
+        parts.append(f"      {indent}...  # lines {body_start}-{body_end} elided\n")
+        number = body_end + 1
+    parts.extend(f"{n:4d}: {line}" for n, line in enumerate(cached.lines(number, end), number))
+    return Window(start, end, (unit.fqn, unit.label) if unit else None, elided, "".join(parts).rstrip("\n"))
+
+
+def adaptive_window(cached: CachedFile, spans: List[Span], start: int, end: int,
+                    fits: Callable[[str], bool]) -> Window:
+    """
+    把请求的 start..end 对齐到实体边界：
+
+    1. 包含整个请求的最内层方法 / 类中，第一个渲染后（省略无关嵌套函数）仍在预算内的；
+    2. 否则把被请求截断的方法、以及被请求截断的类的开头（此时类体以签名骨架显示）补全，
+       只要补全后仍在预算内；
+    3. 仍超出预算时退回到请求的原始行
+    """
+    start = max(1, start)
+    end = min(max(start, end), cached.line_count)
+    focus = (start, end)
+
+    enclosing = sorted((s for s in spans if s.start <= start and end <= s.end), key=lambda s: s.end - s.start)
+    for span in enclosing:
+        window = render_window(cached, spans, span.start, span.end, focus, unit=span)
+        if fits(window.text):
+            return window
+
+    window_start, window_end = start, end
+    changed = True
+    while changed:
+        changed = False
+        for span in spans:
+            overlaps = span.start <= window_end and window_start <= span.end
+            covered = window_start <= span.start and span.end <= window_end
+            # 只截到类的尾部时，窗口中已经是完整的方法，不必扩展到整个类
+            cuts = span.label == "Method" or window_start <= span.start
+            if overlaps and not covered and cuts and span not in enclosing:
+                grown = (min(window_start, span.start), max(window_end, span.end))
+                if fits(render_window(cached, spans, grown[0], grown[1], focus).text):
+                    window_start, window_end = grown
+                    changed = True
+    window = render_window(cached, spans, window_start, window_end, focus)
+    if fits(window.text):
+        return window
+    return render_window(cached, [], start, end, focus)
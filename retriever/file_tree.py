@@ -0,0 +1,161 @@
+"""构建知识图谱时一次性采集的目录树：各层级的文件数、大小与 Python 实体数，渲染时不访问文件系统"""
+import os
+import threading
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+# 不列出的目录
+IGNORED_DIRS = {".git", "__pycache__"}
+
+# 文件信息：[大小（字节）, 类数量, 函数 / 方法数量]，非 Python 文件或未知时数量为 None
+FileInfo = List[Optional[int]]
+
+
+def scan_file_tree(root: str, entity_counts: Callable[[str], Tuple[int, int]]) -> Dict[str, dict]:
+    """
+    用 os.scandir 遍历一次仓库（stat 信息随目录项返回）
+
+    Args:
+        entity_counts: 绝对路径 -> (类数量, 函数数量)，只对 .py 文件调用
+
+    Returns:
+        相对目录（根为 ""）-> {"dirs": [子目录名], "files": [[文件名, 大小, 类数量, 函数数量]]}，
+        可直接作为 JSON 辅助索引保存
+    """
+    tree = {}
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        dirs, files = [], []
+        try:
+            entries = list(os.scandir(os.path.join(root, rel_dir)))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in IGNORED_DIRS:
+                        dirs.append(entry.name)
+                        pending.append(os.path.join(rel_dir, entry.name) if rel_dir else entry.name)
+                elif entry.is_file():
+                    counts = entity_counts(entry.path) if entry.name.endswith(".py") else (None, None)
+                    files.append([entry.name, entry.stat().st_size, *counts])
+            except OSError:
+                continue
+        tree[rel_dir] = {"dirs": sorted(dirs), "files": sorted(files)}
+    return tree
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _plural(count: int, word: str) -> str:
+    return f"{count} {word}" + ("" if count == 1 else "es" if word.endswith("s") else "s")
+
+
+def describe_totals(files: int, size: int, classes: int, functions: int, is_dir: bool = True) -> str:
+    """汇总信息，如 "3 files, 4.2 KB; 2 classes, 9 functions"（文件只显示大小与实体数）"""
+    parts = [f"{_plural(files, 'file')}, {format_size(size)}" if is_dir else format_size(size)]
+    if classes or functions:
+        parts.append(f"{_plural(classes, 'class')}, {_plural(functions, 'function')}")
+    return "; ".join(parts)
+
+
+class FileTree:
+    """
+    可更新的目录树：由 file_tree 辅助索引（或 scan_file_tree）构造，fixer 工具写文件后更新。
+    目录的汇总（递归文件数、大小、实体数）按需计算并缓存，更新时清空
+    """
+
+    def __init__(self, entries: Mapping[str, dict]):
+        self._dirs: Dict[str, set] = {}
+        self._files: Dict[str, Dict[str, FileInfo]] = {}
+        for rel_dir in entries:
+            entry = entries[rel_dir]
+            self._dirs[rel_dir] = set(entry["dirs"])
+            self._files[rel_dir] = {info[0]: list(info[1:]) for info in entry["files"]}
+        self._dirs.setdefault("", set())
+        self._files.setdefault("", {})
+        self._totals: Dict[str, Tuple[int, int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split(rel_path: str) -> Tuple[str, str]:
+        rel_dir, name = os.path.split(os.path.normpath(rel_path))
+        return ("" if rel_dir == "." else rel_dir), name
+
+    def has_dir(self, rel_dir: str) -> bool:
+        return self._normalize(rel_dir) in self._dirs
+
+    def has_file(self, rel_path: str) -> bool:
+        rel_dir, name = self._split(rel_path)
+        return name in self._files.get(rel_dir, {})
+
+    @staticmethod
+    def _normalize(rel_dir: str) -> str:
+        rel_dir = os.path.normpath(rel_dir) if rel_dir else ""
+        return "" if rel_dir == "." else rel_dir
+
+    def update_file(self, rel_path: str, size: int):
+        """记录新建或修改的文件；修改过的 Python 文件保留构建时的实体数，新文件没有实体数"""
+        rel_dir, name = self._split(rel_path)
+        with self._lock:
+            missing, parent = [], rel_dir
+            while parent not in self._dirs:
+                missing.append(parent)
+                parent = self._split(parent)[0]
+            for new_dir in reversed(missing):
+                grand, child = self._split(new_dir)
+                self._dirs[grand].add(child)
+                self._dirs[new_dir] = set()
+                self._files[new_dir] = {}
+            info = self._files[rel_dir].get(name)
+            self._files[rel_dir][name] = [size, *(info[1:] if info else [None, None])]
+            self._totals.clear()
+
+    def totals(self, rel_dir: str) -> Tuple[int, int, int, int]:
+        """目录下（递归）的 (文件数, 总大小, 类数量, 函数数量)"""
+        rel_dir = self._normalize(rel_dir)
+        cached = self._totals.get(rel_dir)
+        if cached is not None:
+            return cached
+        files = self._files.get(rel_dir, {})
+        total = [len(files), 0, 0, 0]
+        for size, classes, functions in files.values():
+            total[1] += size
+            total[2] += classes or 0
+            total[3] += functions or 0
+        for child in self._dirs.get(rel_dir, ()):
+            for i, value in enumerate(self.totals(os.path.join(rel_dir, child) if rel_dir else child)):
+                total[i] += value
+        self._totals[rel_dir] = result = tuple(total)
+        return result
+
+    def python_files(self, rel_dir: str) -> List[str]:
+        """目录下（递归）所有 .py 文件的相对路径，已排序"""
+        rel_dir = self._normalize(rel_dir)
+        found, pending = [], [rel_dir]
+        while pending:
+            current = pending.pop()
+            found.extend(os.path.join(current, name) if current else name
+                         for name in self._files.get(current, {}) if name.endswith(".py"))
+            pending.extend(os.path.join(current, child) if current else child for child in self._dirs.get(current, ()))
+        return sorted(found)
+
+    def render(self, rel_dir: str, depth: int = 1, indent: str = "") -> List[str]:
+        """depth 层内容：子目录在前（带汇总），文件在后（带大小与实体数）"""
+        rel_dir = self._normalize(rel_dir)
+        lines = []
+        for child in sorted(self._dirs.get(rel_dir, ())):
+            child_dir = os.path.join(rel_dir, child) if rel_dir else child
+            files, size, classes, functions = self.totals(child_dir)
+            lines.append(f"{indent}{child}/  ({describe_totals(files, size, classes, functions)})")
+            if depth > 1:
+                lines.extend(self.render(child_dir, depth - 1, indent + "  "))
+        for name, (size, classes, functions) in sorted(self._files.get(rel_dir, {}).items()):
+            lines.append(f"{indent}{name}  ({describe_totals(1, size, classes or 0, functions or 0, False)})")
+        return lines
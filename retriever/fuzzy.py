@@ -0,0 +1,245 @@
+"""Approximate matching of entity fqns and file paths supplied by the agents"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 容忍的最大编辑距离；短名字更严格，见 allowed_distance
+MAX_EDIT_DISTANCE = 2
+# SymSpell 前缀长度：只对前若干字符生成删除变体，索引大小与名字长度无关
+PREFIX_LENGTH = 7
+# fqn 对齐中，查询里一个无法对应的分量（如写错的模块名）的代价
+MISSING_SEGMENT_COST = 2
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    受限 Damerau-Levenshtein（OSA，相邻交换记 1 次）距离，
+    超过 max_distance 时提前返回 max_distance + 1
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        before, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def allowed_distance(word: str) -> int:
+    """名字越短允许的错误越少：≤2 个字符不容错，≤5 个字符容忍 1 处"""
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else MAX_EDIT_DISTANCE
+
+
+class DeletionIndex:
+    """
+    SymSpell 风格的删除变体索引：预先为每个词生成删除 ≤MAX_EDIT_DISTANCE 个字符的变体，
+    查询时只需生成查询词的删除变体并查表，再用编辑距离校验候选
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words = set(words)
+        self._deletes: Dict[str, List[str]] = defaultdict(list)
+        for word in self.words:
+            for variant in self._variants(word[:PREFIX_LENGTH], MAX_EDIT_DISTANCE):
+                self._deletes[variant].append(word)
+
+    @staticmethod
+    def _variants(word: str, distance: int) -> set:
+        result, frontier = {word}, {word}
+        for _ in range(distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            result |= frontier
+        return result
+
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Returns:
+            [(词, 编辑距离)]，按距离、词排序
+        """
+        if max_distance is None:
+            max_distance = allowed_distance(word)
+        if max_distance == 0:
+            return [(word, 0)] if word in self.words else []
+        candidates = set()
+        for variant in self._variants(word[:PREFIX_LENGTH], max_distance):
+            candidates.update(self._deletes.get(variant, ()))
+        result = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                result.append((candidate, distance))
+        result.sort(key=lambda item: (item[1], item[0]))
+        return result
+
+
+def path_parts(path: str) -> List[str]:
+    """路径分量（兼容 \\ 分隔符，去掉空分量和 .）"""
+    return [part for part in path.replace("\\", "/").split("/") if part and part != "."]
+
+
+class PathSuffixTrie:
+    """
+    按路径分量倒序建立的 trie（a/b/c.py 依次插入 c.py、b、a），每个节点记录经过它的全部路径，
+    因此查询只需从文件名开始向上匹配，缺少的前缀（相对路径）天然被容忍
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self.root = {"children": {}, "paths": []}
+        for path in paths:
+            node = self.root
+            for part in reversed(path_parts(path)):
+                node = node["children"].setdefault(part, {"children": {}, "paths": []})
+                node["paths"].append(path)
+        self._basenames = DeletionIndex(self.root["children"])
+
+    def match(self, query: str) -> List[Tuple[int, str]]:
+        """
+        从最后一个分量开始沿 trie 下行：有同名子节点时精确匹配，否则在子节点中容错匹配
+        （代价为编辑距离）；查询中多出的前缀分量（如多写了 src/）每个计 1
+
+        Returns:
+            [(代价, 路径)]，按代价、路径长度排序
+        """
+        parts = list(reversed(path_parts(query)))
+        costs: Dict[str, int] = {}
+
+        def record(node, cost):
+            for path in node["paths"]:
+                if cost < costs.get(path, cost + 1):
+                    costs[path] = cost
+
+        states = [(self.root, 0)]
+        for depth, part in enumerate(parts):
+            next_states = []
+            for node, cost in states:
+                children = node["children"]
+                if part in children:
+                    matches = [(children[part], 0)]
+                elif node is self.root:
+                    matches = [(children[name], d) for name, d in self._basenames.lookup(part)]
+                else:
+                    limit = allowed_distance(part)
+                    matches = [
+                        (child, d) for name, child in children.items()
+                        if (d := edit_distance(part, name, limit)) <= limit
+                    ]
+                if not matches and node is not self.root:
+                    # 剩余的查询分量都视为多余前缀
+                    record(node, cost + len(parts) - depth)
+                next_states.extend(
+                    (child, cost + d) for child, d in matches if cost + d <= 2 * MAX_EDIT_DISTANCE
+                )
+            states = next_states
+        for node, cost in states:
+            record(node, cost)
+        return sorted(((cost, path) for path, cost in costs.items()), key=lambda item: (item[0], len(item[1]), item[1]))
+
+
+def _align(query: List[str], candidate: List[str]) -> Tuple[int, int]:
+    """
+    按顺序对齐两组 fqn 分量（带容错的最长公共子序列）
+
+    Returns:
+        (查询侧代价：未对应分量每个 MISSING_SEGMENT_COST、容错对应计编辑距离,
+         候选侧未对应的分量数)
+    """
+    n, m = len(query), len(candidate)
+    # dp[i][j] = (代价, -对应数)：query[:i] 与 candidate[:j] 的最优对齐
+    dp = [[(i * MISSING_SEGMENT_COST, 0)] * (m + 1) for i in range(n + 1)]
+    for i in range(1, n + 1):
+        limit = allowed_distance(query[i - 1])
+        for j in range(1, m + 1):
+            best = min(dp[i][j - 1], (dp[i - 1][j][0] + MISSING_SEGMENT_COST, dp[i - 1][j][1]))
+            distance = edit_distance(query[i - 1], candidate[j - 1], limit)
+            if distance <= limit:
+                previous = dp[i - 1][j - 1]
+                best = min(best, (previous[0] + distance, previous[1] - 1))
+            dp[i][j] = best
+    cost, matched = dp[n][m]
+    return cost, m + matched
+
+
+class FuzzyIndex:
+    """
+    实体 fqn 与文件路径的容错匹配：fqn 的最后一个分量走删除变体索引，
+    其余分量与候选 fqn 做带容错的顺序对齐；路径走倒序分量 trie。
+    只有唯一的最优候选且代价不超过 MAX_EDIT_DISTANCE 时才自动采用
+    """
+
+    def __init__(self, entities: Iterable[Tuple[str, str]], paths: Iterable[str]):
+        """
+        Args:
+            entities: (fqn, label) 序列
+            paths: 项目内的文件路径
+        """
+        self.labels: Dict[str, str] = {}
+        self._by_name: Dict[str, List[str]] = defaultdict(list)
+        for fqn, label in entities:
+            self.labels[fqn] = label
+            self._by_name[fqn.rsplit(".", 1)[-1]].append(fqn)
+        self._names = DeletionIndex(self._by_name)
+        self.paths = PathSuffixTrie(paths)
+
+    @staticmethod
+    def _pick(scored: list, limit: int) -> Tuple[Optional[str], List[str]]:
+        suggestions = [value for _, value in scored[:limit]]
+        if not scored or scored[0][0][0] > MAX_EDIT_DISTANCE:
+            return None, suggestions
+        if len(scored) > 1 and scored[1][0][0] == scored[0][0][0]:
+            return None, suggestions
+        return scored[0][1], suggestions
+
+    def resolve_fqn(self, query: str, label: Optional[str] = None, limit: int = 5) -> Tuple[Optional[str], List[str]]:
+        """
+        Args:
+            query: 可能写错的 fqn（模块前缀错误、缺失或名字拼错）
+            label: 只匹配该类型的实体（Class / Method / Variable）
+
+        Returns:
+            (唯一可信的匹配或 None, 按相似度排序的建议)
+        """
+        query = query.strip().strip(".")
+        if query in self.labels and (label is None or self.labels[query] == label):
+            return query, [query]
+        parts = query.split(".")
+        name, prefix = parts[-1], parts[:-1]
+        scored = []
+        for candidate, distance in self._names.lookup(name):
+            for fqn in self._by_name[candidate]:
+                if label is not None and self.labels[fqn] != label:
+                    continue
+                cost, extra = _align(prefix, fqn.split(".")[:-1])
+                scored.append(((distance + cost, extra, len(fqn)), fqn))
+        scored.sort()
+        return self._pick(scored, limit)
+
+    def resolve_path(self, query: str, limit: int = 5) -> Tuple[Optional[str], List[str]]:
+        """
+        Returns:
+            (唯一可信的匹配或 None, 按相似度排序的建议)
+        """
+        scored = [((cost,), path) for cost, path in self.paths.match(query)]
+        return self._pick(scored, limit)
+
+
+def build_fuzzy_index(retriever) -> FuzzyIndex:
+    """由检索器的实体表与 path_modules 构建（各存储后端共用）"""
+    entities = [
+        (fqn, label)
+        for label, store in (("Class", retriever.classes), ("Method", retriever.methods), ("Variable", retriever.variables))
+        for fqn in store
+    ]
+    return FuzzyIndex(entities, retriever.path_modules)
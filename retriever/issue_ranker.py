@@ -0,0 +1,235 @@
+"""Rank knowledge-graph entities against an issue description before the localizer starts"""
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from retriever.ckg_retriever import is_test_method, is_test_path
+
+# File "/path/to/mod.py", line 12, in func
+_TRACEBACK_RE = re.compile(r'File "([^"]+\.py)", line (\d+), in ([\w<>]+)')
+_PATH_RE = re.compile(r"(?<![\w/.])((?:[\w.-]+/)*[\w-]+\.py)\b")
+_DOTTED_RE = re.compile(r"\b([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+)\b")
+_BACKTICK_RE = re.compile(r"`([^`\n]{1,120})`")
+# CamelCase、snake_case 或带下划线前缀的名字才视为代码标识符，普通英文单词不算
+_IDENTIFIER_RE = re.compile(r"\b(_*[a-z]+[A-Z]\w*|_*[A-Z][a-z0-9]+[A-Z]\w*|_*[a-z0-9]+_\w+|__\w+__)\b")
+
+# 信号权重：栈帧 > 路径 / 点分名 > 标识符
+TRACEBACK_WEIGHT = 4.0
+DOTTED_WEIGHT = 2.0
+PATH_WEIGHT = 1.5
+IDENTIFIER_WEIGHT = 1.0
+# 测试代码很少是修复位置
+TEST_PENALTY = 0.3
+
+
+def extract_issue_signals(text: str) -> dict:
+    """
+    从问题描述中抽取代码线索
+
+    Returns:
+        {"frames": [(path, line, func)], "paths": [...], "dotted": [...], "identifiers": [...]}
+    """
+    text = text or ""
+    frames = [(path, int(line), func) for path, line, func in _TRACEBACK_RE.findall(text)]
+    paths = sorted(set(_PATH_RE.findall(text)) | {path for path, _, _ in frames})
+
+    snippets = [text] + _BACKTICK_RE.findall(text)
+    dotted, identifiers = set(), set()
+    for snippet in snippets:
+        for name in _DOTTED_RE.findall(snippet):
+            if not name.endswith(".py"):
+                dotted.add(name)
+        identifiers.update(_IDENTIFIER_RE.findall(snippet))
+    # 反引号中的单个名字（如 `save`）也视为标识符
+    for snippet in _BACKTICK_RE.findall(text):
+        if re.fullmatch(r"[A-Za-z_]\w*", snippet.strip()):
+            identifiers.add(snippet.strip())
+
+    return {
+        "frames": frames,
+        "paths": paths,
+        "dotted": sorted(dotted),
+        "identifiers": sorted(identifiers),
+    }
+
+
+def _path_matches(entity_path: str, mentioned: str) -> bool:
+    """
+    按末尾路径分量比较：容器内的 /testbed/pkg/mod.py 与本地 .../pkg/mod.py 视为同一文件，
+    只给出文件名时比较文件名
+    """
+    entity_parts = entity_path.replace("\\", "/").split("/")
+    mentioned_parts = [p for p in mentioned.replace("\\", "/").split("/") if p not in ("", ".")]
+    overlap = 0
+    for a, b in zip(reversed(entity_parts), reversed(mentioned_parts)):
+        if a != b:
+            break
+        overlap += 1
+    return overlap >= min(len(mentioned_parts), 2)
+
+
+def _seed_scores(retriever, text: str, signals: dict) -> Tuple[Dict[str, float], Dict[str, List[str]]]:
+    """词法相似度 + 精确线索命中，得到个性化 PageRank 的初始分布"""
+    scores: Dict[str, float] = defaultdict(float)
+    reasons: Dict[str, List[str]] = defaultdict(list)
+
+    # 1. 稀疏 TF-IDF 余弦相似度（问题全文 vs 实体名称/签名/文档/代码）
+    for fqn, cosine in retriever.text_similarity_scores(text).items():
+        scores[fqn] += cosine
+
+    def hit(fqn: str, weight: float, reason: str):
+        scores[fqn] += weight
+        if reason not in reasons[fqn]:
+            reasons[fqn].append(reason)
+
+    # 2. 栈帧：文件 + 函数名，行号落在实体范围内时额外加分
+    for path, line, func in signals["frames"]:
+        for method in retriever.methods_by_name.get(func, []):
+            if _path_matches(method["absolute_path"], path):
+                bonus = 1.0 if method["start_line"] <= line <= method["end_line"] else 0.5
+                hit(method["full_qualified_name"], TRACEBACK_WEIGHT * bonus, f"traceback frame {func}:{line}")
+
+    # 3. 路径：文件中的顶层类和函数
+    indexed_files = retriever.classes_by_file.keys() | retriever.methods_by_file.keys()
+    for path in signals["paths"]:
+        for file_path in indexed_files:
+            if not _path_matches(file_path, path):
+                continue
+            for entity in retriever.classes_by_file.get(file_path, []) + retriever.methods_by_file.get(file_path, []):
+                hit(entity["full_qualified_name"], PATH_WEIGHT / 4, f"in mentioned file {path}")
+
+    # 4. 点分名：与 fqn 后缀匹配（QuerySet.filter、models.Field.clean）
+    for dotted in signals["dotted"]:
+        parts = dotted.split(".")
+        name = parts[-1]
+        for entity in retriever.methods_by_name.get(name, []) + retriever.classes_by_name.get(name, []):
+            fqn = entity["full_qualified_name"]
+            if fqn == dotted or fqn.endswith("." + dotted):
+                hit(fqn, DOTTED_WEIGHT, f"mentioned as {dotted}")
+            elif len(parts) > 1 and f".{parts[-2]}." in f".{fqn}":
+                hit(fqn, DOTTED_WEIGHT / 2, f"partially matches {dotted}")
+
+    # 5. 标识符：类名/方法名精确命中
+    for name in signals["identifiers"]:
+        candidates = retriever.methods_by_name.get(name, []) + retriever.classes_by_name.get(name, [])
+        if not candidates:
+            continue
+        # 名字越常见，单个候选的权重越低
+        weight = IDENTIFIER_WEIGHT / len(candidates) ** 0.5
+        for entity in candidates:
+            hit(entity["full_qualified_name"], weight, f"mentions {name}")
+
+    return scores, reasons
+
+
+def _build_adjacency(retriever) -> Dict[str, List[str]]:
+    """调用图 + 类引用 + 类/方法包含关系，作为无向图"""
+    adjacency: Dict[str, List[str]] = defaultdict(list)
+
+    def link(a: str, b: str):
+        if a != b:
+            adjacency[a].append(b)
+            adjacency[b].append(a)
+
+    for caller, callees in retriever.calls_index.items():
+        for callee in callees:
+            link(caller, callee["full_qualified_name"])
+    for referrer, referenced in retriever.references_index.items():
+        for cls in referenced:
+            link(referrer, cls["full_qualified_name"])
+    for fqn, method in retriever.methods.items():
+        class_name = method.get("class_name")
+        if class_name and class_name in retriever.classes:
+            link(fqn, class_name)
+    return adjacency
+
+
+def personalized_pagerank(
+    adjacency: Dict[str, List[str]],
+    personalization: Dict[str, float],
+    damping: float = 0.7,
+    iterations: int = 20,
+) -> Dict[str, float]:
+    """
+    稀疏幂迭代的个性化 PageRank，随机游走以 1 - damping 的概率跳回种子分布
+
+    Args:
+        adjacency: node -> 邻居列表（可重复，重复即边权）
+        personalization: 种子节点 -> 非负权重
+    """
+    total = sum(personalization.values())
+    if total <= 0:
+        return {}
+    restart = {node: weight / total for node, weight in personalization.items() if weight > 0}
+    rank = dict(restart)
+    for _ in range(iterations):
+        nxt: Dict[str, float] = defaultdict(float)
+        dangling = 0.0
+        for node, value in rank.items():
+            neighbours = adjacency.get(node)
+            if not neighbours:
+                dangling += value
+                continue
+            share = damping * value / len(neighbours)
+            for neighbour in neighbours:
+                nxt[neighbour] += share
+        # 无出边节点的质量和跳转质量都按种子分布回流
+        back = (1 - damping) + damping * dangling
+        for node, weight in restart.items():
+            nxt[node] += back * weight
+        rank = nxt
+    return rank
+
+
+def rank_issue_candidates(retriever, problem_statement: str, top_k: int = 10) -> List[dict]:
+    """
+    问题描述 -> top-k 候选实体
+
+    Args:
+        retriever: CKGRetriever
+        problem_statement: 问题描述（settings.PROBLEM_STATEMENT）
+        top_k: 返回数量
+
+    Returns:
+        [{"full_qualified_name", "label", "path", "start_line", "end_line", "score", "reasons"}]
+    """
+    if not problem_statement or top_k <= 0:
+        return []
+
+    signals = extract_issue_signals(problem_statement)
+    seeds, reasons = _seed_scores(retriever, problem_statement, signals)
+    if not seeds:
+        return []
+
+    ppr = personalized_pagerank(_build_adjacency(retriever), seeds)
+    max_seed = max(seeds.values()) or 1.0
+    max_ppr = max(ppr.values()) or 1.0
+
+    results = []
+    for fqn in seeds.keys() | ppr.keys():
+        found = retriever.find_entity(fqn)
+        if found is None:
+            continue
+        label, entity = found
+        if label == "Variable":
+            continue
+        score = 0.5 * seeds.get(fqn, 0.0) / max_seed + 0.5 * ppr.get(fqn, 0.0) / max_ppr
+        # 方法与类使用同一套测试代码判定规则
+        is_test = is_test_method(entity) if label == "Method" else is_test_path(entity["absolute_path"])
+        if is_test:
+            score *= TEST_PENALTY
+        entity_reasons = reasons.get(fqn) or (
+            ["related through the call graph"] if fqn not in seeds else ["similar wording"]
+        )
+        results.append({
+            "full_qualified_name": fqn,
+            "label": label,
+            "path": entity["absolute_path"],
+            "start_line": entity.get("start_line", 0),
+            "end_line": entity.get("end_line", 0),
+            "score": round(score, 4),
+            "reasons": entity_reasons[:3],
+        })
+
+    results.sort(key=lambda c: -c["score"])
+    return results[:top_k]
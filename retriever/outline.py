@@ -0,0 +1,93 @@
+"""由知识图谱生成文件 / 包的紧凑大纲：嵌套的类与函数、签名、装饰器、单行 docstring 与行号区间"""
+from typing import Iterable, List
+
+# 单行 docstring 摘要的最大长度
+DOC_SUMMARY_CHARS = 80
+# 一行中列出的属性 / 变量名上限
+MAX_NAMES = 12
+# modifiers 中表示访问级别而不是装饰器的项
+ACCESS_MODIFIERS = ("public", "private")
+
+
+def doc_summary(docstring: str) -> str:
+    """docstring 的第一段非空行，超长时截断"""
+    for line in (docstring or "").splitlines():
+        line = line.strip()
+        if line:
+            return line if len(line) <= DOC_SUMMARY_CHARS else line[:DOC_SUMMARY_CHARS - 1] + "…"
+    return ""
+
+
+def _names(items: Iterable[str]) -> str:
+    items = list(items)
+    shown = ", ".join(items[:MAX_NAMES])
+    return shown + (f", … (+{len(items) - MAX_NAMES})" if len(items) > MAX_NAMES else "")
+
+
+def _decorators(decorators: Iterable[str]) -> str:
+    return "".join(f"@{d} " for d in decorators if d not in ACCESS_MODIFIERS)
+
+
+def _suffix(entity: dict) -> str:
+    summary = doc_summary(entity.get("docstring", ""))
+    return f"  [{entity.get('start_line')}-{entity.get('end_line')}]" + (f"  # {summary}" if summary else "")
+
+
+def file_outline(retriever, path: str, detail: bool = True) -> List[str]:
+    """
+    一个文件的大纲行，按源码顺序并以缩进表示嵌套（各存储后端共用）
+
+    Args:
+        detail: 同时列出模块级变量、类属性和函数内部的嵌套函数；包大纲中关闭以节省 token
+    """
+    entries = [(c.get("start_line") or 0, -(c.get("end_line") or 0), "Class", c)
+               for c in retriever.classes_by_file.get(path, []) or []]
+    entries += [(m.get("start_line") or 0, -(m.get("end_line") or 0), "Method", m)
+                for m in retriever.methods_by_file.get(path, []) or []]
+    entries.sort(key=lambda e: (e[0], e[1]))
+
+    variables = list(retriever.variables_by_file.get(path, []) or [])
+    class_variables = {}
+    for v in variables:
+        if v.get("class_name"):
+            class_variables.setdefault(v["class_name"], []).append(v["name"])
+
+    lines = []
+    if detail:
+        module_variables = [v["name"] for v in variables if not v.get("class_name")]
+        if module_variables:
+            lines.append(f"vars: {_names(module_variables)}")
+
+    stack = []  # (end_line, label) of the open enclosing entities
+    seen = set()
+    for start, negative_end, label, entity in entries:
+        # 嵌套类的方法也会被外层类的访问器记录一次，同一位置只列一次
+        if (start, negative_end, label, entity["name"]) in seen:
+            continue
+        seen.add((start, negative_end, label, entity["name"]))
+        while stack and stack[-1][0] < start:
+            stack.pop()
+        if label == "Method" and stack and stack[-1][1] == "Method" and not detail:
+            continue
+        indent = "  " * len(stack)
+        stack.append((-negative_end, label))
+        if label == "Class":
+            bases = [b.rsplit(".", 1)[-1] for b in entity.get("parent_classes") or [] if b]
+            lines.append(
+                f"{indent}{_decorators(entity.get('decorators') or [])}class {entity['name']}"
+                + (f"({', '.join(bases)})" if bases else "") + _suffix(entity)
+            )
+            if detail:
+                class_attributes = class_variables.get(entity["full_qualified_name"])
+                if class_attributes:
+                    lines.append(f"{indent}  class attrs: {_names(class_attributes)}")
+                instance_attributes = [
+                    a["name"] + (f": {a['data_type']}" if a.get("data_type") else "")
+                    for a in entity.get("attributes") or []
+                ]
+                if instance_attributes:
+                    lines.append(f"{indent}  instance attrs: {_names(instance_attributes)}")
+        else:
+            signature = entity.get("signature") or f"def {entity['name']}(...)"
+            lines.append(f"{indent}{_decorators(entity.get('modifiers') or [])}{signature}{_suffix(entity)}")
+    return lines
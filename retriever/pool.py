@@ -0,0 +1,229 @@
+"""Retriever registry keyed by repository root and commit, with memory-bounded LRU eviction"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PoolKey = Tuple[str, str]  # (仓库根目录 realpath, commit)
+
+
+def read_git_commit(root: str) -> str:
+    """
+    直接读取 .git 下的文件获得 HEAD 对应的 commit，不启动 git 子进程。
+    支持分离 HEAD、松散引用、packed-refs 以及 worktree（.git 为文件）；无法确定时返回空串
+    """
+    return _read_git_commit(root, [])
+
+
+def _read_git_commit(root: str, consulted: List[str]) -> str:
+    """read_git_commit 的实现；依次读取（或尝试读取）的文件追加到 consulted"""
+    git_dir = os.path.join(root, ".git")
+    consulted.append(git_dir)
+    if os.path.isfile(git_dir):
+        try:
+            with open(git_dir, encoding="utf-8") as f:
+                content = f.read().strip()
+        except OSError:
+            return ""
+        if not content.startswith("gitdir:"):
+            return ""
+        git_dir = os.path.normpath(os.path.join(root, content[len("gitdir:"):].strip()))
+
+    consulted.append(os.path.join(git_dir, "HEAD"))
+    try:
+        with open(consulted[-1], encoding="utf-8") as f:
+            head = f.read().strip()
+    except OSError:
+        return ""
+    if not head.startswith("ref:"):
+        return head
+
+    ref = head[len("ref:"):].strip()
+    # worktree 的分支引用保存在主仓库（commondir）中
+    search_dirs = [git_dir]
+    consulted.append(os.path.join(git_dir, "commondir"))
+    try:
+        with open(consulted[-1], encoding="utf-8") as f:
+            search_dirs.append(os.path.normpath(os.path.join(git_dir, f.read().strip())))
+    except OSError:
+        pass
+
+    for directory in search_dirs:
+        consulted.append(os.path.join(directory, ref))
+        try:
+            with open(consulted[-1], encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            pass
+        consulted.append(os.path.join(directory, "packed-refs"))
+        try:
+            with open(consulted[-1], encoding="utf-8") as f:
+                for line in f:
+                    parts = line.strip().split(" ")
+                    if len(parts) == 2 and parts[1] == ref:
+                        return parts[0]
+        except OSError:
+            pass
+    return ""
+
+
+def _stat_signature(paths: List[str]) -> tuple:
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns))
+    return tuple(signature)
+
+
+# root -> (realpath, commit, 解析时读取的 .git 文件, 这些文件的 stat)
+_checkouts: Dict[str, Tuple[str, str, List[str], tuple]] = {}
+
+
+def resolve_checkout(root) -> PoolKey:
+    """
+    root 当前检出的 (realpath, commit)。结果按 root 缓存，并用解析时读取过的 .git 文件
+    （HEAD、分支引用、packed-refs 等）的 stat 校验：git 切换或提交时会重写这些文件，
+    下次调用即重新解析；未变化时只需几次 stat，不再 realpath 和读取文件
+    """
+    root = str(root)
+    cached = _checkouts.get(root)
+    if cached is not None and _stat_signature(cached[2]) == cached[3]:
+        return cached[0], cached[1]
+    real_root = cached[0] if cached is not None else os.path.realpath(root)
+    consulted: List[str] = []
+    commit = _read_git_commit(real_root, consulted)
+    signature = _stat_signature(consulted)
+    # 读取与取 stat 之间文件被改写时，缓存的 commit 会与签名不符：再读一次确认后才缓存
+    if read_git_commit(real_root) == commit:
+        _checkouts[root] = (real_root, commit, consulted, signature)
+    return real_root, commit
+
+
+def approximate_size(retriever: Any) -> int:
+    """检索器自报的内存占用（字节），未实现时视为 0"""
+    estimator = getattr(retriever, "_approximate_size", None)
+    return int(estimator()) if callable(estimator) else 0
+
+
+class RetrieverPool:
+    """
+    (仓库根目录, commit) -> 检索器
+
+    - 同一个 key 只构建一次；并发请求同一个 key 时只有一个线程构建，其余线程等待结果
+    - 不同 key 可以并行构建
+    - 总估算内存超过 max_bytes 时按最近最少使用淘汰整张图（刚构建的图不会被淘汰）
+    - 淘汰只是丢弃池中的引用，不调用 close()：其他线程可能仍在使用这张图，
+      数据库连接 / 缓冲区在最后一个使用者释放引用、对象被回收时关闭
+    """
+
+    def __init__(
+        self,
+        builder: Callable[[str, str], Any],
+        max_bytes: int = 0,
+        size_estimator: Callable[[Any], int] = approximate_size,
+    ):
+        """
+        Args:
+            builder: (root, commit) -> 检索器
+            max_bytes: 内存上限，0 表示不限制
+            size_estimator: 检索器 -> 估算字节数
+        """
+        self.builder = builder
+        self.max_bytes = max_bytes
+        self.size_estimator = size_estimator
+        self._entries: "OrderedDict[PoolKey, Tuple[Any, int]]" = OrderedDict()
+        # 正在构建的 key -> 该次构建的结果；失败时异常只交给这次构建的等待者
+        self._building: Dict[PoolKey, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(root, commit: Optional[str] = None) -> PoolKey:
+        """(realpath, commit)；commit 为 None 时取当前 HEAD（见 resolve_checkout）"""
+        if commit is None:
+            return resolve_checkout(root)
+        return os.path.realpath(str(root)), commit
+
+    def get(self, root, commit: Optional[str] = None) -> Any:
+        """
+        获取（必要时构建）root 在 commit 上的检索器
+
+        Args:
+            root: 仓库根目录
+            commit: 指定 commit；None 时读取仓库当前 HEAD
+        """
+        key = self.make_key(root, commit)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            building = self._building.get(key)
+            if building is None:
+                building = self._building[key] = Future()
+                self.misses += 1
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            # 其他线程正在构建同一张图：等待那次构建的结果（或异常）
+            return building.result()
+
+        try:
+            retriever = self.builder(*key)
+            size = self.size_estimator(retriever)
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            building.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = (retriever, size)
+            del self._building[key]
+            self._evict_locked(keep=key)
+        building.set_result(retriever)
+        return retriever
+
+    def peek(self, root, commit: Optional[str] = None) -> Any:
+        """已缓存的检索器；不构建、不计入命中、不改变 LRU 顺序，没有时返回 None"""
+        key = self.make_key(root, commit)
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def _evict_locked(self, keep: PoolKey):
+        if not self.max_bytes:
+            return
+        while self.total_bytes() > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            _, size = self._entries.pop(oldest)
+            self.evictions += 1
+            print(f"Evicted knowledge graph for {oldest[0]}@{oldest[1][:12] or 'worktree'} (~{size / 2 ** 20:.0f} MB)")
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    def keys(self) -> List[PoolKey]:
+        """按从旧到新（LRU 顺序）返回已缓存的 key"""
+        with self._lock:
+            return list(self._entries)
+
+    def evict(self, root, commit: Optional[str] = None) -> bool:
+        """主动从池中移除一张图（仍在使用它的线程不受影响）"""
+        key = self.make_key(root, commit)
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,585 @@
+"""Cypher-like graph query language over the knowledge graph indexes"""
+import ast
+import re
+from collections import namedtuple, defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LABELS = ("Class", "Method", "Variable")
+EDGE_TYPES = ("CALLS", "REFERENCES", "HAS_METHOD", "HAS_VARIABLE", "BELONGS_TO", "INHERITS", "TESTED_BY")
+# 变长路径 *、*2..、*..n 的跳数上限
+MAX_VARIABLE_HOPS = 5
+# 属性简写
+PROPERTY_ALIASES = {"fqn": "full_qualified_name", "path": "absolute_path"}
+# 返回实体时省略的嵌套字段
+_OMITTED_FIELDS = ("methods", "constants")
+
+NodePattern = namedtuple("NodePattern", "var label props")
+RelPattern = namedtuple("RelPattern", "types direction min_hops max_hops")  # direction: out / in / both
+Comparison = namedtuple("Comparison", "var prop op value")
+PropertyRef = namedtuple("PropertyRef", "var prop")  # 比较右侧引用另一个变量的属性
+BoolOp = namedtuple("BoolOp", "op operands")  # AND / OR / NOT
+ReturnItem = namedtuple("ReturnItem", "var prop key")
+Query = namedtuple("Query", "nodes rels where returns distinct limit")
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<param>\$[A-Za-z_]\w*)
+  | (?P<ident>[A-Za-z_]\w*)
+  | (?P<op>->|<-|\.\.|<>|!=|<=|>=|=~|[()\[\]{}:,.\-<>|*=])
+""", re.VERBOSE)
+
+_KEYWORDS = {
+    "MATCH", "WHERE", "RETURN", "DISTINCT", "LIMIT", "AND", "OR", "NOT",
+    "CONTAINS", "STARTS", "ENDS", "WITH", "IN", "IS", "NULL", "TRUE", "FALSE",
+}
+
+
+class QueryError(ValueError):
+    """查询语法错误或使用了不支持的写法"""
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise QueryError(f"Unexpected character {text[pos]!r} at position {pos}")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        value = match.group(kind)
+        if kind == "ident" and value.upper() in _KEYWORDS:
+            kind, value = "keyword", value.upper()
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    """
+    递归下降解析器，支持的子集：
+
+        MATCH (a:Method {name: "save"})-[:CALLS*1..2]->(b:Class)<-[:INHERITS]-(c)
+        WHERE a.path CONTAINS "models" AND NOT b.name STARTS WITH "_"
+        RETURN DISTINCT a, b.name LIMIT 20
+    """
+
+    def __init__(self, text: str, parameters: Optional[dict]):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.parameters = parameters or {}
+        self._anonymous = 0
+
+    # ---- token helpers ----
+    def _peek(self, offset: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def _accept(self, value: str) -> bool:
+        kind, token = self._peek()
+        if token == value and kind in ("op", "keyword"):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, value: str):
+        if not self._accept(value):
+            raise QueryError(f"Expected {value!r} but found {self._peek()[1]!r}")
+
+    def _identifier(self) -> str:
+        kind, token = self._peek()
+        if kind != "ident":
+            raise QueryError(f"Expected an identifier but found {token!r}")
+        self.pos += 1
+        return token
+
+    # ---- grammar ----
+    def parse(self) -> Query:
+        self._expect("MATCH")
+        nodes, rels = [self._node()], []
+        while self._peek()[1] in ("-", "<-"):
+            rels.append(self._relationship())
+            nodes.append(self._node())
+
+        where = self._or_expr() if self._accept("WHERE") else None
+
+        self._expect("RETURN")
+        distinct = self._accept("DISTINCT")
+        returns = [self._return_item()]
+        while self._accept(","):
+            returns.append(self._return_item())
+
+        limit = None
+        if self._accept("LIMIT"):
+            limit = self._literal()
+            if not isinstance(limit, int) or limit < 0:
+                raise QueryError("LIMIT must be a non-negative integer")
+        if self._peek()[0] is not None:
+            raise QueryError(f"Unexpected {self._peek()[1]!r} after the query")
+
+        bound = {node.var for node in nodes}
+        for var in _expression_vars(where) | {item.var for item in returns}:
+            if var not in bound:
+                raise QueryError(f"Variable '{var}' is not defined in MATCH")
+        return Query(nodes, rels, where, returns, distinct, limit)
+
+    def _node(self) -> NodePattern:
+        self._expect("(")
+        var = None
+        if self._peek()[0] == "ident":
+            var = self._identifier()
+        label = None
+        if self._accept(":"):
+            name = self._identifier()
+            label = next((known for known in LABELS if known.lower() == name.lower()), None)
+            if label is None:
+                raise QueryError(f"Unknown label '{name}', use one of {', '.join(LABELS)}")
+        props = {}
+        if self._accept("{"):
+            while not self._accept("}"):
+                key = self._identifier()
+                self._expect(":")
+                props[PROPERTY_ALIASES.get(key, key)] = self._literal()
+                if not self._accept(","):
+                    self._expect("}")
+                    break
+        self._expect(")")
+        if var is None:
+            var = f"_n{self._anonymous}"
+            self._anonymous += 1
+        return NodePattern(var, label, props)
+
+    def _relationship(self) -> RelPattern:
+        left = self._accept("<-")
+        if not left:
+            self._expect("-")
+        types, min_hops, max_hops = [], 1, 1
+        if self._accept("["):
+            if self._peek()[0] == "ident":
+                # 关系变量仅为兼容 Cypher 写法，不能在 WHERE/RETURN 中使用
+                self._identifier()
+            if self._accept(":"):
+                types.append(self._identifier().upper())
+                while self._accept("|"):
+                    self._accept(":")
+                    types.append(self._identifier().upper())
+            if self._accept("*"):
+                min_hops, max_hops = 1, MAX_VARIABLE_HOPS
+                if self._peek()[0] == "number":
+                    min_hops = max_hops = int(self._peek()[1])
+                    self.pos += 1
+                if self._accept(".."):
+                    max_hops = MAX_VARIABLE_HOPS
+                    if self._peek()[0] == "number":
+                        max_hops = int(self._peek()[1])
+                        self.pos += 1
+            self._expect("]")
+        right = self._accept("->")
+        if not right:
+            self._expect("-")
+
+        for edge_type in types:
+            if edge_type not in EDGE_TYPES:
+                raise QueryError(f"Unknown relationship type '{edge_type}', use one of {', '.join(EDGE_TYPES)}")
+        if left and right:
+            raise QueryError("A relationship cannot point both ways")
+        if min_hops > max_hops:
+            raise QueryError(f"Invalid path length *{min_hops}..{max_hops}")
+        if max_hops > MAX_VARIABLE_HOPS:
+            raise QueryError(f"Path length is limited to {MAX_VARIABLE_HOPS} hops")
+        direction = "in" if left else "out" if right else "both"
+        return RelPattern(tuple(types), direction, min_hops, max_hops)
+
+    def _return_item(self) -> ReturnItem:
+        var = self._identifier()
+        prop = None
+        if self._accept("."):
+            prop = self._identifier()
+        return ReturnItem(var, PROPERTY_ALIASES.get(prop, prop), f"{var}.{prop}" if prop else var)
+
+    def _literal(self):
+        kind, token = self._peek()
+        self.pos += 1
+        if kind == "string":
+            return ast.literal_eval(token)
+        if kind == "number":
+            return float(token) if "." in token else int(token)
+        if kind == "param":
+            name = token[1:]
+            if name not in self.parameters:
+                raise QueryError(f"Missing query parameter ${name}")
+            return self.parameters[name]
+        if kind == "keyword" and token in ("TRUE", "FALSE", "NULL"):
+            return {"TRUE": True, "FALSE": False, "NULL": None}[token]
+        if token == "[":
+            values = []
+            while not self._accept("]"):
+                values.append(self._literal())
+                if not self._accept(","):
+                    self._expect("]")
+                    break
+            return values
+        raise QueryError(f"Expected a value but found {token!r}")
+
+    def _or_expr(self):
+        operands = [self._and_expr()]
+        while self._accept("OR"):
+            operands.append(self._and_expr())
+        return operands[0] if len(operands) == 1 else BoolOp("OR", operands)
+
+    def _and_expr(self):
+        operands = [self._not_expr()]
+        while self._accept("AND"):
+            operands.append(self._not_expr())
+        return operands[0] if len(operands) == 1 else BoolOp("AND", operands)
+
+    def _not_expr(self):
+        if self._accept("NOT"):
+            return BoolOp("NOT", [self._not_expr()])
+        if self._accept("("):
+            expr = self._or_expr()
+            self._expect(")")
+            return expr
+        return self._comparison()
+
+    def _comparison(self) -> Comparison:
+        var = self._identifier()
+        self._expect(".")
+        prop = self._identifier()
+        prop = PROPERTY_ALIASES.get(prop, prop)
+
+        if self._accept("IS"):
+            negate = self._accept("NOT")
+            self._expect("NULL")
+            return Comparison(var, prop, "IS NOT NULL" if negate else "IS NULL", None)
+        if self._accept("STARTS") or self._accept("ENDS"):
+            op = f"{self.tokens[self.pos - 1][1]} WITH"
+            self._expect("WITH")
+            return Comparison(var, prop, op, self._literal())
+        for op in ("CONTAINS", "IN", "=~", "=", "<>", "!=", "<=", ">=", "<", ">"):
+            if self._accept(op):
+                if self._peek()[0] == "ident" and self._peek(1)[1] == ".":
+                    ref_var = self._identifier()
+                    self._expect(".")
+                    ref_prop = self._identifier()
+                    return Comparison(var, prop, "<>" if op == "!=" else op,
+                                      PropertyRef(ref_var, PROPERTY_ALIASES.get(ref_prop, ref_prop)))
+                value = self._literal()
+                if op == "=~":
+                    try:
+                        value = re.compile(value)
+                    except (re.error, TypeError) as e:
+                        raise QueryError(f"Invalid regular expression {value!r}: {e}")
+                return Comparison(var, prop, "<>" if op == "!=" else op, value)
+        raise QueryError(f"Expected a comparison operator after {var}.{prop}")
+
+
+def parse_query(text: str, parameters: Optional[dict] = None) -> Query:
+    """解析查询文本，$name 形式的参数在解析时代入"""
+    return _Parser(text, parameters).parse()
+
+
+def _expression_vars(expr) -> set:
+    if expr is None:
+        return set()
+    if isinstance(expr, Comparison):
+        return {expr.var, expr.value.var} if isinstance(expr.value, PropertyRef) else {expr.var}
+    return set().union(*(_expression_vars(e) for e in expr.operands))
+
+
+def _property(label: str, entity: dict, prop: str):
+    return label if prop == "label" else entity.get(prop)
+
+
+def _evaluate(expr, row: Dict[str, Tuple[str, dict]]) -> bool:
+    if isinstance(expr, BoolOp):
+        if expr.op == "AND":
+            return all(_evaluate(e, row) for e in expr.operands)
+        if expr.op == "OR":
+            return any(_evaluate(e, row) for e in expr.operands)
+        return not _evaluate(expr.operands[0], row)
+
+    value = _property(*row[expr.var], expr.prop)
+    op, expected = expr.op, expr.value
+    if isinstance(expected, PropertyRef):
+        expected = _property(*row[expected.var], expected.prop)
+        if op == "=~":
+            return False
+    if op == "IS NULL":
+        return value is None
+    if op == "IS NOT NULL":
+        return value is not None
+    if value is None:
+        return False
+    try:
+        if op == "=":
+            return value == expected
+        if op == "<>":
+            return value != expected
+        if op == "<":
+            return value < expected
+        if op == "<=":
+            return value <= expected
+        if op == ">":
+            return value > expected
+        if op == ">=":
+            return value >= expected
+        if op == "IN":
+            return value in expected
+        if op == "CONTAINS":
+            return expected in value
+        if op == "STARTS WITH":
+            return str(value).startswith(expected)
+        if op == "ENDS WITH":
+            return str(value).endswith(expected)
+        if op == "=~":
+            return expected.fullmatch(str(value)) is not None
+    except TypeError:
+        return False
+    return False
+
+
+class GraphQueryEngine:
+    """
+    在检索器的索引上执行图查询
+
+    规划：为每个节点模式估算候选数（fqn 精确匹配 < 名称索引 < 文件索引 < 整个标签），
+    从候选最少的节点开始，沿路径向两侧展开；WHERE 中的 AND 子句在所涉变量全部绑定后立即过滤。
+    反向边（调用者、子类、被测试对象等）首次使用时构建
+    """
+
+    def __init__(self, retriever):
+        self.retriever = retriever
+        self._reverse_index: Dict[str, Dict[str, List[str]]] = {}
+
+    def run(self, query: str, parameters: Optional[dict] = None, limit: Optional[int] = None) -> List[dict]:
+        """
+        执行查询
+
+        Args:
+            limit: 最多返回的行数，与查询中的 LIMIT 取较小者；达到后立即停止匹配
+
+        Returns:
+            每行一个字典：RETURN 项（"a" 或 "a.name"）-> 实体字典或属性值
+        """
+        parsed = parse_query(query, parameters)
+        if limit is not None:
+            parsed = parsed._replace(limit=limit if parsed.limit is None else min(parsed.limit, limit))
+        if parsed.limit == 0:
+            return []
+        rows = self._match(parsed)
+
+        results, seen = [], set()
+        for row in rows:
+            record = {}
+            for item in parsed.returns:
+                label, entity = row[item.var]
+                if item.prop is None:
+                    record[item.key] = {"label": label, **{k: v for k, v in entity.items() if k not in _OMITTED_FIELDS}}
+                else:
+                    record[item.key] = _property(label, entity, item.prop)
+            if parsed.distinct:
+                key = repr([
+                    (v["label"], v["full_qualified_name"]) if isinstance(v, dict) else v
+                    for v in record.values()
+                ])
+                if key in seen:
+                    continue
+                seen.add(key)
+            results.append(record)
+            if parsed.limit is not None and len(results) >= parsed.limit:
+                break
+        return results
+
+    # ------------------------------------------------------------------ #
+    # 规划与匹配
+    # ------------------------------------------------------------------ #
+
+    def _match(self, parsed: Query) -> Iterator[Dict[str, Tuple[str, dict]]]:
+        conjuncts = []
+        if parsed.where is not None:
+            where = parsed.where
+            conjuncts = where.operands if isinstance(where, BoolOp) and where.op == "AND" else [where]
+
+        # 用 WHERE 中的等值条件补充节点约束，使规划可以利用索引
+        hints: Dict[str, dict] = defaultdict(dict)
+        for conjunct in conjuncts:
+            if isinstance(conjunct, Comparison) and conjunct.op == "=" and isinstance(conjunct.value, (str, int, float)):
+                hints[conjunct.var].setdefault(conjunct.prop, conjunct.value)
+
+        plans = [self._start_candidates(node, hints[node.var]) for node in parsed.nodes]
+        start = min(range(len(plans)), key=lambda i: plans[i][0])
+
+        # 展开顺序：起点 -> 右侧各节点 -> 左侧各节点（左侧的边方向取反）
+        steps = [(k, k, k + 1, False) for k in range(start, len(parsed.rels))]
+        steps += [(k, k + 1, k, True) for k in range(start - 1, -1, -1)]
+
+        # 条件下推：每个 AND 子句挂在其变量全部绑定的最早一步
+        bound_after = [{parsed.nodes[start].var}]
+        for _, _, dst, _ in steps:
+            bound_after.append(bound_after[-1] | {parsed.nodes[dst].var})
+        scheduled: Dict[int, list] = defaultdict(list)
+        for conjunct in conjuncts:
+            needed = _expression_vars(conjunct)
+            scheduled[next(i for i, bound in enumerate(bound_after) if needed <= bound)].append(conjunct)
+
+        def expand(row: dict, depth: int) -> Iterator[dict]:
+            if depth == len(steps):
+                yield row
+                return
+            rel_index, src, dst, flip = steps[depth]
+            node = parsed.nodes[dst]
+            src_fqn = row[parsed.nodes[src].var][1]["full_qualified_name"]
+            for label, entity in self._traverse(src_fqn, parsed.rels[rel_index], flip):
+                if not self._node_matches(node, label, entity):
+                    continue
+                if node.var in row:
+                    # 同一变量在路径中重复出现（环），必须是同一实体
+                    if row[node.var][1]["full_qualified_name"] != entity["full_qualified_name"]:
+                        continue
+                    next_row = row
+                else:
+                    next_row = {**row, node.var: (label, entity)}
+                if all(_evaluate(c, next_row) for c in scheduled[depth + 1]):
+                    yield from expand(next_row, depth + 1)
+
+        start_node = parsed.nodes[start]
+        for label, entity in plans[start][1]():
+            if not self._node_matches(start_node, label, entity):
+                continue
+            row = {start_node.var: (label, entity)}
+            if all(_evaluate(c, row) for c in scheduled[0]):
+                yield from expand(row, 0)
+
+    def _stores(self, label: str) -> Tuple[dict, dict, dict]:
+        r = self.retriever
+        return {
+            "Class": (r.classes, r.classes_by_name, r.classes_by_file),
+            "Method": (r.methods, r.methods_by_name, r.methods_by_file),
+            "Variable": (r.variables, r.variables_by_name, r.variables_by_file),
+        }[label]
+
+    def _start_candidates(self, node: NodePattern, hints: dict):
+        """返回 (估算候选数, 生成候选的函数)"""
+        constraints = {**hints, **node.props}
+        labels = [node.label] if node.label else list(LABELS)
+
+        fqn = constraints.get("full_qualified_name")
+        if isinstance(fqn, str):
+            def by_fqn():
+                found = self.retriever.find_entity(fqn)
+                return [found] if found and found[0] in labels else []
+            return 1, by_fqn
+
+        for prop, index_position in (("name", 1), ("absolute_path", 2)):
+            value = constraints.get(prop)
+            if isinstance(value, str):
+                groups = [(label, self._stores(label)[index_position].get(value, [])) for label in labels]
+                candidates = [(label, entity) for label, entities in groups for entity in entities]
+                return len(candidates), lambda: candidates
+
+        def scan():
+            for label in labels:
+                for entity in self._stores(label)[0].values():
+                    yield label, entity
+        return sum(len(self._stores(label)[0]) for label in labels), scan
+
+    @staticmethod
+    def _node_matches(node: NodePattern, label: str, entity: dict) -> bool:
+        if node.label and node.label != label:
+            return False
+        return all(_property(label, entity, prop) == value for prop, value in node.props.items())
+
+    # ------------------------------------------------------------------ #
+    # 边遍历
+    # ------------------------------------------------------------------ #
+
+    def _traverse(self, fqn: str, rel: RelPattern, flip: bool) -> Iterator[Tuple[str, dict]]:
+        """按跳数 BFS，返回距离在 [min_hops, max_hops] 内的节点（每个节点只返回一次）"""
+        direction = {"out": "in", "in": "out"}.get(rel.direction, "both") if flip else rel.direction
+        types = rel.types or EDGE_TYPES
+        if rel.min_hops == 0:
+            found = self.retriever.find_entity(fqn)
+            if found:
+                yield found
+
+        frontier, seen = [fqn], set()
+        for hop in range(1, rel.max_hops + 1):
+            next_frontier = []
+            for current in frontier:
+                for neighbour in self._neighbours(current, types, direction):
+                    if neighbour in seen:
+                        continue
+                    seen.add(neighbour)
+                    next_frontier.append(neighbour)
+                    if hop >= rel.min_hops:
+                        found = self.retriever.find_entity(neighbour)
+                        if found:
+                            yield found
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+    def _neighbours(self, fqn: str, types, direction: str) -> List[str]:
+        found = self.retriever.find_entity(fqn)
+        if found is None:
+            return []
+        label, entity = found
+        result = []
+        for edge_type in types:
+            if direction in ("out", "both"):
+                result.extend(self._out_edges(edge_type, fqn, label, entity))
+            if direction in ("in", "both"):
+                result.extend(self._reverse(edge_type).get(fqn, []))
+        return result
+
+    def _out_edges(self, edge_type: str, fqn: str, label: str, entity: dict) -> List[str]:
+        r = self.retriever
+        if edge_type == "CALLS":
+            return [t["full_qualified_name"] for t in r.calls_index.get(fqn, [])]
+        if edge_type == "REFERENCES":
+            return [t["full_qualified_name"] for t in r.references_index.get(fqn, [])]
+        if edge_type == "HAS_METHOD":
+            return [m["full_qualified_name"] for m in entity.get("methods", [])] if label == "Class" else []
+        if edge_type == "HAS_VARIABLE":
+            return [c["full_qualified_name"] for c in entity.get("constants", [])] if label == "Class" else []
+        if edge_type == "BELONGS_TO":
+            class_name = entity.get("class_name") if label != "Class" else None
+            return [class_name] if class_name and class_name in r.classes else []
+        if edge_type == "INHERITS":
+            return [b for b in r.get_class_bases(fqn) if b in r.classes] if label == "Class" else []
+        if edge_type == "TESTED_BY":
+            return list(r.tests_index.get(fqn, []))
+        return []
+
+    def _reverse(self, edge_type: str) -> Dict[str, List[str]]:
+        """反向邻接表：dst -> [src]，首次使用时遍历正向边构建"""
+        if edge_type not in self._reverse_index:
+            r = self.retriever
+            reverse: Dict[str, List[str]] = defaultdict(list)
+            if edge_type in ("CALLS", "REFERENCES"):
+                index = r.calls_index if edge_type == "CALLS" else r.references_index
+                for src, targets in index.items():
+                    for target in targets:
+                        reverse[target["full_qualified_name"]].append(src)
+            elif edge_type in ("HAS_METHOD", "HAS_VARIABLE"):
+                store = r.methods if edge_type == "HAS_METHOD" else r.variables
+                for fqn, entity in store.items():
+                    if entity.get("class_name") in r.classes:
+                        reverse[fqn].append(entity["class_name"])
+            elif edge_type == "BELONGS_TO":
+                for class_fqn, cls in r.classes.items():
+                    for member in cls.get("methods", []) + cls.get("constants", []):
+                        reverse[class_fqn].append(member["full_qualified_name"])
+            elif edge_type == "INHERITS":
+                for class_fqn in r.classes:
+                    for base in r.get_class_bases(class_fqn):
+                        reverse[base].append(class_fqn)
+            elif edge_type == "TESTED_BY":
+                for target, tests in r.tests_index.items():
+                    for test in tests:
+                        reverse[test].append(target)
+            self._reverse_index[edge_type] = dict(reverse)
+        return self._reverse_index[edge_type]
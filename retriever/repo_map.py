@@ -0,0 +1,133 @@
+"""仓库地图：按引用图上的 PageRank 排序文件与符号，在 token 预算内渲染最核心的部分"""
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from retriever.ckg_retriever import is_test_path
+from retriever.issue_ranker import personalized_pagerank
+
+# 全局排序用标准阻尼系数（issue_ranker 的个性化排序更偏向种子）
+DAMPING = 0.85
+ITERATIONS = 30
+# 每个文件最多列出的符号数
+SYMBOLS_PER_FILE = 6
+# 参数列表超过该长度时截断
+MAX_PARAMS_CHARS = 60
+
+
+def _module_of(fqn: str, modules: Dict[str, dict]) -> Optional[str]:
+    """fqn 所在模块：在 modules 中能找到的最长点分前缀"""
+    parts = fqn.split(".")
+    for i in range(len(parts), 0, -1):
+        module = ".".join(parts[:i])
+        if module in modules:
+            return module
+    return None
+
+
+def rank_repository(retriever) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    文件级引用图上的 PageRank：文件 A 每使用一次文件 B 中定义的名字（usages_index）
+    或调用一次 B 中的函数（calls_index，来自 tags），就有一条 A -> B 的边。
+    文件的排名再按边分给被使用的符号。
+
+    Returns:
+        (file -> rank, 符号 fqn -> score)
+    """
+    modules = retriever.modules
+    file_of_module = {module: info["path"] for module, info in modules.items()}
+
+    def file_of(fqn: str) -> Optional[str]:
+        module = _module_of(fqn, modules)
+        return file_of_module.get(module) if module else None
+
+    # src 文件 -> 目标 fqn -> 次数
+    uses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for target, sites in retriever.usages_index.items():
+        target_file = file_of(target)
+        if target_file is None or target in modules:
+            continue  # 整个模块的引用（import x）只反映在文件之间的依赖中，不算符号
+        for site in sites:
+            if site[0] != target_file:
+                uses[site[0]][target] += 1
+    for caller, callees in retriever.calls_index.items():
+        caller_file = file_of(caller)
+        if caller_file is None:
+            continue
+        for callee in callees:
+            if callee.get("absolute_path") not in (None, caller_file):
+                uses[caller_file][callee["full_qualified_name"]] += 1
+
+    adjacency: Dict[str, List[str]] = defaultdict(list)
+    for src, targets in uses.items():
+        for target, count in targets.items():
+            adjacency[src].extend([file_of(target)] * count)
+    files = set(retriever.path_modules) | set(adjacency)
+    file_rank = personalized_pagerank(
+        adjacency, {path: 1.0 for path in files}, damping=DAMPING, iterations=ITERATIONS
+    )
+
+    symbol_score: Dict[str, float] = defaultdict(float)
+    for src, targets in uses.items():
+        total = sum(targets.values())
+        for target, count in targets.items():
+            symbol_score[target] += file_rank.get(src, 0.0) * count / total
+    return file_rank, dict(symbol_score)
+
+
+def _display_entity(retriever, fqn: str) -> Optional[Tuple[str, str, dict]]:
+    """符号对应的可显示实体（实例属性归到所属类），返回 (fqn, label, entity)"""
+    for candidate in (fqn, fqn.rsplit(".", 1)[0]):
+        found = retriever.find_entity(candidate)
+        if found and found[0] in ("Class", "Method"):
+            return candidate, found[0], found[1]
+    return None
+
+
+def _symbol_line(module: str, label: str, fqn: str, entity: dict) -> str:
+    local_name = fqn[len(module) + 1:] if module and fqn.startswith(module + ".") else fqn
+    if label == "Class":
+        return f"  class {local_name}"
+    signature = entity.get("signature") or f"def {entity.get('name')}(...)"
+    params = signature[signature.find("("):] if "(" in signature else "(...)"
+    if len(params) > MAX_PARAMS_CHARS:
+        params = params[:MAX_PARAMS_CHARS - 2] + "…)"
+    return f"  def {local_name}{params}"
+
+
+def render_repo_map(retriever, root: str, fits: Callable[[str], bool]) -> str:
+    """
+    按文件排名依次加入 "相对路径 + 排名最高的符号" 块，直到下一块放不进预算；测试文件不列出
+
+    Args:
+        root: 项目根目录，显示相对路径
+        fits: 文本是否仍在预算内
+    """
+    file_rank, symbol_score = rank_repository(retriever)
+
+    by_file: Dict[str, List[Tuple[float, str, str, dict]]] = defaultdict(list)
+    seen = set()
+    for fqn, score in sorted(symbol_score.items(), key=lambda item: -item[1]):
+        display = _display_entity(retriever, fqn)
+        if display is None or display[0] in seen:
+            continue
+        seen.add(display[0])
+        path = display[2].get("absolute_path")
+        if path:
+            by_file[path].append((score, *display))
+
+    prefix = root.rstrip("/") + "/"
+    ranked = sorted(
+        (path for path in file_rank if not is_test_path("/" + path[len(prefix):] if path.startswith(prefix) else path)),
+        key=lambda path: (-file_rank[path], path),
+    )
+    blocks = []
+    for path in ranked:
+        module = retriever.path_modules.get(path, "")
+        lines = [path[len(prefix):] if path.startswith(prefix) else path]
+        lines += [_symbol_line(module, label, fqn, entity)
+                  for _, fqn, label, entity in by_file.get(path, [])[:SYMBOLS_PER_FILE]]
+        candidate = "\n".join(blocks + ["\n".join(lines)])
+        if not fits(candidate):
+            break
+        blocks.append("\n".join(lines))
+    return "\n".join(blocks)
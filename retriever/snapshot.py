@@ -0,0 +1,788 @@
+"""Flat, pointer-free knowledge graph snapshots shared between worker processes via mmap or shared memory"""
+import json
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from retriever.bm25 import BM25Index
+from retriever.ckg_retriever import CKGRetriever
+from utils.metrics import instrument_queries
+
+MAGIC = b"CKGSNAP\x01"
+SNAPSHOT_VERSION = 2
+
+_HEADER = struct.Struct("<8sII")  # magic, version, section 数量
+_SECTION = struct.Struct("<16sQQ")  # 名称, 偏移, 长度
+# 实体记录：fqn / name / path / content / data(JSON) 五个字符串引用 (offset, length)，start/end 行号，label
+_ENTITY = struct.Struct("<12IB3x")
+_TERM = struct.Struct("<II")
+# 辅助索引记录："<索引名>\0<key>" 与 JSON 值的字符串引用，按 key 字节序排序
+_AUX = struct.Struct("<IIII")
+
+LABELS = ("Class", "Method", "Variable")
+# 按 fqn 建立的 CSR 边表，以及类 -> 成员
+_FQN_EDGES = ("CALLS", "REFERENCES", "TESTED_BY", "SUBCLASSES")
+_MEMBER_EDGES = ("METHODS", "CONSTANTS")
+# 解码后的实体字典缓存上限（每个进程私有）
+ENTITY_CACHE_SIZE = 8192
+# 附加共享内存快照时等待创建方写完的最长时间（秒）
+ATTACH_TIMEOUT = 60.0
+
+
+def _u32(values) -> bytes:
+    return struct.pack(f"<{len(values)}I", *values)
+
+
+def _f32(values) -> bytes:
+    return struct.pack(f"<{len(values)}f", *values)
+
+
+class _StringHeap:
+    """去重的 UTF-8 字符串堆，记录中只保存 (offset, length)"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self._refs: Dict[str, Tuple[int, int]] = {}
+
+    def add(self, text: Optional[str]) -> Tuple[int, int]:
+        text = text or ""
+        ref = self._refs.get(text)
+        if ref is None:
+            encoded = text.encode("utf-8")
+            ref = (len(self.data), len(encoded))
+            self.data += encoded
+            self._refs[text] = ref
+        return ref
+
+
+def _csr(rows: List[List[int]]) -> Tuple[bytes, bytes]:
+    offsets, targets = [0], []
+    for row in rows:
+        targets.extend(row)
+        offsets.append(len(targets))
+    return _u32(offsets), _u32(targets)
+
+
+def write_snapshot(retriever: CKGRetriever, path) -> str:
+    """
+    把内存版 CKGRetriever（含 BM25 索引）写成扁平快照文件。
+    文件中没有指针，只有定长记录、u32/f32 数组和字符串堆，任何进程 mmap 后即可直接查询。
+    先写临时文件再原子替换
+
+    Returns:
+        快照文件路径
+    """
+    path = str(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    heap = _StringHeap()
+
+    # 1. 实体：按 (fqn, label) 排序，便于二分查找
+    entities = []  # (fqn, label_code, seq, entity)
+    for code, store in enumerate((retriever.classes, retriever.methods, retriever.variables)):
+        for seq, (fqn, entity) in enumerate(store.items()):
+            entities.append((fqn, code, seq, entity))
+    entities.sort(key=lambda e: (e[0].encode("utf-8"), e[1]))
+    index_of = {(fqn, code): i for i, (fqn, code, _, _) in enumerate(entities)}
+    first_index = {}
+    for i, (fqn, _, _, _) in enumerate(entities):
+        first_index.setdefault(fqn, i)
+
+    records = bytearray()
+    for fqn, code, _, entity in entities:
+        data = {k: v for k, v in entity.items() if k not in ("content", "methods", "constants")}
+        if code == 0:
+            data["_bases"] = retriever.class_bases.get(fqn, [])
+        refs = (
+            heap.add(fqn), heap.add(entity["name"]), heap.add(entity["absolute_path"]),
+            heap.add(entity.get("content", "")),
+            heap.add(json.dumps(data, ensure_ascii=False, default=str)),
+        )
+        records += _ENTITY.pack(
+            *(v for ref in refs for v in ref),
+            entity.get("start_line", 0) or 0, entity.get("end_line", 0) or 0, code,
+        )
+
+    sections: Dict[str, bytes] = {"ENTITIES": bytes(records)}
+    for code, label in enumerate(LABELS):
+        order = sorted((seq, i) for i, (_, c, seq, _) in enumerate(entities) if c == code)
+        sections[f"ORDER_{label}"] = _u32([i for _, i in order])
+
+    # 2. 名称 / 文件索引：组内保持原始插入顺序
+    for section, field in (("BY_NAME", "name"), ("BY_PATH", "absolute_path")):
+        order = sorted(
+            range(len(entities)),
+            key=lambda i: (entities[i][3][field].encode("utf-8"), entities[i][1], entities[i][2]),
+        )
+        sections[section] = _u32(order)
+
+    # 3. 边：CSR（offsets 长度为实体数 + 1）
+    def target_index(target: dict) -> Optional[int]:
+        fqn = target["full_qualified_name"]
+        code = 0 if retriever.classes.get(fqn) is target else 1
+        return index_of.get((fqn, code), first_index.get(fqn))
+
+    edge_rows = {name: [[] for _ in entities] for name in _FQN_EDGES + _MEMBER_EDGES}
+    for name, index in (("CALLS", retriever.calls_index), ("REFERENCES", retriever.references_index)):
+        for src, targets in index.items():
+            if src in first_index:
+                edge_rows[name][first_index[src]] = [
+                    t for t in (target_index(target) for target in targets) if t is not None
+                ]
+    for src, tests in retriever.tests_index.items():
+        if src in first_index:
+            edge_rows["TESTED_BY"][first_index[src]] = [index_of[(t, 1)] for t in tests if (t, 1) in index_of]
+    for src, subclasses in retriever.class_subclasses.items():
+        if (src, 0) in index_of:
+            edge_rows["SUBCLASSES"][index_of[(src, 0)]] = [index_of[(s, 0)] for s in subclasses if (s, 0) in index_of]
+    for i, (_, code, _, entity) in enumerate(entities):
+        if code == 0:
+            edge_rows["METHODS"][i] = [index_of[(m["full_qualified_name"], 1)] for m in entity.get("methods", [])
+                                       if (m["full_qualified_name"], 1) in index_of]
+            edge_rows["CONSTANTS"][i] = [index_of[(c["full_qualified_name"], 2)] for c in entity.get("constants", [])
+                                         if (c["full_qualified_name"], 2) in index_of]
+    for name, rows in edge_rows.items():
+        sections[f"{name}_OFF"], sections[f"{name}_DST"] = _csr(rows)
+
+    # 4. BM25 倒排索引（含预计算的文档范数，供余弦相似度使用）
+    bm25 = retriever._get_search_index()
+    terms = sorted(bm25.postings, key=lambda t: t.encode("utf-8"))
+    term_refs, post_offsets, post_docs, post_tfs = bytearray(), [0], [], []
+    for term in terms:
+        term_refs += _TERM.pack(*heap.add(term))
+        for doc_idx, tf in bm25.postings[term]:
+            post_docs.append(doc_idx)
+            post_tfs.append(tf)
+        post_offsets.append(len(post_docs))
+    bm25.cosine_scores([])  # 触发文档范数的计算
+    sections.update({
+        "BM25_TERMS": bytes(term_refs),
+        "BM25_POST_OFF": _u32(post_offsets),
+        "BM25_POST_DOC": _u32(post_docs),
+        "BM25_POST_TF": _f32(post_tfs),
+        "BM25_IDF": _f32([bm25.idf[t] for t in terms]),
+        "BM25_DOC_LEN": _f32(bm25.doc_lengths),
+        "BM25_DOC_NORM": _f32(bm25._doc_norms),
+        "BM25_DOC_ENTITY": _u32([index_of[(fqn, LABELS.index(label))] for label, fqn in bm25.doc_ids]),
+    })
+    # 5. 辅助索引（CKGRetriever.AUX_INDEXES）
+    aux = sorted(
+        (f"{name}\0{key}".encode("utf-8"), json.dumps(value, ensure_ascii=False))
+        for name in CKGRetriever.AUX_INDEXES
+        for key, value in getattr(retriever, name).items()
+    )
+    aux_records = bytearray()
+    for key, value in aux:
+        aux_records += _AUX.pack(*heap.add(key.decode("utf-8")), *heap.add(value))
+    sections["AUX"] = bytes(aux_records)
+
+    sections["STRINGS"] = bytes(heap.data)
+    sections["META"] = json.dumps({
+        "root": getattr(retriever, "root", None),
+        "entities": len(entities),
+        "bm25": {"k1": bm25.k1, "b": bm25.b, "avg_doc_length": bm25.avg_doc_length},
+    }).encode("utf-8")
+
+    # 6. 写文件：头 + section 表 + 8 字节对齐的各 section
+    names = list(sections)
+    offset = _HEADER.size + _SECTION.size * len(names)
+    table, layout = bytearray(), []
+    for name in names:
+        offset = (offset + 7) & ~7
+        table += _SECTION.pack(name.encode("ascii"), offset, len(sections[name]))
+        layout.append((offset, sections[name]))
+        offset += len(sections[name])
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, SNAPSHOT_VERSION, len(names)))
+        f.write(table)
+        for section_offset, payload in layout:
+            f.write(b"\0" * (section_offset - f.tell()))
+            f.write(payload)
+    os.replace(tmp_path, path)
+    print(f"Knowledge graph snapshot written to {path} ({offset / 2 ** 20:.1f} MB)")
+    return path
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    """
+    从 resource_tracker 注销共享内存段：Python < 3.13 在创建和附加时都会注册，
+    进程退出时 tracker 会 unlink 该段，而其他 worker 可能仍在使用
+    """
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def load_into_shared_memory(path, name: str) -> shared_memory.SharedMemory:
+    """
+    把快照文件复制到命名共享内存中（每台机器只需一次），其他进程用 SnapshotRetriever.from_shared_memory 附加。
+
+    段名在复制完成前就已可见，因此先写入头部之后的内容，最后写入头部（MAGIC）；
+    附加方看到未写完的头部时等待重试。
+    段的生命周期不属于任何一个 worker（包括创建它的进程）：它与 KG_CACHE_DIR 中的快照文件一样
+    按 仓库-commit 命名、可被之后的进程复用，一直保留到启动 worker 的进程在全部 worker 结束后
+    调用 unlink_shared_snapshot（或机器重启）
+    """
+    size = os.path.getsize(path)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            f.readinto(shm.buf[_HEADER.size:size])
+        shm.buf[:_HEADER.size] = header
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    _untrack(shm)
+    return shm
+
+
+def unlink_shared_snapshot(name: str) -> bool:
+    """删除 load_into_shared_memory 创建的共享内存段（已附加的进程可继续使用到 close）；段不存在时返回 False"""
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    shm.unlink()
+    return True
+
+
+# ---------------------------------------------------------------------- #
+# 只读视图：与内存版 dict 索引接口兼容，按需从缓冲区解码
+# ---------------------------------------------------------------------- #
+
+class _EntityStore(Mapping):
+    """fqn -> entity_dict（对应 classes / methods / variables）"""
+
+    def __init__(self, snapshot: "SnapshotRetriever", code: int):
+        self._snapshot = snapshot
+        self._code = code
+        self._order = snapshot._u32_array(f"ORDER_{LABELS[code]}")
+
+    def __getitem__(self, fqn: str) -> dict:
+        index = self._snapshot._find(fqn, self._code)
+        if index is None:
+            raise KeyError(fqn)
+        return self._snapshot._entity(index)
+
+    def __contains__(self, fqn) -> bool:
+        return isinstance(fqn, str) and self._snapshot._find(fqn, self._code) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for index in self._order:
+            yield self._snapshot._field(index, 0)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def items(self):
+        for index in self._order:
+            entity = self._snapshot._entity(index)
+            yield entity["full_qualified_name"], entity
+
+    def values(self):
+        return [self._snapshot._entity(index) for index in self._order]
+
+
+class _GroupView(Mapping):
+    """name / path -> [entity_dict]（对应 *_by_name / *_by_file），缺失的 key 返回空列表"""
+
+    def __init__(self, snapshot: "SnapshotRetriever", code: int, section: str, field: int):
+        self._snapshot = snapshot
+        self._code = code
+        self._sorted = snapshot._u32_array(section)
+        self._field = field
+
+    def _range(self, key: str) -> Tuple[int, int]:
+        snapshot, target = self._snapshot, key.encode("utf-8")
+        keys = _KeyList(lambda i: snapshot._field_bytes(self._sorted[i], self._field), len(self._sorted))
+        start = bisect_left(keys, target)
+        end = start
+        while end < len(self._sorted) and keys[end] == target:
+            end += 1
+        return start, end
+
+    def get(self, key, default=None):
+        if not isinstance(key, str):
+            return default
+        start, end = self._range(key)
+        result = [
+            self._snapshot._entity(self._sorted[i]) for i in range(start, end)
+            if self._snapshot._label_code(self._sorted[i]) == self._code
+        ]
+        return result if result else default
+
+    def __getitem__(self, key):
+        result = self.get(key)
+        if result is None:
+            raise KeyError(key)
+        return result
+
+    def __iter__(self) -> Iterator[str]:
+        previous = None
+        for index in self._sorted:
+            if self._snapshot._label_code(index) != self._code:
+                continue
+            key = self._snapshot._field(index, self._field)
+            if key != previous:
+                previous = key
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class _KeyList(Sequence):
+    """把排序数组包装成可二分的序列"""
+
+    def __init__(self, getter, length: int):
+        self._getter = getter
+        self._length = length
+
+    def __getitem__(self, i):
+        return self._getter(i)
+
+    def __len__(self) -> int:
+        return self._length
+
+
+class _EdgeView(Mapping):
+    """fqn -> 邻居（实体字典或 fqn 字符串），CSR 边表；同名 fqn 的各实体的边合并返回"""
+
+    def __init__(self, snapshot: "SnapshotRetriever", name: str, as_fqn: bool):
+        self._snapshot = snapshot
+        self._offsets = snapshot._u32_array(f"{name}_OFF")
+        self._targets = snapshot._u32_array(f"{name}_DST")
+        self._as_fqn = as_fqn
+
+    def _neighbours(self, index: int) -> List[int]:
+        return list(self._targets[self._offsets[index]:self._offsets[index + 1]])
+
+    def get(self, fqn, default=None):
+        if not isinstance(fqn, str):
+            return default
+        targets = [t for index in self._snapshot._find_all(fqn) for t in self._neighbours(index)]
+        if not targets:
+            return default
+        if self._as_fqn:
+            return [self._snapshot._field(t, 0) for t in targets]
+        return [self._snapshot._entity(t) for t in targets]
+
+    def __getitem__(self, fqn):
+        result = self.get(fqn)
+        if result is None:
+            raise KeyError(fqn)
+        return result
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+        for index in range(len(self._offsets) - 1):
+            if self._offsets[index + 1] > self._offsets[index]:
+                fqn = self._snapshot._field(index, 0)
+                if fqn not in seen:
+                    seen.add(fqn)
+                    yield fqn
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class _ClassBasesView(Mapping):
+    """class_fqn -> 直接基类（项目内 fqn 或外部基类原始引用）"""
+
+    def __init__(self, snapshot: "SnapshotRetriever"):
+        self._classes = snapshot.classes
+
+    def get(self, fqn, default=None):
+        if fqn not in self._classes:
+            return default
+        return self._classes[fqn].get("_bases", [])
+
+    def __getitem__(self, fqn):
+        if fqn not in self._classes:
+            raise KeyError(fqn)
+        return self.get(fqn)
+
+    def __iter__(self):
+        return iter(self._classes)
+
+    def __len__(self) -> int:
+        return len(self._classes)
+
+
+class _ClassMethodNamesView(_ClassBasesView):
+    """class_fqn -> {method_name: method_fqn}，类体中先出现的同名方法优先"""
+
+    def get(self, fqn, default=None):
+        if fqn not in self._classes:
+            return default
+        names: Dict[str, str] = {}
+        for method in self._classes[fqn].get("methods", []):
+            names.setdefault(method["name"], method["full_qualified_name"])
+        return names
+
+
+class _FileIntervalsView(Mapping):
+    """path -> [(start_line, end_line, fqn, label, name)]，按起始行排序"""
+
+    def __init__(self, snapshot: "SnapshotRetriever"):
+        self._snapshot = snapshot
+
+    def get(self, path, default=None):
+        snapshot = self._snapshot
+        intervals = [
+            (e["start_line"], e["end_line"], e["full_qualified_name"], label, e["name"])
+            for label, by_file in (("Class", snapshot.classes_by_file), ("Method", snapshot.methods_by_file))
+            for e in by_file.get(path, [])
+        ]
+        if not intervals:
+            return default
+        intervals.sort(key=lambda t: t[0])
+        return intervals
+
+    def __getitem__(self, path):
+        result = self.get(path)
+        if result is None:
+            raise KeyError(path)
+        return result
+
+    def __iter__(self):
+        return iter(set(self._snapshot.classes_by_file) | set(self._snapshot.methods_by_file))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class _TermTable:
+    """BM25 词表：按 UTF-8 字节序排序，二分查找 term -> term_idx"""
+
+    def __init__(self, snapshot: "SnapshotRetriever"):
+        self._snapshot = snapshot
+        start, length = snapshot._sections["BM25_TERMS"]
+        self._start = start
+        self._count = length // _TERM.size
+        self.offsets = snapshot._u32_array("BM25_POST_OFF")
+        self.docs = snapshot._u32_array("BM25_POST_DOC")
+        self.tfs = snapshot._f32_array("BM25_POST_TF")
+        self.idf = snapshot._f32_array("BM25_IDF")
+
+    def _term(self, i: int) -> bytes:
+        off, length = _TERM.unpack_from(self._snapshot._buf, self._start + i * _TERM.size)
+        return self._snapshot._bytes(self._snapshot._strings_start + off, length)
+
+    def lookup(self, term: str) -> int:
+        target = term.encode("utf-8")
+        i = bisect_left(_KeyList(self._term, self._count), target)
+        return i if i < self._count and self._term(i) == target else -1
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class _PostingsView(Mapping):
+    """term -> [(doc_idx, tf)]"""
+
+    def __init__(self, table: _TermTable):
+        self._table = table
+
+    def get(self, term, default=None):
+        i = self._table.lookup(term) if isinstance(term, str) else -1
+        if i < 0:
+            return default
+        start, end = self._table.offsets[i], self._table.offsets[i + 1]
+        return list(zip(self._table.docs[start:end], self._table.tfs[start:end]))
+
+    def __getitem__(self, term):
+        result = self.get(term)
+        if result is None:
+            raise KeyError(term)
+        return result
+
+    def __iter__(self):
+        for i in range(len(self._table)):
+            yield self._table._term(i).decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+
+class _IdfView(_PostingsView):
+    """term -> idf"""
+
+    def get(self, term, default=None):
+        i = self._table.lookup(term) if isinstance(term, str) else -1
+        return self._table.idf[i] if i >= 0 else default
+
+    def __contains__(self, term) -> bool:
+        return isinstance(term, str) and self._table.lookup(term) >= 0
+
+
+class _AuxView(Mapping):
+    """辅助索引（CKGRetriever.AUX_INDEXES）的只读视图，值按需 JSON 解码"""
+
+    def __init__(self, snapshot: "SnapshotRetriever", name: str):
+        self._snapshot = snapshot
+        self._prefix = f"{name}\0".encode("utf-8")
+        start, length = snapshot._sections["AUX"]
+        self._start = start
+        self._count = length // _AUX.size
+        self._keys = _KeyList(self._key, self._count)
+
+    def _record(self, i: int) -> tuple:
+        return _AUX.unpack_from(self._snapshot._buf, self._start + i * _AUX.size)
+
+    def _key(self, i: int) -> bytes:
+        key_off, key_len, _, _ = self._record(i)
+        return self._snapshot._bytes(self._snapshot._strings_start + key_off, key_len)
+
+    def get(self, key, default=None):
+        if not isinstance(key, str):
+            return default
+        target = self._prefix + key.encode("utf-8")
+        i = bisect_left(self._keys, target)
+        if i >= self._count or self._key(i) != target:
+            return default
+        _, _, value_off, value_len = self._record(i)
+        return json.loads(self._snapshot._bytes(self._snapshot._strings_start + value_off, value_len))
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        i = bisect_left(self._keys, self._prefix)
+        while i < self._count:
+            key = self._key(i)
+            if not key.startswith(self._prefix):
+                break
+            yield key[len(self._prefix):].decode("utf-8")
+            i += 1
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class _DocIdsView(Sequence):
+    """doc_idx -> (label, fqn)"""
+
+    def __init__(self, snapshot: "SnapshotRetriever"):
+        self._snapshot = snapshot
+        self._entities = snapshot._u32_array("BM25_DOC_ENTITY")
+
+    def __getitem__(self, doc_idx):
+        index = self._entities[doc_idx]
+        return LABELS[self._snapshot._label_code(index)], self._snapshot._field(index, 0)
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+
+@instrument_queries
+class SnapshotRetriever(CKGRetriever):
+    """
+    基于扁平快照的只读检索器
+
+    快照通过 mmap（只读文件）或 multiprocessing.shared_memory 附加，同一台机器上的所有 worker
+    共享同一份物理页；打开时不做反序列化，只解析 section 表，实体在首次访问时解码并缓存在本进程。
+    继承 CKGRetriever 的全部查询方法，原有 dict 索引由只读视图代替
+    """
+
+    def __init__(self, buffer, owner=None):
+        """
+        Args:
+            buffer: 快照内容（mmap / SharedMemory.buf 等支持缓冲区协议的对象）
+            owner: 需要随检索器一起关闭的底层对象（mmap 或 SharedMemory）
+        """
+        self._buf = memoryview(buffer)
+        self._owner = owner
+        self._views: List[memoryview] = []
+        magic, version, count = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("Not a knowledge graph snapshot (or unsupported version)")
+        self._sections: Dict[str, Tuple[int, int]] = {}
+        for i in range(count):
+            name, offset, length = _SECTION.unpack_from(self._buf, _HEADER.size + i * _SECTION.size)
+            self._sections[name.rstrip(b"\0").decode("ascii")] = (offset, length)
+        meta = json.loads(self._bytes(*self._sections["META"]))
+        self._strings_start = self._sections["STRINGS"][0]
+        self._entities_start, entities_length = self._sections["ENTITIES"]
+        self._entity_count = entities_length // _ENTITY.size
+        self._entity_cache: Dict[int, dict] = {}
+
+        self.root = meta.get("root")
+        self.structure, self.tags = {}, []
+        self.focal_method_id = -1
+        self._mro_cache: Dict[str, List[str]] = {}
+        self._test_method_fqns: set = set()
+        self._files: List[dict] = []
+        self._query_engine = None
+        self._fuzzy_index = None
+
+        self.classes, self.methods, self.variables = (_EntityStore(self, code) for code in range(3))
+        self.classes_by_name, self.methods_by_name, self.variables_by_name = (
+            _GroupView(self, code, "BY_NAME", 1) for code in range(3)
+        )
+        self.classes_by_file, self.methods_by_file, self.variables_by_file = (
+            _GroupView(self, code, "BY_PATH", 2) for code in range(3)
+        )
+        self.calls_index = _EdgeView(self, "CALLS", as_fqn=False)
+        self.references_index = _EdgeView(self, "REFERENCES", as_fqn=False)
+        self.tests_index = _EdgeView(self, "TESTED_BY", as_fqn=True)
+        self.class_subclasses = _EdgeView(self, "SUBCLASSES", as_fqn=True)
+        self._methods_csr = _EdgeView(self, "METHODS", as_fqn=False)
+        self._constants_csr = _EdgeView(self, "CONSTANTS", as_fqn=False)
+        self.class_bases = _ClassBasesView(self)
+        self.class_method_names = _ClassMethodNamesView(self)
+        self.file_intervals = _FileIntervalsView(self)
+        for name in self.AUX_INDEXES:
+            setattr(self, name, _AuxView(self, name))
+
+        # BM25 索引直接使用快照中的数组
+        table = _TermTable(self)
+        index = BM25Index(k1=meta["bm25"]["k1"], b=meta["bm25"]["b"])
+        index.avg_doc_length = meta["bm25"]["avg_doc_length"]
+        index.doc_ids = _DocIdsView(self)
+        index.doc_lengths = self._f32_array("BM25_DOC_LEN")
+        index.postings = _PostingsView(table)
+        index.idf = _IdfView(table)
+        index._doc_norms = self._f32_array("BM25_DOC_NORM")
+        self._search_index = index
+
+    @classmethod
+    def from_file(cls, path) -> "SnapshotRetriever":
+        """只读 mmap 快照文件；多个进程映射同一文件时共享页缓存"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, owner=mapped)
+
+    @classmethod
+    def from_shared_memory(cls, name: str, path=None) -> "SnapshotRetriever":
+        """
+        附加到命名共享内存中的快照；不存在且给出 path 时由当前进程创建（其余进程直接附加）。
+        段已存在但创建方尚未写完时等待，最多 ATTACH_TIMEOUT 秒
+        """
+        deadline = time.monotonic() + ATTACH_TIMEOUT
+        while True:
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                if path is None:
+                    raise
+                try:
+                    shm = load_into_shared_memory(path, name)
+                except FileExistsError:
+                    continue  # 另一个进程刚刚创建，按附加处理
+                return cls(shm.buf, owner=shm)
+            except ValueError:
+                shm = None  # 创建方还没有设置段的大小
+            if shm is not None:
+                _untrack(shm)
+                if bytes(shm.buf[:len(MAGIC)]) == MAGIC:
+                    return cls(shm.buf, owner=shm)
+                shm.close()
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Shared memory snapshot {name} was not completed within {ATTACH_TIMEOUT:.0f}s")
+            time.sleep(0.01)
+
+    def close(self):
+        """释放缓冲区；共享内存只 close 不 unlink"""
+        self._entity_cache.clear()
+        self._search_index = None
+        try:
+            for view in self._views:
+                view.release()
+            self._views.clear()
+            self._buf.release()
+            if self._owner is not None:
+                self._owner.close()
+        except BufferError:
+            # 仍有视图引用缓冲区时交给垃圾回收
+            pass
+
+    def _approximate_size(self) -> int:
+        """快照页在进程间共享，只计算本进程的解码缓存"""
+        return 2048 * len(self._entity_cache)
+
+    def _get_search_index(self) -> BM25Index:
+        return self._search_index
+
+    # ------------------------------------------------------------------ #
+    # 缓冲区访问
+    # ------------------------------------------------------------------ #
+
+    def _bytes(self, offset: int, length: int) -> bytes:
+        return bytes(self._buf[offset:offset + length])
+
+    def _array(self, section: str, fmt: str) -> memoryview:
+        offset, length = self._sections[section]
+        raw = self._buf[offset:offset + length]
+        array = raw.cast(fmt)
+        # 记录派生视图，close 时先释放它们，否则底层 mmap 无法关闭
+        self._views.extend((array, raw))
+        return array
+
+    def _u32_array(self, section: str) -> memoryview:
+        return self._array(section, "I")
+
+    def _f32_array(self, section: str) -> memoryview:
+        return self._array(section, "f")
+
+    def _record(self, index: int) -> tuple:
+        return _ENTITY.unpack_from(self._buf, self._entities_start + index * _ENTITY.size)
+
+    def _field_bytes(self, index: int, field: int) -> bytes:
+        """field: 0 fqn, 1 name, 2 path, 3 content, 4 data"""
+        off, length = struct.unpack_from("<II", self._buf, self._entities_start + index * _ENTITY.size + 8 * field)
+        return self._bytes(self._strings_start + off, length)
+
+    def _field(self, index: int, field: int) -> str:
+        return self._field_bytes(index, field).decode("utf-8")
+
+    def _label_code(self, index: int) -> int:
+        return self._buf[self._entities_start + index * _ENTITY.size + 48]
+
+    def _find_all(self, fqn: str) -> List[int]:
+        """fqn 对应的所有实体（不同 label 可能同名）"""
+        target = fqn.encode("utf-8")
+        keys = _KeyList(lambda i: self._field_bytes(i, 0), self._entity_count)
+        start = bisect_left(keys, target)
+        result = []
+        while start < self._entity_count and keys[start] == target:
+            result.append(start)
+            start += 1
+        return result
+
+    def _find(self, fqn: str, code: int) -> Optional[int]:
+        for index in self._find_all(fqn):
+            if self._label_code(index) == code:
+                return index
+        return None
+
+    def _entity(self, index: int) -> dict:
+        entity = self._entity_cache.get(index)
+        if entity is not None:
+            return entity
+        record = self._record(index)
+        entity = json.loads(self._bytes(self._strings_start + record[8], record[9]))
+        entity["content"] = self._bytes(self._strings_start + record[6], record[7]).decode("utf-8")
+        entity.setdefault("start_line", record[10])
+        entity.setdefault("end_line", record[11])
+        if record[12] == 0:
+            fqn = entity["full_qualified_name"]
+            entity["methods"] = self._methods_csr.get(fqn, [])
+            entity["constants"] = self._constants_csr.get(fqn, [])
+        if len(self._entity_cache) >= ENTITY_CACHE_SIZE:
+            self._entity_cache.clear()
+        self._entity_cache[index] = entity
+        return entity
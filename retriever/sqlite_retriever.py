@@ -0,0 +1,705 @@
+"""SQLite/FTS5 storage backend for the Code Knowledge Graph Retriever"""
+import os
+import json
+import sqlite3
+from collections.abc import Mapping
+from typing import List, Dict, Optional, Tuple, Iterator
+
+from models.entities import Clazz, Method, Variable
+from utils.metrics import instrument_queries
+from retriever.converters import _convert_to_clazz, _convert_to_method, _convert_to_variable
+from retriever.bm25 import tokenize_identifier
+from retriever.ckg_retriever import CKGRetriever, collect_class_attributes, is_test_method, linearize_mro
+from retriever.query import GraphQueryEngine
+from retriever.fuzzy import FuzzyIndex, build_fuzzy_index
+from retriever.symbols import find_definitions, find_usages, module_dependencies, resolve_module_name
+
+SCHEMA_VERSION = "2"
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE entities (
+    id INTEGER PRIMARY KEY,
+    fqn TEXT NOT NULL UNIQUE,
+    label TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    start_line INTEGER,
+    end_line INTEGER,
+    class_name TEXT,
+    content TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX entities_name ON entities (name, label);
+CREATE INDEX entities_path ON entities (path, label);
+CREATE INDEX entities_class ON entities (class_name, label);
+CREATE TABLE edges (
+    src TEXT NOT NULL,
+    dst TEXT NOT NULL,
+    type TEXT NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX edges_src ON edges (src, type, seq);
+CREATE INDEX edges_dst ON edges (dst, type);
+CREATE TABLE aux (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (name, key)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE entities_fts USING fts5 (
+    name, signature, docstring, content,
+    content='', tokenize='unicode61 remove_diacritics 0'
+);
+"""
+
+# 与内存版 BM25 的字段权重一致：名称 > 签名 > 文档字符串 > 代码
+_FTS_WEIGHTS = (3.0, 2.0, 1.5, 1.0)
+
+# 嵌套结构和大字段不进入 data 列
+_DATA_EXCLUDED = ("content", "methods", "constants")
+
+
+def _tokens(text: Optional[str]) -> str:
+    """FTS 列写入按标识符拆分后的 token，与内存版分词一致"""
+    return " ".join(tokenize_identifier(text or ""))
+
+
+def export_to_sqlite(retriever, db_path) -> str:
+    """
+    把内存版 CKGRetriever 的实体、边和全文索引持久化到 SQLite 文件。
+    先写临时文件再原子替换，其他进程不会打开到写了一半的库
+
+    Args:
+        retriever: 已构建好索引的 CKGRetriever
+        db_path: 目标数据库文件
+
+    Returns:
+        数据库文件路径
+    """
+    db_path = str(db_path)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    tmp_path = f"{db_path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        stores = (("Class", retriever.classes), ("Method", retriever.methods), ("Variable", retriever.variables))
+        for label, store in stores:
+            for fqn, entity in store.items():
+                data = {k: v for k, v in entity.items() if k not in _DATA_EXCLUDED}
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO entities (fqn, label, name, path, start_line, end_line, class_name, content, data)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        fqn, label, entity["name"], entity["absolute_path"],
+                        entity.get("start_line", 0), entity.get("end_line", 0),
+                        entity.get("class_name"), entity.get("content", ""),
+                        json.dumps(data, ensure_ascii=False, default=str),
+                    ),
+                )
+                if not cursor.rowcount:
+                    continue
+                if label == "Class":
+                    members = " ".join(
+                        [m["name"] for m in entity.get("methods", [])]
+                        + [c["name"] for c in entity.get("constants", [])]
+                        + [a["name"] for a in entity.get("attributes", [])]
+                    )
+                    fields = (entity["name"], entity.get("parent_class") or "", entity.get("docstring", ""), members)
+                elif label == "Method":
+                    fields = (entity["name"], entity.get("signature", ""), entity.get("docstring", ""), entity.get("content", ""))
+                elif entity.get("class_name"):
+                    # 类常量不参与全文检索，与内存版一致
+                    continue
+                else:
+                    fields = (entity["name"], "", "", entity.get("content", ""))
+                conn.execute(
+                    "INSERT INTO entities_fts (rowid, name, signature, docstring, content) VALUES (?, ?, ?, ?, ?)",
+                    (cursor.lastrowid, *(_tokens(f) for f in fields)),
+                )
+
+        edges = []
+        for edge_type, index in (("CALLS", retriever.calls_index), ("REFERENCES", retriever.references_index)):
+            for src, targets in index.items():
+                edges.extend((src, t["full_qualified_name"], edge_type, seq) for seq, t in enumerate(targets))
+        for target, tests in retriever.tests_index.items():
+            edges.extend((target, test, "TESTED_BY", seq) for seq, test in enumerate(tests))
+        for cls, bases in retriever.class_bases.items():
+            edges.extend((cls, base, "INHERITS", seq) for seq, base in enumerate(bases))
+        conn.executemany("INSERT INTO edges (src, dst, type, seq) VALUES (?, ?, ?, ?)", edges)
+
+        for name in CKGRetriever.AUX_INDEXES:
+            conn.executemany(
+                "INSERT INTO aux (name, key, value) VALUES (?, ?, ?)",
+                ((name, key, json.dumps(value, ensure_ascii=False)) for key, value in getattr(retriever, name).items()),
+            )
+
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [("schema_version", SCHEMA_VERSION), ("entities", str(len(retriever.classes) + len(retriever.methods) + len(retriever.variables)))],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    print(f"Knowledge graph exported to {db_path}")
+    return db_path
+
+
+class _EntityView(Mapping):
+    """fqn -> entity_dict 的只读视图，按需查询，与内存版 dict 索引接口兼容"""
+
+    def __init__(self, owner: "SQLiteCKGRetriever", label: str):
+        self._owner = owner
+        self._label = label
+
+    def __getitem__(self, fqn: str) -> dict:
+        rows = self._owner._select("fqn = ? AND label = ?", (fqn, self._label))
+        if not rows:
+            raise KeyError(fqn)
+        return rows[0]
+
+    def __contains__(self, fqn) -> bool:
+        return self._owner._conn.execute(
+            "SELECT 1 FROM entities WHERE fqn = ? AND label = ?", (fqn, self._label)
+        ).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for (fqn,) in self._owner._conn.execute("SELECT fqn FROM entities WHERE label = ? ORDER BY id", (self._label,)):
+            yield fqn
+
+    def __len__(self) -> int:
+        return self._owner._conn.execute("SELECT COUNT(*) FROM entities WHERE label = ?", (self._label,)).fetchone()[0]
+
+    def items(self):
+        for entity in self._owner._select("label = ?", (self._label,)):
+            yield entity["full_qualified_name"], entity
+
+    def values(self):
+        return self._owner._select("label = ?", (self._label,))
+
+
+class _GroupedView(Mapping):
+    """name/path -> [entity_dict] 的只读视图（对应 *_by_name / *_by_file）"""
+
+    def __init__(self, owner: "SQLiteCKGRetriever", label: str, column: str):
+        self._owner = owner
+        self._label = label
+        self._column = column
+
+    def __getitem__(self, key: str) -> List[dict]:
+        rows = self._owner._select(f"{self._column} = ? AND label = ?", (key, self._label))
+        if not rows:
+            raise KeyError(key)
+        return rows
+
+    def get(self, key, default=None):
+        rows = self._owner._select(f"{self._column} = ? AND label = ?", (key, self._label))
+        return rows if rows else default
+
+    def __iter__(self) -> Iterator[str]:
+        query = f"SELECT DISTINCT {self._column} FROM entities WHERE label = ?"
+        for (key,) in self._owner._conn.execute(query, (self._label,)):
+            yield key
+
+    def __len__(self) -> int:
+        query = f"SELECT COUNT(DISTINCT {self._column}) FROM entities WHERE label = ?"
+        return self._owner._conn.execute(query, (self._label,)).fetchone()[0]
+
+
+class _EdgeView(Mapping):
+    """src -> [dst] 的只读视图；resolve=True 时 dst 展开为实体字典（对应 calls_index 等）"""
+
+    def __init__(self, owner: "SQLiteCKGRetriever", edge_type: str, resolve: bool, reverse: bool = False):
+        self._owner = owner
+        self._type = edge_type
+        self._resolve = resolve
+        self._reverse = reverse
+
+    def get(self, key, default=None):
+        targets = self._owner._edges(key, self._type, reverse=self._reverse)
+        if not targets:
+            return default
+        if self._resolve:
+            entities = self._owner._entities_by_fqn(targets)
+            return [entities[t] for t in targets if t in entities]
+        return targets
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        column = "dst" if self._reverse else "src"
+        for (key,) in self._owner._conn.execute(f"SELECT DISTINCT {column} FROM edges WHERE type = ?", (self._type,)):
+            yield key
+
+    def __len__(self) -> int:
+        column = "dst" if self._reverse else "src"
+        return self._owner._conn.execute(
+            f"SELECT COUNT(DISTINCT {column}) FROM edges WHERE type = ?", (self._type,)
+        ).fetchone()[0]
+
+    def items(self):
+        """整张边表一次查询（repo map / 图查询的全表扫描不再逐 key 查询）"""
+        if self._reverse:
+            query = "SELECT dst, src FROM edges WHERE type = ? ORDER BY dst, rowid"
+        else:
+            query = "SELECT src, dst FROM edges WHERE type = ? ORDER BY src, seq"
+        grouped: Dict[str, List[str]] = {}
+        for key, target in self._owner._conn.execute(query, (self._type,)):
+            grouped.setdefault(key, []).append(target)
+        entities = self._owner._entities_by_fqn([t for targets in grouped.values() for t in targets]) \
+            if self._resolve else None
+        for key, targets in grouped.items():
+            yield key, [entities[t] for t in targets if t in entities] if self._resolve else targets
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+
+class _AuxView(Mapping):
+    """辅助索引（CKGRetriever.AUX_INDEXES）的只读视图，值按需 JSON 解码"""
+
+    def __init__(self, owner: "SQLiteCKGRetriever", name: str):
+        self._owner = owner
+        self._name = name
+
+    def get(self, key, default=None):
+        row = self._owner._conn.execute(
+            "SELECT value FROM aux WHERE name = ? AND key = ?", (self._name, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        for (key,) in self._owner._conn.execute("SELECT key FROM aux WHERE name = ?", (self._name,)):
+            yield key
+
+    def __len__(self) -> int:
+        return self._owner._conn.execute("SELECT COUNT(*) FROM aux WHERE name = ?", (self._name,)).fetchone()[0]
+
+    def items(self):
+        for key, value in self._owner._conn.execute("SELECT key, value FROM aux WHERE name = ?", (self._name,)):
+            yield key, json.loads(value)
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+
+@instrument_queries
+class SQLiteCKGRetriever:
+    """
+    SQLite 版 Code Knowledge Graph Retriever
+
+    实体、边和 FTS5 全文索引都保存在一个 SQLite 文件中（由 export_to_sqlite 生成）。
+    以只读、immutable 方式打开：打开时间与仓库大小无关，常驻内存只有 SQLite 页缓存，
+    同一文件可被多个 worker 进程同时打开。
+    查询接口与内存版 CKGRetriever 一致；内存版的 dict 索引（classes、methods_by_name、
+    calls_index 等）以只读 Mapping 视图的形式提供
+    """
+
+    def __init__(self, db_path: str, cache_size_kb: int = 16384):
+        """
+        Args:
+            db_path: export_to_sqlite 生成的数据库文件
+            cache_size_kb: SQLite 页缓存上限（KB）
+        """
+        self.db_path = str(db_path)
+        self.cache_size_kb = int(cache_size_kb)
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"Knowledge graph database {self.db_path} does not exist")
+        self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA cache_size = -{self.cache_size_kb}")
+        version = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if not version or version[0] != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported knowledge graph schema in {self.db_path}")
+
+        self.focal_method_id = -1
+        self._mro_cache: Dict[str, List[str]] = {}
+        self._query_engine: Optional[GraphQueryEngine] = None
+        self._fuzzy_index: Optional[FuzzyIndex] = None
+
+        # 与内存版同名的索引视图
+        self.classes = _EntityView(self, "Class")
+        self.methods = _EntityView(self, "Method")
+        self.variables = _EntityView(self, "Variable")
+        self.classes_by_name = _GroupedView(self, "Class", "name")
+        self.methods_by_name = _GroupedView(self, "Method", "name")
+        self.variables_by_name = _GroupedView(self, "Variable", "name")
+        self.classes_by_file = _GroupedView(self, "Class", "path")
+        self.methods_by_file = _GroupedView(self, "Method", "path")
+        self.variables_by_file = _GroupedView(self, "Variable", "path")
+        self.calls_index = _EdgeView(self, "CALLS", resolve=True)
+        self.references_index = _EdgeView(self, "REFERENCES", resolve=True)
+        self.tests_index = _EdgeView(self, "TESTED_BY", resolve=False)
+        self.class_bases = _EdgeView(self, "INHERITS", resolve=False)
+        self.class_subclasses = _EdgeView(self, "INHERITS", resolve=False, reverse=True)
+        for name in CKGRetriever.AUX_INDEXES:
+            setattr(self, name, _AuxView(self, name))
+
+    _is_test_method = staticmethod(is_test_method)
+
+    # ------------------------------------------------------------------ #
+    # 底层查询
+    # ------------------------------------------------------------------ #
+
+    def _row_to_entity(self, row, with_members: bool = True) -> dict:
+        fqn, label, content, data = row
+        entity = json.loads(data)
+        entity["content"] = content or ""
+        if label == "Class" and with_members:
+            entity["methods"] = self._select("class_name = ? AND label = 'Method'", (fqn,))
+            entity["constants"] = self._select("class_name = ? AND label = 'Variable'", (fqn,))
+        return entity
+
+    def _select(self, where: str, params: tuple = (), order: str = "path, start_line") -> List[dict]:
+        rows = self._conn.execute(
+            f"SELECT fqn, label, content, data FROM entities WHERE {where} ORDER BY {order}", params
+        ).fetchall()
+        return [self._row_to_entity(row) for row in rows]
+
+    def _entities_by_fqn(self, fqns: List[str]) -> Dict[str, dict]:
+        result = {}
+        unique = list(dict.fromkeys(fqns))
+        # SQLite 默认最多 999 个参数
+        for i in range(0, len(unique), 900):
+            chunk = unique[i:i + 900]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self._conn.execute(
+                f"SELECT fqn, label, content, data FROM entities WHERE fqn IN ({placeholders})", chunk
+            ):
+                result[row[0]] = self._row_to_entity(row, with_members=False)
+        return result
+
+    def _edges(self, key: str, edge_type: str, reverse: bool = False) -> List[str]:
+        if reverse:
+            query = "SELECT src FROM edges WHERE dst = ? AND type = ? ORDER BY rowid"
+        else:
+            query = "SELECT dst FROM edges WHERE src = ? AND type = ? ORDER BY seq"
+        return [value for (value,) in self._conn.execute(query, (key, edge_type))]
+
+    # ------------------------------------------------------------------ #
+    # 兼容接口
+    # ------------------------------------------------------------------ #
+
+    def close(self):
+        """关闭数据库连接"""
+        self._conn.close()
+
+    def _approximate_size(self) -> int:
+        """常驻内存只有 SQLite 页缓存"""
+        return self.cache_size_kb * 1024
+
+    def change_focal_method_id(self, focal_method_id):
+        """兼容接口"""
+        self.focal_method_id = focal_method_id
+
+    def run_query(self, query: str, parameters: Optional[dict] = None, limit: Optional[int] = None) -> List[dict]:
+        """执行 Cypher 风格的图查询，与内存版语义一致（通过 Mapping 视图访问索引）"""
+        if self._query_engine is None:
+            self._query_engine = GraphQueryEngine(self)
+        return self._query_engine.run(query, parameters, limit)
+
+    # ------------------------------------------------------------------ #
+    # 与 CKGRetriever 一致的查询接口
+    # ------------------------------------------------------------------ #
+
+    def find_entity(self, full_qualified_name: str) -> Optional[Tuple[str, dict]]:
+        """按全限定名查找实体，返回 (label, entity_dict) 或 None"""
+        row = self._conn.execute(
+            "SELECT fqn, label, content, data FROM entities WHERE fqn = ?", (full_qualified_name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[1], self._row_to_entity(row)
+
+    def search_method_accurately(self, absolute_path: str, full_qualified_name: str = None) -> List[Method]:
+        """精确查找方法：同一文件内 fqn 包含给定串的方法"""
+        if full_qualified_name is None:
+            results = self._select("path = ? AND label = 'Method'", (absolute_path,), order="id")
+        else:
+            results = self._select(
+                "path = ? AND label = 'Method' AND instr(fqn, ?) > 0",
+                (absolute_path, full_qualified_name), order="id",
+            )
+        return [_convert_to_method(m) for m in results]
+
+    def search_methods_many(self, queries: List[Tuple[str, Optional[str]]]) -> List[List[Method]]:
+        """批量精确查找方法"""
+        return [self.search_method_accurately(path, fqn) for path, fqn in queries]
+
+    def search_method_fuzzy(self, name: str) -> List[Method]:
+        """方法名包含 name 的所有方法"""
+        results = self._select("label = 'Method' AND instr(name, ?) > 0", (name,), order="name, id")
+        if not results:
+            print(f"No methods found containing '{name}' in name.")
+        return [_convert_to_method(m) for m in results]
+
+    def go_to_definition(self, path: str, line: int, identifier: str) -> List[dict]:
+        """跳转定义，见 retriever.symbols.find_definitions"""
+        return find_definitions(self, path, line, identifier)
+
+    def find_usages(self, full_qualified_name: str, include_writes: bool = True) -> List[dict]:
+        """查找引用，见 retriever.symbols.find_usages"""
+        return find_usages(self, full_qualified_name, include_writes)
+
+    def resolve_module(self, name: str) -> Optional[str]:
+        """模块名或文件路径 -> 图中的模块名，见 retriever.symbols.resolve_module_name"""
+        return resolve_module_name(self, name)
+
+    def resolve_approximate_fqn(self, query: str, label: Optional[str] = None,
+                                limit: int = 5) -> Tuple[Optional[str], List[str]]:
+        """容错解析 fqn，见 retriever.fuzzy.FuzzyIndex"""
+        if self._fuzzy_index is None:
+            self._fuzzy_index = build_fuzzy_index(self)
+        return self._fuzzy_index.resolve_fqn(query, label, limit)
+
+    def resolve_approximate_path(self, query: str, limit: int = 5) -> Tuple[Optional[str], List[str]]:
+        """容错解析文件路径，见 retriever.fuzzy.FuzzyIndex"""
+        if self._fuzzy_index is None:
+            self._fuzzy_index = build_fuzzy_index(self)
+        return self._fuzzy_index.resolve_path(query, limit)
+
+    def get_module_dependencies(self, module: str, reverse: bool = False, transitive: bool = False,
+                                max_depth: Optional[int] = None) -> List[dict]:
+        """模块导入依赖，见 retriever.symbols.module_dependencies"""
+        return module_dependencies(self, module, reverse, transitive, max_depth)
+
+    def get_class_attributes(self, class_fqn: str, inherited: bool = True) -> List[dict]:
+        """类变量与实例属性，见 collect_class_attributes"""
+        return collect_class_attributes(self, class_fqn, inherited)
+
+    def get_relevant_entities(self, file: str, full_qualified_name: str) -> dict:
+        """查找与目标实体相关的六类关系节点"""
+        result = {rt: [] for rt in (
+            "BELONGS_TO", "CALLS", "HAS_METHOD",
+            "HAS_VARIABLE", "INHERITS", "REFERENCES"
+        )}
+        found = self.find_entity(full_qualified_name)
+        if found is None:
+            return result
+        target_type, target = found
+
+        class_name = target.get("class_name")
+        if target_type in ("Method", "Variable") and class_name:
+            owner = self._select("fqn = ? AND label = 'Class'", (class_name,))
+            if owner:
+                result["BELONGS_TO"].append(owner[0])
+
+        if target_type == "Class":
+            result["HAS_METHOD"] = target["methods"]
+            result["HAS_VARIABLE"] = target["constants"]
+            for base in self.get_class_bases(full_qualified_name):
+                if base in self.classes:
+                    result["INHERITS"].append(self.classes[base])
+        elif class_name:
+            sibling_label = "Method" if target_type == "Method" else "Variable"
+            key = "HAS_METHOD" if target_type == "Method" else "HAS_VARIABLE"
+            result[key] = self._select(
+                "class_name = ? AND label = ? AND fqn != ?", (class_name, sibling_label, full_qualified_name)
+            )
+
+        result["CALLS"] = self.calls_index.get(full_qualified_name, [])
+        result["REFERENCES"] = self.references_index.get(full_qualified_name, [])
+        return result
+
+    def get_relevant_entities_many(self, queries: List[Tuple[str, str]]) -> List[dict]:
+        """批量查找关系节点，重复目标只查询一次"""
+        computed: Dict[Tuple[str, str], dict] = {}
+        results = []
+        for key in queries:
+            key = tuple(key)
+            if key not in computed:
+                computed[key] = self.get_relevant_entities(*key)
+            results.append(computed[key])
+        return results
+
+    def read_all_classes_and_methods(self, file: str) -> Tuple[List[Clazz], List[Method]]:
+        """读取指定文件中的所有类和方法"""
+        classes = self._select("path = ? AND label = 'Class'", (file,), order="id")
+        methods = self._select("path = ? AND label = 'Method'", (file,), order="id")
+        return [_convert_to_clazz(c) for c in classes], [_convert_to_method(m) for m in methods]
+
+    def search_constructor_in_clazz(self, name: str) -> List[Method]:
+        """根据类名查找构造函数"""
+        results = self._select(
+            "label = 'Method' AND name = '__init__' AND class_name IN "
+            "(SELECT fqn FROM entities WHERE label = 'Class' AND name = ?)",
+            (name,),
+        )
+        return [_convert_to_method(m) for m in results]
+
+    def search_variable_query(self, file: str, variable_name: str) -> List[Variable]:
+        """查询指定文件中的变量"""
+        if "." not in variable_name:
+            results = self._select("path = ? AND label = 'Variable' AND name = ?", (file, variable_name), order="id")
+        else:
+            results = self._select(
+                "path = ? AND label = 'Variable' AND instr(fqn, ?) > 0", (file, variable_name), order="id"
+            )
+        return [_convert_to_variable(v) for v in results]
+
+    def search_field_variables_of_class(self, name: str) -> List[Variable]:
+        """查找类的字段变量"""
+        results = self._select(
+            "label = 'Variable' AND class_name IN (SELECT fqn FROM entities WHERE label = 'Class' AND name = ?)",
+            (name,),
+        )
+        # 实例属性保存在类实体的 data 中
+        for row in self._conn.execute(
+            "SELECT fqn, label, content, data FROM entities WHERE label = 'Class' AND name = ? ORDER BY path, start_line",
+            (name,),
+        ):
+            results.extend(self._row_to_entity(row, with_members=False).get("attributes", []))
+        return [_convert_to_variable(v) for v in results]
+
+    def search_file_by_keyword(self, keyword: str) -> List[str]:
+        """内容包含关键字的文件（类、独立方法、独立变量），按相关度排序"""
+        rows = self._conn.execute(
+            "SELECT DISTINCT path FROM entities WHERE instr(lower(content), lower(?)) > 0 "
+            "AND (label = 'Class' OR class_name IS NULL)",
+            (keyword,),
+        ).fetchall()
+        matched_paths = {path for (path,) in rows}
+
+        file_scores: Dict[str, float] = {}
+        for _, entity, score in self.search_entities_ranked(keyword, top_k=None):
+            path = entity["absolute_path"]
+            if path in matched_paths and score > file_scores.get(path, 0.0):
+                file_scores[path] = score
+        return sorted(matched_paths, key=lambda p: (-file_scores.get(p, 0.0), p))
+
+    def search_entities_ranked(
+        self, query: str, top_k: Optional[int] = 10, label: Optional[str] = None
+    ) -> List[Tuple[str, dict, float]]:
+        """FTS5 bm25 排序检索实体，返回 [(label, entity_dict, score)]；top_k 为 None 时不限数量"""
+        tokens = list(dict.fromkeys(tokenize_identifier(query)))
+        if not tokens:
+            return []
+        match = " OR ".join(f'"{t}"' for t in tokens)
+        sql = (
+            "SELECT e.fqn, e.label, e.content, e.data, -bm25(entities_fts, ?, ?, ?, ?) AS score "
+            "FROM entities_fts JOIN entities e ON e.id = entities_fts.rowid "
+            "WHERE entities_fts MATCH ?"
+        )
+        params: list = [*_FTS_WEIGHTS, match]
+        if label:
+            sql += " AND e.label = ?"
+            params.append(label)
+        sql += " ORDER BY score DESC"
+        if top_k is not None:
+            sql += " LIMIT ?"
+            params.append(top_k)
+        return [
+            (row[1], self._row_to_entity(row[:4]), row[4])
+            for row in self._conn.execute(sql, params)
+        ]
+
+    def text_similarity_scores(self, text: str) -> Dict[str, float]:
+        """自由文本与实体的相似度（FTS5 bm25，按最高分归一化到 [0, 1]）"""
+        tokens = list(dict.fromkeys(tokenize_identifier(text)))
+        if not tokens:
+            return {}
+        match = " OR ".join(f'"{t}"' for t in tokens)
+        rows = self._conn.execute(
+            "SELECT e.fqn, -bm25(entities_fts, ?, ?, ?, ?) FROM entities_fts "
+            "JOIN entities e ON e.id = entities_fts.rowid WHERE entities_fts MATCH ?",
+            (*_FTS_WEIGHTS, match),
+        ).fetchall()
+        top = max((score for _, score in rows), default=0.0) or 1.0
+        return {fqn: score / top for fqn, score in rows}
+
+    def search_variable_by_only_name_query(self, variable_name: str) -> List[Variable]:
+        """根据变量名（或 fqn 片段）查询所有匹配的变量"""
+        if "." not in variable_name:
+            results = self._select("label = 'Variable' AND name = ?", (variable_name,))
+        else:
+            results = self._select("label = 'Variable' AND instr(fqn, ?) > 0", (variable_name,))
+        return [_convert_to_variable(v) for v in results]
+
+    def search_tests_for_entity(self, full_qualified_name: str) -> List[Method]:
+        """从 TESTED_BY 边查找测试函数"""
+        tests = self._edges(full_qualified_name, "TESTED_BY")
+        entities = self._entities_by_fqn(tests)
+        return [_convert_to_method(entities[t]) for t in tests if t in entities]
+
+    def search_test_cases_by_method_query(self, full_qualified_name: str) -> List[Method]:
+        """测试索引优先，其次按 test_xxx 命名约定推断"""
+        indexed = self.search_tests_for_entity(full_qualified_name)
+        if indexed:
+            return indexed
+        method_name = full_qualified_name.split(".")[-1]
+        results = []
+        for pattern in (f"test_{method_name}", f"test{method_name.capitalize()}"):
+            results.extend(self._select("label = 'Method' AND instr(name, ?) > 0", (pattern,)))
+        return [_convert_to_method(m) for m in results]
+
+    def get_class_bases(self, class_fqn: str) -> List[str]:
+        """直接基类"""
+        return self._edges(class_fqn, "INHERITS")
+
+    def get_class_mro(self, class_fqn: str) -> List[str]:
+        """近似 MRO（与内存版相同的 C3 线性化）"""
+        return linearize_mro(
+            class_fqn,
+            bases_of=self.get_class_bases,
+            is_project_class=lambda fqn: fqn in self.classes,
+            cache=self._mro_cache,
+        )
+
+    def get_class_ancestors(self, class_fqn: str) -> List[str]:
+        """全部祖先类（按 MRO 顺序，不含自身）"""
+        return self.get_class_mro(class_fqn)[1:]
+
+    def get_class_descendants(self, class_fqn: str) -> List[str]:
+        """全部后代类，递归 CTE 一次查询完成"""
+        rows = self._conn.execute(
+            """
+            WITH RECURSIVE descendants(fqn, depth) AS (
+                SELECT src, 1 FROM edges WHERE dst = ? AND type = 'INHERITS'
+                UNION
+                SELECT e.src, d.depth + 1 FROM edges e JOIN descendants d ON e.dst = d.fqn
+                WHERE e.type = 'INHERITS' AND d.depth < 64
+            )
+            SELECT fqn, MIN(depth) AS depth FROM descendants WHERE fqn != ? GROUP BY fqn ORDER BY depth, fqn
+            """,
+            (class_fqn, class_fqn),
+        ).fetchall()
+        return [fqn for fqn, _ in rows]
+
+    def get_method_overrides(self, method_fqn: str) -> Dict[str, List[str]]:
+        """祖先中被重写的同名方法与后代中的重写版本"""
+        result = {"overrides": [], "overridden_by": []}
+        found = self.find_entity(method_fqn)
+        if found is None or found[0] != "Method" or not found[1].get("class_name"):
+            return result
+        name, class_fqn = found[1]["name"], found[1]["class_name"]
+
+        def method_in(owner: str) -> Optional[str]:
+            row = self._conn.execute(
+                "SELECT fqn FROM entities WHERE class_name = ? AND label = 'Method' AND name = ? ORDER BY id LIMIT 1",
+                (owner, name),
+            ).fetchone()
+            return row[0] if row else None
+
+        for key, owners in (
+            ("overrides", self.get_class_ancestors(class_fqn)),
+            ("overridden_by", self.get_class_descendants(class_fqn)),
+        ):
+            for owner in owners:
+                found_fqn = method_in(owner)
+                if found_fqn:
+                    result[key].append(found_fqn)
+        return result
@@ -0,0 +1,573 @@
+"""Scope and import resolution of identifier occurrences (go-to-definition)"""
+import re
+from bisect import bisect_left
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+# 解析结果：("entity", fqn) / ("module", 模块名) / ("attribute", (类 fqn.属性名, 赋值行号))
+# / ("local", 绑定行号) / None
+Resolution = Optional[Tuple[str, object]]
+
+# 解析后的一次名字出现：(line, col, name, target, def_line, is_store)
+# target 为实体 fqn、模块名或实例属性（类 fqn.属性名，def_line 为首次赋值行号）；
+# 局部变量 target 为 None、def_line 为绑定行号；无法解析时两者均为空
+Occurrence = Tuple[int, int, str, Optional[str], int, bool]
+
+# 一次引用：(path, line, col, is_store)
+Usage = Tuple[str, int, int, bool]
+
+# import 链（re-export）的最大跟随深度
+MAX_IMPORT_DEPTH = 8
+
+
+def module_name(module_prefix: str) -> str:
+    """pkg.__init__ -> pkg"""
+    if module_prefix == "__init__":
+        return ""
+    return module_prefix[:-len(".__init__")] if module_prefix.endswith(".__init__") else module_prefix
+
+
+class SymbolResolver:
+    """
+    结合全局实体表解析 kg 阶段收集的符号信息（见 kg.utils.SymbolVisitor）：
+    作用域链中的局部绑定、import / 别名 / 相对导入、包 __init__ 的 re-export、
+    模块属性（mod.func）以及 self./cls. 属性（沿 MRO 查找类成员）
+    """
+
+    def __init__(self, retriever, files: List[dict]):
+        """
+        Args:
+            retriever: 已建立实体和继承索引的 CKGRetriever
+            files: structure 中的文件字典（含 module / path / symbols）
+        """
+        self.retriever = retriever
+        self.files = [f for f in files if f.get("symbols")]
+        # 模块名 -> {"prefix": 实体 fqn 前缀, "path": 文件路径}
+        self.modules: Dict[str, dict] = {}
+        self._packages = set()
+        for f in files:
+            name = module_name(f["module"])
+            self.modules[name] = {"prefix": f["module"], "path": f["path"]}
+            if f["module"].endswith("__init__"):
+                self._packages.add(name)
+        # 绝对导入名 -> 候选模块（按点分后缀）
+        self._by_suffix: Dict[str, List[str]] = defaultdict(list)
+        for name in self.modules:
+            parts = name.split(".")
+            for i in range(len(parts)):
+                self._by_suffix[".".join(parts[i:])].append(name)
+        self._module_scopes = {module_name(f["module"]): f["symbols"]["scopes"][0] for f in self.files}
+        # 类 fqn -> {实例属性名: 定义行号}
+        self.attributes: Dict[str, Dict[str, int]] = {}
+        for cls, data in retriever.classes.items():
+            for attr in data.get("attributes", []):
+                self.attributes.setdefault(cls, {}).setdefault(attr["name"], attr["start_line"])
+        self._module_cache: Dict[Tuple[str, str], Optional[str]] = {}
+
+    # ------------------------------------------------------------------ #
+    # 模块与成员
+    # ------------------------------------------------------------------ #
+
+    def resolve_module(self, dotted: str, from_module: str) -> Optional[str]:
+        """
+        把 import 中的点分名映射为项目内模块。项目模块名带有相对测试床的路径前缀，
+        因此按后缀匹配；剩余前缀本身是包时不匹配（import json 不会指向 pkg/json.py）
+        """
+        key = (dotted, from_module)
+        if key in self._module_cache:
+            return self._module_cache[key]
+        result = None
+        if dotted in self.modules:
+            result = dotted
+        else:
+            candidates = [
+                name for name in self._by_suffix.get(dotted, [])
+                if name[:-len(dotted) - 1] not in self._packages
+            ]
+            if candidates:
+                # 多个候选时取与当前模块公共前缀最长的
+                own = from_module.split(".")
+
+                def shared(name):
+                    n = 0
+                    for a, b in zip(name.split("."), own):
+                        if a != b:
+                            break
+                        n += 1
+                    return n, -len(name)
+
+                result = max(candidates, key=shared)
+        self._module_cache[key] = result
+        return result
+
+    def resolve_dotted(self, dotted: str, from_module: str, depth: int = 0) -> Resolution:
+        """a.b.C.meth -> 最长的模块前缀 + 成员链"""
+        if not dotted or depth > MAX_IMPORT_DEPTH:
+            return None
+        parts = dotted.split(".")
+        for i in range(len(parts), 0, -1):
+            module = self.resolve_module(".".join(parts[:i]), from_module)
+            if module is not None:
+                return self.member_chain(("module", module), parts[i:], depth)
+        return None
+
+    def member_chain(self, current: Resolution, attrs, depth: int = 0) -> Resolution:
+        for attr in attrs:
+            if current is None:
+                return None
+            current = self.member(current, attr, depth)
+        return current
+
+    def member(self, owner: Resolution, attr: str, depth: int = 0) -> Resolution:
+        """owner.attr；attr 为 "()" 时表示调用，类的调用结果视为该类的实例"""
+        kind, value = owner
+        retriever = self.retriever
+        if attr == "()":
+            return owner if kind == "entity" and value in retriever.classes else None
+        if kind == "module":
+            fqn = f"{self.modules[value]['prefix']}.{attr}"
+            if fqn in retriever.classes or fqn in retriever.methods or fqn in retriever.variables:
+                return "entity", fqn
+            submodule = f"{value}.{attr}" if value else attr
+            if submodule in self.modules:
+                return "module", submodule
+            scope = self._module_scopes.get(value)
+            if scope is None:
+                return None
+            binding = scope["bindings"].get(attr)
+            if binding is not None and binding[1]:
+                return self.resolve_dotted(binding[1], value, depth + 1)
+            for star in scope["stars"]:
+                star_module = self.resolve_module(star, value)
+                if star_module is not None and star_module != value and depth < MAX_IMPORT_DEPTH:
+                    found = self.member(("module", star_module), attr, depth + 1)
+                    if found is not None:
+                        return found
+            return None
+        if kind == "entity" and value in retriever.classes:
+            return self.class_member(value, attr)
+        return None
+
+    def class_member(self, class_fqn: str, attr: str) -> Resolution:
+        """沿 MRO 查找类成员（方法、类变量、内部类、self.x 实例属性）"""
+        retriever = self.retriever
+        for cls in retriever.get_class_mro(class_fqn):
+            if cls not in retriever.classes:
+                continue
+            method = retriever.class_method_names.get(cls, {}).get(attr)
+            if method is not None:
+                return "entity", method
+            if f"{cls}.{attr}" in retriever.variables:
+                return "entity", f"{cls}.{attr}"
+            if f"{cls}.{attr}" in retriever.classes:
+                return "entity", f"{cls}.{attr}"
+            line = self.attributes.get(cls, {}).get(attr)
+            if line is not None:
+                return "attribute", (f"{cls}.{attr}", line)
+        return None
+
+    # ------------------------------------------------------------------ #
+    # 作用域内的名字
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _lookup(name: str, scope_id: int, scopes: dict) -> Tuple[Optional[int], Optional[tuple]]:
+        """按 LEGB 规则查找绑定，返回 (作用域 id, binding)；类作用域只对类体本身可见"""
+        current, innermost = scope_id, True
+        while current:
+            scope = scopes[current]
+            if scope["kind"] != "class" or innermost:
+                if scope["free"].get(name) == "global":
+                    break
+                binding = scope["bindings"].get(name)
+                if binding is not None:
+                    return current, binding
+            innermost = False
+            current = scope["parent"]
+        binding = scopes[0]["bindings"].get(name)
+        return (0, binding) if binding is not None else (None, None)
+
+    def resolve_name(self, name: str, scope_id: int, scopes: dict, module: str, prefix: str) -> Resolution:
+        """裸名字：局部绑定 / import -> 模块级实体 -> from x import *"""
+        bound_scope, binding = self._lookup(name, scope_id, scopes)
+        if bound_scope:
+            line, target, _ = binding
+            if target:
+                # 项目外的导入（标准库、第三方包）指向 import 语句本身
+                return self.resolve_dotted(target, module) or ("local", line)
+            if scopes[bound_scope]["kind"] == "class":
+                found = self.class_member(scopes[bound_scope]["class"], name)
+                if found is not None:
+                    return found
+            return "local", line
+
+        fqn = f"{prefix}.{name}"
+        retriever = self.retriever
+        if fqn in retriever.classes or fqn in retriever.methods or fqn in retriever.variables:
+            return "entity", fqn
+        if binding is not None:
+            line, target, _ = binding
+            if target:
+                return self.resolve_dotted(target, module) or ("local", line)
+            return "local", line
+        for star in scopes[0]["stars"]:
+            star_module = self.resolve_module(star, module)
+            if star_module is not None:
+                found = self.member(("module", star_module), name)
+                if found is not None:
+                    return found
+        return None
+
+    def _self_class(self, name: str, scope_id: int, scopes: dict) -> Optional[str]:
+        """name 是否为某个外层方法的 self / cls 参数"""
+        current = scope_id
+        while current:
+            scope = scopes[current]
+            if scope["kind"] == "function":
+                if scope["self"] == name:
+                    return scope["class"]
+                if name in scope["bindings"]:
+                    return None
+            current = scope["parent"]
+        return None
+
+    def _base_value(self, name: str, scope_id: int, scopes: dict, module: str, prefix: str, depth: int) -> Resolution:
+        """作为属性基底的名字：self / cls、带类型线索的变量（x = Foo()、x: Foo），否则按普通名字解析"""
+        cls = self._self_class(name, scope_id, scopes)
+        if cls is not None:
+            return "entity", cls
+        bound_scope, binding = self._lookup(name, scope_id, scopes)
+        if binding is not None and binding[2] and depth < MAX_IMPORT_DEPTH:
+            return self.resolve_chain(binding[2], bound_scope, scopes, module, prefix, depth + 1)
+        current = self.resolve_name(name, scope_id, scopes, module, prefix)
+        if current is None or current[0] not in ("entity", "module"):
+            return None
+        return current
+
+    def resolve_chain(
+        self, chain: tuple, scope_id: int, scopes: dict, module: str, prefix: str, depth: int = 0
+    ) -> Resolution:
+        base, attrs = chain[0], chain[1:]
+        if not base:
+            return None
+        if not attrs:
+            return self.resolve_name(base, scope_id, scopes, module, prefix)
+        return self.member_chain(self._base_value(base, scope_id, scopes, module, prefix, depth), attrs)
+
+    def resolve_file(self, file: dict) -> List[Occurrence]:
+        """解析一个文件中的全部名字出现，按 (line, col) 排序"""
+        symbols = file["symbols"]
+        scopes = symbols["scopes"]
+        prefix = file["module"]
+        module = module_name(prefix)
+        cache: Dict[Tuple[tuple, int], Resolution] = {}
+        resolved = []
+        for line, col, chain, scope_id, is_store in symbols["occurrences"]:
+            key = (chain, scope_id)
+            if key not in cache:
+                cache[key] = self.resolve_chain(chain, scope_id, scopes, module, prefix)
+            resolution = cache[key]
+            target, def_line = None, 0
+            if resolution is not None:
+                kind, value = resolution
+                if kind == "local":
+                    def_line = value
+                elif kind == "attribute":
+                    target, def_line = value
+                else:
+                    target = value
+            resolved.append((line, col, chain[-1], target, def_line, is_store))
+        # import 语句本身也是一次引用（被导入名与别名各记一次）
+        for imp in symbols.get("imports", []):
+            if imp["alias"] == "*":
+                continue
+            resolution = self.resolve_dotted(imp["target"], module)
+            if resolution is None or resolution[0] not in ("entity", "module"):
+                continue
+            names = {imp["target"].rsplit(".", 1)[-1], imp["alias"]}
+            for name in sorted(names):
+                resolved.append((imp["line"], imp.get("col", 0), name, resolution[1], 0, False))
+        resolved.sort(key=lambda o: (o[0], o[1]))
+        return resolved
+
+    def resolve_imports(self, file: dict) -> Tuple[List[Tuple[str, int]], List[str]]:
+        """
+        文件导入的模块：import 目标的最长项目模块前缀（from pkg.mod import C -> pkg.mod，
+        from pkg import sub -> pkg.sub），无法解析的记为外部包的顶层名
+
+        Returns:
+            ([(项目模块, 首次导入行号)] 按行号排序, [外部顶层包名] 按名称排序)
+        """
+        module = module_name(file["module"])
+        project: Dict[str, int] = {}
+        external = set()
+        for imp in file["symbols"].get("imports", []):
+            target = imp["target"]
+            if not target:
+                continue
+            parts = target.split(".")
+            found = None
+            for i in range(len(parts), 0, -1):
+                found = self.resolve_module(".".join(parts[:i]), module)
+                if found is not None:
+                    break
+            if found is None:
+                external.add(parts[0])
+            elif found != module:
+                project.setdefault(found, imp["line"])
+        return sorted(project.items(), key=lambda item: (item[1], item[0])), sorted(external)
+
+
+def occurrences_at(occurrences: List[Occurrence], line: int, name: str, window: int = 0) -> List[Occurrence]:
+    """
+    文件中第 line 行（允许 ±window 行）名为 name 的出现，精确行优先
+
+    Args:
+        occurrences: 按 (line, col) 排序的出现列表
+    """
+    if not occurrences:
+        return []
+    # 其他存储后端反序列化后元素为 list，按行号二分
+    start = bisect_left(occurrences, line - window, key=lambda o: o[0])
+    found = []
+    for occurrence in occurrences[start:]:
+        if occurrence[0] > line + window:
+            break
+        if occurrence[2] == name:
+            found.append(occurrence)
+    found.sort(key=lambda o: abs(o[0] - line))
+    return found
+
+
+def find_definitions(retriever, path: str, line: int, identifier: str, window: int = 2) -> List[dict]:
+    """
+    跳转定义：file:line 处的 identifier 定义在哪里（各存储后端共用）
+
+    Args:
+        retriever: 提供 symbol_occurrences / modules / find_entity / *_by_file 的检索器
+        path: 文件绝对路径
+        line: 行号（该行找不到时在 ±window 行内查找）
+        identifier: 名字或点分表达式（如 self.radius、np.array），取最后一段
+
+    Returns:
+        [{"kind": "entity" | "module" | "attribute" | "local" | "unresolved", "line", "target",
+          "label", "entity", "path", "def_line"}]，按离 line 的距离排序、按目标去重
+    """
+    names = re.findall(r"[A-Za-z_][A-Za-z0-9_]*", identifier or "")
+    if not names:
+        return []
+    name = names[-1]
+
+    results, seen = [], set()
+    # 光标所在行本身就是定义（class / def / 模块变量）
+    for label, by_file in (("Class", retriever.classes_by_file), ("Method", retriever.methods_by_file),
+                           ("Variable", retriever.variables_by_file)):
+        for entity in by_file.get(path, []) or []:
+            if entity["name"] == name and entity.get("start_line") == line:
+                seen.add(entity["full_qualified_name"])
+                results.append({"kind": "entity", "line": line, "target": entity["full_qualified_name"],
+                                "label": label, "entity": entity, "path": entity["absolute_path"],
+                                "def_line": entity.get("start_line", 0)})
+
+    found = occurrences_at(retriever.symbol_occurrences.get(path) or [], line, name, window)
+    exact = [o for o in found if o[0] == line]
+    for occurrence in exact or found:
+        occ_line, _, _, target, def_line, _ = occurrence
+        key = target or ("local", def_line)
+        if key in seen:
+            continue
+        seen.add(key)
+        result = {"kind": "unresolved", "line": occ_line, "target": target, "label": None,
+                  "entity": None, "path": path, "def_line": def_line}
+        if target is not None:
+            module = retriever.modules.get(target)
+            entity = retriever.find_entity(target) if module is None else None
+            if module is not None:
+                result.update(kind="module", label="Module", path=module["path"], def_line=1)
+            elif entity is not None:
+                label, entity = entity
+                result.update(kind="entity", label=label, entity=entity, path=entity["absolute_path"],
+                              def_line=entity.get("start_line", 0))
+            else:
+                # self.x 实例属性：定义在所属类所在文件的首次赋值处
+                owner = retriever.classes.get(target.rsplit(".", 1)[0])
+                if owner is not None:
+                    result.update(kind="attribute", label="Attribute", path=owner["absolute_path"])
+        elif def_line:
+            result["kind"] = "local"
+        results.append(result)
+    return results
+
+
+def build_usages_index(symbol_occurrences: Dict[str, List[Occurrence]]) -> Dict[str, List[Usage]]:
+    """名字出现的反向索引：目标（实体 fqn / 模块名 / 实例属性）-> 所有引用位置，按 (path, line, col) 排序"""
+    usages: Dict[str, List[Usage]] = defaultdict(list)
+    for path in sorted(symbol_occurrences):
+        for line, col, _, target, _, is_store in symbol_occurrences[path]:
+            if target is None:
+                continue
+            sites = usages[target]
+            # 同一位置的多个名字（import x as y）只算一次
+            if not sites or tuple(sites[-1][:3]) != (path, line, col):
+                sites.append((path, line, col, is_store))
+    return dict(usages)
+
+
+def enclosing_entity(retriever, path: str, line: int, cache: Dict[str, list]) -> Optional[str]:
+    """包含该行的最内层方法或类（各存储后端共用，按文件缓存区间）"""
+    intervals = cache.get(path)
+    if intervals is None:
+        intervals = sorted(
+            (e.get("start_line", 0), e.get("end_line", 0), e["full_qualified_name"])
+            for by_file in (retriever.methods_by_file, retriever.classes_by_file)
+            for e in by_file.get(path, []) or []
+        )
+        cache[path] = intervals
+    best = None
+    for start, end, fqn in intervals:
+        if start > line:
+            break
+        if line <= end and (best is None or end - start <= best[1] - best[0]):
+            best = (start, end, fqn)
+    return best[2] if best else None
+
+
+def find_usages(retriever, target: str, include_writes: bool = True) -> List[dict]:
+    """
+    查找引用：实体 / 模块 / 实例属性（类 fqn.属性名）在整个项目中被使用的位置（各存储后端共用）
+
+    Args:
+        retriever: 提供 usages_index 与 *_by_file 的检索器
+        target: fqn
+        include_writes: 是否包含赋值（x = ... / self.x = ...）
+
+    Returns:
+        [{"path", "line", "col", "is_store", "container"}]，按 (path, line, col) 排序
+    """
+    cache: Dict[str, list] = {}
+    return [
+        {"path": path, "line": line, "col": col, "is_store": bool(is_store),
+         "container": enclosing_entity(retriever, path, line, cache)}
+        for path, line, col, is_store in retriever.usages_index.get(target) or []
+        if include_writes or not is_store
+    ]
+
+
+def build_import_graph(resolver: SymbolResolver) -> Tuple[Dict[str, list], Dict[str, list], Dict[str, List[str]]]:
+    """
+    模块级导入图
+
+    Returns:
+        (import_graph: 模块 -> [[被导入模块, 行号]],
+         imported_by: 模块 -> [[导入方模块, 行号]]（按导入方排序）,
+         external_imports: 模块 -> [外部顶层包名])
+    """
+    import_graph: Dict[str, list] = {}
+    imported_by: Dict[str, list] = defaultdict(list)
+    external_imports: Dict[str, List[str]] = {}
+    for file in resolver.files:
+        module = module_name(file["module"])
+        project, external = resolver.resolve_imports(file)
+        if project:
+            import_graph[module] = [[dep, line] for dep, line in project]
+            for dep, line in project:
+                imported_by[dep].append([module, line])
+        if external:
+            external_imports[module] = external
+    for importers in imported_by.values():
+        importers.sort()
+    return import_graph, dict(imported_by), external_imports
+
+
+def resolve_import(resolver: SymbolResolver, imp: dict, module: str) -> dict:
+    """
+    一条 import 解析到的目标：项目实体（含文件与行区间）、项目模块、实例属性，
+    项目模块中找不到的名字记为 unresolved，其余为外部包
+    """
+    record = {"line": imp["line"], "alias": imp["alias"], "target": imp["target"], "local": imp["scope"] != 0,
+              "kind": "external", "fqn": None, "label": None, "path": None, "start_line": None, "end_line": None}
+    resolution = resolver.resolve_dotted(imp["target"], module) if imp["target"] else None
+    if resolution is not None:
+        kind, value = resolution
+        record["kind"] = kind
+        if kind == "module":
+            record.update(fqn=value, path=resolver.modules[value]["path"])
+        elif kind == "attribute":
+            owner = resolver.retriever.find_entity(value[0].rsplit(".", 1)[0])
+            record.update(fqn=value[0], path=owner[1].get("absolute_path") if owner else None, start_line=value[1])
+        else:
+            label, entity = resolver.retriever.find_entity(value) or (None, {})
+            record.update(fqn=value, label=label, path=entity.get("absolute_path"),
+                          start_line=entity.get("start_line"), end_line=entity.get("end_line"))
+        return record
+    parts = imp["target"].split(".")
+    for i in range(len(parts) - 1, 0, -1):
+        found = resolver.resolve_module(".".join(parts[:i]), module)
+        if found is not None:
+            record.update(kind="unresolved", fqn=found, path=resolver.modules[found]["path"])
+            return record
+    return record
+
+
+def build_file_imports(resolver: SymbolResolver) -> Dict[str, List[dict]]:
+    """
+    每个文件的 import（kg 阶段由 AST 收集：括号内多行、条件导入与函数内导入都包括），
+    按源码顺序，每个被导入名解析一次（见 resolve_import）
+
+    Returns:
+        文件路径 -> [{"line", "alias", "target", "local", "kind", "fqn", "label", "path",
+        "start_line", "end_line"}]，local 表示在函数 / 类内部导入
+    """
+    file_imports: Dict[str, List[dict]] = {}
+    for file in resolver.files:
+        module = module_name(file["module"])
+        imports = sorted(file["symbols"].get("imports", []), key=lambda imp: (imp["line"], imp.get("col", 0)))
+        if imports:
+            file_imports[file["path"]] = [resolve_import(resolver, imp, module) for imp in imports]
+    return file_imports
+
+
+def resolve_module_name(retriever, name: str) -> Optional[str]:
+    """
+    模块名或文件路径 -> 图中的模块名。依次尝试：完整模块名、文件路径、点分后缀
+    （geo.shapes 匹配 proj.geo.shapes），后缀有多个候选时取最短
+    """
+    if name in retriever.modules:
+        return name
+    module = retriever.path_modules.get(name)
+    if module is not None:
+        return module
+    dotted = name[:-3] if name.endswith(".py") else name
+    dotted = dotted.replace("\\", "/").strip("/").replace("/", ".")
+    dotted = module_name(dotted)
+    candidates = [m for m in retriever.modules if m == dotted or m.endswith("." + dotted)]
+    return min(candidates, key=len) if candidates else None
+
+
+def module_dependencies(retriever, module: str, reverse: bool = False, transitive: bool = False,
+                        max_depth: Optional[int] = None) -> List[dict]:
+    """
+    模块依赖（各存储后端共用）：reverse=False 为该模块导入的项目模块，True 为导入该模块的模块。
+    transitive 时按广度优先求传递闭包，每个模块只出现一次（取最短路径）
+
+    Returns:
+        [{"module", "path", "depth", "via", "line"}]，via 为引入该依赖的模块，
+        line 为 via 中（reverse 时为导入方中）的 import 行号
+    """
+    edges = retriever.imported_by if reverse else retriever.import_graph
+    result, seen = [], {module}
+    queue = deque([(module, 0)])
+    while queue:
+        current, depth = queue.popleft()
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for other, line in edges.get(current) or []:
+            if other in seen:
+                continue
+            seen.add(other)
+            info = retriever.modules.get(other) or {}
+            result.append({"module": other, "path": info.get("path"), "depth": depth + 1, "via": current,
+                           "line": line})
+            if transitive:
+                queue.append((other, depth + 1))
+    return result
@@ -0,0 +1,103 @@
+"""Parallel text / regex search over cached project files, ranked by proximity to the current locations"""
+import os
+import re
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from retriever.ckg_retriever import is_test_path
+from utils.file_cache import file_cache
+
+# 一次命中：(path, line, col)
+Hit = Tuple[str, int, int]
+# 关注区域：(path, start_line, end_line)，通常来自 Context.locations
+Focus = Tuple[str, int, int]
+
+SEARCH_MODES = ("literal", "word", "regex")
+# 与关注区域的距离在该行数以内视为"附近"
+NEAR_LINES = 50
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 4), thread_name_prefix="code-search")
+    return _executor
+
+
+def compile_pattern(keyword: str, mode: str = "literal", case_sensitive: bool = True) -> "re.Pattern":
+    """
+    literal：子串；word：整词（两侧不能是标识符字符）；regex：Python 正则
+
+    Raises:
+        ValueError: 未知模式
+        re.error: 正则无效
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of {', '.join(SEARCH_MODES)}")
+    flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+    if mode == "regex":
+        return re.compile(keyword, flags)
+    escaped = re.escape(keyword)
+    if mode == "word":
+        escaped = rf"(?<!\w){escaped}(?!\w)"
+    return re.compile(escaped, flags)
+
+
+def search_file(path: str, pattern: "re.Pattern") -> List[Hit]:
+    """单个文件中的命中，每行只记第一次；文件无法读取时返回空"""
+    try:
+        cached = file_cache.get(path)
+    except OSError:
+        return []
+    hits, last_line = [], 0
+    offsets = cached.offsets
+    for match in pattern.finditer(cached.text):
+        line = bisect_right(offsets, match.start())
+        if line == last_line:
+            continue
+        last_line = line
+        hits.append((path, line, match.start() - offsets[line - 1]))
+    return hits
+
+
+def search_files(paths: Sequence[str], pattern: "re.Pattern") -> List[Hit]:
+    """在线程池中并行搜索（未缓存文件的读取可并行），结果按输入顺序拼接"""
+    if len(paths) <= 1:
+        return [hit for path in paths for hit in search_file(path, pattern)]
+    results = _get_executor().map(lambda path: search_file(path, pattern), paths)
+    return [hit for hits in results for hit in hits]
+
+
+def rank_hits(hits: Iterable[Hit], focus: Sequence[Focus] = (), root: Optional[str] = None) -> List[Hit]:
+    """
+    排序：非测试代码优先；同一文件中靠近关注区域的命中、关注文件中的命中、
+    与关注文件同目录的命中依次靠前；其余按路径与行号
+
+    Args:
+        root: 项目根目录，测试代码按相对它的路径判断（避免项目所在目录名被误判）
+    """
+    focus_files = {}
+    for path, start, end in focus:
+        focus_files.setdefault(os.path.normpath(path), []).append((start, end))
+    focus_dirs = {os.path.dirname(path) for path in focus_files}
+
+    is_test = {}
+
+    def key(hit: Hit):
+        path, line, _ = hit
+        if path not in is_test:
+            is_test[path] = is_test_path("/" + os.path.relpath(path, root) if root else path)
+        normalized = os.path.normpath(path)
+        proximity = 3
+        ranges = focus_files.get(normalized)
+        if ranges:
+            distance = min(0 if start <= line <= end else min(abs(line - start), abs(line - end)) for start, end in ranges)
+            proximity = 0 if distance <= NEAR_LINES else 1
+        elif os.path.dirname(normalized) in focus_dirs:
+            proximity = 2
+        return is_test[path], proximity, path, line
+
+    return sorted(hits, key=key)
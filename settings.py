@@ -5,6 +5,7 @@ import pandas as pd
 import os
 import subprocess
 from pathlib import Path
+from typing import Dict
 
 
 class Settings(BaseSettings):
@@ -28,6 +29,26 @@ class Settings(BaseSettings):
     LOG_DIR: str = Field(default="results/logs", env="LOG_DIR")
     
     DOCKER_IMAGE:str = Field(default="",env="DOCKER_IMAGE")
+    ISSUE_CANDIDATES_TOP_K: int = Field(default=10, env="ISSUE_CANDIDATES_TOP_K")
+    # 知识图谱后端：memory（每次进程内构建）、sqlite（持久化到 KG_CACHE_DIR，多进程共享）
+    # 或 snapshot（扁平快照文件，各进程 mmap 同一份物理页，无需反序列化）
+    KG_BACKEND: str = Field(default="memory", env="KG_BACKEND")
+    KG_CACHE_DIR: str = Field(default="results/kg", env="KG_CACHE_DIR")
+    # snapshot 后端：把快照放入命名共享内存（/dev/shm）而不是 mmap 缓存文件；
+    # 段在 worker 退出后保留，由启动 worker 的进程在结束时调用 retriever.unlink_shared_snapshot 删除
+    KG_SNAPSHOT_SHARED_MEMORY: bool = Field(default=False, env="KG_SNAPSHOT_SHARED_MEMORY")
+    # 进程内缓存的知识图谱总内存上限（MB），超出后按 LRU 淘汰整张图；0 表示不限制
+    KG_POOL_MAX_MB: int = Field(default=4096, env="KG_POOL_MAX_MB")
+    # 读文件工具共享的文件文本缓存上限（MB），按 LRU 淘汰；0 表示不限制
+    FILE_CACHE_MAX_MB: int = Field(default=256, env="FILE_CACHE_MAX_MB")
+    # 工具输出的默认预算（估算 token 数），超出部分通过 next_page 游标分页获取
+    TOOL_OUTPUT_TOKEN_BUDGET: int = Field(default=2200, env="TOOL_OUTPUT_TOKEN_BUDGET")
+    # 按工具名覆盖的预算，JSON 格式，例如 {"read_file_lines": 3000}
+    TOOL_OUTPUT_TOKEN_BUDGETS: Dict[str, int] = Field(default_factory=dict, env="TOOL_OUTPUT_TOKEN_BUDGETS")
+    # 跨 agent 共享的工具结果缓存条目上限（按工具名和规范化参数缓存，文件修改后失效）；0 表示关闭
+    TOOL_RESULT_CACHE_SIZE: int = Field(default=1024, env="TOOL_RESULT_CACHE_SIZE")
+    # 注入各 agent 系统提示词的仓库地图预算（估算 token 数），0 表示不注入
+    REPO_MAP_TOKENS: int = Field(default=1024, env="REPO_MAP_TOKENS")
     def load_problem_statement(self) -> None:
         try:
             dataset_file = f"dataset/{self.DATASET}.parquet"
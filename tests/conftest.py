@@ -0,0 +1,75 @@
+"""
+Shared fixtures: small projects written to disk and parsed into an in-memory knowledge graph
+"""
+import textwrap
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple
+
+import pytest
+
+from kg import construct_tags
+from retriever.ckg_retriever import CKGRetriever
+
+
+class KGProject(NamedTuple):
+    root: Path
+    retriever: CKGRetriever
+    # fqn 前缀：取决于项目目录相对当前工作目录的位置（kg.utils.PREFIX）
+    prefix: str
+
+
+def write_files(root: Path, files: Dict[str, str]) -> Path:
+    """相对路径 -> 内容（去除公共缩进）写入 root"""
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(textwrap.dedent(text))
+    return root
+
+
+def fqn_prefix(retriever: CKGRetriever, root: Path) -> str:
+    """由任一非 __init__ 模块的图中模块名与其相对路径之差求出 fqn 前缀"""
+    for path, module in retriever.path_modules.items():
+        relative = Path(path).relative_to(root)
+        if relative.name != "__init__.py":
+            dotted = ".".join(relative.with_suffix("").parts)
+            return module[:len(module) - len(dotted)]
+    return ""
+
+
+@pytest.fixture(scope="session")
+def kg_project(tmp_path_factory) -> Callable[[Dict[str, str]], KGProject]:
+    """工厂：写入文件并构建内存知识图谱（带 root，包含目录树等依赖根目录的索引）"""
+
+    def build(files: Dict[str, str]) -> KGProject:
+        root = write_files(tmp_path_factory.mktemp("kg") / "proj", files)
+        retriever = CKGRetriever(*construct_tags.run(str(root)), root=str(root))
+        return KGProject(root, retriever, fqn_prefix(retriever, root))
+
+    return build
+
+
+SHAPES = '''
+class Shape:
+    """Base shape"""
+    def area(self):
+        return 0
+
+
+class Circle(Shape):
+    def __init__(self, radius):
+        self.radius = radius
+
+    def area(self):
+        return 3.14 * self.radius ** 2
+
+
+def total_area(shapes):
+    return sum(s.area() for s in shapes) + Circle(1).area()
+'''
+
+
+@pytest.fixture(scope="session")
+def shapes_project(kg_project) -> KGProject:
+    """geo/shapes.py：继承、重写、调用，供各存储后端与内存版对照"""
+    return kg_project({"geo/__init__.py": "", "geo/shapes.py": SHAPES})
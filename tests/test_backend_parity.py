@@ -0,0 +1,56 @@
+"""
+Tests that the persistent backends (SQLite, flat snapshot) answer like the in-memory graph
+"""
+import pytest
+
+from retriever.snapshot import SnapshotRetriever, write_snapshot
+from retriever.sqlite_retriever import SQLiteCKGRetriever, export_to_sqlite
+
+
+@pytest.fixture(scope="module", params=["sqlite", "snapshot"])
+def backend(request, shapes_project, tmp_path_factory):
+    directory = tmp_path_factory.mktemp(request.param)
+    if request.param == "sqlite":
+        retriever = SQLiteCKGRetriever(export_to_sqlite(shapes_project.retriever, directory / "kg.sqlite"))
+    else:
+        retriever = SnapshotRetriever.from_file(write_snapshot(shapes_project.retriever, directory / "kg.ckgsnap"))
+    yield retriever
+    retriever.close()
+
+
+def _fqns(entities):
+    return [e.full_qualified_name for e in entities]
+
+
+def test_entity_lookups_match_memory_backend(shapes_project, backend):
+    memory, p = shapes_project.retriever, shapes_project.prefix
+    circle = f"{p}geo.shapes.Circle"
+    assert sorted(backend.methods) == sorted(memory.methods)
+    assert backend.classes[circle]["content"] == memory.classes[circle]["content"]
+    assert _fqns(backend.search_method_fuzzy("area")) == _fqns(memory.search_method_fuzzy("area"))
+    path = memory.classes[circle]["absolute_path"]
+    assert _fqns(backend.search_method_accurately(path, "Circle")) == _fqns(memory.search_method_accurately(path, "Circle"))
+    assert [m["name"] for m in backend.classes[circle]["methods"]] == ["__init__", "area"]
+    assert backend.methods_by_name.get("missing", []) == []
+
+
+def test_relationships_and_hierarchy_match_memory_backend(shapes_project, backend):
+    memory, p = shapes_project.retriever, shapes_project.prefix
+    path = memory.methods[f"{p}geo.shapes.total_area"]["absolute_path"]
+    for fqn in (f"{p}geo.shapes.total_area", f"{p}geo.shapes.Circle", f"{p}geo.shapes.Circle.area"):
+        expected = memory.get_relevant_entities(path, fqn)
+        actual = backend.get_relevant_entities(path, fqn)
+        for relation in expected:
+            assert sorted(e["full_qualified_name"] for e in actual[relation]) == \
+                sorted(e["full_qualified_name"] for e in expected[relation]), (fqn, relation)
+    assert backend.get_class_descendants(f"{p}geo.shapes.Shape") == [f"{p}geo.shapes.Circle"]
+    assert backend.get_class_mro(f"{p}geo.shapes.Circle") == memory.get_class_mro(f"{p}geo.shapes.Circle")
+    assert backend.get_method_overrides(f"{p}geo.shapes.Circle.area") == \
+        {"overrides": [f"{p}geo.shapes.Shape.area"], "overridden_by": []}
+
+
+def test_ranked_search_puts_name_match_first(shapes_project, backend):
+    label, entity, score = backend.search_entities_ranked("circle", top_k=1)[0]
+    assert (label, entity["full_qualified_name"]) == ("Class", f"{shapes_project.prefix}geo.shapes.Circle")
+    assert score > 0
+    assert backend.search_file_by_keyword("area") == shapes_project.retriever.search_file_by_keyword("area")
@@ -0,0 +1,71 @@
+"""
+Tests for the batched method / relationship lookups behind extract_methods_batch
+"""
+import pytest
+
+from retriever.sqlite_retriever import SQLiteCKGRetriever, export_to_sqlite
+
+
+@pytest.fixture(scope="module", params=["memory", "sqlite"])
+def backend(request, shapes_project, tmp_path_factory):
+    if request.param == "memory":
+        return shapes_project.retriever
+    return SQLiteCKGRetriever(export_to_sqlite(shapes_project.retriever, tmp_path_factory.mktemp("batch") / "kg.db"))
+
+
+def test_search_methods_many_answers_each_query_in_order(backend, shapes_project):
+    shapes = str(shapes_project.root / "geo" / "shapes.py")
+    queries = [
+        (shapes, "Circle.area"),
+        (str(shapes_project.root / "missing.py"), "Circle.area"),
+        (shapes, "Shape.area"),
+        (shapes, None),
+        (shapes, "Circle.area"),
+    ]
+    results = backend.search_methods_many(queries)
+
+    assert len(results) == len(queries)
+    assert [m.full_qualified_name for m in results[0]] == [f"{shapes_project.prefix}geo.shapes.Circle.area"]
+    assert results[1] == []
+    assert [m.name for m in results[2]] == ["area"] and results[2][0].start_line < results[0][0].start_line
+    assert {m.name for m in results[3]} == {"area", "__init__", "total_area"} and len(results[3]) == 4
+    for (path, fqn), methods in zip(queries, results):
+        expected = backend.search_method_accurately(path, fqn)  # 与逐个查询一致
+        assert [(m.full_qualified_name, m.start_line) for m in methods] == [
+            (m.full_qualified_name, m.start_line) for m in expected
+        ]
+
+
+def test_get_relevant_entities_many_matches_single_lookups(backend, shapes_project):
+    shapes = str(shapes_project.root / "geo" / "shapes.py")
+    area = (shapes, f"{shapes_project.prefix}geo.shapes.Circle.area")
+    init = (shapes, f"{shapes_project.prefix}geo.shapes.Circle.__init__")
+    results = backend.get_relevant_entities_many([area, init, area])
+
+    assert results == [backend.get_relevant_entities(*area), backend.get_relevant_entities(*init), results[0]]
+    assert results[2] is results[0]  # 重复目标只计算一次
+    assert [e["full_qualified_name"] for e in results[0]["HAS_METHOD"]] == [init[1]]
+    assert [e["full_qualified_name"] for e in results[1]["BELONGS_TO"]] == [f"{shapes_project.prefix}geo.shapes.Circle"]
+
+
+def test_extract_methods_batch_sections_follow_target_order(shapes_project, monkeypatch):
+    from settings import settings
+    from tools.retriever_tools import extract_methods_batch
+
+    monkeypatch.setattr(settings, "TEST_BED", str(shapes_project.root.parent))
+    monkeypatch.setattr(settings, "PROJECT_NAME", shapes_project.root.name)
+    out = extract_methods_batch([
+        ["geo/shapes.py", f"{shapes_project.prefix}geo.shapes.Circle.area"],
+        ["geo/shapes.py", "Circle.nope"],
+        ["/elsewhere/x.py", "f"],
+        ["geo/shapes.py"],
+        [str(shapes_project.root / "geo" / "shapes.py"), "total_area"],
+    ])
+    sections = out.split("\n\n")
+
+    assert [s.split("\n", 1)[0].split(" ", 2)[1] for s in sections] == ["[1]", "[2]", "[3]", "[4]", "[5]"]
+    assert "return 3.14 * self.radius ** 2" in sections[0] and "HAS_METHOD (1):" in sections[0]
+    assert "Method not found!" in sections[1]
+    assert "Error: Absolute path does not start with" in sections[2]
+    assert "expected a [file, full_qualified_name] pair" in sections[3]
+    assert "def total_area(shapes):" in sections[4] and "KEY RELATIONSHIPS" not in sections[4]
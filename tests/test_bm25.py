@@ -0,0 +1,35 @@
+"""
+Tests for the BM25 entity search index
+"""
+from retriever.bm25 import BM25Index, tokenize_identifier
+
+
+def test_tokenize_splits_camel_and_snake_case():
+    tokens = tokenize_identifier("parseHTTPResponse read_file_lines")
+    assert "parsehttpresponse" in tokens
+    assert {"parse", "http", "response"} <= set(tokens)
+    assert {"read_file_lines", "read", "file", "lines"} <= set(tokens)
+
+
+def test_tokenize_drops_keywords_and_self():
+    tokens = tokenize_identifier("def run(self): return None")
+    assert tokens == ["run"]
+
+
+def test_search_ranks_name_match_first():
+    index = BM25Index()
+    index.add("compute_area", [("compute_area", 3.0), ("return shape.area()", 1.0)])
+    index.add("draw", [("draw", 3.0), ("canvas.paint(shape)", 1.0)])
+    index.add("volume", [("volume", 3.0), ("return area * height", 1.0)])
+    index.finalize()
+
+    hits = index.search("computeArea", top_k=2)
+    assert [doc_id for doc_id, _ in hits] == ["compute_area", "volume"]
+    assert hits[0][1] > hits[1][1] > 0
+
+
+def test_search_without_matches_is_empty():
+    index = BM25Index()
+    index.add("a", [("alpha", 1.0)])
+    index.finalize()
+    assert index.search("omega") == []
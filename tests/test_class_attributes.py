@@ -0,0 +1,96 @@
+"""
+Tests for the instance-attribute index built from self.x assignments
+"""
+import pytest
+
+from retriever.sqlite_retriever import SQLiteCKGRetriever, export_to_sqlite
+
+MODELS = '''
+from typing import Optional
+
+class Base:
+    kind = "base"
+
+    def __init__(self):
+        self.created = 0
+
+class Account(Base):
+    def __init__(self, owner: str, limit):
+        super().__init__()
+        self.owner = owner
+        self.balance: float = 0
+        self.history = []
+        self.meta = Meta(
+            owner,
+        )
+        self.limit = limit
+        self._cache = None
+
+    def deposit(self, amount):
+        self.balance = self.balance + amount
+        self._cache = {}
+
+    @staticmethod
+    def helper(other):
+        other.ignored = 1
+
+class Meta:
+    def __init__(self, owner):
+        def inner(self):
+            self.not_meta = 1
+        self.owner = owner
+'''
+
+
+@pytest.fixture(scope="module")
+def retriever(kg_project):
+    project = kg_project({"models.py": MODELS})
+    return project.retriever, f"{project.prefix}models"
+
+
+def test_indexes_self_assignments_with_types_and_sites(retriever):
+    memory, mod = retriever
+    attrs = {a["name"]: a for a in memory.classes[f"{mod}.Account"]["attributes"]}
+    assert list(attrs) == ["owner", "balance", "history", "meta", "limit", "_cache"]
+    assert attrs["owner"]["data_type"] == "str"  # 来自参数注解
+    assert attrs["balance"]["data_type"] == "float"  # 注解优先于赋值推断
+    assert attrs["history"]["data_type"] == "list"
+    assert attrs["meta"]["data_type"] == "Meta"
+    assert attrs["limit"]["data_type"] is None
+
+    meta = attrs["meta"]
+    assert (meta["start_line"], meta["end_line"]) == (16, 18)  # 多行语句的完整范围
+    assert meta["content"].strip().startswith("self.meta = Meta(")
+    init, deposit = f"{mod}.Account.__init__", f"{mod}.Account.deposit"
+    assert attrs["balance"]["defined_in"] == init
+    assert attrs["balance"]["assigned_in"] == [init, deposit]
+    assert attrs["_cache"]["assignments"] == [[20, 20, init], [24, 24, deposit]]
+    assert attrs["_cache"]["data_type"] == "dict"  # None 不作为类型
+    # 嵌套函数中的 self 不是 Meta 的实例
+    assert [a["name"] for a in memory.classes[f"{mod}.Meta"]["attributes"]] == ["owner"]
+
+
+def test_class_attributes_merge_mro_and_search(retriever):
+    memory, mod = retriever
+    attributes = memory.get_class_attributes(f"{mod}.Account")
+    by_name = {a["name"]: (a["kind"], a["declared_in"].rsplit(".", 1)[-1]) for a in attributes}
+    assert by_name["kind"] == ("class", "Base")
+    assert by_name["created"] == ("instance", "Base")
+    assert by_name["balance"] == ("instance", "Account")
+    assert "created" not in {a["name"] for a in memory.get_class_attributes(f"{mod}.Account", inherited=False)}
+
+    fields = {v.name: v for v in memory.search_field_variables_of_class("Account")}
+    assert fields["balance"].data_type == "float"
+    assert fields["balance"].full_qualified_name == f"{mod}.Account.balance"
+
+
+def test_sqlite_backend_keeps_attributes(retriever, tmp_path):
+    memory, mod = retriever
+    sqlite = SQLiteCKGRetriever(export_to_sqlite(memory, tmp_path / "kg.sqlite"))
+    try:
+        assert sqlite.get_class_attributes(f"{mod}.Account") == memory.get_class_attributes(f"{mod}.Account")
+        assert {v.name for v in sqlite.search_field_variables_of_class("Account")} == {
+            v.name for v in memory.search_field_variables_of_class("Account")
+        }
+    finally:
+        sqlite.close()
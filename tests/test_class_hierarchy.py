@@ -0,0 +1,105 @@
+"""
+Tests for C3 linearization (linearize_mro) and method override lookups
+"""
+import pytest
+
+from retriever.ckg_retriever import linearize_mro
+
+HIERARCHY = '''
+import ext
+
+
+class Base:
+    def run(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class Left(Base):
+    def run(self):
+        pass
+
+
+class Right(Base):
+    def run(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class Leaf(Left, Right):
+    def run(self):
+        pass
+
+
+class Widget(ext.Thing, Base):
+    def run(self):
+        pass
+
+
+def run():
+    pass
+'''
+
+
+def _mro(bases, cls, cache=None):
+    """bases: 类 -> 直接基类；不在 bases 中的名字视为外部基类"""
+    return linearize_mro(cls, lambda c: bases.get(c, []), lambda c: c in bases, {} if cache is None else cache)
+
+
+def test_c3_matches_python_for_consistent_hierarchies():
+    diamond = {"A": [], "B": ["A"], "C": ["A"], "D": ["B", "C"]}
+    assert _mro(diamond, "D") == ["D", "B", "C", "A"]
+
+    # Python 文档中 C3 的经典示例
+    bases = {"O": [], "A": ["O"], "B": ["O"], "C": ["O"], "D": ["O"], "E": ["O"],
+             "K1": ["A", "B", "C"], "K2": ["D", "B", "E"], "K3": ["D", "A"], "Z": ["K1", "K2", "K3"]}
+    namespace = {}
+    for name in ["O", "A", "B", "C", "D", "E", "K1", "K2", "K3", "Z"]:
+        namespace[name] = type(name, tuple(namespace[b] for b in bases[name]), {})
+    expected = [c.__name__ for c in namespace["Z"].__mro__[:-1]]  # 去掉 object
+    assert _mro(bases, "Z") == expected == ["Z", "K1", "K2", "K3", "D", "A", "B", "C", "E", "O"]
+
+
+def test_inconsistent_hierarchies_fall_back_to_depth_first():
+    bases = {"A": [], "B": [], "X": ["A", "B"], "Y": ["B", "A"], "Z": ["X", "Y"]}
+    a, b = type("A", (), {}), type("B", (), {})
+    with pytest.raises(TypeError):  # Python 本身拒绝这样的继承
+        type("Z", (type("X", (a, b), {}), type("Y", (b, a), {})), {})
+    assert _mro(bases, "Z") == ["Z", "X", "A", "B", "Y"]  # 深度优先、保留首次出现
+
+    cyclic = {"P": ["Q"], "Q": ["P"]}  # 基类解析错误可能产生环，不能无限递归
+    assert _mro(cyclic, "P") == ["P", "Q"]
+
+
+def test_external_bases_stay_as_leaves_and_results_are_cached():
+    bases = {"app.Base": ["abc.ABC"], "app.C": ["app.Base", "models.Model"]}
+    cache = {}
+    assert _mro(bases, "app.C", cache) == ["app.C", "app.Base", "abc.ABC", "models.Model"]
+    assert cache["app.Base"] == ["app.Base", "abc.ABC"]
+    cache["app.C"] = ["cached"]
+    assert _mro(bases, "app.C", cache) == ["cached"]
+
+
+def test_method_overrides_follow_mro_and_descendants(kg_project):
+    project = kg_project({"pkg/__init__.py": "", "pkg/shapes.py": HIERARCHY})
+    retriever, h = project.retriever, f"{project.prefix}pkg.shapes."
+
+    assert retriever.get_class_mro(f"{h}Leaf") == [f"{h}Leaf", f"{h}Left", f"{h}Right", f"{h}Base"]
+    assert retriever.get_class_mro(f"{h}Widget") == [f"{h}Widget", "ext.Thing", f"{h}Base"]
+    assert retriever.get_method_overrides(f"{h}Leaf.run") == {
+        "overrides": [f"{h}Left.run", f"{h}Right.run", f"{h}Base.run"], "overridden_by": [],
+    }
+    assert retriever.get_method_overrides(f"{h}Base.run") == {
+        "overrides": [],
+        "overridden_by": [f"{h}Left.run", f"{h}Right.run", f"{h}Widget.run", f"{h}Leaf.run"],
+    }
+    assert retriever.get_method_overrides(f"{h}Base.stop")["overridden_by"] == [f"{h}Right.stop"]
+    assert retriever.get_method_overrides(f"{h}Widget.run")["overrides"] == [f"{h}Base.run"]
+    # 模块级函数与不存在的方法没有重写关系
+    empty = {"overrides": [], "overridden_by": []}
+    assert retriever.get_method_overrides(f"{h}run") == empty
+    assert retriever.get_method_overrides(f"{h}Nope.run") == empty
@@ -0,0 +1,71 @@
+"""
+Tests for entity-aligned read windows
+"""
+import ast
+import textwrap
+
+from retriever.code_window import Span, adaptive_window
+from utils.file_cache import CachedFile
+
+SOURCE = textwrap.dedent("""\
+    class Handler:
+        def __init__(self, name):
+            self.name = name
+            self.items = []
+            self.count = 0
+
+        def process(self, data):
+            def helper(x):
+                y = x * 2
+                z = y + 1
+                return z
+
+            result = []
+            for value in data:
+                result.append(helper(value))
+            return result
+
+
+    def top(a, b):
+        return a + b
+    """)
+
+SPANS = [
+    Span(1, 16, "m.Handler", "Class"),
+    Span(2, 5, "m.Handler.__init__", "Method"),
+    Span(7, 16, "m.Handler.process", "Method"),
+    Span(8, 11, "m.Handler.process.helper", "Method"),
+    Span(19, 20, "m.top", "Method"),
+]
+
+
+def _code(window):
+    """去掉行号前缀后的源码"""
+    return "\n".join(line[6:] for line in window.text.split("\n"))
+
+
+def test_snaps_to_enclosing_method_and_elides_nested_bodies():
+    cached = CachedFile("m.py", 0, 0, SOURCE)
+    window = adaptive_window(cached, SPANS, 14, 15, fits=lambda text: True)
+    assert (window.start, window.end, window.unit) == (7, 16, ("m.Handler.process", "Method"))
+    assert [e[1:] for e in window.elided] == [(9, 11, "m.Handler.process.helper")]
+    ast.parse(textwrap.dedent(_code(window)))  # 省略后仍是完整的代码
+
+    # 请求落在嵌套函数内时不省略它
+    window = adaptive_window(cached, SPANS, 9, 9, fits=lambda text: True)
+    assert window.unit == ("m.Handler.process.helper", "Method") and not window.elided
+
+
+def test_outer_units_are_skeletons_and_budget_is_respected():
+    cached = CachedFile("m.py", 0, 0, SOURCE)
+    # 请求类的开头时得到类骨架；预算不足时退回请求的行
+    window = adaptive_window(cached, SPANS, 1, 1, fits=lambda text: text.count("\n") < 12)
+    assert window.unit == ("m.Handler", "Class")
+    assert [e[3] for e in window.elided] == ["m.Handler.__init__", "m.Handler.process"]
+    ast.parse(_code(window))
+    window = adaptive_window(cached, SPANS, 14, 15, fits=lambda text: text.count("\n") < 2)
+    assert (window.start, window.end, window.unit) == (14, 15, None)
+
+    # 跨越两个实体的请求补全到两者的边界；只截到类尾时不扩展到整个类
+    window = adaptive_window(cached, SPANS, 15, 19, fits=lambda text: True)
+    assert (window.start, window.end) == (7, 20)
@@ -0,0 +1,56 @@
+"""
+Tests for the shared file-text cache used by the read tools
+"""
+import os
+
+from utils.file_cache import FileTextCache
+
+
+def test_line_slices_match_file_iteration(tmp_path):
+    path = tmp_path / "m.py"
+    path.write_bytes(b"a = 1\r\nb = 2\n\nlast")
+    cache = FileTextCache()
+    cached = cache.get(path)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        expected = list(f)
+    assert cached.line_count == len(expected) == 4
+    assert cached.lines(1, 4) == expected
+    assert cached.lines(2, 99) == expected[1:]
+    assert cached.line(4) == "last" and cached.line(5) == ""
+    assert FileTextCache().get(_write(tmp_path / "empty.py", "")).line_count == 0
+
+
+def test_revalidates_on_change_and_invalidate(tmp_path):
+    path = _write(tmp_path / "m.py", "x = 1\n")
+    cache = FileTextCache()
+    first = cache.get(path)
+    assert cache.get(path) is first and (cache.hits, cache.misses) == (1, 1)
+
+    path.write_text("x = 1\ny = 2\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, first.mtime_ns))  # 同一 mtime 下仍能通过 size 发现变化
+    assert cache.get(path).line_count == 2
+
+    cache.invalidate(path)
+    assert len(cache) == 0
+    assert cache.get(path).line(2) == "y = 2"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    a, b, c = (_write(tmp_path / f"{name}.py", name * 1000) for name in "abc")
+    cache = FileTextCache(max_bytes=2500)
+    cache.get(a)
+    cache.get(b)
+    cache.get(a)
+    cache.get(c)
+    assert len(cache) == 2
+    misses = cache.misses
+    cache.get(a)
+    assert cache.misses == misses  # a 最近使用过，b 被淘汰
+    cache.get(b)
+    assert cache.misses == misses + 1
+
+
+def _write(path, text):
+    path.write_text(text)
+    return path
@@ -0,0 +1,124 @@
+"""
+Tests for the directory tree captured with the KG
+"""
+from retriever.file_tree import FileTree, format_size, scan_file_tree
+from retriever.sqlite_retriever import SQLiteCKGRetriever, export_to_sqlite
+
+from tests.conftest import write_files
+
+MODELS = '''\
+class Model:
+    def save(self):
+        pass
+
+
+def load():
+    return Model()
+'''
+
+
+FILES = {
+    ".git/HEAD": "ref: refs/heads/main\n",
+    "pkg/__init__.py": "",
+    "pkg/models.py": MODELS,
+    "pkg/sub/util.py": "def helper():\n    return 1\n",
+    "README.md": "x" * 2048,
+}
+
+
+def test_tree_is_captured_with_the_graph_and_persisted(kg_project, tmp_path):
+    retriever = kg_project(FILES).retriever
+
+    assert retriever.file_tree[""] == {"dirs": ["pkg"], "files": [["README.md", 2048, None, None]]}
+    assert retriever.file_tree["pkg"]["files"] == [["__init__.py", 0, 0, 0], ["models.py", len(MODELS), 1, 2]]
+    assert ".git" not in retriever.file_tree
+
+    db_path = export_to_sqlite(retriever, tmp_path / "kg.db")
+    assert SQLiteCKGRetriever(str(db_path)).file_tree["pkg/sub"] == retriever.file_tree["pkg/sub"]
+
+
+def test_render_totals_and_updates(tmp_path):
+    root = write_files(tmp_path / "proj", FILES)
+    tree = FileTree(scan_file_tree(str(root), lambda path: (1, 2) if path.endswith("models.py") else (0, 1)))
+
+    assert tree.totals("") == (4, 2048 + len(MODELS) + 27, 1, 4)
+    assert tree.render("", depth=1) == [
+        f"pkg/  (3 files, {format_size(len(MODELS) + 27)}; 1 class, 4 functions)",
+        "README.md  (2.0 KB)",
+    ]
+    assert tree.render("pkg", depth=2) == [
+        "sub/  (1 file, 27 B; 0 classes, 1 function)",
+        "  util.py  (27 B; 0 classes, 1 function)",
+        "__init__.py  (0 B; 0 classes, 1 function)",
+        f"models.py  ({len(MODELS)} B; 1 class, 2 functions)",
+    ]
+
+    tree.update_file("pkg/sub/deep/new.py", 10)
+    tree.update_file("pkg/models.py", 5)
+    assert tree.has_dir("pkg/sub/deep") and tree.has_file("pkg/sub/deep/new.py")
+    assert tree.render("pkg/sub", depth=1)[0] == "deep/  (1 file, 10 B)"
+    assert tree.totals("pkg") == (4, 5 + 10 + 27, 1, 4)
+    assert tree.python_files("pkg") == ["pkg/__init__.py", "pkg/models.py", "pkg/sub/deep/new.py", "pkg/sub/util.py"]
+
+
+def test_search_covers_files_written_after_the_build(tmp_path, monkeypatch):
+    from settings import settings
+    from tools.retriever_tools import get_file_tree, record_file_write, search_code_with_context
+
+    root = write_files(tmp_path / "proj", FILES)
+    monkeypatch.setattr(settings, "TEST_BED", str(tmp_path))
+    monkeypatch.setattr(settings, "PROJECT_NAME", "proj")
+    get_file_tree()
+    (root / "pkg" / "fresh.py").write_text("def fresh():\n    return Model()\n")
+    record_file_write(str(root / "pkg" / "fresh.py"))
+
+    out = search_code_with_context("Model()", "pkg")
+    assert "2 matches in 2 files" in out and f"File: {root / 'pkg' / 'fresh.py'}" in out
+
+
+def test_fixer_edits_reach_the_tree_before_results_are_invalidated(tmp_path, monkeypatch):
+    from settings import settings
+    from tools.fixer_tools import edit_file_by_lineno
+    from tools.result_cache import tool_result_cache
+    from tools.retriever_tools import get_file_tree
+
+    root = write_files(tmp_path / "proj", FILES)
+    monkeypatch.setattr(settings, "TEST_BED", str(tmp_path))
+    monkeypatch.setattr(settings, "PROJECT_NAME", "proj")
+    tree = get_file_tree()
+
+    sizes = []
+    monkeypatch.setattr(tool_result_cache, "invalidate", lambda: sizes.append(tree.totals("pkg/sub")[1]))
+    assert edit_file_by_lineno("pkg/sub/util.py", "    return 2  # changed", 2, 2).startswith("Successfully")
+
+    assert get_file_tree() is tree
+    assert sizes == [(root / "pkg" / "sub" / "util.py").stat().st_size]  # 失效前目录树已更新
+
+
+def test_tree_follows_the_checkout_and_lives_with_its_graph(tmp_path, monkeypatch):
+    import gc
+    import os
+    import weakref
+
+    from settings import settings
+    from tools.retriever_tools import get_file_tree, retriever_pool
+
+    root = write_files(tmp_path / "proj", {**FILES, ".git/HEAD": "a" * 40 + "\n"})
+    monkeypatch.setattr(settings, "TEST_BED", str(tmp_path))
+    monkeypatch.setattr(settings, "PROJECT_NAME", "proj")
+    monkeypatch.setattr(settings, "KG_CACHE_DIR", str(tmp_path / "cache"))
+    old = get_file_tree()
+
+    # 同一测试床检出另一个 commit：目录树随新 commit 的图重新取得
+    (root / "pkg" / "late.py").write_text("x = 1\n")
+    (root / ".git" / "HEAD.lock").write_text("b" * 40 + "\n")
+    os.replace(root / ".git" / "HEAD.lock", root / ".git" / "HEAD")
+    new = get_file_tree()
+    assert new is not old and new.has_file("pkg/late.py") and not old.has_file("pkg/late.py")
+
+    # 图被淘汰且不再有人使用后，目录树随之释放
+    tree_ref = weakref.ref(new)
+    assert retriever_pool.evict(root) and retriever_pool.evict(root, "a" * 40)
+    del new
+    gc.collect()
+    assert tree_ref() is None
@@ -0,0 +1,56 @@
+"""
+Tests for typo-tolerant resolution of fqns and file paths
+"""
+from retriever.fuzzy import DeletionIndex, FuzzyIndex, edit_distance
+
+ENTITIES = [
+    ("astropy.io.fits.column.Column", "Class"),
+    ("astropy.io.fits.column.Column.__init__", "Method"),
+    ("astropy.io.fits.column.Column.dtype", "Method"),
+    ("astropy.io.fits.column.ColDefs", "Class"),
+    ("astropy.io.fits.column.ColDefs.dtype", "Method"),
+    ("astropy.table.column.Column", "Class"),
+    ("astropy.table.column.Column.__init__", "Method"),
+    ("astropy.units.core.Unit", "Class"),
+]
+
+PATHS = [
+    "/repo/astropy/io/fits/column.py",
+    "/repo/astropy/table/column.py",
+    "/repo/astropy/units/core.py",
+    "/repo/astropy/units/__init__.py",
+]
+
+
+def test_edit_distance_and_deletion_index():
+    assert edit_distance("column", "colmun", 2) == 1  # 相邻交换
+    assert edit_distance("column", "colum", 2) == 1
+    assert edit_distance("column", "table", 2) == 3  # 超过上限时返回上限 + 1
+    index = DeletionIndex(["dtype", "Column", "ColDefs", "Unit"])
+    assert index.lookup("Colunm") == [("Column", 1)]
+    assert index.lookup("dtyp") == [("dtype", 1)]
+    assert index.lookup("ab") == []  # 短名字不容错
+
+
+def test_resolves_near_miss_fqns():
+    index = FuzzyIndex(ENTITIES, PATHS)
+    # 缺少模块前缀、模块名写错、名字拼错
+    assert index.resolve_fqn("fits.column.Column.dtype")[0] == "astropy.io.fits.column.Column.dtype"
+    assert index.resolve_fqn("astropy.io.fits.columns.Column.dtyp")[0] == "astropy.io.fits.column.Column.dtype"
+    assert index.resolve_fqn("astropy.io.fits.utils.Column.dtype")[0] == "astropy.io.fits.column.Column.dtype"
+    # 两个 Column.__init__ 同样接近时不自动选择，只给出建议
+    resolved, suggestions = index.resolve_fqn("column.Column.__init__")
+    assert resolved is None
+    assert set(suggestions[:2]) == {"astropy.io.fits.column.Column.__init__", "astropy.table.column.Column.__init__"}
+    assert index.resolve_fqn("astropy.io.fits.column.Column", label="Method")[0] is None
+    assert index.resolve_fqn("nothing.like.this") == (None, [])
+
+
+def test_resolves_near_miss_paths():
+    index = FuzzyIndex(ENTITIES, PATHS)
+    assert index.resolve_path("io/fits/column.py")[0] == "/repo/astropy/io/fits/column.py"
+    assert index.resolve_path("astropy/io/fit/column.py")[0] == "/repo/astropy/io/fits/column.py"
+    assert index.resolve_path("src/astropy/units/core.py")[0] == "/repo/astropy/units/core.py"
+    assert index.resolve_path("astropy/units/cor.py")[0] == "/repo/astropy/units/core.py"
+    resolved, suggestions = index.resolve_path("column.py")
+    assert resolved is None and len(suggestions) == 2
@@ -0,0 +1,96 @@
+"""
+Tests for the Cypher-like graph query language
+"""
+import pytest
+
+from retriever.query import GraphQueryEngine, QueryError, parse_query
+
+
+def _entity(fqn, **extra):
+    return {"name": fqn.split(".")[-1], "full_qualified_name": fqn, "absolute_path": "/p/shapes.py", **extra}
+
+
+class FakeRetriever:
+    """Shape <- Circle，Circle.area 调用 Shape.area，helper 调用 Circle.area"""
+
+    def __init__(self):
+        shape_area = _entity("shapes.Shape.area", class_name="shapes.Shape", start_line=3)
+        circle_area = _entity("shapes.Circle.area", class_name="shapes.Circle", start_line=8)
+        helper = _entity("shapes.helper", start_line=12)
+        self.methods = {m["full_qualified_name"]: m for m in (shape_area, circle_area, helper)}
+        self.classes = {
+            "shapes.Shape": _entity("shapes.Shape", methods=[shape_area], constants=[]),
+            "shapes.Circle": _entity("shapes.Circle", methods=[circle_area], constants=[]),
+        }
+        self.variables = {}
+        self.methods_by_name, self.classes_by_name = {}, {}
+        for store, by_name in ((self.methods, self.methods_by_name), (self.classes, self.classes_by_name)):
+            for entity in store.values():
+                by_name.setdefault(entity["name"], []).append(entity)
+        self.variables_by_name = {}
+        self.methods_by_file = {"/p/shapes.py": list(self.methods.values())}
+        self.classes_by_file = {"/p/shapes.py": list(self.classes.values())}
+        self.variables_by_file = {}
+        self.calls_index = {"shapes.Circle.area": [shape_area], "shapes.helper": [circle_area]}
+        self.references_index = {}
+        self.tests_index = {}
+
+    def find_entity(self, fqn):
+        for label, store in (("Method", self.methods), ("Class", self.classes), ("Variable", self.variables)):
+            if fqn in store:
+                return label, store[fqn]
+        return None
+
+    def get_class_bases(self, fqn):
+        return ["shapes.Shape"] if fqn == "shapes.Circle" else []
+
+
+def test_parse_query_pattern():
+    query = parse_query(
+        'MATCH (a:Method {name: $name})<-[:CALLS|REFERENCES*1..3]-(b) '
+        'WHERE b.path STARTS WITH "/p" AND NOT b.name IN ["x", "y"] RETURN DISTINCT a, b.fqn LIMIT 5',
+        {"name": "area"},
+    )
+    assert query.nodes[0] == ("a", "Method", {"name": "area"})
+    assert query.rels[0] == (("CALLS", "REFERENCES"), "in", 1, 3)
+    assert [item.key for item in query.returns] == ["a", "b.fqn"]
+    assert query.distinct and query.limit == 5
+
+
+@pytest.mark.parametrize("text", [
+    "MATCH (a:Module) RETURN a",
+    "MATCH (a)-[:IMPORTS]->(b) RETURN a",
+    "MATCH (a) RETURN b",
+    "MATCH (a)<-[:CALLS]->(b) RETURN a",
+    "MATCH (a {name: $missing}) RETURN a",
+])
+def test_parse_query_errors(text):
+    with pytest.raises(QueryError):
+        parse_query(text)
+
+
+def test_engine_traverses_in_both_directions():
+    engine = GraphQueryEngine(FakeRetriever())
+    callers = engine.run('MATCH (m:Method {fqn: "shapes.Shape.area"})<-[:CALLS*1..2]-(c) RETURN c.fqn')
+    assert [row["c.fqn"] for row in callers] == ["shapes.Circle.area", "shapes.helper"]
+
+    overridden = engine.run(
+        'MATCH (m:Method)-[:BELONGS_TO]->(:Class)-[:INHERITS]->(:Class)-[:HAS_METHOD]->(base) '
+        'WHERE m.name = base.name RETURN m.fqn, base.fqn'
+    )
+    assert overridden == [{"m.fqn": "shapes.Circle.area", "base.fqn": "shapes.Shape.area"}]
+
+    rows = engine.run("MATCH (c:Class) WHERE c.name =~ 'C.*' RETURN c LIMIT 1")
+    assert rows[0]["c"]["label"] == "Class" and "methods" not in rows[0]["c"]
+
+
+def test_caller_limit_stops_matching_early():
+    engine = GraphQueryEngine(FakeRetriever())
+    pulled = []
+    match = engine._match
+    engine._match = lambda parsed: (pulled.append(row) or row for row in match(parsed))
+
+    assert len(engine.run("MATCH (m:Method) RETURN m.fqn", limit=2)) == 2
+    assert len(pulled) == 2  # 达到上限后不再继续匹配
+    assert len(engine.run("MATCH (m:Method) RETURN m.fqn LIMIT 1", limit=2)) == 1  # 取较小的上限
+    assert len(engine.run("MATCH (m:Method) RETURN m.fqn", limit=10)) == 3
@@ -0,0 +1,45 @@
+"""
+Tests for issue-to-code candidate ranking helpers
+"""
+from retriever.issue_ranker import extract_issue_signals, personalized_pagerank
+
+
+ISSUE = '''QuerySet.bulk_create crashes on `ignore_conflicts`
+
+Traceback (most recent call last):
+  File "/testbed/django/db/models/query.py", line 512, in bulk_create
+    self._batched_insert(objs)
+TypeError: unexpected keyword
+'''
+
+
+def test_extract_issue_signals():
+    signals = extract_issue_signals(ISSUE)
+    assert signals["frames"] == [("/testbed/django/db/models/query.py", 512, "bulk_create")]
+    assert "/testbed/django/db/models/query.py" in signals["paths"]
+    assert "QuerySet.bulk_create" in signals["dotted"]
+    assert {"bulk_create", "ignore_conflicts", "_batched_insert", "TypeError"} <= set(signals["identifiers"])
+
+
+def test_personalized_pagerank_spreads_to_neighbours():
+    adjacency = {"a": ["b"], "b": ["a", "c"], "c": ["b"], "d": []}
+    rank = personalized_pagerank(adjacency, {"a": 1.0})
+    assert abs(sum(rank.values()) - 1.0) < 1e-9
+    assert rank["a"] > rank["b"] > rank["c"] > 0
+    assert "d" not in rank
+
+
+def test_test_classes_and_methods_share_the_penalty(kg_project):
+    from retriever.issue_ranker import TEST_PENALTY, rank_issue_candidates
+
+    project = kg_project({
+        "pkg/__init__.py": "",
+        "pkg/widget.py": "class WidgetBase:\n    def render_widget(self):\n        return 1\n",
+        # 不在 tests/ 目录下，仅凭文件名 test_*.py 判定为测试代码
+        "pkg/test_widget.py": "class WidgetCase:\n    def test_render_widget(self):\n        return 2\n",
+    })
+    ranked = {
+        c["full_qualified_name"][len(project.prefix):]: c["score"]
+        for c in rank_issue_candidates(project.retriever, "`WidgetBase` and `WidgetCase` break in `render_widget`")
+    }
+    assert ranked["pkg.test_widget.WidgetCase"] <= ranked["pkg.widget.WidgetBase"] * TEST_PENALTY + 1e-9
@@ -0,0 +1,52 @@
+"""
+Tests for tool and retriever query instrumentation
+"""
+import inspect
+
+from utils.metrics import (
+    RunStats,
+    current_agent,
+    instrument_queries,
+    instrument_tool,
+    result_count,
+    track_agent_run,
+)
+
+
+@instrument_queries
+class _Retriever:
+    def find(self, name: str) -> list:
+        return [name, name]
+
+    def _private(self):
+        return None
+
+
+def test_instrumented_tool_records_run_stats():
+    retriever = _Retriever()
+
+    def lookup(name: str, limit: int = 3) -> str:
+        """Look something up."""
+        return "\n".join(retriever.find(name))
+
+    tool = instrument_tool("lookup", lookup)
+    assert inspect.signature(tool) == inspect.signature(lookup)
+    assert tool.__doc__ == "Look something up."
+
+    stats = RunStats("LocalizerAgent")
+    with track_agent_run("LocalizerAgent", stats):
+        assert current_agent.get() == "LocalizerAgent"
+        assert tool("abc") == "abc\nabc"
+    assert current_agent.get() == "none"
+
+    calls, total, longest, chars = stats.rows[("tool", "lookup")]
+    assert calls == 1 and chars == 7 and 0 <= longest <= total
+    assert stats.rows[("query", "find")][0] == 1
+    assert ("query", "_private") not in stats.rows
+
+
+def test_result_count():
+    assert result_count(None) == 0
+    assert result_count("a\n\nb\n") == 2
+    assert result_count({"x": 1}) == 1
+    assert result_count(object()) == 1
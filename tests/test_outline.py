@@ -0,0 +1,65 @@
+"""
+Tests for the file outline rendered from the KG
+"""
+from retriever.outline import doc_summary, file_outline
+
+SOURCE = '''\
+LIMIT = 10
+
+
+class Base(object):
+    """Base class.
+
+    Details."""
+    kind = "base"
+
+    def __init__(self, size: int):
+        self.size = size
+
+    @staticmethod
+    def make(value: int) -> "Base":
+        def inner():
+            return value
+        return Base(inner())
+
+    class Inner:
+        def run(self):
+            pass
+
+
+def top(a, *args, b=1, **kw):
+    return a
+'''
+
+
+def test_outline_nests_entities_with_signatures_and_spans(kg_project):
+    project = kg_project({"m.py": SOURCE})
+    retriever, path = project.retriever, str(project.root / "m.py")
+
+    assert file_outline(retriever, path) == [
+        "vars: LIMIT",
+        "class Base(object)  [4-21]  # Base class.",
+        "  class attrs: kind",
+        "  instance attrs: size: int",
+        "  def __init__(self, size: int)  [10-11]",
+        "  @staticmethod def make(value: int) -> 'Base'  [14-17]",
+        "    def inner()  [15-16]",
+        "  class Inner  [19-21]",
+        "    def run(self)  [20-21]",
+        "def top(a, *args, b=1, **kw)  [24-25]",
+    ]
+    # 包大纲中省略变量、属性和函数内部的嵌套函数
+    assert file_outline(retriever, path, detail=False) == [
+        "class Base(object)  [4-21]  # Base class.",
+        "  def __init__(self, size: int)  [10-11]",
+        "  @staticmethod def make(value: int) -> 'Base'  [14-17]",
+        "  class Inner  [19-21]",
+        "    def run(self)  [20-21]",
+        "def top(a, *args, b=1, **kw)  [24-25]",
+    ]
+
+
+def test_doc_summary():
+    assert doc_summary("\n  First line.\n  Second.") == "First line."
+    assert doc_summary("x" * 100).endswith("…") and len(doc_summary("x" * 100)) == 80
+    assert doc_summary("") == ""
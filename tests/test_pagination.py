@@ -0,0 +1,74 @@
+"""
+Tests for token-budgeted tool output and next_page cursors
+"""
+from tools.pagination import CursorStore, cursor_store, estimate_tokens, paginate, split_page
+
+
+def test_estimate_tokens_collapses_indentation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("        return x") == estimate_tokens(" return x")
+
+
+def test_split_page_prefers_section_boundaries():
+    first = "".join(f"line {i}\n" for i in range(6))
+    second = "".join(f"line {i}\n" for i in range(6, 12))
+    page, rest = split_page(first + "\n" + second, budget=20)
+    assert page == first + "\n" and rest == second  # 在空行处切开，而不是切进第二段
+    page, rest = split_page("x" * 100, budget=10)
+    assert (page, rest) == ("x" * 40, "x" * 60)  # 超长单行按字符切
+    assert split_page("short\n", budget=10) == ("short\n", "")
+
+
+def test_paginate_and_follow_cursors():
+    text = "\n".join(f"result {i:03d}" for i in range(200))
+    assert paginate(text, "t", budget=10_000) == text
+    pages, output = [], paginate(text, "t", budget=100)
+    while True:
+        body, _, footer = output.partition("\n\n... [showing")
+        pages.append(body)
+        if not footer:
+            break
+        cursor = footer.split('cursor="')[1].split('"')[0]
+        tool_name, rest, budget = cursor_store.get(cursor)
+        assert (tool_name, budget) == ("t", 100)
+        output = paginate(rest, tool_name, budget)
+    assert len(pages) > 1 and all(estimate_tokens(page) <= 100 for page in pages)
+    assert "\n".join(pages) == text  # 逐页取回的内容拼起来就是完整结果
+
+
+def test_cursor_store_is_bounded():
+    store = CursorStore(max_entries=2)
+    first = store.put("t", "a", 10)
+    second = store.put("t", "b", 10)
+    store.get(first)
+    store.put("t", "c", 10)
+    assert len(store) == 2 and store.get(second) is None and store.get(first) == ("t", "a", 10)
+
+
+def test_relationship_listings_page_at_entity_boundaries():
+    from tools.retriever_tools import _format_relationships, _simplify_relationships
+
+    entities = [{"name": f"f{i}", "full_qualified_name": f"pkg.mod.f{i}", "absolute_path": f"/other/m{i % 3}.py",
+                 "start_line": i, "end_line": i + 2, "content": "x" * 200} for i in range(60)]
+    entities.append({"name": "near", "full_qualified_name": "pkg.target.near", "absolute_path": "/t.py",
+                     "start_line": 1, "end_line": 2})
+    simplified = _simplify_relationships({"CALLS": entities, "REFERENCES": []}, "/t.py")
+    assert list(simplified) == ["CALLS"]
+    assert simplified["CALLS"][0]["name"] == "near"  # 同一文件中的实体排在最前
+
+    lines = _format_relationships(simplified)
+    page = paginate("\n".join(lines), "t", budget=100).partition("\n\n... [showing")[0]
+    assert page.split("\n") == lines[:len(page.split("\n"))]  # 每页都由完整的实体行组成
+
+
+def test_next_page_is_served_from_the_cursor_store_not_the_result_cache(monkeypatch):
+    from tools.result_cache import tool_result_cache
+    from tools.retriever_tools import next_page
+
+    calls = []
+    monkeypatch.setattr(tool_result_cache, "call", lambda tool_name, *args, **kwargs: calls.append(tool_name))
+    output = paginate("\n".join(f"result {i:03d}" for i in range(200)), "t", budget=100)
+    cursor = output.split('cursor="')[1].split('"')[0]
+    assert next_page(cursor).startswith("[t output, continued]\nresult ")
+    assert calls == []
@@ -0,0 +1,37 @@
+"""
+Tests for the batch read tool
+"""
+import textwrap
+
+import kg.utils
+from settings import settings
+from tools.retriever_tools import _merge_line_ranges, read_file_ranges
+
+
+def test_merge_line_ranges():
+    merged = _merge_line_ranges([(30, 40, "b"), (1, 10, "a"), (12, 20, ""), (8, 9, "a"), (100, 100, "")])
+    assert merged == [(1, 20, ["a"]), (30, 40, ["b"]), (100, 100, [])]  # 间隔不超过 3 行的范围合并
+
+
+def test_reads_ranges_and_entities_once_per_file(tmp_path, monkeypatch):
+    project = tmp_path / "proj"
+    (project / "pkg").mkdir(parents=True)
+    (project / "pkg" / "__init__.py").write_text("")
+    body = "\n".join(f"    x{i} = {i}" for i in range(80))
+    (project / "pkg" / "mod.py").write_text(textwrap.dedent("""\
+        def long_function():
+        {body}
+            return x0
+
+        def other():
+            return 1
+        """).format(body=body))
+    monkeypatch.setattr(settings, "TEST_BED", str(tmp_path))
+    monkeypatch.setattr(settings, "PROJECT_NAME", "proj")
+    monkeypatch.setattr(kg.utils, "PREFIX", None)  # fqn 相对项目根目录
+
+    out = read_file_ranges(["pkg.mod.long_function", ["pkg/mod.py", 70, 84], "pkg/mod.py:84-90", "pkg.mod.nothing"])
+    assert out.count("=== pkg/mod.py") == 1
+    assert "--- lines 1-85 (Method pkg.mod.long_function) ---" in out  # 超过 50 行，且重叠范围合并为一段
+    assert "  85:     return 1" in out and "'pkg.mod.nothing': no such entity" in out
+    assert "  86:" not in out
@@ -0,0 +1,128 @@
+"""
+Tests for the ranked repository map
+"""
+import pytest
+
+from retriever.repo_map import rank_repository, render_repo_map
+
+FILES = {
+    "core/__init__.py": "",
+    "core/base.py": '''
+        class Model:
+            def save(self):
+                return 1
+
+        def helper():
+            return 2
+
+        def unused():
+            return 3
+        ''',
+    "core/users.py": '''
+        from core.base import Model, helper
+
+        class User(Model):
+            def save(self):
+                helper()
+                return super().save()
+        ''',
+    "core/orders.py": '''
+        from core.base import Model, helper
+        from core.users import User
+
+        class Order(Model):
+            def owner(self):
+                helper()
+                return User()
+        ''',
+    "tests/test_base.py": '''
+        from core.base import Model
+
+        def test_model():
+            assert Model().save() == 1
+        ''',
+}
+
+
+@pytest.fixture(scope="module")
+def repo(kg_project):
+    project = kg_project(FILES)
+    return project.retriever, str(project.root)
+
+
+def test_most_used_file_and_symbols_rank_first(repo):
+    retriever, root = repo
+    file_rank, symbol_score = rank_repository(retriever)
+    ranked = sorted(file_rank, key=file_rank.get, reverse=True)
+    assert ranked[0] == f"{root}/core/base.py"
+    assert file_rank[f"{root}/core/users.py"] > file_rank[f"{root}/core/orders.py"]  # users 被 orders 使用
+    model = next(fqn for fqn in symbol_score if fqn.endswith("base.Model"))
+    assert symbol_score[model] > max(score for fqn, score in symbol_score.items() if fqn.endswith("users.User"))
+    assert not any(fqn.endswith("unused") for fqn in symbol_score)
+
+
+def test_render_respects_budget_and_skips_tests(repo):
+    retriever, root = repo
+    full = render_repo_map(retriever, root, fits=lambda text: True)
+    lines = full.split("\n")
+    assert lines[:2] == ["core/base.py", "  class Model"]
+    first_block = lines[:next(i for i, line in enumerate(lines[1:], 1) if not line.startswith("  "))]
+    assert "  def helper()" in first_block and "  def unused()" not in first_block
+    assert "tests/test_base.py" not in full
+    short = render_repo_map(retriever, root, fits=lambda text: text.count("\n") < len(first_block) + 1)
+    assert short == "\n".join(first_block)  # 下一块放不下时停止
+
+
+def test_cached_map_is_written_atomically(tmp_path, monkeypatch):
+    import os
+
+    from settings import settings
+    from tests.conftest import write_files
+    from tools import retriever_tools
+
+    write_files(tmp_path / "proj", {**FILES, ".git/HEAD": "ab" * 20 + "\n"})
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(settings, "TEST_BED", str(tmp_path))
+    monkeypatch.setattr(settings, "PROJECT_NAME", "proj")
+    monkeypatch.setattr(settings, "KG_CACHE_DIR", str(cache_dir))
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(retriever_tools.os, "replace", fail)
+        with pytest.raises(OSError):
+            retriever_tools.get_repo_map(max_tokens=300)
+    assert os.listdir(cache_dir) == []  # 写入失败不留下半个文件或临时文件
+
+    repo_map = retriever_tools.get_repo_map(max_tokens=300)
+    assert "core/base.py" in repo_map
+    assert [p.name for p in cache_dir.iterdir()] == [f"proj-{'ab' * 6}-300.repomap"]
+    assert (cache_dir / f"proj-{'ab' * 6}-300.repomap").read_text(encoding="utf-8") == repo_map
+
+
+def test_uncommitted_maps_are_kept_with_their_graph(tmp_path, monkeypatch):
+    import gc
+    import weakref
+
+    from settings import settings
+    from tests.conftest import write_files
+    from tools import retriever_tools
+
+    root = write_files(tmp_path / "proj", FILES)  # 没有 .git：不写 KG_CACHE_DIR
+    monkeypatch.setattr(settings, "TEST_BED", str(tmp_path))
+    monkeypatch.setattr(settings, "PROJECT_NAME", "proj")
+    monkeypatch.setattr(settings, "KG_CACHE_DIR", str(tmp_path / "cache"))
+    renders = []
+    render = retriever_tools.render_repo_map
+    monkeypatch.setattr(retriever_tools, "render_repo_map", lambda *args, **kwargs: renders.append(1) or render(*args, **kwargs))
+
+    assert retriever_tools.get_repo_map(max_tokens=300) == retriever_tools.get_repo_map(max_tokens=300)
+    assert len(renders) == 1 and not (tmp_path / "cache").exists()
+
+    # 图被淘汰并释放后，渲染结果一并释放
+    graph = weakref.ref(retriever_tools.retriever_pool.peek(root))
+    assert graph() in retriever_tools._repo_maps
+    assert retriever_tools.retriever_pool.evict(root)
+    gc.collect()
+    assert graph() is None and len(renders) == 1
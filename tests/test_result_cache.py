@@ -0,0 +1,107 @@
+"""
+Tests for the cross-agent tool result cache
+"""
+import threading
+import time
+
+import pytest
+
+from tools.result_cache import ToolResultCache
+
+
+def test_repeats_are_served_until_invalidated():
+    cache = ToolResultCache()
+    calls = []
+
+    def read(path: str, start: int = 1, end: int = 10) -> str:
+        calls.append((path, start, end))
+        return f"{path}:{start}-{end}:{len(calls)}"
+
+    tool = cache.wrap("read", read)
+    first = tool("a.py", 1)
+    assert tool("a.py", start=1, end=10) == first  # 位置参数、关键字参数与默认值规范化为同一个键
+    assert tool("a.py", 2) != first
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.invalidate()
+    assert tool("a.py", 1) != first and len(calls) == 3
+    assert cache.discard_if(lambda result: result.startswith("a.py:2")) == 0  # 失效后旧结果已清空
+    assert cache.discard_if(lambda result: result.startswith("a.py:1")) == 1
+
+
+def test_unkeyable_calls_and_failures_are_not_cached():
+    cache = ToolResultCache()
+    calls = []
+
+    def tool(arg, fail: bool = False):
+        calls.append(arg)
+        if fail:
+            raise ValueError("boom")
+        return len(calls)
+
+    wrapped = cache.wrap("tool", tool)
+    assert wrapped(object()) != wrapped(object())  # 参数无法序列化时直接调用
+    with pytest.raises(ValueError):
+        wrapped("x", fail=True)
+    with pytest.raises(ValueError):
+        wrapped("x", fail=True)
+    assert len(cache) == 0 and len(calls) == 4
+
+
+def test_concurrent_identical_calls_run_once():
+    cache = ToolResultCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow(name: str) -> str:
+        calls.append(name)
+        started.set()
+        release.wait(5)
+        return name.upper()
+
+    tool = cache.wrap("slow", slow)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tool("x"))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ["X"] * 4 and calls == ["x"]
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_results_of_calls_overlapping_an_edit_are_dropped():
+    cache = ToolResultCache()
+
+    def read(path: str) -> str:
+        cache.invalidate()  # 调用过程中发生了文件修改
+        return "old"
+
+    cache.wrap("read", read)("a.py")
+    assert len(cache) == 0
+
+
+def test_results_follow_the_checkout_the_pool_resolves(tmp_path, monkeypatch):
+    import os
+
+    from settings import settings
+
+    git = tmp_path / "proj" / ".git"
+    git.mkdir(parents=True)
+    (git / "HEAD").write_text("a" * 40 + "\n")
+    monkeypatch.setattr(settings, "TEST_BED", str(tmp_path))
+    monkeypatch.setattr(settings, "PROJECT_NAME", "proj")
+    cache = ToolResultCache()
+    calls = []
+    tool = cache.wrap("count", lambda text: calls.append(text) or len(calls))
+
+    assert tool("x") == tool("x") == 1
+    # 同一测试床切换到另一个 commit（git 以重命名方式写 HEAD）：旧 commit 的结果不再命中
+    (git / "HEAD.lock").write_text("b" * 40 + "\n")
+    os.replace(git / "HEAD.lock", git / "HEAD")
+    assert tool("x") == 2 and (cache.hits, cache.misses) == (1, 2)
@@ -0,0 +1,142 @@
+"""
+Tests for the per-repository retriever pool
+"""
+import gc
+import threading
+import time
+import weakref
+
+from retriever.pool import RetrieverPool, read_git_commit
+
+
+class FakeRetriever:
+    def __init__(self, root, commit, size):
+        self.root, self.commit, self.size = root, commit, size
+        self.closed = False
+
+    def _approximate_size(self):
+        return self.size
+
+    def close(self):
+        self.closed = True
+
+
+def test_read_git_commit(tmp_path):
+    git = tmp_path / ".git"
+    (git / "refs" / "heads").mkdir(parents=True)
+    (git / "HEAD").write_text("ref: refs/heads/main\n")
+    (git / "refs" / "heads" / "main").write_text("a" * 40 + "\n")
+    assert read_git_commit(str(tmp_path)) == "a" * 40
+
+    (git / "refs" / "heads" / "main").unlink()
+    (git / "packed-refs").write_text("# pack-refs with: peeled\n" + "b" * 40 + " refs/heads/main\n")
+    assert read_git_commit(str(tmp_path)) == "b" * 40
+
+    (git / "HEAD").write_text("c" * 40)
+    assert read_git_commit(str(tmp_path)) == "c" * 40
+    assert read_git_commit(str(tmp_path / "missing")) == ""
+
+
+def test_checkout_is_reread_only_after_git_rewrites_it(tmp_path, monkeypatch):
+    import os
+
+    from retriever import pool
+
+    git = tmp_path / ".git"
+    (git / "refs" / "heads").mkdir(parents=True)
+    (git / "HEAD").write_text("ref: refs/heads/main\n")
+    (git / "refs" / "heads" / "main").write_text("a" * 40 + "\n")
+    reads = []
+    read = pool._read_git_commit
+    monkeypatch.setattr(pool, "_read_git_commit", lambda root, consulted: reads.append(root) or read(root, consulted))
+
+    key = (os.path.realpath(tmp_path), "a" * 40)
+    assert RetrieverPool.make_key(tmp_path) == RetrieverPool.make_key(str(tmp_path)) == key
+    assert len(reads) == 2  # 每个 root 解析一次，之后只做 stat 校验
+
+    def rewrite(path, text):  # 与 git 一样先写锁文件再重命名
+        lock = path.with_name(path.name + ".lock")
+        lock.write_text(text)
+        os.replace(lock, path)
+
+    rewrite(git / "refs" / "heads" / "main", "b" * 40 + "\n")  # 分支上提交
+    assert RetrieverPool.make_key(tmp_path)[1] == "b" * 40
+    rewrite(git / "HEAD", "c" * 40 + "\n")  # 分离 HEAD 检出
+    assert RetrieverPool.make_key(tmp_path)[1] == "c" * 40
+    assert RetrieverPool.make_key(tmp_path, "d" * 40) == (key[0], "d" * 40)
+
+
+def test_pool_evicts_least_recently_used(tmp_path):
+    pool = RetrieverPool(lambda root, commit: FakeRetriever(root, commit, 40), max_bytes=100)
+    a = pool.get(tmp_path / "a", "1")
+    b = pool.get(tmp_path / "b", "1")
+    assert pool.get(tmp_path / "a", "1") is a  # a 变为最近使用
+    c = pool.get(tmp_path / "c", "1")
+
+    # 被淘汰的图不会被池关闭，仍在使用它的调用方不受影响
+    assert not b.closed and not a.closed and not c.closed
+    assert [key[0].rsplit("/", 1)[-1] for key in pool.keys()] == ["a", "c"]
+    assert pool.get(tmp_path / "a", "2") is not a  # 同一仓库的不同 commit 是不同的图
+    assert (pool.hits, pool.misses, pool.evictions) == (1, 4, 2)
+
+
+def test_pool_builds_each_key_once_under_concurrency(tmp_path):
+    builds = []
+
+    def builder(root, commit):
+        builds.append(root)
+        time.sleep(0.05)
+        return FakeRetriever(root, commit, 1)
+
+    pool = RetrieverPool(builder)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get(tmp_path, "x"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len(results) == 8 and all(r is results[0] for r in results)
+
+
+def test_pool_drops_evicted_retrievers_without_closing_them(tmp_path):
+    pool = RetrieverPool(lambda root, commit: FakeRetriever(root, commit, 1))
+    held = pool.get(tmp_path / "a", "1")
+    ref = weakref.ref(pool.get(tmp_path / "b", "1"))
+    assert pool.evict(tmp_path / "a", "1") and pool.evict(tmp_path / "b", "1")
+    assert not pool.evict(tmp_path / "a", "1")
+
+    assert not held.closed
+    gc.collect()
+    assert ref() is None  # 池不再持有引用
+
+
+def test_build_errors_reach_only_that_builds_waiters(tmp_path):
+    attempts = []
+    release = threading.Event()
+
+    def builder(root, commit):
+        attempts.append(commit)
+        if len(attempts) == 1:
+            raise RuntimeError("first build failed")
+        release.wait()
+        return FakeRetriever(root, commit, 1)
+
+    pool = RetrieverPool(builder)
+    try:
+        pool.get(tmp_path, "x")
+    except RuntimeError:
+        pass
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get(tmp_path, "x"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(attempts) == 2
+    assert len(results) == 4 and all(isinstance(r, FakeRetriever) for r in results)
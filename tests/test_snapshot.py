@@ -0,0 +1,68 @@
+"""
+Tests for snapshot-specific behaviour: BM25 arrays and shared memory (see test_backend_parity.py)
+"""
+import threading
+import time
+import uuid
+from multiprocessing import shared_memory
+
+import pytest
+
+from retriever.snapshot import (
+    SnapshotRetriever, _untrack, load_into_shared_memory, unlink_shared_snapshot, write_snapshot,
+)
+
+
+@pytest.fixture(scope="module")
+def snapshot_path(shapes_project, tmp_path_factory):
+    return write_snapshot(shapes_project.retriever, tmp_path_factory.mktemp("snap") / "kg.ckgsnap")
+
+
+def test_snapshot_search_uses_the_same_bm25_ranking(shapes_project, snapshot_path):
+    memory = shapes_project.retriever
+    snapshot = SnapshotRetriever.from_file(snapshot_path)
+    try:
+        assert list(snapshot.methods) == list(memory.methods)
+        expected = [(label, e["full_qualified_name"]) for label, e, _ in memory.search_entities_ranked("circle area")]
+        actual = [(label, e["full_qualified_name"]) for label, e, _ in snapshot.search_entities_ranked("circle area")]
+        assert actual == expected
+    finally:
+        snapshot.close()
+
+
+def test_shared_memory_attach(shapes_project, snapshot_path):
+    memory, p, path = shapes_project.retriever, shapes_project.prefix, snapshot_path
+    name = f"ckg-test-{uuid.uuid4().hex[:8]}"
+    shm = load_into_shared_memory(path, name)
+    shm.close()
+    try:
+        attached = SnapshotRetriever.from_shared_memory(name)
+        assert sorted(attached.classes) == sorted(memory.classes)
+        assert attached.get_class_descendants(f"{p}geo.shapes.Shape") == [f"{p}geo.shapes.Circle"]
+        attached.close()
+    finally:
+        assert unlink_shared_snapshot(name)
+    assert not unlink_shared_snapshot(name)
+
+
+def test_shared_memory_attach_waits_for_the_header(shapes_project, snapshot_path):
+    memory, path = shapes_project.retriever, snapshot_path
+    name = f"ckg-test-{uuid.uuid4().hex[:8]}"
+    content = open(path, "rb").read()
+    # 模拟创建方：段已可见，头部还没有写入
+    shm = shared_memory.SharedMemory(name=name, create=True, size=len(content))
+    _untrack(shm)
+    shm.buf[16:len(content)] = content[16:]
+    attached = []
+    thread = threading.Thread(target=lambda: attached.append(SnapshotRetriever.from_shared_memory(name)))
+    thread.start()
+    try:
+        time.sleep(0.05)
+        assert not attached
+        shm.buf[:16] = content[:16]
+        thread.join(timeout=5)
+        assert sorted(attached[0].classes) == sorted(memory.classes)
+        attached[0].close()
+    finally:
+        shm.close()
+        unlink_shared_snapshot(name)
@@ -0,0 +1,21 @@
+"""
+Tests for SQLite-specific behaviour (see test_backend_parity.py for answers shared with the in-memory graph)
+"""
+import pytest
+
+from retriever.sqlite_retriever import SQLiteCKGRetriever, export_to_sqlite
+
+
+@pytest.fixture(scope="module")
+def sqlite(shapes_project, tmp_path_factory):
+    retriever = SQLiteCKGRetriever(export_to_sqlite(shapes_project.retriever, tmp_path_factory.mktemp("db") / "kg.sqlite"))
+    yield retriever
+    retriever.close()
+
+
+def test_bulk_scans_match_per_key_lookups(shapes_project, sqlite):
+    for view in (sqlite.calls_index, sqlite.class_subclasses, sqlite.usages_index, sqlite.path_modules):
+        assert dict(view.items()) == {key: view[key] for key in view}
+        assert sorted(map(str, view.values())) == sorted(str(view[key]) for key in view)
+    memory = shapes_project.retriever
+    assert dict(sqlite.usages_index.items()) == {k: [list(u) for u in v] for k, v in memory.usages_index.items()}
@@ -0,0 +1,149 @@
+"""
+Tests for go-to-definition: scope, import and attribute resolution of identifier occurrences
+"""
+import pytest
+
+from retriever.snapshot import SnapshotRetriever, write_snapshot
+from retriever.sqlite_retriever import SQLiteCKGRetriever, export_to_sqlite
+
+SHAPES = '''
+import math
+SCALE = 2
+
+class Shape:
+    unit = "cm"
+    def area(self):
+        return 0
+
+class Circle(Shape):
+    def __init__(self, radius):
+        self.radius = radius
+
+    def area(self):
+        r = self.radius * SCALE
+        return math.pi * r ** 2 + len(self.unit)
+
+    def describe(self):
+        return self.area()
+'''
+
+APP = '''
+import geo.shapes as gs
+from geo import Round
+from geo.shapes import Shape
+
+async def build(n):
+    c = Round(n)
+    total = [gs.Circle(i).area() for i in range(n)]
+    return c.describe(), gs.SCALE, Shape
+'''
+
+
+@pytest.fixture(scope="module")
+def project(kg_project):
+    return kg_project({"geo/__init__.py": "from .shapes import Circle as Round\n", "geo/shapes.py": SHAPES, "app.py": APP})
+
+
+def _targets(retriever, path, line, identifier):
+    return [(d["kind"], d["target"], d["def_line"]) for d in retriever.go_to_definition(str(path), line, identifier)]
+
+
+def test_resolves_imports_aliases_and_attributes(project):
+    root, memory, p = project
+    app, shapes = root / "app.py", root / "geo" / "shapes.py"
+    circle = f"{p}geo.shapes.Circle"
+    assert _targets(memory, app, 7, "Round") == [("entity", circle, 10)]  # 包 __init__ 中 re-export 的别名
+    assert _targets(memory, app, 8, "gs.Circle") == [("entity", circle, 10)]
+    assert _targets(memory, app, 8, "area") == [("entity", f"{circle}.area", 14)]  # Circle(i).area()
+    assert _targets(memory, app, 9, "describe") == [("entity", f"{circle}.describe", 18)]  # c = Round(n)
+    assert _targets(memory, app, 9, "SCALE") == [("entity", f"{p}geo.shapes.SCALE", 3)]
+    assert _targets(memory, shapes, 15, "self.radius") == [("attribute", f"{circle}.radius", 12)]
+    assert _targets(memory, shapes, 16, "unit") == [("entity", f"{p}geo.shapes.Shape.unit", 6)]  # 沿 MRO
+
+
+def test_resolves_locals_and_external_names(project):
+    root, memory, _ = project
+    app, shapes = root / "app.py", root / "geo" / "shapes.py"
+    assert _targets(memory, shapes, 16, "r") == [("local", None, 15)]
+    assert _targets(memory, app, 8, "i") == [("local", None, 8)]
+    assert _targets(memory, shapes, 16, "math") == [("local", None, 2)]  # 项目外导入指向 import 语句
+    assert _targets(memory, app, 8, "range") == [("unresolved", None, 0)]
+    assert memory.methods[f"{project[2]}app.build"]["name"] == "build"  # async def 也是实体
+
+
+def test_find_usages_resolves_through_imports_and_instances(project):
+    root, memory, p = project
+    circle = f"{p}geo.shapes.Circle"
+    sites = [(u["path"].rsplit("/", 1)[-1], u["line"]) for u in memory.find_usages(circle)]
+    # import 语句、别名调用 Round(n)、模块属性 gs.Circle，以及包 __init__ 中的 re-export
+    assert sites == [("app.py", 3), ("app.py", 7), ("app.py", 8), ("__init__.py", 1)]
+
+    radius = memory.find_usages(f"{circle}.radius")
+    assert [(u["line"], u["is_store"], u["container"]) for u in radius] == [
+        (12, True, f"{circle}.__init__"), (15, False, f"{circle}.area"),
+    ]
+    assert [u["line"] for u in memory.find_usages(f"{circle}.radius", include_writes=False)] == [15]
+    assert memory.find_usages(f"{p}geo.shapes.Shape.area") == []  # 被 Circle.area 重写，调用都解析到子类
+
+
+def test_persistent_backends_answer_like_memory(project, tmp_path):
+    root, memory, _ = project
+    sqlite = SQLiteCKGRetriever(export_to_sqlite(memory, tmp_path / "kg.sqlite"))
+    snapshot = SnapshotRetriever.from_file(write_snapshot(memory, tmp_path / "kg.ckgsnap"))
+    try:
+        for path, line, identifier in ((root / "app.py", 9, "describe"), (root / "geo" / "shapes.py", 15, "self.radius"),
+                                       (root / "geo" / "shapes.py", 16, "r")):
+            expected = _targets(memory, path, line, identifier)
+            assert _targets(sqlite, path, line, identifier) == expected
+            assert _targets(snapshot, path, line, identifier) == expected
+        usages = memory.find_usages(f"{project[2]}geo.shapes.Circle")
+        assert sqlite.find_usages(f"{project[2]}geo.shapes.Circle") == usages
+        assert snapshot.find_usages(f"{project[2]}geo.shapes.Circle") == usages
+    finally:
+        sqlite.close()
+        snapshot.close()
+
+
+def test_module_import_graph_and_reverse_closure(project, tmp_path):
+    root, memory, p = project
+    app, geo, shapes = f"{p}app", f"{p}geo", f"{p}geo.shapes"
+    assert memory.import_graph[app] == [[shapes, 2], [geo, 3]]
+    assert memory.external_imports[shapes] == ["math"]
+    assert memory.resolve_module(str(root / "geo" / "shapes.py")) == shapes
+    assert memory.resolve_module("geo/__init__.py") == geo
+
+    importers = memory.get_module_dependencies(shapes, reverse=True, transitive=True)
+    assert [(d["module"], d["depth"], d["line"]) for d in importers] == [(app, 1, 2), (geo, 1, 1)]
+    # app -> geo -> geo.shapes：geo.shapes 已是直接依赖，闭包中只出现一次
+    closure = memory.get_module_dependencies(app, transitive=True)
+    assert [(d["module"], d["depth"], d["via"]) for d in closure] == [(shapes, 1, app), (geo, 1, app)]
+
+    sqlite = SQLiteCKGRetriever(export_to_sqlite(memory, tmp_path / "kg.sqlite"))
+    snapshot = SnapshotRetriever.from_file(write_snapshot(memory, tmp_path / "kg.ckgsnap"))
+    try:
+        for other in (sqlite, snapshot):
+            assert other.get_module_dependencies(shapes, reverse=True, transitive=True) == importers
+            assert other.resolve_module("geo.shapes") == shapes
+    finally:
+        sqlite.close()
+        snapshot.close()
+
+
+def test_file_imports_resolve_to_entities_modules_or_external(project, tmp_path):
+    root, memory, p = project
+    shapes_path = str(root / "geo" / "shapes.py")
+    imports = memory.file_imports[str(root / "app.py")]
+    assert [(i["line"], i["alias"], i["kind"], i["fqn"]) for i in imports] == [
+        (2, "gs", "module", f"{p}geo.shapes"),
+        (3, "Round", "entity", f"{p}geo.shapes.Circle"),
+        (4, "Shape", "entity", f"{p}geo.shapes.Shape"),
+    ]
+    assert (imports[2]["label"], imports[2]["path"], imports[2]["start_line"], imports[2]["end_line"]) == \
+        ("Class", shapes_path, 5, 8)
+    assert [(i["alias"], i["kind"], i["local"]) for i in memory.file_imports[shapes_path]] == [("math", "external", False)]
+
+    snapshot = SnapshotRetriever.from_file(write_snapshot(memory, tmp_path / "kg.ckgsnap"))
+    try:
+        assert snapshot.file_imports[str(root / "app.py")] == imports
+    finally:
+        snapshot.close()
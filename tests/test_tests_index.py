@@ -0,0 +1,117 @@
+"""
+Tests for the test index built with the KG and the find_tests_for_entity tool
+"""
+import pytest
+
+import kg.utils
+from kg import construct_tags
+from retriever.ckg_retriever import CKGRetriever, is_test_method, is_test_path
+from settings import settings
+from tests.conftest import write_files
+
+CALC = '''
+class Calc:
+    def add(self, a, b):
+        return a + b
+
+    def mul(self, a, b):
+        return a * b
+
+
+def helper():
+    return Calc()
+'''
+
+TEST_CALC = '''
+from pkg.calc import Calc, helper
+from pkg.jobs_a import go, run
+
+
+def test_add():
+    assert Calc().add(1, 2) == 3
+
+
+class TestCalc:
+    def test_mul(self):
+        assert helper().mul(2, 3) == 6
+
+
+def test_jobs():
+    go()
+    run()
+
+
+def make_calc():
+    return helper()
+'''
+
+FILES = {
+    "pkg/__init__.py": "",
+    "pkg/calc.py": CALC,
+    # 3 个同名 go（不超过上限，全部关联），4 个同名 run（超过上限，视为噪声）
+    **{f"pkg/jobs_{c}.py": "def go():\n    pass\n\n\ndef run():\n    pass\n" for c in "abc"},
+    "pkg/jobs_d.py": "def run():\n    pass\n",
+    "tests/__init__.py": "",
+    "tests/test_calc.py": TEST_CALC,
+}
+
+
+@pytest.fixture(scope="module")
+def project(kg_project):
+    return kg_project(FILES)
+
+
+def test_detects_tests_by_naming_convention():
+    assert is_test_path("/p/tests/helpers.py") and is_test_path("/p/pkg/test_x.py")
+    assert is_test_path("/p/pkg/x_test.py") and is_test_path("/p/testing/util.py")
+    assert not is_test_path("/p/pkg/contest.py") and not is_test_path("/p/pkg/calc.py")
+    assert is_test_method({"name": "test_add", "absolute_path": "/p/tests/test_calc.py"})
+    assert not is_test_method({"name": "helper", "absolute_path": "/p/tests/test_calc.py"})
+    assert not is_test_method({"name": "test_add", "absolute_path": "/p/pkg/calc.py"})
+
+
+def test_index_links_tests_to_called_methods_and_their_classes(project):
+    retriever, prefix = project.retriever, project.prefix
+    tests = f"{prefix}tests.test_calc."
+    assert retriever.tests_index[f"{prefix}pkg.calc.Calc.add"] == [f"{tests}test_add"]
+    assert retriever.tests_index[f"{prefix}pkg.calc.Calc.mul"] == [f"{tests}TestCalc.test_mul"]
+    # 实例化与方法调用都算作对类的测试，按测试在文件中的位置排序
+    assert retriever.tests_index[f"{prefix}pkg.calc.Calc"] == [f"{tests}test_add", f"{tests}TestCalc.test_mul"]
+    # 测试文件中的普通辅助函数（make_calc）不产生测试关系
+    assert retriever.tests_index[f"{prefix}pkg.calc.helper"] == [f"{tests}TestCalc.test_mul"]
+    assert [m.name for m in retriever.search_tests_for_entity(f"{prefix}pkg.calc.Calc.add")] == ["test_add"]
+
+
+def test_ambiguous_names_link_up_to_the_candidate_limit(project):
+    retriever, prefix = project.retriever, project.prefix
+    assert CKGRetriever.MAX_TEST_LINK_CANDIDATES == 3
+    for c in "abc":
+        assert retriever.tests_index[f"{prefix}pkg.jobs_{c}.go"] == [f"{prefix}tests.test_calc.test_jobs"]
+    assert not any(f"{prefix}pkg.jobs_{c}.run" in retriever.tests_index for c in "abcd")
+
+
+def test_candidate_limit_is_a_class_attribute(project):
+    class Strict(CKGRetriever):
+        MAX_TEST_LINK_CANDIDATES = 2
+
+    strict = Strict(*construct_tags.run(str(project.root)))
+    assert not any(f"{project.prefix}pkg.jobs_{c}.go" in strict.tests_index for c in "abc")
+    assert strict.tests_index[f"{project.prefix}pkg.calc.Calc.add"] == project.retriever.tests_index[
+        f"{project.prefix}pkg.calc.Calc.add"
+    ]
+
+
+def test_find_tests_for_entity_formats_pytest_node_ids(tmp_path, monkeypatch):
+    from tools.retriever_tools import find_tests_for_entity
+
+    root = write_files(tmp_path / "proj", FILES)
+    monkeypatch.setattr(settings, "TEST_BED", str(tmp_path))
+    monkeypatch.setattr(settings, "PROJECT_NAME", "proj")
+    monkeypatch.setattr(kg.utils, "PREFIX", None)  # fqn 相对项目根目录
+
+    out = find_tests_for_entity("pkg.calc.Calc")
+    assert out.startswith("Found 2 test functions for pkg.calc.Calc:")
+    assert "node_id: tests/test_calc.py::test_add\n" in out
+    assert "node_id: tests/test_calc.py::TestCalc::test_mul\n" in out
+    assert f"abs_path: {root / 'tests' / 'test_calc.py'}\n" in out
+    assert "No test function was found" in find_tests_for_entity("pkg.jobs_d.run")
@@ -0,0 +1,49 @@
+"""
+Tests for the ranked code search behind search_code_with_context
+"""
+import re
+
+import pytest
+
+from retriever.text_search import compile_pattern, rank_hits, search_files
+
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "tests").mkdir()
+    core = tmp_path / "pkg" / "core.py"
+    core.write_text("def parse(x):\n    return parser(x)\n\n" + "\n" * 100 + "PARSE = parse\n")
+    util = tmp_path / "pkg" / "util.py"
+    util.write_text("from pkg.core import parse\n")
+    test = tmp_path / "tests" / "test_core.py"
+    test.write_text("def test_parse():\n    assert parse(1)\n")
+    return tmp_path, str(core), str(util), str(test)
+
+
+def test_modes(files):
+    _, core, util, test = files
+    paths = [core, util, test]
+    literal = search_files(paths, compile_pattern("parse"))
+    assert [(p.rsplit("/", 1)[-1], line) for p, line, _ in literal] == [
+        ("core.py", 1), ("core.py", 2), ("core.py", 104), ("util.py", 1), ("test_core.py", 1), ("test_core.py", 2),
+    ]
+    word = search_files(paths, compile_pattern("parse", "word"))
+    assert (core, 2, 11) not in word and (core, 104, 8) in word  # parser 不是整词命中；列号指向匹配位置
+    assert len(search_files([core], compile_pattern("PARSE", case_sensitive=False))) == 3
+    assert [line for _, line, _ in search_files([core], compile_pattern(r"^def \w+\(", "regex"))] == [1]
+    with pytest.raises(re.error):
+        compile_pattern("(", "regex")
+    with pytest.raises(ValueError):
+        compile_pattern("x", "fuzzy")
+
+
+def test_ranking_prefers_code_near_locations(files):
+    root, core, util, test = files
+    hits = search_files([test, util, core], compile_pattern("parse", "word"))
+    ranked = rank_hits(hits, focus=[(core, 100, 110)], root=str(root))
+    assert [(p.rsplit("/", 1)[-1], line) for p, line, _ in ranked] == [
+        ("core.py", 104), ("core.py", 1), ("util.py", 1), ("test_core.py", 2),  # test_parse 不是整词命中
+    ]
+    # 没有关注区域时非测试代码仍然优先
+    assert rank_hits(hits, root=str(root))[-1][0] == test
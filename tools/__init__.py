@@ -4,17 +4,30 @@ from .registry import tool_registry
 from .retriever_tools import (
     explore_directory,
     analyze_file_structure,
+    get_file_outline,
     find_files_containing,
     get_code_relationships,
     find_methods_by_name,
     extract_complete_method,
+    extract_methods_batch,
     find_class_constructor,
     list_class_attributes,
+    get_class_hierarchy,
+    find_method_overrides,
+    go_to_definition,
+    find_usages,
+    get_module_dependencies,
     show_file_imports,
     find_variable_usage,
     find_all_variables_named,
+    find_tests_for_entity,
+    search_entities,
+    run_graph_query,
     read_file_lines,
+    read_file_ranges,
+    read_code_window,
     search_code_with_context,
+    next_page,
 )
 from .fixer_tools import (
     edit_file_by_content,
@@ -30,17 +43,30 @@ from .sequential_thinking_tool import (
 __all__ = [
     "explore_directory",
     "analyze_file_structure",
+    "get_file_outline",
     "find_files_containing",
     "get_code_relationships",
     "find_methods_by_name",
     "extract_complete_method",
+    "extract_methods_batch",
     "find_class_constructor",
     "list_class_attributes",
+    "get_class_hierarchy",
+    "find_method_overrides",
+    "go_to_definition",
+    "find_usages",
+    "get_module_dependencies",
     "show_file_imports",
     "find_variable_usage",
     "find_all_variables_named",
+    "find_tests_for_entity",
+    "search_entities",
+    "run_graph_query",
     "read_file_lines",
+    "read_file_ranges",
+    "read_code_window",
     "search_code_with_context",
+    "next_page",
     "tool_registry",
     "edit_file_by_content",
     "edit_file_by_lineno",
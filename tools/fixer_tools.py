@@ -4,9 +4,12 @@ from pathlib import Path
 import subprocess
 import re
 from utils.apply_check import ruff_check_file
+from utils.file_cache import file_cache
+from tools.result_cache import tool_result_cache
+from tools.retriever_tools import record_file_write
 from settings import settings
 
-@tool_registry.register(agents=[AgentType.FIXER])
+@tool_registry.register(agents=[AgentType.FIXER], cacheable=False)
 def create_file(file_path: str, code: str, timeout: int = 60) -> str:
     """
     Create a new file with the given code at the specified path.  
@@ -32,6 +35,9 @@ def create_file(file_path: str, code: str, timeout: int = 60) -> str:
         full_path.parent.mkdir(parents=True, exist_ok=True)
         with open(full_path, "w", encoding="utf-8") as f:
             f.write(code)
+        file_cache.invalidate(full_path)
+        record_file_write(full_path)
+        tool_result_cache.invalidate()
 
         script_rel_path = f"./{full_path.relative_to(Path(settings.TEST_BED) / settings.PROJECT_NAME)}"
 
@@ -66,7 +72,7 @@ def create_file(file_path: str, code: str, timeout: int = 60) -> str:
         return f"Error: {str(e)}"
 
 
-@tool_registry.register(agents=[AgentType.FIXER])
+@tool_registry.register(agents=[AgentType.FIXER], cacheable=False)
 def edit_file_by_lineno(
     file_path: str, content: str, start_line: int, end_line: int
 ) -> str:
@@ -124,6 +130,9 @@ def edit_file_by_lineno(
         # Write the updated content back to the file
         with open(full_path, "w", encoding="utf-8") as f:
             f.write("".join(updated_lines))
+        file_cache.invalidate(full_path)
+        record_file_write(full_path)
+        tool_result_cache.invalidate()
 
         # Perform ruff check on the modified file
         ruff_result = ruff_check_file(str(full_path))
@@ -144,7 +153,7 @@ def edit_file_by_lineno(
         return f"Error editing file: {str(e)}"
 
 
-@tool_registry.register(agents=[AgentType.FIXER])
+@tool_registry.register(agents=[AgentType.FIXER], cacheable=False)
 def insert(file_path: str, content: str, insert_line: int) -> str:
     """
     Insert content at the specified line in a file.
@@ -194,6 +203,9 @@ def insert(file_path: str, content: str, insert_line: int) -> str:
         # Write the updated content back to the file
         with open(full_path, "w", encoding="utf-8") as f:
             f.write("".join(updated_lines))
+        file_cache.invalidate(full_path)
+        record_file_write(full_path)
+        tool_result_cache.invalidate()
 
         # Perform ruff check on the modified file
         ruff_result = ruff_check_file(str(full_path))
@@ -207,7 +219,7 @@ def insert(file_path: str, content: str, insert_line: int) -> str:
         return f"Error inserting content: {str(e)}"
 
 
-@tool_registry.register(agents=[AgentType.FIXER])
+@tool_registry.register(agents=[AgentType.FIXER], cacheable=False)
 def edit_file_by_content(file_path: str, old_content: str, new_content: str) -> str:
     """
     Edit a file by replacing content using regex matching instead of line numbers.
@@ -257,6 +269,9 @@ def edit_file_by_content(file_path: str, old_content: str, new_content: str) ->
         # Write the updated content back to the file
         with open(full_path, "w", encoding="utf-8") as f:
             f.write(new_file_content)
+        file_cache.invalidate(full_path)
+        record_file_write(full_path)
+        tool_result_cache.invalidate()
 
         # Perform ruff check on the modified file
         ruff_result = ruff_check_file(str(full_path))
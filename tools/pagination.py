@@ -0,0 +1,105 @@
+"""Token budgets for tool output and cursors that hand out the rest of a long result page by page"""
+import math
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from settings import settings
+from utils.metrics import current_tool
+
+# Rough characters per token for code and English text
+CHARS_PER_TOKEN = 4
+_WHITESPACE_RUN = re.compile(r"[ \t]{2,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated token count: ~4 characters per token, a run of spaces/tabs (indentation) counts as one character"""
+    if not text:
+        return 0
+    return math.ceil(len(_WHITESPACE_RUN.sub(" ", text)) / CHARS_PER_TOKEN)
+
+
+def token_budget(tool_name: str) -> int:
+    """Per-tool budget from TOOL_OUTPUT_TOKEN_BUDGETS, else TOOL_OUTPUT_TOKEN_BUDGET"""
+    return settings.TOOL_OUTPUT_TOKEN_BUDGETS.get(tool_name, settings.TOOL_OUTPUT_TOKEN_BUDGET)
+
+
+def split_page(text: str, budget: int) -> Tuple[str, str]:
+    """
+    Split text into (page, rest): the longest run of whole lines within budget,
+    pulled back to the last blank line (a section boundary) when one falls in the
+    second half of the page. A single line longer than the budget is cut mid-line.
+    """
+    lines = text.splitlines(keepends=True)
+    used = cut = section_cut = 0
+    for i, line in enumerate(lines):
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        used += cost
+        cut = i + 1
+        if not line.strip() and used * 2 >= budget:
+            section_cut = cut
+    else:
+        return text, ""
+    if cut == 0:
+        limit = budget * CHARS_PER_TOKEN
+        return text[:limit], text[limit:]
+    if section_cut and section_cut < cut:
+        cut = section_cut
+    return "".join(lines[:cut]), "".join(lines[cut:])
+
+
+class CursorStore:
+    """
+    cursor -> (tool name, remaining text, budget). The remainder is kept as
+    rendered text, so following a cursor never re-runs the query. Bounded LRU;
+    cursors stay valid when followed more than once.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, tool_name: str, rest: str, budget: int) -> str:
+        cursor = secrets.token_urlsafe(6)
+        with self._lock:
+            self._entries[cursor] = (tool_name, rest, budget)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cursor
+
+    def get(self, cursor: str) -> Optional[Tuple[str, str, int]]:
+        with self._lock:
+            entry = self._entries.get(cursor)
+            if entry is not None:
+                self._entries.move_to_end(cursor)
+            return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Process-wide store behind the next_page tool
+cursor_store = CursorStore()
+
+
+def paginate(text: str, tool_name: Optional[str] = None, budget: Optional[int] = None) -> str:
+    """
+    Return text unchanged when it fits the budget (default: the budget of the tool
+    currently running), otherwise its first page plus a footer with the cursor for the rest.
+    """
+    tool_name = tool_name or current_tool.get()
+    budget = budget or token_budget(tool_name)
+    total = estimate_tokens(text)
+    if total <= budget:
+        return text
+    page, rest = split_page(text, budget)
+    cursor = cursor_store.put(tool_name, rest, budget)
+    return (
+        f"{page.rstrip()}\n\n... [showing ~{estimate_tokens(page)} of ~{total} tokens; "
+        f"call next_page(cursor=\"{cursor}\") for the next part]"
+    )
@@ -1,6 +1,9 @@
 from typing import Dict, List, Callable, Optional
 from enum import Enum
 
+from utils.metrics import instrument_tool
+from tools.result_cache import tool_result_cache
+
 #TODO @hanyu transfer to models dir
 class AgentType(Enum):
     LOCALIZER = "localizer"
@@ -17,9 +20,18 @@ class ToolRegistry:
         self._tools: Dict[str, Callable] = {}
         self._tool_agents: Dict[str, List[AgentType]] = {}
 
-    def register(self, name: str = None, agents: List[AgentType] | None = None):
+    def register(self, name: str = None, agents: List[AgentType] | None = None, cacheable: bool = True):
+        """
+        cacheable=False for tools with side effects or whose output depends on more than
+        their arguments and the checkout; the other tools share results across agents.
+        """
         def decorator(func):
             tool_name = name or func.__name__
+            # 相同参数的重复调用直接返回缓存结果（文件修改后失效）
+            if cacheable:
+                func = tool_result_cache.wrap(tool_name, func)
+            # 每次调用记录耗时、输出大小和结果数
+            func = instrument_tool(tool_name, func)
             self._tools[tool_name] = func
             self._tool_agents[tool_name] = agents or [
                 AgentType.LOCALIZER,
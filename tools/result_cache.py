@@ -0,0 +1,119 @@
+"""Cross-agent cache of tool results with single-flight deduplication of concurrent identical calls"""
+import functools
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from retriever.pool import RetrieverPool
+from settings import settings
+from utils.metrics import record_tool_cache_hit
+
+
+class ToolResultCache:
+    """
+    (generation, checkout, tool name, normalized args) -> result, LRU-bounded.
+
+    The checkout is the project root and its HEAD commit, so agents working on the
+    same repository share results while other checkouts never see them. Edits made
+    through the fixer tools call invalidate(), which bumps the generation: older
+    entries become unreachable and results of calls still running when the edit
+    happened are not stored. Concurrent identical calls run once; the others wait
+    for that result (single-flight).
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.generation = 0
+        self._results: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, tool_name: str, signature: inspect.Signature, args: tuple, kwargs: dict) -> Optional[Tuple]:
+        """Key for one call, None when the arguments do not bind or are not JSON-serializable"""
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            return None
+        bound.apply_defaults()
+        try:
+            normalized = json.dumps(bound.arguments, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        # The key the pool resolves for this project: re-read only when HEAD or the branch ref changes
+        checkout = RetrieverPool.make_key(Path(settings.TEST_BED) / settings.PROJECT_NAME)
+        return self.generation, checkout, tool_name, normalized
+
+    def call(self, tool_name: str, key: Tuple, func: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                record_tool_cache_hit(tool_name)
+                return self._results[key]
+            running = self._inflight.get(key)
+            if running is None:
+                self.misses += 1
+                self._inflight[key] = future = Future()
+            else:
+                self.hits += 1
+        if running is not None:
+            record_tool_cache_hit(tool_name)
+            # Re-raises the running call's exception; failures are never cached
+            return running.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if key[0] == self.generation:
+                self._results[key] = result
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def wrap(self, tool_name: str, func: Callable) -> Callable:
+        """Serve repeated calls of a synchronous tool from the cache; coroutine tools are returned unchanged"""
+        if inspect.iscoroutinefunction(func):
+            return func
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = self.make_key(tool_name, signature, args, kwargs) if self.max_entries else None
+            if key is None:
+                return func(*args, **kwargs)
+            return self.call(tool_name, key, func, *args, **kwargs)
+        return wrapper
+
+    def invalidate(self):
+        """Forget every result (after a file edit)"""
+        with self._lock:
+            self.generation += 1
+            self._results.clear()
+
+    def discard_if(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop the cached results matching predicate; returns how many were dropped"""
+        with self._lock:
+            stale = [key for key, result in self._results.items() if predicate(result)]
+            for key in stale:
+                del self._results[key]
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+# Process-wide cache shared by all agents; the fixer tools invalidate it after every write
+tool_result_cache = ToolResultCache(max_entries=settings.TOOL_RESULT_CACHE_SIZE)
@@ -1,18 +1,30 @@
 """Tool functions that wrap CKGRetriever methods for agent use"""
 
+import ast
 import os
 import re
-from typing import Optional
+import tempfile
+import weakref
+from typing import List, Optional, Tuple, Union
 from pathlib import Path
 
 from retriever.ckg_retriever import CKGRetriever
+from retriever.sqlite_retriever import SQLiteCKGRetriever, export_to_sqlite
+from retriever.snapshot import SnapshotRetriever, write_snapshot
+from retriever.query import QueryError
+from retriever.code_window import adaptive_window, entity_spans
+from retriever.file_tree import FileTree, describe_totals, scan_file_tree
+from retriever.outline import file_outline
+from retriever.repo_map import render_repo_map
+from retriever.text_search import compile_pattern, rank_hits, search_files
+from retriever.pool import RetrieverPool
 from settings import settings
 from kg import construct_tags
 from tools.registry import tool_registry, AgentType
-
-# Global retriever instance (will be initialized when first used)
-_retriever: Optional[CKGRetriever] = None
-
+from tools.result_cache import tool_result_cache
+from tools.pagination import cursor_store, estimate_tokens, paginate, token_budget
+from utils.file_cache import file_cache
+from agents.context import active_context
 
 def build_knowledge_graph(dir_name):
     print("Step 1: Constructing Knowledge Graph and Tags in memory...\n")
@@ -22,105 +34,390 @@ def build_knowledge_graph(dir_name):
 
     print("Step 2: Initializing Memory-based Retriever...\n")
 
-    retriever = CKGRetriever(structure, tags)
+    retriever = CKGRetriever(structure, tags, root=str(dir_name))
 
     print("🎉 Knowledge Graph built successfully in memory!\n")
     return retriever
 
 
-def get_retriever() -> CKGRetriever:
-    """Get or create the global CKGRetriever instance (memory-based)"""
-    global _retriever
-    if _retriever is None:
-        dir_name = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        print(f"Building knowledge graph for {dir_name}...")
-        _retriever = build_knowledge_graph(dir_name)
-    return _retriever
+def _build_retriever(root: str, commit: str) -> Union[CKGRetriever, SQLiteCKGRetriever, SnapshotRetriever]:
+    """
+    Build the graph for one repository checkout (RetrieverPool builder).
+
+    With KG_BACKEND=sqlite the graph is built once, exported to
+    KG_CACHE_DIR/<repo>-<commit>.sqlite and reopened read-only by later processes.
+    With KG_BACKEND=snapshot it is written to KG_CACHE_DIR/<repo>-<commit>.ckgsnap and
+    mapped read-only (or attached from shared memory), so workers share the same pages.
+    Checkouts without a commit are never cached on disk (see _build_uncached).
+    """
+    if settings.KG_BACKEND in ("sqlite", "snapshot") and not commit:
+        return _build_uncached(root)
+    name = f"{os.path.basename(root)}-{commit[:12]}"
+    if settings.KG_BACKEND == "sqlite":
+        db_path = Path(settings.KG_CACHE_DIR) / f"{name}.sqlite"
+        if not db_path.exists():
+            print(f"Building knowledge graph for {root}...")
+            export_to_sqlite(build_knowledge_graph(root), db_path)
+        return SQLiteCKGRetriever(str(db_path))
+    if settings.KG_BACKEND == "snapshot":
+        snapshot_path = Path(settings.KG_CACHE_DIR) / f"{name}.ckgsnap"
+        if not snapshot_path.exists():
+            print(f"Building knowledge graph for {root}...")
+            write_snapshot(build_knowledge_graph(root), snapshot_path)
+        if settings.KG_SNAPSHOT_SHARED_MEMORY:
+            return SnapshotRetriever.from_shared_memory(f"ckg-{name}", snapshot_path)
+        return SnapshotRetriever.from_file(snapshot_path)
+    print(f"Building knowledge graph for {root}...")
+    return build_knowledge_graph(root)
+
+
+def _build_uncached(root: str) -> Union[SQLiteCKGRetriever, SnapshotRetriever]:
+    """
+    Without a commit the cache file name cannot tell one state of the working tree
+    (or one test bed with the same basename) from another, so the graph is written
+    to a private temporary file that is removed as soon as it is opened.
+    """
+    print(f"Building knowledge graph for {root} (no commit, not cached)...")
+    suffix = ".sqlite" if settings.KG_BACKEND == "sqlite" else ".ckgsnap"
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(root)}-", suffix=suffix)
+    os.close(fd)
+    try:
+        if settings.KG_BACKEND == "sqlite":
+            retriever = SQLiteCKGRetriever(str(export_to_sqlite(build_knowledge_graph(root), tmp_path)))
+        else:
+            retriever = SnapshotRetriever.from_file(write_snapshot(build_knowledge_graph(root), tmp_path))
+    finally:
+        try:
+            os.unlink(tmp_path)  # the open connection / mapping keeps the data
+        except OSError:
+            pass
+    return retriever
 
 
-def truncate_output(text: str, max_chars: int = 8888) -> str:
+# Graphs for every (repo root, commit) seen by this process, LRU-evicted above KG_POOL_MAX_MB
+retriever_pool = RetrieverPool(_build_retriever, max_bytes=settings.KG_POOL_MAX_MB * 2 ** 20)
+
+
+def get_retriever() -> Union[CKGRetriever, SQLiteCKGRetriever, SnapshotRetriever]:
+    """Get (building on first use) the retriever for the current TEST_BED/PROJECT_NAME checkout"""
+    return retriever_pool.get(Path(settings.TEST_BED) / settings.PROJECT_NAME)
+
+
+# retriever -> {budget: repo map} for checkouts without a commit (those have no KG_CACHE_DIR copy).
+# Entries go away with the graph they were rendered from, so the pool's memory ceiling bounds them.
+_repo_maps: "weakref.WeakKeyDictionary[object, dict]" = weakref.WeakKeyDictionary()
+
+
+def get_repo_map(max_tokens: Optional[int] = None) -> str:
     """
-    Truncate text output if it exceeds max_chars limit
+    Ranked map of the current checkout (central files and their most used symbols) within
+    max_tokens (default REPO_MAP_TOKENS). Committed checkouts keep it under KG_CACHE_DIR
+    per repo and commit, so later processes do not need the graph to render it again;
+    uncommitted ones keep it in memory next to their graph.
+    """
+    budget = settings.REPO_MAP_TOKENS if max_tokens is None else max_tokens
+    real_root, commit = retriever_pool.make_key(Path(settings.TEST_BED) / settings.PROJECT_NAME)
+    name = os.path.basename(real_root) + (f"-{commit[:12]}" if commit else "")
+    cache_path = Path(settings.KG_CACHE_DIR) / f"{name}-{budget}.repomap"
+    if commit:
+        try:
+            return cache_path.read_text(encoding="utf-8")
+        except OSError:
+            pass
+
+    retriever = get_retriever()
+    if not commit and budget in _repo_maps.get(retriever, {}):
+        return _repo_maps[retriever][budget]
+    repo_map = render_repo_map(retriever, real_root, fits=lambda text: estimate_tokens(text) <= budget)
+    if commit:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write next to the target and rename, so readers never see a partial map
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, prefix=f"{cache_path.name}.tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(repo_map)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    else:
+        _repo_maps.setdefault(retriever, {})[budget] = repo_map
+    return repo_map
+
+
+# retriever -> FileTree, dropped together with the graph (so the pool's memory ceiling bounds it);
+# the fixer tools keep it current through record_file_write
+_file_trees: "weakref.WeakKeyDictionary[object, FileTree]" = weakref.WeakKeyDictionary()
+
+
+def get_file_tree() -> FileTree:
+    """
+    Directory tree of the current checkout, captured once with the knowledge graph
+    (the file_tree auxiliary index) so listings never walk the filesystem. Graphs
+    loaded from caches written before the index existed are scanned once instead.
+    """
+    retriever = get_retriever()
+    tree = _file_trees.get(retriever)
+    if tree is None:
+        entries = getattr(retriever, "file_tree", None)
+        if not entries:
+            real_root, _ = retriever_pool.make_key(Path(settings.TEST_BED) / settings.PROJECT_NAME)
+            entries = scan_file_tree(real_root, lambda path: (
+                len(retriever.classes_by_file.get(path) or []), len(retriever.methods_by_file.get(path) or [])
+            ))
+        tree = _file_trees.setdefault(retriever, FileTree(entries))
+    return tree
+
+
+def record_file_write(path) -> None:
+    """Record a file created or modified by a fixer tool in the cached directory tree"""
+    root = Path(settings.TEST_BED) / settings.PROJECT_NAME
+    retriever = retriever_pool.peek(root)
+    tree = _file_trees.get(retriever) if retriever is not None else None
+    if tree is None:
+        return
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    rel_path = os.path.relpath(path, root)
+    if not rel_path.startswith(".." + os.sep):
+        tree.update_file(rel_path, size)
+
+
+def truncate_output(text: str, max_tokens: Optional[int] = None) -> str:
+    """
+    Fit text into the calling tool's token budget (TOOL_OUTPUT_TOKEN_BUDGET, per-tool
+    TOOL_OUTPUT_TOKEN_BUDGETS) or max_tokens; the rest stays available through next_page
     """
     if isinstance(text, (list, dict)):
         text = str(text)
+    return paginate(text, budget=max_tokens)
+
+
+def _resolve_project_path(file) -> Tuple[Optional[Path], Optional[str]]:
+    """
+    Convert a relative path to TEST_BED/PROJECT_NAME/<path> and reject absolute
+    paths outside the project. Returns (path, None) or (None, error message).
+    """
+    path_obj = Path(file)
+    base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
+    if not path_obj.is_absolute():
+        return base_path / file, None
+    try:
+        path_obj.relative_to(base_path)
+    except ValueError:
+        return None, f"Error: Absolute path does not start with {base_path}"
+    return path_obj, None
+
+
+def _approximate_path(file) -> Tuple[Optional[Path], str]:
+    """
+    Map a project file path that does not exist (typo, missing or extra directory)
+    onto the file it most likely means. Returns (path, note) when the match is
+    unambiguous, otherwise (None, a "Did you mean" list or "").
+    """
+    resolved, suggestions = get_retriever().resolve_approximate_path(str(file))
+    if resolved:
+        return Path(resolved), f"Note: '{file}' does not exist; using {_relative_to_project(resolved)} instead.\n"
+    if suggestions:
+        return None, "Did you mean:\n" + "\n".join(f"  {_relative_to_project(p)}" for p in suggestions)
+    return None, ""
 
-    if len(text) <= max_chars:
-        return text
 
-    truncated = text[:max_chars]
-    return f"{truncated}\n\n... [输出被截断，原始长度: {len(text)} 字符，显示前 {max_chars} 字符]"
+def _simplify_relationships(relationships: dict, target_file: Optional[str] = None) -> dict:
+    """
+    Keep only name / full_qualified_name / absolute_path / line span of each related entity.
+    Entities in target_file come first, the rest by path and line, so a paged listing
+    starts with the closest ones.
+    """
+    simplified_relationships = {}
+    for rel_type, entities in relationships.items():
+        if not entities:
+            continue
+        ordered = sorted(entities, key=lambda e: (
+            e.get("absolute_path", "") != target_file, e.get("absolute_path") or "", e.get("start_line") or 0
+        ))
+        simplified_relationships[rel_type] = [
+            {
+                "name": entity.get("name", ""),
+                "full_qualified_name": entity.get("full_qualified_name", ""),
+                "absolute_path": entity.get("absolute_path", ""),
+                "start_line": entity.get("start_line", ""),
+                "end_line": entity.get("end_line", ""),
+            }
+            for entity in ordered
+        ]
+    return simplified_relationships
+
+
+def _format_relationships(simplified_relationships: dict) -> List[str]:
+    """One line per related entity, so paging never cuts an entity in half"""
+    lines = []
+    for rel_type, entities in simplified_relationships.items():
+        lines.append(f"{rel_type} ({len(entities)}):")
+        for entity in entities:
+            where = _relative_to_project(entity["absolute_path"]) if entity["absolute_path"] else "?"
+            if entity["start_line"]:
+                where += f":{entity['start_line']}-{entity['end_line']}"
+            lines.append(f"  {entity['full_qualified_name'] or entity['name']}  {where}")
+    return lines
+
+
+def _relationship_section(relationships: Optional[dict], target_file: Optional[str] = None) -> List[str]:
+    """The simplified KEY RELATIONSHIPS block appended after a method body"""
+    simplified_relationships = _simplify_relationships(relationships or {}, target_file)
+    if not simplified_relationships:
+        return []
+    return ["=== KEY RELATIONSHIPS (simplified) ==="] + _format_relationships(simplified_relationships)
+
+
+def _format_method(method) -> str:
+    lines = method.content.split("\n")
+    numbered_content = "\n".join(f"{method.start_line + i:4d}: {line}" for i, line in enumerate(lines))
+    return f"{method.full_qualified_name} (lines {method.start_line}-{method.end_line}):\n{numbered_content}"
 
 
 @tool_registry.register(
     agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
 )
 def extract_complete_method(file, full_qualified_name):
-    # Check if the path is relative and needs to be converted to absolute
-    path_obj = Path(file)
-    if not path_obj.is_absolute():
-        absolute_file = Path(settings.TEST_BED) / settings.PROJECT_NAME / file
-    else:
-        base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        try:
-            path_obj.relative_to(base_path)
-        except ValueError:
-            return f"Error: Absolute path does not start with {base_path}"
-        absolute_file = path_obj
+    absolute_file, error = _resolve_project_path(file)
+    if error:
+        return error
 
     graph_retriever = get_retriever()
     res = graph_retriever.search_method_accurately(str(absolute_file), full_qualified_name)
-    if res is None:
-        return "Method not found! Please check your parameters and try again."
-    method_res = []
+    note = None
+    if not res:
+        # 近似匹配：fqn 的模块前缀写错 / 缺失、名字拼错，或 fqn 正确但文件不对
+        resolved, suggestions = graph_retriever.resolve_approximate_fqn(full_qualified_name, label="Method")
+        if resolved is None:
+            hint = (
+                "\nDid you mean:\n" + "\n".join(
+                    f"  {fqn}  ({_relative_to_project(graph_retriever.methods[fqn]['absolute_path'])})"
+                    for fqn in suggestions
+                )
+                if suggestions else ""
+            )
+            return "Method not found! Please check your parameters and try again." + hint
+        absolute_file = Path(graph_retriever.methods[resolved]["absolute_path"])
+        if resolved != full_qualified_name:
+            note = f"Note: '{full_qualified_name}' not found; showing {resolved} instead."
+        else:
+            note = f"Note: {resolved} is defined in {_relative_to_project(str(absolute_file))}."
+        full_qualified_name = resolved
+        res = graph_retriever.search_method_accurately(str(absolute_file), full_qualified_name)
+    parts = [note] if note else []
     for method in res:
-        lines = method.content.split("\n")
-        numbered_content = "\n".join(
-            f"{method.start_line + i:4d}: {line}" for i, line in enumerate(lines)
-        )
-        method_info = {
-            "content": numbered_content,
-            "start_line": method.start_line,
-            "end_line": method.end_line,
-        }
+        parts.append(_format_method(method))
         try:
-            relationships = graph_retriever.get_relevant_entities(
-                absolute_file, full_qualified_name
-            )
-            if relationships:
-                simplified_relationships = {}
-                for rel_type, entities in relationships.items():
-                    if entities:  
-                        simplified_entities = []
-                        for entity in (
-                            entities
-                        ): 
-                            simple_entity = {
-                                "name": entity.get("name", ""),
-                                "full_qualified_name": entity.get(
-                                    "full_qualified_name", ""
-                                ),
-                                "absolute_path": entity.get("absolute_path", ""),
-                            }
-                            simplified_entities.append(simple_entity)
-
-                        simplified_relationships[rel_type] = simplified_entities
-
-                if simplified_relationships:
-                    method_info["analysis_header"] = (
-                        "=== KEY RELATIONSHIPS (simplified) ==="
-                    )
-                    method_info["relationships"] = simplified_relationships
+            relationships = graph_retriever.get_relevant_entities(absolute_file, full_qualified_name)
+            parts.extend(_relationship_section(relationships, str(absolute_file)))
         except Exception as e:
-            method_info["relationships_note"] = (
-                f"Could not retrieve relationships: {str(e)}"
+            parts.append(f"Could not retrieve relationships: {str(e)}")
+    if not res:
+        parts.append("Check whether your full_qualified_name is named in compliance with the specification.")
+    return truncate_output("\n".join(parts))
+
+
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def get_file_outline(path: str) -> str:
+    """
+    Show a compact skeleton of a file or package: classes (with bases and attributes),
+    functions and methods nested as in the source, with signatures, decorators, one-line
+    docstrings and [start-end] line spans. Use it before reading a file to pick the lines
+    you need; a file of thousands of lines becomes a few hundred tokens.
+
+    :param path: A .py file or a package directory (relative to the project root or absolute).
+    :return: The outline. For a directory, every Python file under it with its classes and functions.
+    """
+    full_path, error = _resolve_project_path(path)
+    if error:
+        return error
+    note = ""
+    if not full_path.exists():
+        full_path, note = _approximate_path(path)
+        if full_path is None:
+            return f"Path {path} does not exist." + (f"\n{note}" if note else "")
+
+    graph_retriever = get_retriever()
+    if full_path.is_dir():
+        prefix = str(full_path).rstrip(os.sep) + os.sep
+        files = sorted(p for p in graph_retriever.path_modules if p.startswith(prefix))
+        if not files:
+            return f"{note}No Python files known under {_relative_to_project(str(full_path))}."
+        out = [f"{note}Outline of package {_relative_to_project(str(full_path))} ({len(files)} files; "
+               "module variables, attributes and nested functions omitted, use get_file_outline on a file for them):"]
+        for file in files:
+            out.append(f"\n{_relative_to_project(file)}")
+            out.extend(f"  {line}" for line in file_outline(graph_retriever, file, detail=False))
+        return truncate_output("\n".join(out))
+
+    try:
+        line_count = file_cache.get(full_path).line_count
+    except OSError as e:
+        return f"File: {full_path}\nError reading file: {str(e)}"
+    lines = file_outline(graph_retriever, str(full_path))
+    header = f"{note}{_relative_to_project(str(full_path))} ({line_count} lines)"
+    if not lines:
+        return f"{header}\nNo classes, functions or module variables found."
+    return truncate_output("\n".join([header] + lines))
+
+
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def extract_methods_batch(targets: List[Tuple[str, str]], max_tokens: Optional[int] = None) -> str:
+    """
+    Extract several methods and their key relationships in one call.
+    Prefer this over calling extract_complete_method repeatedly.
+
+    :param targets: List of [file, full_qualified_name] pairs.
+    :param max_tokens: Total token budget shared evenly by all targets (default: the tool's budget).
+        Sections cut short end with a next_page cursor.
+    :return: One combined result with a section per target.
+    """
+    if not targets:
+        return "No targets given. Pass a list of [file, full_qualified_name] pairs."
+
+    sections = [None] * len(targets)
+    queries = []
+    query_slots = []
+    for i, target in enumerate(targets):
+        if len(target) != 2:
+            sections[i] = f"=== [{i + 1}] {target} ===\nError: expected a [file, full_qualified_name] pair"
+            continue
+        file, full_qualified_name = target
+        absolute_file, error = _resolve_project_path(file)
+        if error:
+            sections[i] = f"=== [{i + 1}] {full_qualified_name} ===\n{error}"
+            continue
+        queries.append((str(absolute_file), full_qualified_name))
+        query_slots.append(i)
+
+    graph_retriever = get_retriever()
+    methods_per_query = graph_retriever.search_methods_many(queries)
+    relationships_per_query = graph_retriever.get_relevant_entities_many(queries)
+
+    share = max((max_tokens or token_budget("extract_methods_batch")) // len(targets), 50)
+    for slot, (absolute_file, full_qualified_name), methods, relationships in zip(
+        query_slots, queries, methods_per_query, relationships_per_query
+    ):
+        header = f"=== [{slot + 1}] {full_qualified_name} ({absolute_file}) ==="
+        if not methods:
+            sections[slot] = (
+                f"{header}\nMethod not found! Check whether your full_qualified_name "
+                "is named in compliance with the specification."
             )
-        method_res.append(method_info)
-    if len(method_res) == 0:
-        method_res.append(
-            "Check whether your full_qualified_name is named in compliance with the specification."
-        )
-    return method_res
+            continue
+        parts = [header] + [_format_method(method) for method in methods]
+        parts.extend(_relationship_section(relationships, absolute_file))
+        sections[slot] = truncate_output("\n".join(parts), share)
+
+    return "\n\n".join(sections)
 
 
 @tool_registry.register(agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER])
@@ -129,7 +426,7 @@ def find_methods_by_name(name: str):
     Find all methods with a specific name across the project and analyze their relationships.
     Returns method implementations with automatic relationship analysis for better understanding.
     :param name: method's name.
-    :return: A List containing method info with relationship analysis.
+    :return: Each method's code followed by its relationships, one related entity per line.
     """
 
     graph_retriever = get_retriever()
@@ -137,68 +434,24 @@ def find_methods_by_name(name: str):
     if res is None:
         return "Method not found! Please check your parameters and try again."
 
-    method_res = []
+    parts = []
     for method in res:
-        # Add line numbers to method content
-        lines = method.content.split("\n")
-        numbered_content = "\n".join(
-            f"{method.start_line + i:4d}: {line}" for i, line in enumerate(lines)
-        )
-
-        method_info = {
-            "absolute_path": method.absolute_path,
-            "full_qualified_name": method.full_qualified_name,
-            "content": numbered_content,
-            "start_line": method.start_line,
-            "end_line": method.end_line,
-        }
-
+        parts.append(f"=== {method.full_qualified_name} ({_relative_to_project(method.absolute_path)}) ===")
+        parts.append(_format_method(method))
         # Automatically get simplified relationships for each method
         try:
-            relationships = graph_retriever.get_relevant_entities(
-                method.absolute_path, method.full_qualified_name
-            )
-            if relationships:
-                # Only include key relationship info, not full details
-                simplified_relationships = {}
-                for rel_type, entities in relationships.items():
-                    if entities:  # Only include non-empty relationships
-                        # Just show entity names and paths, not full content
-                        simplified_entities = []
-                        for entity in (
-                            entities
-                        ):  # Limit to first 3 entities per relationship type
-                            simple_entity = {
-                                "name": entity.get("name", ""),
-                                "full_qualified_name": entity.get(
-                                    "full_qualified_name", ""
-                                ),
-                                "absolute_path": entity.get("absolute_path", ""),
-                            }
-                            simplified_entities.append(simple_entity)
-
-                        simplified_relationships[rel_type] = simplified_entities
-
-                if simplified_relationships:
-                    method_info["analysis_header"] = (
-                        "=== KEY RELATIONSHIPS (simplified) ==="
-                    )
-                    method_info["relationships"] = simplified_relationships
+            relationships = graph_retriever.get_relevant_entities(method.absolute_path, method.full_qualified_name)
+            parts.extend(_relationship_section(relationships, method.absolute_path))
         except Exception as e:
-            method_info["relationships_note"] = (
-                f"Could not retrieve relationships: {str(e)}"
-            )
-
-        method_res.append(method_info)
+            parts.append(f"Could not retrieve relationships: {str(e)}")
+        parts.append("")
 
-    if len(method_res) == 0:
-        method_res.append(
-            "you're searching for could be a variable name, or the function might not be explicitly defined in the visible scope but still exists elsewhere."
+    if not parts:
+        return (
+            "you're searching for could be a variable name, or the function might not be explicitly defined "
+            "in the visible scope but still exists elsewhere."
         )
-
-    # Apply character limit
-    result_str = str(method_res)
-    return truncate_output(result_str)
+    return truncate_output("\n".join(parts).rstrip("\n"))
 
 
 @tool_registry.register(
@@ -218,17 +471,9 @@ def get_code_relationships(file, full_qualified_name):
         INHERITS
         REFERENCES
     """
-    # Check if the path is relative and needs to be converted to absolute
-    path_obj = Path(file)
-    if not path_obj.is_absolute():
-        absolute_file = Path(settings.TEST_BED) / settings.PROJECT_NAME / file
-    else:
-        base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        try:
-            path_obj.relative_to(base_path)
-        except ValueError:
-            return f"Error: Absolute path does not start with {base_path}"
-        absolute_file = path_obj
+    absolute_file, error = _resolve_project_path(file)
+    if error:
+        return error
 
     graph_retriever = get_retriever()
     res = graph_retriever.get_relevant_entities(str(absolute_file), full_qualified_name)
@@ -236,59 +481,42 @@ def get_code_relationships(file, full_qualified_name):
     if not res:
         return res
 
-    # Check total size of result
+    # Check the estimated size of the result against the tool's token budget
     result_str = str(res)
-    MAX_LENGTH = 8000  # characters, ~2000 tokens
+    result_tokens = estimate_tokens(result_str)
 
     # If result is small enough, return as is
-    if len(result_str) <= MAX_LENGTH:
+    if result_tokens <= token_budget("get_code_relationships"):
         return res
 
     # If too large, simplify by removing content fields
-    simplified_res = {}
-    for rel_type, entities in res.items():
-        if not entities:
-            continue
-
-        simplified_entities = []
-        for entity in entities:
-            # Only keep essential metadata, remove 'content' field
-            simple_entity = {
-                "name": entity.get("name", ""),
-                "full_qualified_name": entity.get("full_qualified_name", ""),
-                "absolute_path": entity.get("absolute_path", ""),
-                "start_line": entity.get("start_line", ""),
-                "end_line": entity.get("end_line", ""),
-                # 'content' field removed to save tokens
-            }
-            simplified_entities.append(simple_entity)
-
-        simplified_res[rel_type] = simplified_entities
-
-    # Add a note that content was simplified
+    simplified_res = _simplify_relationships(res, str(absolute_file))
     simplified_res["_note"] = (
-        f"Result simplified due to size ({len(result_str)} chars). Use read_file_lines or extract_complete_method to view content."
+        f"Result simplified due to size (~{result_tokens} tokens). Use read_file_lines or extract_complete_method to view content."
     )
 
+    # Still too large: page the listing, one entity per line, instead of dropping relationships
+    if estimate_tokens(str(simplified_res)) > token_budget("get_code_relationships"):
+        note = simplified_res.pop("_note")
+        return truncate_output("\n".join([note] + _format_relationships(simplified_res)))
     return simplified_res
 
 
 @tool_registry.register(agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER])
 def analyze_file_structure(file):
-    # Check if the path is relative and needs to be converted to absolute
-    path_obj = Path(file)
-    if not path_obj.is_absolute():
-        absolute_file = Path(settings.TEST_BED) / settings.PROJECT_NAME / file
-    else:
-        base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        try:
-            path_obj.relative_to(base_path)
-        except ValueError:
-            return f"Error: Absolute path does not start with {base_path}"
-        absolute_file = path_obj
+    absolute_file, error = _resolve_project_path(file)
+    if error:
+        return error
     graph_retriever = get_retriever()
     classes, methods = graph_retriever.read_all_classes_and_methods(str(absolute_file))
-    res = "Each line below indicates a class, including class_name and absolute_path:\n"
+    note = ""
+    if not classes and not methods and not absolute_file.exists():
+        approximate, note = _approximate_path(file)
+        if approximate is None:
+            return f"File {file} does not exist." + (f"\n{note}" if note else "")
+        absolute_file = approximate
+        classes, methods = graph_retriever.read_all_classes_and_methods(str(absolute_file))
+    res = note + "Each line below indicates a class, including class_name and absolute_path:\n"
     res += "\n".join(f"{i.name} {i.absolute_path}" for i in classes)
     res += "\nEach line below indicates a method, including method_name, full_qualifie_ name and param list:\n"
     for method in methods:
@@ -322,6 +550,269 @@ def find_class_constructor(class_name: str):
     return res_str
 
 
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def get_class_hierarchy(class_name: str) -> str:
+    """
+    Show the inheritance hierarchy of a class: direct bases, approximate MRO,
+    direct subclasses and all transitive subclasses.
+
+    :param class_name: Class name or full qualified name (e.g. package.module.ClassName).
+    :return: A formatted description of the hierarchy of each matching class.
+    """
+    graph_retriever = get_retriever()
+    if class_name in graph_retriever.classes:
+        class_fqns = [class_name]
+    else:
+        class_fqns = [
+            c["full_qualified_name"]
+            for c in graph_retriever.classes_by_name.get(class_name.split(".")[-1], [])
+        ]
+    if not class_fqns:
+        return f"No class named '{class_name}' found."
+
+    def describe(fqn):
+        cls = graph_retriever.classes.get(fqn)
+        if cls is None:
+            return f"{fqn} (external)"
+        return f"{fqn}  {cls['absolute_path']}:{cls['start_line']}-{cls['end_line']}"
+
+    out = []
+    for fqn in class_fqns:
+        subclasses = graph_retriever.class_subclasses.get(fqn, [])
+        descendants = graph_retriever.get_class_descendants(fqn)
+        out.append(f"=== {describe(fqn)} ===")
+        out.append("Bases:\n" + ("\n".join(f"  {describe(b)}" for b in graph_retriever.get_class_bases(fqn)) or "  (none)"))
+        out.append("MRO:\n  " + " -> ".join(graph_retriever.get_class_mro(fqn)))
+        out.append("Direct subclasses:\n" + ("\n".join(f"  {describe(c)}" for c in subclasses) or "  (none)"))
+        indirect = [d for d in descendants if d not in subclasses]
+        if indirect:
+            out.append("Indirect subclasses:\n" + "\n".join(f"  {describe(d)}" for d in indirect))
+        out.append("")
+    return truncate_output("\n".join(out))
+
+
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def find_method_overrides(full_qualified_name: str) -> str:
+    """
+    Find the versions of a method in the ancestors (methods it overrides) and
+    in the descendants (methods that override it) of its class.
+
+    :param full_qualified_name: Full qualified name of the method, like package.module.ClassName.method_name
+    :return: Overridden and overriding methods with file paths and line spans.
+    """
+    graph_retriever = get_retriever()
+    if full_qualified_name not in graph_retriever.methods:
+        return f"Method '{full_qualified_name}' not found. Use the full qualified name of a class method."
+    overrides = graph_retriever.get_method_overrides(full_qualified_name)
+
+    def describe(fqn):
+        method = graph_retriever.methods[fqn]
+        return f"  {fqn}  {method['absolute_path']}:{method['start_line']}-{method['end_line']}"
+
+    out = []
+    for title, key in (
+        ("Overrides (ancestor versions, nearest first):", "overrides"),
+        ("Overridden by (descendant versions):", "overridden_by"),
+    ):
+        out.append(title)
+        out.extend(describe(f) for f in overrides[key])
+        if not overrides[key]:
+            out.append("  (none)")
+    return truncate_output("\n".join(out))
+
+
+# Lines of a definition shown inline by go_to_definition
+DEFINITION_PREVIEW_LINES = 30
+
+
+def _source_line(path: str, line: int) -> str:
+    """One line of a file on disk (re-read if the file changed since the last call)"""
+    try:
+        return file_cache.get(path).line(line)
+    except OSError:
+        return ""
+
+
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def go_to_definition(file_path: str, line: int, identifier: str) -> str:
+    """
+    Jump from a name you see in the code to where it is defined, in one call.
+    Resolves local variables and parameters, imports (including aliases, relative
+    imports and package re-exports), module attributes like mod.func, self./cls.
+    attributes through the class hierarchy, and methods called on instances
+    created in the same function (x = Foo(); x.bar()).
+
+    :param file_path: File in which the name appears (relative to the project root or absolute).
+    :param line: Line number where the name appears (nearby lines are tried if it is not on that exact line).
+    :param identifier: The name, or the dotted expression ending with it, e.g. "radius", "self.radius", "np.array".
+    :return: The definition(s) with path, line span and code, or a note if it cannot be resolved.
+    """
+    absolute_file, error = _resolve_project_path(file_path)
+    if error:
+        return error
+
+    graph_retriever = get_retriever()
+    definitions = graph_retriever.go_to_definition(str(absolute_file), int(line), identifier)
+    if not definitions:
+        return (
+            f"No occurrence of '{identifier}' found at {file_path}:{line}. "
+            "Check the line number with read_file_lines."
+        )
+
+    out = []
+    for d in definitions:
+        where = f"'{identifier}' at line {d['line']}"
+        if d["kind"] == "entity":
+            entity = d["entity"]
+            start, end = entity.get("start_line", 0), entity.get("end_line", 0)
+            lines = (entity.get("content") or "").split("\n")
+            numbered = "\n".join(
+                f"{start + i:4d}: {text}" for i, text in enumerate(lines[:DEFINITION_PREVIEW_LINES])
+            )
+            if len(lines) > DEFINITION_PREVIEW_LINES:
+                numbered += f"\n      ... {len(lines) - DEFINITION_PREVIEW_LINES} more lines (use read_file_lines)"
+            out.append(
+                f"{where} -> {d['label']} {d['target']}\n"
+                f"  {d['path']}:{start}-{end}\n{numbered}"
+            )
+        elif d["kind"] == "module":
+            out.append(f"{where} -> Module {d['target']}\n  {d['path']}")
+        elif d["kind"] in ("attribute", "local"):
+            what = f"Attribute {d['target']} (first assigned here)" if d["kind"] == "attribute" \
+                else "local name / import in this file"
+            out.append(
+                f"{where} -> {what}\n"
+                f"  {d['path']}:{d['def_line']}\n"
+                f"{d['def_line']:4d}: {_source_line(d['path'], d['def_line'])}"
+            )
+        else:
+            out.append(
+                f"{where} could not be resolved statically "
+                "(builtin, external library object or dynamically created attribute)."
+            )
+    return truncate_output("\n\n".join(out))
+
+
+# Usage sites listed per find_usages page
+USAGES_PAGE_SIZE = 50
+
+
+def _relative_to_project(path: str) -> str:
+    try:
+        return Path(path).relative_to(Path(settings.TEST_BED) / settings.PROJECT_NAME).as_posix()
+    except ValueError:
+        return path
+
+
+def _format_usages(usages: List[dict]) -> List[str]:
+    return [
+        f"  {_relative_to_project(u['path'])}:{u['line']}:{u['col']}"
+        + (" [write]" if u["is_store"] else "")
+        + (f"  in {u['container']}" if u["container"] else "")
+        + f"\n      {_source_line(u['path'], u['line']).strip()}"
+        for u in usages
+    ]
+
+
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def find_usages(full_qualified_name: str, page: int = 1) -> str:
+    """
+    Find every place in the project where a class, method, function, module
+    variable, instance attribute (ClassFqn.attr, e.g. pkg.mod.Circle.radius) or
+    module is used, resolved through imports, aliases and self./instance access
+    (not a textual search, so unrelated names that merely look the same are not listed).
+
+    :param full_qualified_name: Full qualified name of the entity; a bare name lists the matching entities.
+    :param page: Page number; each page shows 50 usage sites with their enclosing method or class.
+    :return: Usage sites as path:line:col with the enclosing entity and the source line.
+    """
+    graph_retriever = get_retriever()
+    usages = graph_retriever.find_usages(full_qualified_name)
+    if not usages:
+        known = (
+            graph_retriever.find_entity(full_qualified_name) is not None
+            or full_qualified_name in graph_retriever.modules
+        )
+        if known:
+            return f"No usages of {full_qualified_name} found in the project."
+        name = full_qualified_name.split(".")[-1]
+        candidates = [
+            e["full_qualified_name"]
+            for by_name in (graph_retriever.classes_by_name, graph_retriever.methods_by_name, graph_retriever.variables_by_name)
+            for e in by_name.get(name, []) or []
+        ]
+        if not candidates:
+            return f"No entity named '{full_qualified_name}' found."
+        return (
+            f"'{full_qualified_name}' is not a full qualified name with usages. Candidates:\n"
+            + "\n".join(f"  {fqn}" for fqn in candidates[:30])
+        )
+
+    pages = (len(usages) + USAGES_PAGE_SIZE - 1) // USAGES_PAGE_SIZE
+    page = min(max(1, int(page)), pages)
+    shown = usages[(page - 1) * USAGES_PAGE_SIZE:page * USAGES_PAGE_SIZE]
+    header = f"{len(usages)} usages of {full_qualified_name} (page {page}/{pages}):"
+    footer = [f"Call find_usages again with page={page + 1} for more."] if page < pages else []
+    return truncate_output("\n".join([header] + _format_usages(shown) + footer))
+
+
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def get_module_dependencies(module_or_file: str, direction: str = "both", transitive: bool = False) -> str:
+    """
+    Show the resolved import graph around a module: the project modules it imports,
+    the external packages it uses, and the modules that import it. With
+    transitive=True the full closure is listed with its depth, e.g. every module
+    that (indirectly) depends on the file you are about to change.
+
+    :param module_or_file: File path (relative to the project root or absolute) or dotted module name, e.g. "pkg/io.py" or "pkg.io".
+    :param direction: "imports", "imported_by" or "both".
+    :param transitive: Follow imports transitively instead of listing only direct ones.
+    :return: The dependencies with file paths and import line numbers.
+    """
+    if direction not in ("imports", "imported_by", "both"):
+        return 'Error: direction must be "imports", "imported_by" or "both".'
+    graph_retriever = get_retriever()
+    module = None
+    if module_or_file.endswith(".py") or "/" in module_or_file:
+        absolute_file, error = _resolve_project_path(module_or_file)
+        if error:
+            return error
+        module = graph_retriever.resolve_module(str(absolute_file))
+    if module is None:
+        module = graph_retriever.resolve_module(module_or_file)
+    if module is None:
+        return f"No module '{module_or_file}' found in the knowledge graph."
+
+    def describe(dep):
+        where = f"line {dep['line']}" + (f" of {dep['via']}" if dep["via"] != module else "")
+        depth = f"[depth {dep['depth']}] " if transitive else ""
+        return f"  {depth}{dep['module']}  {_relative_to_project(dep['path'] or '')}  ({where})"
+
+    info = graph_retriever.modules.get(module) or {}
+    out = [f"Module {module}  {_relative_to_project(info.get('path') or '')}"]
+    for reverse, title in ((False, "Imports"), (True, "Imported by")):
+        if direction == ("imported_by" if not reverse else "imports"):
+            continue
+        deps = graph_retriever.get_module_dependencies(module, reverse=reverse, transitive=transitive)
+        label = f"{title} ({len(deps)}{', transitive' if transitive else ''}):"
+        out.append(label + ("" if deps else " none"))
+        out.extend(describe(dep) for dep in deps)
+        if not reverse:
+            external = graph_retriever.external_imports.get(module) or []
+            out.append("External packages: " + (", ".join(external) if external else "none"))
+    return truncate_output("\n".join(out))
+
+
 @tool_registry.register(
     agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
 )
@@ -330,23 +821,16 @@ def find_variable_usage(
     variable_name: str,
 ):
     """
-    Searches through the knowledge graph and return variables of certain name in the given file.
+    Searches through the knowledge graph and return variables of certain name in the given file,
+    each with the places in the project where it is used.
 
     :param file: path of the file
     :param variable_name: name of the variable to search
-    :return: a string of variable info.
+    :return: a string of variable info and usage sites.
     """
-    # Check if the path is relative and needs to be converted to absolute
-    path_obj = Path(file)
-    if not path_obj.is_absolute():
-        absolute_file = Path(settings.TEST_BED) / settings.PROJECT_NAME / file
-    else:
-        base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        try:
-            path_obj.relative_to(base_path)
-        except ValueError:
-            return f"Error: Absolute path does not start with {base_path}"
-        absolute_file = path_obj
+    absolute_file, error = _resolve_project_path(file)
+    if error:
+        return error
 
     graph_retriever = get_retriever()
     res = graph_retriever.search_variable_query(str(absolute_file), variable_name)
@@ -358,11 +842,17 @@ def find_variable_usage(
             numbered_content = "\n".join(
                 f"{v.start_line + i:4d}: {line}" for i, line in enumerate(lines)
             )
-            res_str += f"abs_path:{v.absolute_path}\ncontent:\n{numbered_content}\nstart line:{v.start_line}\nend line:{v.end_line}\n\n"
+            res_str += f"abs_path:{v.absolute_path}\ncontent:\n{numbered_content}\nstart line:{v.start_line}\nend line:{v.end_line}\n"
         else:
-            res_str += f"abs_path:{v.absolute_path}\ncontent:{v.content}\nstart line:{v.start_line}\nend line:{v.end_line}\n\n"
+            res_str += f"abs_path:{v.absolute_path}\ncontent:{v.content}\nstart line:{v.start_line}\nend line:{v.end_line}\n"
+        usages = graph_retriever.find_usages(v.full_qualified_name)
+        if usages:
+            shown = usages[:USAGES_PAGE_SIZE]
+            res_str += f"usages ({len(usages)}{', use find_usages for all' if len(shown) < len(usages) else ''}):\n"
+            res_str += "\n".join(_format_usages(shown)) + "\n"
+        res_str += "\n"
     return (
-        res_str
+        truncate_output(res_str)
         if res_str != ""
         else "No variable found.The variable might be in the __init__ function or it might be a method or a class name."
     )
@@ -371,60 +861,138 @@ def find_variable_usage(
 @tool_registry.register(
     agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
 )
-def list_class_attributes(class_name: str) -> str:
+def list_class_attributes(class_name: str, include_inherited: bool = True) -> str:
     """
-    Searches through the knowledge graph and return field variables info of the class given, including name, data type and content.
-
-    :param class_name: Name of the class to search for
-    :return: a string of variable info.
+    List the attributes of a class: class-level variables and instance attributes
+    assigned through self.x = ... in its methods. Each attribute shows its data type
+    (annotation, or inferred from the assigned value), the method that defines it,
+    every method that assigns it with line spans, and the defining statement.
+
+    :param class_name: Class name or full qualified name (e.g. package.module.ClassName).
+    :param include_inherited: Also list attributes declared by project base classes.
+    :return: a string of attribute info for each matching class.
     """
-    if "." in class_name:
-        class_name = class_name.split(".")[-1]
     graph_retriever = get_retriever()
-    res = graph_retriever.search_field_variables_of_class(class_name)
-    res_str = ""
-    if len(res) == 0:
-        return "No field variable found!"
-    res_str += f"Each line below indicates a variable inside the class {class_name}, including its name, full qualified name, data type and content\n"
-    for variable in res:
-        res_str += f"{variable.name}  {variable.full_qualified_name}  {variable.data_type}  {variable.content}\n"
-    return res_str
+    if class_name in graph_retriever.classes:
+        class_fqns = [class_name]
+    else:
+        class_fqns = [
+            c["full_qualified_name"]
+            for c in graph_retriever.classes_by_name.get(class_name.split(".")[-1], [])
+        ]
+    if not class_fqns:
+        return f"No class named '{class_name}' found."
+
+    def method_name(fqn):
+        return fqn.rsplit(".", 1)[-1] if fqn else "?"
+
+    out = []
+    for fqn in class_fqns:
+        cls = graph_retriever.classes[fqn]
+        attributes = graph_retriever.get_class_attributes(fqn, inherited=include_inherited)
+        out.append(f"=== {fqn}  {cls['absolute_path']}:{cls['start_line']}-{cls['end_line']} ===")
+        if not attributes:
+            out.append("No field variable found!\n")
+            continue
+        for kind, title in (("instance", "Instance attributes (self.x)"), ("class", "Class attributes")):
+            group = [a for a in attributes if a["kind"] == kind]
+            if not group:
+                continue
+            out.append(f"{title}:")
+            for attr in group:
+                line = f"  {attr['name']}: {attr.get('data_type') or 'unknown'}"
+                if kind == "instance":
+                    line += f"  defined in {method_name(attr.get('defined_in'))} (line {attr['start_line']})"
+                    sites = ", ".join(
+                        f"{method_name(method)} ({start}-{end})" if end != start else f"{method_name(method)} ({start})"
+                        for start, end, method in attr.get("assignments", [])
+                    )
+                    line += f"; assigned in {sites}"
+                else:
+                    line += f"  line {attr['start_line']}"
+                if attr["declared_in"] != fqn:
+                    line += f"  (inherited from {attr['declared_in']})"
+                out.append(line)
+                out.append(f"      {attr['content'].strip().splitlines()[0] if attr['content'].strip() else ''}")
+        out.append("")
+    return truncate_output("\n".join(out))
+
+
+def _format_import(imp: dict) -> str:
+    """One resolved import (see retriever.symbols.build_file_imports) as a listing line"""
+    target, alias = imp["target"], imp["alias"]
+    if alias == "*":
+        name = f"{target}.*"
+    elif alias in (target.rsplit(".", 1)[-1], target.split(".")[0]):
+        name = target
+    else:
+        name = f"{target} as {alias}"
+    where = _relative_to_project(imp["path"]) if imp["path"] else ""
+    kind = imp["kind"]
+    if kind == "entity":
+        resolved = f"{imp['label']} {imp['fqn']}  {where}:{imp['start_line']}-{imp['end_line']}"
+    elif kind == "module":
+        resolved = f"module {imp['fqn']}  {where}"
+    elif kind == "attribute":
+        resolved = f"attribute {imp['fqn']}  {where}:{imp['start_line']}"
+    elif kind == "unresolved":
+        resolved = f"not found in project module {imp['fqn']}  {where}"
+    else:
+        resolved = f"external ({target.split('.')[0] or target})"
+    return f"{imp['line']:4d}: {name}" + ("  [inside a function/class]" if imp["local"] else "") + f"  -> {resolved}"
+
+
+def _parse_imports(text: str) -> List[str]:
+    """Import statements of a file outside the knowledge graph, unresolved"""
+    lines = []
+    for node in ast.walk(ast.parse(text)):
+        if isinstance(node, ast.Import):
+            names = [a.name + (f" as {a.asname}" if a.asname else "") for a in node.names]
+            lines.append((node.lineno, f"import {', '.join(names)}"))
+        elif isinstance(node, ast.ImportFrom):
+            names = [a.name + (f" as {a.asname}" if a.asname else "") for a in node.names]
+            lines.append((node.lineno, f"from {'.' * node.level}{node.module or ''} import {', '.join(names)}"))
+    return [f"{line:4d}: {statement}" for line, statement in sorted(lines)]
 
 
 @tool_registry.register(agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER])
-def show_file_imports(python_file_path):
+def show_file_imports(python_file_path: str) -> str:
     """
-    Get all import information of the given Python file.
+    List the imports of a Python file, each imported name resolved to what it refers to:
+    the project class / function / variable (with its file and line span), a project
+    module, or an external package. Includes imports spread over several lines, imports
+    under if/try and imports inside functions.
 
-    :param python_file_path: The path to the Python file
-    :return: Import lines inside the Python file
+    :param python_file_path: The path to the Python file (relative to the project root or absolute)
+    :return: One line per imported name: line number, name, and the resolved target
     """
-    # Check if the path is relative and needs to be converted to absolute
-    path_obj = Path(python_file_path)
-    if not path_obj.is_absolute():
-        full_path = Path(settings.TEST_BED) / settings.PROJECT_NAME / python_file_path
-    else:
-        base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        try:
-            path_obj.relative_to(base_path)
-        except ValueError:
-            return f"Error: Absolute path does not start with {base_path}"
-        full_path = path_obj
-
-    try:
-        with open(full_path, "r", encoding="utf-8") as file:
-            content = file.read()
+    full_path, error = _resolve_project_path(python_file_path)
+    if error:
+        return error
+    note = ""
+    if not full_path.exists():
+        full_path, note = _approximate_path(python_file_path)
+        if full_path is None:
+            return f"File {python_file_path} does not exist." + (f"\n{note}" if note else "")
 
-        import_pattern = r"^\s*(?:import|from)\s+.*?(?:;|\n)"
-        imports = re.findall(import_pattern, content, re.MULTILINE)
+    graph_retriever = get_retriever()
+    path = str(full_path)
+    if path not in graph_retriever.path_modules:
+        # Not part of the graph (e.g. created after it was built): list the statements without resolving them
+        try:
+            lines = _parse_imports(file_cache.get(full_path).text)
+        except (OSError, SyntaxError, ValueError) as e:
+            return f"File: {full_path}\nError parsing file: {str(e)}"
+        header = f"{note}Imports of {_relative_to_project(path)} (not in the knowledge graph, names not resolved):"
+        return truncate_output("\n".join([header] + lines)) if lines else f"{note}No imports in {_relative_to_project(path)}."
 
-        return imports
-    except FileNotFoundError:
-        print(f"Error:file {full_path} not found。")
-        return []
-    except Exception as e:
-        print(f"Uknown error:{e}")
-        return []
+    imports = graph_retriever.file_imports.get(path) or []
+    if not imports:
+        return f"{note}No imports in {_relative_to_project(path)}."
+    external = sum(1 for imp in imports if imp["kind"] == "external")
+    header = (f"{note}Imports of {_relative_to_project(path)} ({len(imports)} name{'' if len(imports) == 1 else 's'}: "
+              f"{len(imports) - external} project, {external} external):")
+    return truncate_output("\n".join([header] + [_format_import(imp) for imp in imports]))
 
 
 @tool_registry.register(
@@ -435,7 +1003,7 @@ def find_files_containing(keyword):
     Searches through the knowledge graph and return those files'content containing the keyword.
 
     :param keyword: The keyword in file to search for.
-    :return: A list of python files (containing the keyword.) and keyword's full qualified name
+    :return: A list of python files containing the keyword, most relevant first
     """
     graph_retriever = get_retriever()
     res = graph_retriever.search_file_by_keyword(keyword)
@@ -444,12 +1012,97 @@ def find_files_containing(keyword):
     return res
 
 
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def search_entities(query: str, top_k: int = 10, kind: str = "") -> str:
+    """
+    Ranked (BM25) search over classes, methods and module variables by name,
+    signature, docstring and code. Identifiers are split on camelCase and
+    snake_case, so "parse header" also matches parseHeader and parse_header.
+
+    :param query: Free text or identifiers to search for.
+    :param top_k: Number of results to return (default 10).
+    :param kind: Optional filter: "Class", "Method" or "Variable".
+    :return: The top entities with scores, paths and line spans.
+    """
+    label = kind.capitalize() if kind else None
+    if label and label not in ("Class", "Method", "Variable"):
+        return f"Unknown kind '{kind}'. Use Class, Method or Variable."
+
+    graph_retriever = get_retriever()
+    hits = graph_retriever.search_entities_ranked(query, top_k=max(1, top_k), label=label)
+    if not hits:
+        return f"No entity matches '{query}'."
+
+    lines = [f"Top {len(hits)} entities for '{query}':"]
+    for hit_label, entity, score in hits:
+        summary = entity.get("signature") or (f"class {entity['name']}" if hit_label == "Class" else "")
+        docstring = (entity.get("docstring") or "").strip()
+        if docstring:
+            summary = f"{summary}  # {docstring.splitlines()[0]}".strip()
+        lines.append(
+            f"{score:6.2f}  {hit_label:<8} {entity['full_qualified_name']}  "
+            f"{entity['absolute_path']}:{entity.get('start_line', 0)}-{entity.get('end_line', 0)}"
+            + (f"\n        {summary}" if summary else "")
+        )
+    return truncate_output("\n".join(lines))
+
+
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def run_graph_query(query: str, limit: int = 50) -> str:
+    """
+    Runs a Cypher-like query over the code knowledge graph, so compound lookups
+    take one call instead of several tool round trips.
+
+    Supported subset:
+      MATCH (a:Method {name: "save"})<-[:CALLS*1..2]-(b) WHERE b.path CONTAINS "views" RETURN DISTINCT b.fqn LIMIT 20
+    - Labels: Class, Method, Variable
+    - Relationships: CALLS, REFERENCES, HAS_METHOD, HAS_VARIABLE, BELONGS_TO, INHERITS, TESTED_BY;
+      -> / <- / undirected, alternatives [:CALLS|REFERENCES], path length *, *2, *1..3 (at most 5 hops)
+    - WHERE: =, <>, <, >, <=, >=, CONTAINS, STARTS WITH, ENDS WITH, IN [..], =~ regex, IS [NOT] NULL, AND/OR/NOT
+    - Properties: name, fqn, path, start_line, end_line, class_name, signature, docstring, content, label
+
+    :param query: The query text.
+    :param limit: Maximum number of rows to show (default 50); a smaller LIMIT in the query wins.
+    :return: One line per result row, or an error message explaining the syntax problem.
+    """
+    graph_retriever = get_retriever()
+    try:
+        # One row past the limit tells whether the listing was cut
+        rows = graph_retriever.run_query(query, limit=max(1, limit) + 1)
+    except QueryError as e:
+        return f"Query error: {e}"
+    if not rows:
+        return "No results."
+
+    shown = rows[:max(1, limit)]
+    lines = [
+        (f"More than {len(shown)} rows (showing first {len(shown)}; raise limit or narrow the query)"
+         if len(shown) < len(rows) else f"{len(rows)} rows") + ":"
+    ]
+    for row in shown:
+        cells = []
+        for key, value in row.items():
+            if isinstance(value, dict):
+                value = (
+                    f"{value['label']} {value['full_qualified_name']} "
+                    f"{value['absolute_path']}:{value.get('start_line', 0)}-{value.get('end_line', 0)}"
+                )
+            cells.append(f"{key}={value}")
+        lines.append("  " + " | ".join(cells))
+    return truncate_output("\n".join(lines))
+
+
 @tool_registry.register(
     agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
 )
 def find_all_variables_named(variable_name: str) -> str:
     """
     Searches through the knowledge graph for all variables matching the given name.
+    This lists definitions only; use find_usages on a result to see where it is used.
 
     :param variable_name: name (or part of the fully‐qualified name) of the variable to search for
     :return: a formatted string of all matching variable nodes, or "No variable found."
@@ -484,36 +1137,42 @@ def find_all_variables_named(variable_name: str) -> str:
     return truncate_output(result)
 
 
-# @tool
-# def search_test_cases_by_method(full_qualified_name: str) -> str:
-#     """
-#     Searches through the knowledge graph for all test‐case nodes that the given method tests.
-#
-#     :param full_qualified_name: the fully‐qualified name of the method under test
-#     :return: a formatted string of all test case nodes reached by a TESTED relationship,
-#              or "No test case found." if none.
-#     """
-
-#     test_cases = graph_retriever.search_test_cases_by_method_query(full_qualified_name)
-#     if not test_cases:
-#         return "No test function was found; it is possible that this function has not been tested yet."
-
-#     lines = []
-#     for tc in test_cases:
-#         # Add line numbers to test case content
-#         content_lines = tc.content.split('\n')
-#         numbered_content = '\n'.join(f"{tc.start_line + i:4d}: {line}" for i, line in enumerate(content_lines))
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def find_tests_for_entity(full_qualified_name: str) -> str:
+    """
+    Find the test functions that call or reference a method or class, using the
+    test index built together with the knowledge graph.
 
-#         lines.append(
-#             f"abs_path: {tc.absolute_path}\n"
-#             f"name: {tc.name}\n"
-#             f"content:\n{numbered_content}\n"
-#             f"start line: {tc.start_line}\n"
-#             f"end line: {tc.end_line}\n"
-#         )
+    :param full_qualified_name: the fully-qualified name of the method or class under test
+    :return: a formatted string of test functions with their pytest node ids,
+             or a note if no test was found.
+    """
+    graph_retriever = get_retriever()
+    test_cases = graph_retriever.search_test_cases_by_method_query(full_qualified_name)
+    if not test_cases:
+        return "No test function was found; it is possible that this function has not been tested yet."
+
+    lines = [f"Found {len(test_cases)} test functions for {full_qualified_name}:"]
+    for tc in test_cases:
+        rel_path = _relative_to_project(tc.absolute_path)
+        # module.Class.test_x -> path::Class::test_x
+        module_prefix = rel_path[:-3].replace("/", ".") if rel_path.endswith(".py") else ""
+        nested = tc.full_qualified_name
+        if module_prefix and nested.startswith(module_prefix + "."):
+            nested = nested[len(module_prefix) + 1:]
+        node_id = "::".join([rel_path] + nested.split("."))
+        lines.append(
+            f"node_id: {node_id}\n"
+            f"abs_path: {tc.absolute_path}\n"
+            f"full_qualified_name: {tc.full_qualified_name}\n"
+            f"start line: {tc.start_line}\n"
+            f"end line: {tc.end_line}\n"
+        )
 
-#     result = "\n".join(lines)
-#     return truncate_output(result)
+    result = "\n".join(lines)
+    return truncate_output(result)
 
 
 def _browse_structure(dir_path: str, prefix: str = "") -> str:
@@ -554,46 +1213,39 @@ def _browse_structure(dir_path: str, prefix: str = "") -> str:
 @tool_registry.register(
     agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
 )
-def explore_directory(dir_path: str, prefix: str = "") -> str:
+def explore_directory(dir_path: str, depth: int = 1) -> str:
     """
-    Generate a simple listing of the immediate contents of dir_path (one level only), ignoring .git directories.
+    List the contents of dir_path down to depth levels, ignoring .git and __pycache__.
+    Directories show their file count, total size and number of Python classes and
+    functions; files show their size and entity counts.
 
-    :param dir_path: Path to the root directory
-    :param prefix: Internal use for line prefixing (not used in single-level mode)
+    :param dir_path: Path to the directory (relative to the project root, or absolute)
+    :param depth: Number of levels to expand (default 1: immediate contents only)
     :return: A string representing the directory contents
     """
-    # Check if the path is relative and needs to be converted to absolute
-    path_obj = Path(dir_path)
-    if not path_obj.is_absolute():
-        final_path = Path(settings.TEST_BED) / settings.PROJECT_NAME / dir_path
-    else:
-        base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        try:
-            path_obj.relative_to(base_path)
-        except ValueError:
-            return f"Error: Absolute path does not start with {base_path}"
-        final_path = path_obj
-
-    if not os.path.exists(final_path):
-        return f'Directory "{final_path}" does not exist.'
+    final_path, error = _resolve_project_path(dir_path)
+    if error:
+        return error
+    base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
 
     try:
-        entries = sorted(e for e in os.listdir(final_path) if e != ".git")
-        if not entries:
-            return f'Directory "{final_path}" is empty.'
-
-        result = f"Contents of {final_path}:\n"
-        for entry in entries:
-            path = os.path.join(final_path, entry)
-            if os.path.isdir(path):
-                result += f"{entry}/\n"
-            else:
-                result += f"{entry}\n"
-        return result
-    except PermissionError:
-        return f'Permission denied accessing directory "{final_path}".'
+        tree = get_file_tree()
     except Exception as e:
         return f'Error reading directory "{final_path}": {str(e)}'
+    rel_dir = os.path.relpath(final_path, base_path)
+    if rel_dir == ".." or rel_dir.startswith(".." + os.sep):
+        return f"Error: Path {final_path} is outside {base_path}"
+    if not tree.has_dir(rel_dir):
+        if tree.has_file(rel_dir):
+            return f'"{final_path}" is a file, not a directory.'
+        return f'Directory "{final_path}" does not exist.'
+
+    lines = tree.render(rel_dir, depth=max(1, depth))
+    if not lines:
+        return f'Directory "{final_path}" is empty.'
+    files, size, classes, functions = tree.totals(rel_dir)
+    header = f"Contents of {final_path} ({describe_totals(files, size, classes, functions)}):"
+    return truncate_output(header + "\n" + "\n".join(lines))
 
 
 @tool_registry.register(agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER])
@@ -608,156 +1260,310 @@ def read_file_lines(file_path: str, start_line: int, end_line: int) -> str:
     :param end_line: Ending line number
     :return: Formatted string containing file info and content
     """
-    # Check if the path is relative and needs to be converted to absolute
-    path_obj = Path(file_path)
-    if not path_obj.is_absolute():
-        full_path = Path(settings.TEST_BED) / settings.PROJECT_NAME / file_path
-    else:
-        base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        try:
-            path_obj.relative_to(base_path)
-        except ValueError:
-            return f"Error: Absolute path does not start with {base_path}"
-        full_path = path_obj
+    full_path, error = _resolve_project_path(file_path)
+    if error:
+        return error
+
+    note = ""
+    if not full_path.exists():
+        approximate, note = _approximate_path(file_path)
+        if approximate is None:
+            return f"File: {full_path}\nError: file does not exist" + (f"\n{note}" if note else "")
+        full_path = approximate
 
     # Adjust start line (ensure it's at least 1)
     adjusted_start = max(1, start_line)
-    adjusted_end = end_line
-    total_lines = 0
-    content_lines = []
 
     try:
-        # First pass: count total lines in file
-        with open(full_path, "r", encoding="utf-8", errors="replace") as f:
-            for total_lines, _ in enumerate(f, 1):
-                pass
-
-        # Handle invalid line range
-        if total_lines == 0 or adjusted_start > total_lines:
-            return f"File: {full_path}\nTotal lines: {total_lines}\nError: Invalid line range"
-
-        # Adjust end line (ensure it doesn't exceed max lines or 50-line limit)
-        adjusted_end = min(
-            max(adjusted_start, adjusted_end),  # Ensure end >= start
-            adjusted_start + 50 - 1,  # Read max 50 lines
-            total_lines,  # Don't exceed file end
-        )
+        cached = file_cache.get(full_path)
+    except Exception as e:
+        return f"File: {full_path}\nError reading file: {str(e)}"
+    total_lines = cached.line_count
 
-        # Second pass: read the specified line range with line numbers
-        with open(full_path, "r", encoding="utf-8", errors="replace") as f:
-            for current_line, line in enumerate(f, 1):
-                if current_line < adjusted_start:
-                    continue
-                if current_line > adjusted_end:
-                    break
-                # Add line numbers to content
-                content_lines.append(f"{current_line:4d}: {line}")
+    # Handle invalid line range
+    if total_lines == 0 or adjusted_start > total_lines:
+        return f"File: {full_path}\nTotal lines: {total_lines}\nError: Invalid line range"
 
-        content = "".join(content_lines)
-        result = f"File: {full_path}\nTotal lines: {total_lines}\nShowing lines {adjusted_start}-{adjusted_end}:\n\n{content}"
-        return truncate_output(result)
+    # Adjust end line (ensure it doesn't exceed max lines or 50-line limit)
+    adjusted_end = min(
+        max(adjusted_start, end_line),  # Ensure end >= start
+        adjusted_start + 50 - 1,  # Read max 50 lines
+        total_lines,  # Don't exceed file end
+    )
 
-    except Exception as e:
+    # Add line numbers to content
+    content = "".join(
+        f"{number:4d}: {line}"
+        for number, line in enumerate(cached.lines(adjusted_start, adjusted_end), adjusted_start)
+    )
+    result = f"{note}File: {full_path}\nTotal lines: {total_lines}\nShowing lines {adjusted_start}-{adjusted_end}:\n\n{content}"
+    return truncate_output(result)
+
+
+# Part of the read_code_window budget kept for the header lines
+WINDOW_HEADER_TOKENS = 60
+
+
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
+)
+def read_code_window(file_path: str, start_line: int, end_line: int) -> str:
+    """
+    Read the code around a line range as a complete unit: the window is snapped to the
+    innermost enclosing method or class (or widened to cover entities it cuts through),
+    as long as that fits the output budget. Bodies of nested functions outside the
+    requested lines are replaced by `...` so the result stays syntactically complete.
+    Use this instead of read_file_lines when you want to see whole functions or classes.
+
+    :param file_path: Path to the file (relative or absolute)
+    :param start_line: First line of interest (1-based)
+    :param end_line: Last line of interest
+    :return: The window with line numbers, the entity it was snapped to and the elided ranges.
+    """
+    full_path, error = _resolve_project_path(file_path)
+    if error:
+        return error
+    note = ""
+    if not full_path.exists():
+        full_path, note = _approximate_path(file_path)
+        if full_path is None:
+            return f"File: {file_path}\nError: file does not exist" + (f"\n{note}" if note else "")
+    try:
+        cached = file_cache.get(full_path)
+    except OSError as e:
         return f"File: {full_path}\nError reading file: {str(e)}"
+    if cached.line_count == 0 or max(1, start_line) > cached.line_count:
+        return f"File: {full_path}\nTotal lines: {cached.line_count}\nError: Invalid line range"
+
+    budget = token_budget("read_code_window") - WINDOW_HEADER_TOKENS
+    spans = entity_spans(get_retriever(), str(full_path))
+    window = adaptive_window(cached, spans, start_line, end_line, fits=lambda text: estimate_tokens(text) <= budget)
+
+    header = f"{note}File: {full_path}\nTotal lines: {cached.line_count}\nShowing lines {window.start}-{window.end}"
+    if window.unit:
+        header += f" ({window.unit[1]} {window.unit[0]})"
+    elif (window.start, window.end) != (max(1, start_line), min(max(start_line, end_line), cached.line_count)):
+        header += " (widened to entity boundaries)"
+    if window.elided:
+        header += f"; bodies of {len(window.elided)} nested function(s) outside lines {start_line}-{end_line} elided"
+    return truncate_output(f"{header}:\n\n{window.text}")
+
+
+# Ranges of the same file closer than this many lines are read as one block
+READ_MERGE_GAP = 3
+_RANGE_SPEC = re.compile(r"^(?P<path>.+?):(?P<start>\d+)(?:-(?P<end>\d+))?$")
+
+
+def _merge_line_ranges(ranges: List[Tuple[int, int, str]], gap: int = READ_MERGE_GAP) -> List[Tuple[int, int, List[str]]]:
+    """Sort (start, end, label) ranges and merge overlapping or nearby ones, keeping their labels"""
+    merged = []
+    for start, end, label in sorted(ranges):
+        if merged and start <= merged[-1][1] + gap + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+            if label and label not in merged[-1][2]:
+                merged[-1][2].append(label)
+        else:
+            merged.append([start, end, [label] if label else []])
+    return [(start, end, labels) for start, end, labels in merged]
 
 
 @tool_registry.register(
-    agents=[AgentType.FIXER, AgentType.LOCALIZER]
+    agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER]
 )
-def search_code_with_context(keyword: str, search_path: str) -> str:
+def read_file_ranges(targets: List[Union[str, Tuple[str, int, int]]]) -> str:
+    """
+    Read several line ranges and/or whole entities in one call, without the 50-line limit
+    of read_file_lines. Prefer this over calling read_file_lines repeatedly.
+    Overlapping or adjacent ranges of the same file are merged and every file is read once;
+    the combined output shares one token budget (continue with next_page if it is cut).
+
+    :param targets: List of items, each either [file_path, start_line, end_line],
+        a "file_path:start-end" string, or the full_qualified_name of a method, class or variable.
+    :return: The requested code with line numbers, grouped by file.
     """
-    Search for lines containing the keyword in Python files, supporting both directory and file paths.
-    Returns the content of 3 lines before and after (including the matched line),
-    along with the file path and start/end line numbers.
+    if not targets:
+        return "No targets given. Pass [file_path, start_line, end_line] ranges or full_qualified_names."
+
+    notes = []
+    per_file = {}  # path -> [(start, end, label)], in first-seen order
+    graph_retriever = None
+    for target in targets:
+        if isinstance(target, str) and not _RANGE_SPEC.match(target):
+            graph_retriever = graph_retriever or get_retriever()
+            found = graph_retriever.find_entity(target.strip())
+            fqn = target.strip()
+            if found is None:
+                resolved, suggestions = graph_retriever.resolve_approximate_fqn(fqn)
+                found = graph_retriever.find_entity(resolved) if resolved else None
+                if found is None:
+                    notes.append(f"'{target}': no such entity" + (
+                        f". Did you mean: {', '.join(suggestions)}" if suggestions else ""))
+                    continue
+                notes.append(f"'{target}' not found; using {resolved}")
+                fqn = resolved
+            label, entity = found
+            per_file.setdefault(entity["absolute_path"], []).append(
+                (entity.get("start_line") or 1, entity.get("end_line") or 1, f"{label} {fqn}"))
+            continue
 
-    :param keyword: The keyword to search for.
-    :param search_path: The directory or file path to search in.
+        if isinstance(target, str):
+            match = _RANGE_SPEC.match(target)
+            file_path, start = match.group("path"), int(match.group("start"))
+            end = int(match.group("end") or start)
+        elif len(target) == 3:
+            file_path, start, end = target[0], int(target[1]), int(target[2])
+        else:
+            notes.append(f"{target}: expected [file_path, start_line, end_line]")
+            continue
+        full_path, error = _resolve_project_path(file_path)
+        if error:
+            notes.append(f"{file_path}: {error}")
+            continue
+        if not full_path.exists():
+            full_path, note = _approximate_path(file_path)
+            if full_path is None:
+                notes.append(f"{file_path}: file does not exist" + (f". {note.strip()}" if note else ""))
+                continue
+            notes.append(note.strip().replace("Note: ", "", 1))
+        start, end = max(1, start), max(start, end)
+        per_file.setdefault(str(full_path), []).append((start, end, ""))
+
+    out = [f"Note: {note}" for note in notes]
+    for path, ranges in per_file.items():
+        try:
+            cached = file_cache.get(path)
+        except OSError as e:
+            out.append(f"=== {_relative_to_project(path)} ===\nError reading file: {e}")
+            continue
+        out.append(f"=== {_relative_to_project(path)} ({cached.line_count} lines) ===")
+        for start, end, labels in _merge_line_ranges(ranges):
+            end = min(end, cached.line_count)
+            if start > end:
+                out.append(f"--- line {start} is past the end of the file ---")
+                continue
+            out.append(f"--- lines {start}-{end}" + (f" ({', '.join(labels)})" if labels else "") + " ---")
+            out.append("".join(
+                f"{number:4d}: {line}" for number, line in enumerate(cached.lines(start, end), start)
+            ).rstrip("\n"))
+    return truncate_output("\n".join(out))
+
+
+# Matches rendered by search_code_with_context; the output is paged through next_page
+SEARCH_MAX_MATCHES = 300
+
+
+def _focus_locations() -> List[Tuple[str, int, int]]:
+    """(absolute path, start, end) of the locations in the running agent's context"""
+    context = active_context.get()
+    if context is None or not context.locations:
+        return []
+    focus = []
+    for location in context.locations.locations:
+        path, error = _resolve_project_path(location.path)
+        if not error:
+            focus.append((str(path), location.start_line, location.end_line))
+    return focus
+
+
+# Ranking depends on the calling agent's current locations, not only on the arguments
+@tool_registry.register(
+    agents=[AgentType.FIXER, AgentType.LOCALIZER], cacheable=False
+)
+def search_code_with_context(
+    keyword: str,
+    search_path: str,
+    mode: str = "literal",
+    case_sensitive: bool = True,
+) -> str:
+    """
+    Search Python files for a keyword, a whole word or a regular expression,
+    supporting both directory and file paths. Each match comes with 3 lines
+    before and after it. Non-test code and matches near the current bug
+    locations are listed first; the total number of matches is reported. Long
+    results end with a next_page cursor.
+
+    :param keyword: The text (or regular expression when mode="regex") to search for.
+    :param search_path: The directory or file path to search in ("." for the whole project).
+    :param mode: "literal" (substring, default), "word" (whole identifier/word only) or "regex".
+    :param case_sensitive: Set to False for a case-insensitive search.
     :return: A formatted string of search results.
     """
     # Check if the path is relative and needs to be converted to absolute
-    path_obj = Path(search_path)
-    if not path_obj.is_absolute():
-        final_search_path = Path(settings.TEST_BED) / settings.PROJECT_NAME / search_path
-    else:
-        base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
-        try:
-            path_obj.relative_to(base_path)
-        except ValueError:
-            return f"Error: Absolute path does not start with {base_path}"
-        final_search_path = path_obj
-    final_search_path = str(final_search_path)
-    results = []
-
-    def search_in_file(file_path: str):
-        """Helper function to search for keyword in a single file"""
-        if not file_path.endswith(".py"):
-            return
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
-                lines = f.readlines()
-            for idx, line in enumerate(lines):
-                if keyword in line:
-                    start = max(0, idx - 3)
-                    end = min(len(lines), idx + 4)  # idx+4 because end is exclusive
-                    # Add line numbers to context
-                    context_lines = []
-                    for i in range(start, end):
-                        context_lines.append(f"{i + 1:4d}: {lines[i]}")
-                    context = "".join(context_lines)
-
-                    results.append(
-                        {
-                            file_path: {
-                                "start_line": start + 1,
-                                "end_line": end,
-                                "content": context,
-                            }
-                        }
-                    )
-
-                    # Limit to first 15 matches to prevent excessive output
-                    if len(results) >= 15:
-                        return True  # Signal to break outer loops
-        except Exception:
-            pass
-        return False
+    final_search_path, error = _resolve_project_path(search_path)
+    if error:
+        return error
+    final_search_path = os.path.normpath(str(final_search_path))
+    try:
+        pattern = compile_pattern(keyword, mode, case_sensitive)
+    except (ValueError, re.error) as e:
+        return f"Error: invalid search: {e}"
 
-    # Check if search_path is a file or directory
     if os.path.isfile(final_search_path):
-        # Single file search
-        search_in_file(final_search_path)
+        path_type, files = "file", [final_search_path]
     elif os.path.isdir(final_search_path):
-        # Directory search - walk through all files
-        for dirpath, _, filenames in os.walk(final_search_path):
-            for fname in filenames:
-                if not fname.endswith(".py"):
-                    continue
-                file_path = os.path.join(dirpath, fname)
-                if search_in_file(file_path):
-                    break  # Break if we hit the limit
-
-            # Break outer loop if we have enough results
-            if len(results) >= 15:
-                break
+        path_type = "directory"
+        # Python files known to the knowledge graph, plus those the cached directory tree
+        # has seen since (e.g. written by create_file after the build)
+        prefix = final_search_path.rstrip(os.sep) + os.sep
+        files = {path for path in get_retriever().path_modules if path.startswith(prefix)}
+        base_path = Path(settings.TEST_BED) / settings.PROJECT_NAME
+        rel_dir = os.path.relpath(final_search_path, base_path)
+        files.update(str(base_path / path) for path in get_file_tree().python_files(rel_dir))
+        files = sorted(files)
     else:
         return f"Path '{final_search_path}' does not exist or is not accessible."
 
-    # Format results as string
-    if not results:
-        path_type = "file" if os.path.isfile(final_search_path) else "directory"
+    hits = rank_hits(
+        search_files(files, pattern),
+        focus=_focus_locations(),
+        root=str(Path(settings.TEST_BED) / settings.PROJECT_NAME),
+    )
+    if not hits:
         return f"No matches found for '{keyword}' in {path_type} '{final_search_path}'"
 
-    path_type = "file" if os.path.isfile(final_search_path) else "directory"
-    result_str = f"Search results for '{keyword}' in {path_type} (showing first {len(results)} matches):\n\n"
-    for result_dict in results:
-        for file_path, content_info in result_dict.items():
-            result_str += f"File: {file_path}\n"
-            result_str += (
-                f"Lines {content_info['start_line']}-{content_info['end_line']}:\n"
-            )
-            result_str += f"{content_info['content']}\n"
-            result_str += "=" * 80 + "\n\n"
+    shown = hits[:SEARCH_MAX_MATCHES]
+    file_count = len({path for path, _, _ in hits})
+    result_str = (
+        f"Search results for '{keyword}' ({mode}) in {path_type} '{final_search_path}': "
+        f"{len(hits)} matches in {file_count} files"
+        + (f", showing the first {len(shown)}" if len(shown) < len(hits) else "")
+        + " (non-test code and matches near the current locations first):\n\n"
+    )
+    for file_path, line, _ in shown:
+        try:
+            cached = file_cache.get(file_path)
+        except OSError as e:
+            result_str += f"File: {file_path}\nError reading file: {str(e)}\n" + "=" * 80 + "\n\n"
+            continue
+        start, end = max(1, line - 3), min(cached.line_count, line + 3)
+        context = "".join(
+            f"{number:4d}: {text}" for number, text in enumerate(cached.lines(start, end), start)
+        )
+        result_str += f"File: {file_path}\n"
+        result_str += f"Lines {start}-{end}:\n"
+        result_str += f"{context}\n"
+        result_str += "=" * 80 + "\n\n"
+    if len(shown) < len(hits):
+        result_str += f"{len(hits) - len(shown)} more matches not shown; narrow the search path or pattern.\n"
 
     return truncate_output(result_str)
 
 
+@tool_registry.register(agents=[AgentType.FIXER, AgentType.LOCALIZER, AgentType.SUGGESTER], cacheable=False)
+def next_page(cursor: str) -> str:
+    """
+    Continue a tool result that was cut at its token budget.
+    Long outputs end with `call next_page(cursor="...")`; pass that cursor here to get
+    the next part of the same result (already computed, nothing is re-run).
+    :param cursor: The cursor string from the end of the previous output.
+    :return: The next part of the result, with a new cursor if more remains.
+    """
+    cursor = cursor.strip().strip('"')
+    entry = cursor_store.get(cursor)
+    if entry is None:
+        # Cached outputs that still point at this cursor would hand it out again
+        marker = f'cursor="{cursor}"'
+        tool_result_cache.discard_if(lambda result: isinstance(result, str) and marker in result)
+        return f"Error: unknown or expired cursor '{cursor}'. Re-run the original tool call."
+    tool_name, rest, budget = entry
+    return f"[{tool_name} output, continued]\n" + paginate(rest, tool_name, budget)
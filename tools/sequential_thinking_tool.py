@@ -78,7 +78,7 @@ def _validate_thought_data(
     }
 
 
-@tool_registry.register(agents=[AgentType.FIXER,AgentType.LOCALIZER,AgentType.SUGGESTER])
+@tool_registry.register(agents=[AgentType.FIXER,AgentType.LOCALIZER,AgentType.SUGGESTER], cacheable=False)
 def sequential_thinking(
     thought: str,
     thought_number: int,
@@ -0,0 +1,121 @@
+"""Shared cache of decoded file text with per-line offsets for the read tools"""
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List
+
+from settings import settings
+
+
+class CachedFile:
+    """Decoded text of one file plus the start offset of every line"""
+
+    __slots__ = ("path", "mtime_ns", "size", "text", "offsets")
+
+    def __init__(self, path: str, mtime_ns: int, size: int, text: str):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.text = text
+        # offsets[i] is where line i + 1 starts; the last entry is len(text)
+        offsets = array("q", [0])
+        find = text.find
+        position = find("\n")
+        while position != -1:
+            offsets.append(position + 1)
+            position = find("\n", position + 1)
+        if offsets[-1] != len(text):
+            offsets.append(len(text))
+        self.offsets = offsets
+
+    @property
+    def line_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def slice(self, start_line: int, end_line: int) -> str:
+        """Text of lines start_line..end_line (1-based, inclusive, clamped), line endings kept"""
+        start_line = max(1, start_line)
+        end_line = min(end_line, self.line_count)
+        if start_line > end_line:
+            return ""
+        return self.text[self.offsets[start_line - 1]:self.offsets[end_line]]
+
+    def lines(self, start_line: int, end_line: int) -> List[str]:
+        """Lines start_line..end_line (1-based, inclusive, clamped), line endings kept"""
+        offsets, text = self.offsets, self.text
+        return [text[offsets[i]:offsets[i + 1]] for i in range(max(0, start_line - 1), min(end_line, self.line_count))]
+
+    def line(self, number: int) -> str:
+        """One line without its line ending, "" when out of range"""
+        return self.slice(number, number).rstrip("\r\n")
+
+    def nbytes(self) -> int:
+        return len(self.text) + self.offsets.itemsize * len(self.offsets) + 200
+
+
+class FileTextCache:
+    """
+    path -> CachedFile, validated against the file's mtime and size on every get()
+    (one stat call, no read when unchanged). Edits made through the fixer tools
+    also invalidate entries explicitly. Least recently used files are evicted once
+    the cached text exceeds max_bytes (0 = unbounded).
+    """
+
+    def __init__(self, max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self._files: "OrderedDict[str, CachedFile]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path) -> CachedFile:
+        """
+        Cached text of path, re-read when the file changed on disk.
+        Decodes as UTF-8 with replacement and universal newlines, like open(..., errors="replace").
+
+        Raises:
+            OSError: the file does not exist or cannot be read
+        """
+        key = os.fspath(path)
+        stat = os.stat(key)
+        with self._lock:
+            cached = self._files.get(key)
+            if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+                self._files.move_to_end(key)
+                self.hits += 1
+                return cached
+        with open(key, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        cached = CachedFile(key, stat.st_mtime_ns, stat.st_size, text)
+        with self._lock:
+            self.misses += 1
+            self._discard(key)
+            self._files[key] = cached
+            self._bytes += cached.nbytes()
+            while self.max_bytes and self._bytes > self.max_bytes and len(self._files) > 1:
+                _, evicted = self._files.popitem(last=False)
+                self._bytes -= evicted.nbytes()
+        return cached
+
+    def invalidate(self, path=None):
+        """Drop one file (after an edit) or, without a path, everything"""
+        with self._lock:
+            if path is None:
+                self._files.clear()
+                self._bytes = 0
+            else:
+                self._discard(os.fspath(path))
+
+    def _discard(self, key: str):
+        cached = self._files.pop(key, None)
+        if cached is not None:
+            self._bytes -= cached.nbytes()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+
+# Process-wide cache shared by the read tools; the fixer tools invalidate the files they write
+file_cache = FileTextCache(max_bytes=settings.FILE_CACHE_MAX_MB * 2 ** 20)
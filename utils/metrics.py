@@ -1,6 +1,12 @@
-from prometheus_client import Counter, generate_latest
-from typing import Dict, Any
+from prometheus_client import Counter, Histogram, generate_latest
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from contextvars import ContextVar
+from contextlib import contextmanager
 from datetime import datetime
+import functools
+import inspect
+import threading
+import time
 from rich.table import Table
 from rich.console import Console
 from rich.panel import Panel
@@ -13,6 +19,13 @@ tool_usage_counter = Counter(
     ['tool_name']
 )
 
+# Counter to track tool calls served from the tool result cache (including calls that joined an identical running call)
+tool_cache_hits_counter = Counter(
+    'tool_cache_hits_total',
+    'Total count of tool calls served from the result cache by tool name',
+    ['tool_name']
+)
+
 # Counter to track agent runs
 agent_runs_counter = Counter(
     'agent_runs_total',
@@ -20,10 +33,189 @@ agent_runs_counter = Counter(
     ['agent_name']
 )
 
+# Latency / size histograms for tool calls and retriever queries
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CHARS_BUCKETS = (0, 100, 500, 1000, 2000, 4000, 8888, 16000, 32000, 64000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+tool_latency_histogram = Histogram(
+    'tool_latency_seconds',
+    'Tool call latency in seconds',
+    ['tool_name', 'agent'],
+    buckets=LATENCY_BUCKETS
+)
+
+tool_output_chars_histogram = Histogram(
+    'tool_output_chars',
+    'Size of tool output in characters',
+    ['tool_name', 'agent'],
+    buckets=CHARS_BUCKETS
+)
+
+tool_result_count_histogram = Histogram(
+    'tool_result_count',
+    'Number of results returned by a tool (lines for text output)',
+    ['tool_name', 'agent'],
+    buckets=COUNT_BUCKETS
+)
+
+retriever_query_latency_histogram = Histogram(
+    'retriever_query_latency_seconds',
+    'Retriever query latency in seconds',
+    ['query', 'tool_name', 'agent'],
+    buckets=LATENCY_BUCKETS
+)
+
+retriever_result_count_histogram = Histogram(
+    'retriever_query_result_count',
+    'Number of results returned by a retriever query',
+    ['query', 'tool_name', 'agent'],
+    buckets=COUNT_BUCKETS
+)
+
+# Agent and tool currently executing; used as metric labels
+current_agent: ContextVar[str] = ContextVar('current_agent', default='none')
+current_tool: ContextVar[str] = ContextVar('current_tool', default='none')
+
+
+class RunStats:
+    """Per-run aggregate of tool call and retriever query timings."""
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+        self._lock = threading.Lock()
+        # (kind, name) -> [calls, total_seconds, max_seconds, total_chars]
+        self.rows: Dict[Tuple[str, str], List[float]] = {}
+
+    def record(self, kind: str, name: str, seconds: float, chars: int = 0) -> None:
+        with self._lock:
+            row = self.rows.setdefault((kind, name), [0, 0.0, 0.0, 0])
+            row[0] += 1
+            row[1] += seconds
+            row[2] = max(row[2], seconds)
+            row[3] += chars
+
+
+_current_run: ContextVar[Optional[RunStats]] = ContextVar('current_run', default=None)
+
+
+@contextmanager
+def track_agent_run(agent_name: str, stats: RunStats):
+    """Label metrics recorded inside the block with agent_name and aggregate them into stats."""
+    agent_token = current_agent.set(agent_name)
+    run_token = _current_run.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_run.reset(run_token)
+        current_agent.reset(agent_token)
+
+
+def result_count(result: Any) -> int:
+    """Number of results: length for collections, non-empty lines for text."""
+    if result is None:
+        return 0
+    if isinstance(result, str):
+        return sum(1 for line in result.splitlines() if line.strip())
+    if isinstance(result, (list, tuple, set, dict)):
+        return len(result)
+    return 1
+
+
+def record_tool_call(tool_name: str, seconds: float, result: Any) -> None:
+    """Record latency, output size and result count of one tool call."""
+    agent = current_agent.get()
+    chars = len(result) if isinstance(result, str) else len(str(result))
+    tool_latency_histogram.labels(tool_name=tool_name, agent=agent).observe(seconds)
+    tool_output_chars_histogram.labels(tool_name=tool_name, agent=agent).observe(chars)
+    tool_result_count_histogram.labels(tool_name=tool_name, agent=agent).observe(result_count(result))
+    stats = _current_run.get()
+    if stats is not None:
+        stats.record('tool', tool_name, seconds, chars)
+
+
+def record_retriever_query(query: str, seconds: float, result: Any) -> None:
+    """Record latency and result count of one retriever query."""
+    labels = dict(query=query, tool_name=current_tool.get(), agent=current_agent.get())
+    retriever_query_latency_histogram.labels(**labels).observe(seconds)
+    retriever_result_count_histogram.labels(**labels).observe(result_count(result))
+    stats = _current_run.get()
+    if stats is not None:
+        stats.record('query', query, seconds)
+
+
+def instrument_tool(tool_name: str, func: Callable) -> Callable:
+    """Wrap a tool so every call is timed and measured; keeps the signature for schema generation."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token = current_tool.set(tool_name)
+            start = time.perf_counter()
+            result = None
+            try:
+                result = await func(*args, **kwargs)
+                return result
+            finally:
+                record_tool_call(tool_name, time.perf_counter() - start, result)
+                current_tool.reset(token)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = current_tool.set(tool_name)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            record_tool_call(tool_name, time.perf_counter() - start, result)
+            current_tool.reset(token)
+    return wrapper
+
+
+def instrument_queries(cls):
+    """Class decorator: time every public method of a retriever class."""
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_') or not inspect.isfunction(value) or attr in ('close', 'change_focal_method_id'):
+            continue
+
+        def make_wrapper(method, query_name):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                result = None
+                try:
+                    result = method(*args, **kwargs)
+                    return result
+                finally:
+                    record_retriever_query(query_name, time.perf_counter() - start, result)
+            return wrapper
+
+        setattr(cls, attr, make_wrapper(value, attr))
+    return cls
+
+
 def increment_tool_usage(tool_name: str) -> None:
     """Increment the tool usage counter for a given tool name."""
     tool_usage_counter.labels(tool_name=tool_name).inc()
 
+def record_tool_cache_hit(tool_name: str) -> None:
+    """Count one tool call answered from the result cache."""
+    tool_cache_hits_counter.labels(tool_name=tool_name).inc()
+
+def get_tool_cache_hit_stats() -> Dict[str, int]:
+    """Cache hits per tool name."""
+    return {
+        sample.labels['tool_name']: int(sample.value)
+        for metric in tool_cache_hits_counter.collect()
+        for sample in metric.samples
+        if sample.name == 'tool_cache_hits_total'
+    }
+
+def _hit_rate(hits: int, count: int) -> str:
+    return f"{100 * min(hits, count) / count:.0f}%" if count else "-"
+
 def increment_agent_run(agent_name: str) -> None:
     """Increment the agent run counter for a given agent name."""
     agent_runs_counter.labels(agent_name=agent_name).inc()
@@ -71,16 +263,22 @@ def format_tool_usage_stats() -> str:
     table = Table(title="📊 Tool Usage Statistics", show_header=True, header_style="bold magenta")
     table.add_column("Tool Name", style="cyan", width=40)
     table.add_column("Count", style="green", justify="right")
+    table.add_column("Cache hits", justify="right")
+    table.add_column("Hit rate", justify="right")
 
+    cache_hits = get_tool_cache_hit_stats()
     for tool_name, count in sorted_stats:
-        table.add_row(tool_name, str(count))
+        hits = cache_hits.get(tool_name, 0)
+        table.add_row(tool_name, str(count), str(hits), _hit_rate(hits, count))
 
     # Create summary information
     total_unique = len(stats)
     total_invocations = sum(stats.values())
+    total_hits = sum(cache_hits.get(tool_name, 0) for tool_name in stats)
 
     summary_text = Text(f"\nTotal unique tools used: {total_unique}\n")
     summary_text.append(f"Total tool invocations: {total_invocations}\n")
+    summary_text.append(f"Served from cache: {total_hits} ({_hit_rate(total_hits, total_invocations)})\n")
     summary_text.append(f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
     # Create a panel with the table and summary
@@ -120,16 +318,22 @@ def print_tool_usage_stats():
     table = Table(title="", show_header=True, header_style="bold magenta")
     table.add_column("Tool Name", style="cyan", width=40)
     table.add_column("Count", style="green", justify="right")
+    table.add_column("Cache hits", justify="right")
+    table.add_column("Hit rate", justify="right")
 
+    cache_hits = get_tool_cache_hit_stats()
     for tool_name, count in sorted_stats:
-        table.add_row(tool_name, str(count))
+        hits = cache_hits.get(tool_name, 0)
+        table.add_row(tool_name, str(count), str(hits), _hit_rate(hits, count))
 
     # Create summary information
     total_unique = len(stats)
     total_invocations = sum(stats.values())
+    total_hits = sum(cache_hits.get(tool_name, 0) for tool_name in stats)
 
     summary_text = Text(f"\nTotal unique tools used: {total_unique}\n")
     summary_text.append(f"Total tool invocations: {total_invocations}\n")
+    summary_text.append(f"Served from cache: {total_hits} ({_hit_rate(total_hits, total_invocations)})\n")
     summary_text.append(f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
     # Print the panel with the table and summary
@@ -141,4 +345,43 @@ def print_tool_usage_stats():
         expand=False
     )
 
-    console.print(panel)
\ No newline at end of file
+    console.print(panel)
+
+
+def print_tool_latency_summary(stats: RunStats) -> None:
+    """Print the per-run latency table, slowest tools and queries first."""
+    if not stats.rows:
+        return
+
+    table = Table(title="", show_header=True, header_style="bold magenta")
+    table.add_column("Kind", style="white", no_wrap=True)
+    table.add_column("Name", style="cyan", overflow="fold")
+    table.add_column("Calls", style="green", justify="right", no_wrap=True)
+    table.add_column("Total s", style="red", justify="right", no_wrap=True)
+    table.add_column("Mean ms", justify="right", no_wrap=True)
+    table.add_column("Max ms", justify="right", no_wrap=True)
+    table.add_column("Chars", justify="right", no_wrap=True)
+
+    ordered = sorted(stats.rows.items(), key=lambda item: item[1][1], reverse=True)
+    for (kind, name), (calls, total, longest, chars) in ordered:
+        table.add_row(
+            kind,
+            name,
+            str(int(calls)),
+            f"{total:.3f}",
+            f"{1000 * total / calls:.1f}",
+            f"{1000 * longest:.1f}",
+            str(int(chars / calls)) if kind == 'tool' else "-",
+        )
+
+    tool_total = sum(row[1] for (kind, _), row in stats.rows.items() if kind == 'tool')
+    summary_text = Text(f"\nTime spent in tools: {tool_total:.2f}s\n")
+    summary_text.append(f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    Console().print(Panel(
+        table,
+        title=f"Tool Latency ({stats.agent_name})",
+        subtitle=summary_text,
+        border_style="blue",
+        expand=False
+    ))